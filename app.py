@@ -2,23 +2,39 @@ from fastapi import FastAPI, Request, Form, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse
 import os
 import logging
 import json
+from contextlib import asynccontextmanager
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Import our modules
-from src.flashcards.database import csv_db
+from src.flashcards.database import db
 from src.flashcards.routes import api
 from src.flashcards.ai import gemini
-from src.flashcards.utils.template_helper import get_common_context
+from src.flashcards.utils import metrics, rate_limit, url_extractor
+from src.flashcards.utils.template_helper import get_common_context, get_flashcard_page_context, get_study_context
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Set up storage on startup; write queued history rows, save the search
+    index and close pooled connections before the process exits
+
+    The model provider is created on the first model call (see gemini.py).
+    """
+    db.init_database()
+    yield
+    await url_extractor.close_client()
+    db.close_history()
+    db.close_search_index()
 
 # Initialize FastAPI app
-app = FastAPI(title="StudyWAI - AI-Powered Flashcard Application")
+app = FastAPI(title="StudyWAI - AI-Powered Flashcard Application", lifespan=lifespan)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -26,7 +42,14 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 # Set up templates
 templates = Jinja2Templates(directory="app/templates")
 
-# Add CORS middleware
+# Per-client token buckets for the endpoints that call the model
+client_limiter = rate_limit.ClientLimiter()
+app.add_middleware(rate_limit.RateLimitMiddleware, limiter=client_limiter)
+
+# Request latency per route for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Add CORS middleware (outermost, so 429 responses carry the CORS headers too)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -35,20 +58,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize database
-csv_db.init_database()
-
 # Include API router
 app.include_router(api.router)
 
 # Define web routes directly in app.py
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
-    """Homepage showing all flashcards"""
-    flashcards = csv_db.get_flashcards()
+    """Homepage showing a page of flashcards"""
     context = get_common_context()
     context["nav_info"]["current_path"] = "/"
-    context["flashcards"] = flashcards.to_dict('records')
+    try:
+        context.update(get_flashcard_page_context(request, "/"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return templates.TemplateResponse("index.html", {"request": request, **context})
 
@@ -63,9 +85,15 @@ async def create_get(request: Request):
 async def create_post(
     request: Request,
     word: str = Form(...),
-    language: str = Form("english")
+    language: str = Form("english"),
+    force: bool = Form(False)
 ):
-    """Handle flashcard creation form submission"""
+    """
+    Handle flashcard creation form submission
+    
+    Words with an existing card or a near duplicate are sent back with the
+    matches listed, before any model call; ``force`` creates them anyway.
+    """
     if not word.strip():
         context = get_common_context()
         context["nav_info"]["current_path"] = "/create"
@@ -74,11 +102,21 @@ async def create_post(
             {"request": request, **context, "error": "Please enter a word"}
         )
     
+    if not force:
+        duplicates = db.find_duplicate_flashcards(word, language)
+        if duplicates:
+            context = get_common_context()
+            context["nav_info"]["current_path"] = "/create"
+            return templates.TemplateResponse(
+                "create.html",
+                {"request": request, **context, "duplicates": duplicates, "word": word, "language": language}
+            )
+    
     try:
         # Use Gemini to generate flashcard content
         flashcard_data = await gemini.generate_flashcard_data(word, language)
         
-        csv_db.save_flashcard(
+        db.save_flashcard(
             word=word,
             language=language,
             translations=flashcard_data['translations'],
@@ -98,7 +136,7 @@ async def create_post(
 @app.get("/edit/{flashcard_id}", response_class=HTMLResponse)
 async def edit_get(request: Request, flashcard_id: int):
     """Flashcard edit page"""
-    flashcard = csv_db.get_flashcard(flashcard_id)
+    flashcard = db.get_flashcard(flashcard_id)
     if not flashcard:
         return RedirectResponse(url="/", status_code=303)
     
@@ -120,7 +158,7 @@ async def edit_post(
 ):
     """Handle flashcard edit form submission"""
     if not word.strip():
-        flashcard = csv_db.get_flashcard(flashcard_id)
+        flashcard = db.get_flashcard(flashcard_id)
         
         context = get_common_context()
         context["nav_info"]["current_path"] = f"/edit/{flashcard_id}"
@@ -129,7 +167,7 @@ async def edit_post(
         
         return templates.TemplateResponse("edit.html", {"request": request, **context})
     
-    csv_db.save_flashcard(
+    db.save_flashcard(
         word=word,
         language=language,
         translations=translations,
@@ -145,7 +183,7 @@ async def delete(flashcard_id: int, request: Request):
     """Delete a flashcard"""
     try:
         # Check if flashcard exists first
-        flashcard = csv_db.get_flashcard(flashcard_id)
+        flashcard = db.get_flashcard(flashcard_id)
         if not flashcard:
             # Return a JSON response for API clients or redirect with message for browser
             if request.headers.get('content-type') == 'application/json':
@@ -160,7 +198,7 @@ async def delete(flashcard_id: int, request: Request):
                 )
                 
         # Delete the flashcard
-        csv_db.delete_flashcard(flashcard_id)
+        db.delete_flashcard(flashcard_id)
         
         # Return appropriate response based on request type
         if request.headers.get('content-type') == 'application/json':
@@ -205,12 +243,10 @@ async def delete_get(flashcard_id: int, request: Request):
 
 @app.get("/study", response_class=HTMLResponse)
 async def study(request: Request):
-    """Study page for flashcards"""
-    flashcards = csv_db.get_flashcards()
-    
+    """Study page for the flashcards due for review"""
     context = get_common_context()
     context["nav_info"]["current_path"] = "/study"
-    context["flashcards"] = flashcards.to_dict('records')
+    context.update(get_study_context(request))
     
     return templates.TemplateResponse("study.html", {"request": request, **context})
 
@@ -243,7 +279,7 @@ async def chatbot(request: Request):
     context["nav_info"]["current_path"] = "/chatbot"
     
     # Get recent chat history
-    context["chat_history"] = csv_db.get_chat_history(5)
+    context["chat_history"] = db.get_chat_history(5)
     
     return templates.TemplateResponse("chatbot.html", {"request": request, **context})
 
@@ -254,6 +290,7 @@ async def api_chat(request: Request):
         data = await request.json()
         message = data.get("message", "")
         context = data.get("context", "")
+        session_id = data.get("session_id")
         
         if not message:
             return JSONResponse(
@@ -261,10 +298,18 @@ async def api_chat(request: Request):
                 status_code=400
             )
         
+        if session_id is None:
+            session_id = db.create_chat_session()["id"]
+        elif db.get_chat_session(session_id) is None:
+            return JSONResponse(
+                content={"error": "Chat session not found"}, 
+                status_code=404
+            )
+        
         # Use the chat_with_ai function from gemini
-        response = await gemini.chat_with_ai(message, context)
+        response = await gemini.chat_with_ai(message, context, session_id)
         
-        return JSONResponse(content={"response": response})
+        return JSONResponse(content={"response": response, "session_id": session_id})
     except Exception as e:
         logger.error(f"Error in chat API: {str(e)}")
         return JSONResponse(
@@ -276,7 +321,7 @@ async def api_chat(request: Request):
 async def api_history(feature: str, limit: int = 10):
     """Get history of interactions for a specific feature"""
     try:
-        history = csv_db.get_query_log(feature, limit)
+        history = db.get_query_log(feature, limit)
         return JSONResponse(content={"history": history})
     except Exception as e:
         logger.error(f"Error getting history: {str(e)}")
@@ -290,6 +335,11 @@ async def healthcheck():
     """Simple health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Metrics in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Run the app with uvicorn when this file is executed directly
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,166 @@
+"""
+Chat sessions: summarized history versus the whole conversation in each prompt
+
+Uses a fake model whose latency grows with the prompt and the reply, like
+a hosted model's: a fixed round trip, a cost per input token (prefill) and
+a cost per output token (decoding). Replies are about 60 words. It runs one
+conversation of --turns turns two ways:
+
+- "naive": every earlier exchange concatenated into each prompt
+- "session": gemini.chat_with_ai with a session, which sends the rolling
+  summary and the recent turns after it; summary calls are included in
+  the time
+
+For each it reports prompt tokens (first, median, last, max) and the total
+and per-turn latency. It also times reading the last turns once the turn
+log holds --history exchanges: get_recent_chat_turns against reading the
+whole history CSV to sort it, as get_chat_history did before.
+
+Run from the repository root:
+
+    python benchmarks/bench_chat_sessions.py --turns 200
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('AI_PROVIDER', 'fake')
+
+import pandas as pd
+
+from src.flashcards.ai import gemini
+from src.flashcards.ai.chunking import estimate_tokens
+from src.flashcards.ai.fake_model import FakeProvider, respond
+from src.flashcards.database import csv_db
+
+WORDS = ('verb tense noun article gender plural subjunctive past future pronoun accent vowel example '
+         'sentence phrase meaning usage formal informal question').split()
+
+
+class TimedModel(FakeProvider):
+    """FakeProvider with prompt- and reply-dependent latency and longer chat replies"""
+
+    def __init__(self, round_trip, prefill_ms, decode_ms):
+        super().__init__()
+        self.round_trip = round_trip
+        self.prefill = prefill_ms / 1000
+        self.decode = decode_ms / 1000
+        self.rng = random.Random(1)
+        self.prompt_tokens = []
+
+    def generate(self, prompt):
+        self.calls += 1
+        text = respond(prompt)
+        if 'Update the summary' not in prompt:
+            self.prompt_tokens.append(estimate_tokens(prompt))
+            text = ' '.join(self.rng.choice(WORDS) for _ in range(60)).capitalize() + '.'
+        time.sleep(self.round_trip + estimate_tokens(prompt) * self.prefill + estimate_tokens(text) * self.decode)
+        return text
+
+
+def messages(turns):
+    rng = random.Random(2)
+    return [f'Question {i}: how do I use the ' + ' '.join(rng.choice(WORDS) for _ in range(12)) + '?'
+            for i in range(turns)]
+
+
+async def naive(conversation):
+    exchanges = []
+    for message in conversation:
+        reply = await gemini._generate(gemini._chat_prompt(message, None, turns=exchanges), timeout=3600)
+        exchanges.append({'user_message': message, 'ai_response': reply})
+
+
+async def session(conversation):
+    session_id = csv_db.create_chat_session()['id']
+    for message in conversation:
+        await gemini.chat_with_ai(message, session_id=session_id)
+
+
+def run(name, model, conversation, coroutine):
+    model.prompt_tokens = []
+    calls = model.calls
+    started = time.perf_counter()
+    asyncio.run(coroutine(conversation))
+    elapsed = time.perf_counter() - started
+    tokens = model.prompt_tokens
+    return name, {
+        'prompt_tokens': {
+            'first': tokens[0],
+            'median': sorted(tokens)[len(tokens) // 2],
+            'last': tokens[-1],
+            'max': max(tokens),
+        },
+        'total_s': round(elapsed, 2),
+        'per_turn_ms': round(elapsed / len(conversation) * 1000, 1),
+        'model_calls': model.calls - calls,
+    }
+
+
+def retrieval(history, limit):
+    """Time reading the last ``limit`` turns with ``history`` exchanges stored"""
+    session_id = csv_db.create_chat_session()['id']
+    for i in range(history):
+        csv_db.save_chat_history(f'question {i}', f'answer {i}', session_id)
+    with open(csv_db.CHAT_HISTORY_CSV, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_db.CHAT_HISTORY_COLUMNS)
+        writer.writerows([i, f'question {i}', f'answer {i}', '2024-01-01 10:00:00'] for i in range(history))
+
+    def timed(read, repeat=20):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            read()
+        return round((time.perf_counter() - started) / repeat * 1000, 3)
+
+    return {
+        'history': history,
+        'recent_turns_ms': timed(lambda: csv_db.get_recent_chat_turns(session_id, limit)),
+        'latest_history_ms': timed(lambda: csv_db.get_chat_history(limit)),
+        'read_csv_ms': timed(lambda: pd.read_csv(csv_db.CHAT_HISTORY_CSV)
+                             .sort_values(by='id', ascending=False).head(limit).to_dict('records')),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--history', type=int, default=20000, help='exchanges stored for the retrieval timing')
+    parser.add_argument('--round-trip', type=float, default=0.02, help='seconds of fixed latency per call')
+    parser.add_argument('--prefill-ms', type=float, default=0.05, help='ms per input token')
+    parser.add_argument('--decode-ms', type=float, default=0.5, help='ms per output token')
+    args = parser.parse_args()
+
+    model = TimedModel(args.round_trip, args.prefill_ms, args.decode_ms)
+    gemini.provider = model
+    conversation = messages(args.turns)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Chat turns and sessions are saved under app/data
+        os.chdir(tmp)
+        csv_db.init_database()
+        try:
+            results = dict(run(name, model, conversation, coroutine)
+                           for name, coroutine in (('naive', naive), ('session', session)))
+            results['retrieval'] = retrieval(args.history, 5)
+        finally:
+            csv_db.close_history()
+            os.chdir(cwd)
+    print(json.dumps({
+        'turns': args.turns,
+        'history_tokens': gemini.CHAT_HISTORY_TOKENS,
+        'recent_turns': csv_db.CHAT_RECENT_TURNS,
+        **results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Due-card queue: next N due cards as the deck grows
+
+Seeds decks of N flashcards created over a year, a third of them already
+reviewed with due dates spread over the next month, and on each storage
+backend reports:
+
+- p50/p99 latency of get_due_flashcards(limit=20)
+- p50/p99 of a study loop step: review the first due card, then fetch the
+  next 20 (the queue takes the change in before answering)
+- the csv queue's build time, and a full scan for comparison: sorting the
+  whole deck by due time, which is what answering without the heap costs
+
+Run from the repository root:
+
+    python benchmarks/bench_due_queue.py --cards 10000 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.flashcards.database import csv_db, scheduler, sqlite_db
+from src.flashcards.database.record_log import RecordLog
+
+LANGUAGES = ['english', 'spanish', 'french', 'german', 'italian', 'vietnamese', 'japanese', 'korean']
+NOW = datetime(2025, 1, 1, 12, 0, 0)
+
+
+def generate(n, seed=1):
+    """Yield (card row, schedule or None) pairs"""
+    rng = random.Random(seed)
+    start = NOW - timedelta(days=365)
+    for i in range(1, n + 1):
+        created = (start + timedelta(seconds=i * 365 * 86400 // n)).strftime(scheduler.TIMESTAMP_FORMAT)
+        row = [i, f'word{i}', LANGUAGES[i % len(LANGUAGES)], f'translation {i}', '', 'An example', created, created]
+        schedule = None
+        if i % 3 == 0:
+            reviewed = NOW - timedelta(days=rng.randint(0, 30))
+            schedule = scheduler.next_review(scheduler.new_schedule(created), 4, reviewed)
+            schedule['due'] = (NOW + timedelta(seconds=rng.randint(-86400, 30 * 86400))).strftime(scheduler.TIMESTAMP_FORMAT)
+        yield row, schedule
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return {
+        'p50_ms': round(timings[len(timings) // 2] * 1000, 3),
+        'p99_ms': round(timings[int(len(timings) * 0.99)] * 1000, 3),
+    }
+
+
+def measure(backend, now, repeat):
+    fetch = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        backend.get_due_flashcards(20, None, now)
+        fetch.append(time.perf_counter() - started)
+
+    study = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        first = backend.get_due_flashcards(1, None, now)[0]
+        backend.review_flashcard(first['id'], 4)
+        backend.get_due_flashcards(20, None, now)
+        study.append(time.perf_counter() - started)
+    return {'fetch_20': percentiles(fetch), 'review_then_fetch': percentiles(study)}
+
+
+def run_csv(pairs, now, repeat):
+    cards = RecordLog(csv_db.FLASHCARDS_LOG).open()
+    schedules = RecordLog(csv_db.SCHEDULES_LOG).open()
+    for start in range(0, len(pairs), 50000):
+        batch = pairs[start:start + 50000]
+        cards.put_many([dict(zip(csv_db.FLASHCARD_COLUMNS, row)) for row, _ in batch])
+        schedules.put_many([{'id': row[0], **schedule} for row, schedule in batch if schedule])
+    csv_db._flashcard_log = cards
+    csv_db._schedule_log = schedules
+
+    started = time.perf_counter()
+    csv_db._flashcard_due_queue()
+    build = time.perf_counter() - started
+
+    # Without the queue: order every card by its due time
+    started = time.perf_counter()
+    due = {row[0]: row[6] for row, _ in pairs}
+    due.update((row[0], schedule['due']) for row, schedule in pairs if schedule)
+    sorted((value, card_id) for card_id, value in due.items() if value <= now)[:20]
+    scan = time.perf_counter() - started
+
+    result = {'queue_build_s': round(build, 2), 'full_scan_ms': round(scan * 1000, 1)}
+    result.update(measure(csv_db, now, repeat))
+
+    csv_db.close_history()
+    cards.close()
+    schedules.close()
+    csv_db._flashcard_log = csv_db._schedule_log = csv_db._due_queue = None
+    # Otherwise the sqlite backend imports them on first start
+    os.remove(csv_db.FLASHCARDS_LOG)
+    os.remove(csv_db.SCHEDULES_LOG)
+    return result
+
+
+def run_sqlite(pairs, now, repeat):
+    sqlite_db.init_database()
+    conn = sqlite_db._connect()
+    with conn:
+        conn.executemany(f"INSERT INTO flashcards VALUES ({', '.join('?' * 8)})", [row for row, _ in pairs])
+        conn.executemany(
+            f"UPDATE schedules SET {', '.join(column + ' = ?' for column in csv_db.SCHEDULE_COLUMNS)} WHERE flashcard_id = ?",
+            [[schedule[column] for column in csv_db.SCHEDULE_COLUMNS] + [row[0]] for row, schedule in pairs if schedule],
+        )
+    result = measure(sqlite_db, now, repeat)
+    sqlite_db.close_history()
+    return result
+
+
+def run(n, repeat):
+    pairs = list(generate(n))
+    now = NOW.strftime(scheduler.TIMESTAMP_FORMAT)
+    result = {'cards': n}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs(csv_db.DATA_DIR)
+        result['csv'] = run_csv(pairs, now, repeat)
+        result['sqlite'] = run_sqlite(pairs, now, repeat)
+        os.chdir('/')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cards', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    try:
+        results = [run(n, args.repeat) for n in args.cards]
+    finally:
+        os.chdir(cwd)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Near-duplicate checks for new words against a large deck
+
+Seeds N flashcards whose words are built from syllables, so they share
+3-grams the way real words do, with most cards in one language. Times
+find_duplicate_flashcards on both backends for four kinds of new words:
+
+- "exact": an existing word with different case and spacing
+- "inflected": an existing word plus "s" or "ing", which should find it
+- "new": a word not in the deck
+- "short": a 3-letter word, whose 3-grams are the most common ones
+
+It also reports the csv index build time and memory, and the recall of
+"inflected" words. For comparison, "brute_force" scores the new word
+against the vector of every card of its language.
+
+Run from the repository root:
+
+    python benchmarks/bench_duplicates.py --cards 500000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.flashcards.database import csv_db, duplicate_index, sqlite_db
+from src.flashcards.database.record_log import RecordLog
+
+CONSONANTS = 'bcdfghjklmnprstvwz'
+VOWELS = 'aeiou'
+
+
+def generate(n, seed=1):
+    """Return card rows with distinct words, 80% of them english"""
+    rng = random.Random(seed)
+    syllables = [c + v for c in CONSONANTS for v in VOWELS] + [c + v + c2 for c in CONSONANTS[:8] for v in VOWELS for c2 in 'nrst']
+    words = set()
+    while len(words) < n:
+        words.add(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return [
+        [i + 1, word, 'english' if i % 5 else 'spanish', '', '', '', '2024-01-01 00:00:00', '2024-01-01 00:00:00']
+        for i, word in enumerate(words)
+    ]
+
+
+def queries(cards, count, seed=2):
+    rng = random.Random(seed)
+    english = [card for card in cards if card[2] == 'english']
+    existing = {card[1] for card in cards}
+    mix = []
+    for i in range(count):
+        word = rng.choice(english)[1]
+        kind = ('exact', 'inflected', 'new', 'short')[i % 4]
+        if kind == 'exact':
+            mix.append((kind, f' {word.upper()} ', word))
+        elif kind == 'inflected':
+            mix.append((kind, word + rng.choice(['s', 'ing']), word))
+        elif kind == 'new':
+            new = word[::-1] + 'q'
+            while new in existing:
+                new += 'q'
+            mix.append((kind, new, None))
+        else:
+            mix.append((kind, rng.choice(CONSONANTS) + rng.choice(VOWELS) + rng.choice(CONSONANTS), None))
+    return mix
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return {
+        'p50_ms': round(timings[len(timings) // 2] * 1000, 3),
+        'p99_ms': round(timings[int(len(timings) * 0.99)] * 1000, 3),
+    }
+
+
+def timed_queries(find, mix):
+    by_kind = {}
+    found = 0
+    for kind, word, base in mix:
+        started = time.perf_counter()
+        matches = find(word, 'english')
+        by_kind.setdefault(kind, []).append(time.perf_counter() - started)
+        if kind == 'inflected' and base in [match['word'] for match in matches]:
+            found += 1
+    result = {kind: percentiles(timings) for kind, timings in by_kind.items()}
+    result['all'] = percentiles([t for timings in by_kind.values() for t in timings])
+    result['inflected_recall'] = round(found / len(by_kind['inflected']), 3)
+    return result
+
+
+def brute_force(index, mix):
+    """Score every english card for each word"""
+    vectors = index._vectors[index._language_codes == index._languages['english']]
+    timings = []
+    for _, word, _ in mix[:200]:
+        started = time.perf_counter()
+        scores = duplicate_index.similarities(duplicate_index.vector(word), vectors)
+        np.flatnonzero(scores >= duplicate_index.DUPLICATE_THRESHOLD)
+        timings.append(time.perf_counter() - started)
+    return percentiles(timings)
+
+
+def run(n, count):
+    cards = generate(n)
+    mix = queries(cards, count)
+    result = {'cards': n}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs(csv_db.DATA_DIR)
+        log = RecordLog(csv_db.FLASHCARDS_LOG).open()
+        for start in range(0, n, 50000):
+            log.put_many([dict(zip(csv_db.FLASHCARD_COLUMNS, row)) for row in cards[start:start + 50000]])
+        csv_db._flashcard_log = log
+
+        started = time.perf_counter()
+        index = csv_db._flashcard_duplicate_index()
+        build = time.perf_counter() - started
+        postings = sum(len(posting) for posting in index._postings.values())
+        result['csv'] = {
+            'build_s': round(build, 2),
+            'vectors_mb': round(index._vectors.nbytes / 1e6, 1),
+            'postings_mb': round(postings * 4 / 1e6, 1),
+            'queries': timed_queries(csv_db.find_duplicate_flashcards, mix),
+            'brute_force': brute_force(index, mix),
+        }
+
+        log.close()
+        csv_db._flashcard_log = csv_db._duplicate_index = None
+        # Otherwise the sqlite backend imports it on first start
+        os.remove(csv_db.FLASHCARDS_LOG)
+
+        sqlite_db.init_database()
+        started = time.perf_counter()
+        conn = sqlite_db._connect()
+        with conn:
+            conn.executemany(f"INSERT INTO flashcards VALUES ({', '.join('?' * 8)})", cards)
+        result['sqlite'] = {
+            'insert_s': round(time.perf_counter() - started, 2),
+            'queries': timed_queries(sqlite_db.find_duplicate_flashcards, mix),
+        }
+        sqlite_db.close_history()
+        os.chdir('/')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cards', type=int, nargs='+', default=[500000])
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    try:
+        results = [run(n, args.queries) for n in args.cards]
+    finally:
+        os.chdir(cwd)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
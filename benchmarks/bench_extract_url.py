@@ -0,0 +1,150 @@
+"""
+Concurrent URL extraction against a local stub server
+
+Serves article pages of about 40 KB from a threaded HTTP server on
+loopback, which adds a fixed delay to each response as a stand-in for
+the network. The pages are spread over ten host names (127.0.0.2-11), so
+the per-host limit applies the way it would across real sites. It times
+rounds of 100 concurrent extract_url calls:
+
+- "cold": 100 different pages, each downloaded and parsed
+- "revalidated": the same 100 pages again; each is a conditional request
+  answered with 304, so nothing is downloaded or parsed
+- "client_per_request": the cold round without the shared client, with a
+  new httpx.AsyncClient and connection for every page and no cache
+
+It also reports extract_text alone on one page.
+
+Run from the repository root:
+
+    python benchmarks/bench_extract_url.py --rounds 5 --delay 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.flashcards.utils import url_extractor
+
+HOSTS = [f'127.0.0.{i}' for i in range(2, 12)]
+CONCURRENCY = 100
+
+
+def page(number):
+    """An article page wrapped in navigation, sidebars and scripts"""
+    paragraphs = ''.join(
+        f'<p>Paragraph {i} of article {number} talks about plants, light and water in some detail.</p>'
+        for i in range(300)
+    )
+    menu = ''.join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(100))
+    return (
+        f'<html><head><title>Article {number}</title><script>{"var x = 1;" * 500}</script></head><body>'
+        f'<header><nav><ul>{menu}</ul></nav></header>'
+        f'<article><h1>Article {number}</h1>{paragraphs}</article>'
+        f'<aside class="sidebar"><ul>{menu}</ul></aside><footer>Copyright</footer></body></html>'
+    ).encode()
+
+
+def serve(delay):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(delay)
+            number = int(self.path.rsplit('/', 1)[-1])
+            etag = f'"{number}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            body = page(number)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        # Room for every connection of a round in the listen backlog
+        request_queue_size = 4 * CONCURRENCY
+
+    server = Server(('0.0.0.0', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def client_per_request(url):
+    async with httpx.AsyncClient(timeout=url_extractor.EXTRACT_TIMEOUT) as client:
+        response = await client.get(url)
+        return url_extractor.extract_text(response.text)
+
+
+async def timed_round(extract, urls):
+    started = time.perf_counter()
+    results = await asyncio.gather(*(extract(url) for url in urls))
+    return time.perf_counter() - started, results
+
+
+def summary(timings):
+    timings = sorted(timings)
+    median = timings[len(timings) // 2]
+    return {
+        'median_s': round(median, 3),
+        'extractions_per_s': round(CONCURRENCY / median, 1),
+    }
+
+
+async def run(rounds, port):
+    result = {'cold': [], 'revalidated': [], 'client_per_request': []}
+    for r in range(rounds):
+        urls = [f'http://{HOSTS[i % len(HOSTS)]}:{port}/page/{r * CONCURRENCY + i}' for i in range(CONCURRENCY)]
+        elapsed, pages = await timed_round(url_extractor.extract_url, urls)
+        assert not any(extracted['cached'] for extracted in pages)
+        result['cold'].append(elapsed)
+        elapsed, pages = await timed_round(url_extractor.extract_url, urls)
+        assert all(extracted['cached'] for extracted in pages)
+        result['revalidated'].append(elapsed)
+        elapsed, _ = await timed_round(client_per_request, urls)
+        result['client_per_request'].append(elapsed)
+    await url_extractor.close_client()
+    return {name: summary(timings) for name, timings in result.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--delay', type=float, default=0.02, help='seconds the server waits before each response')
+    args = parser.parse_args()
+
+    server = serve(args.delay)
+    try:
+        result = {'concurrency': CONCURRENCY, 'hosts': len(HOSTS), 'delay_s': args.delay, 'page_kb': len(page(0)) // 1024}
+        result.update(asyncio.run(run(args.rounds, server.server_port)))
+    finally:
+        server.shutdown()
+
+    html = page(0).decode()
+    started = time.perf_counter()
+    for _ in range(20):
+        url_extractor.extract_text(html)
+    result['extract_text_ms'] = round((time.perf_counter() - started) / 20 * 1000, 2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Flashcard reads: DataFrame snapshot vs compact rows
+
+Seeds a flashcard log of N cards and compares, for each deck size, the
+DataFrame snapshot csv_db used to serve reads from with the FlashcardTable
+of Flashcard rows it uses now:
+
+- memory_per_card_bytes: memory held per card by the snapshot ordered by
+  id, and with all four sort orders built (tracemalloc)
+- get_us: one card by id, as a dict. The DataFrame path is the original
+  get_flashcard (``id in df['id'].values``, then a mask and to_dict);
+  record_log is a read from the log file by offset
+- page_us: the first page of 48 cards by word, as dicts
+- after_write_us: bringing the snapshot up to date after one card was
+  edited (a full rebuild from the log for the DataFrame)
+
+Run from the repository root:
+
+    python benchmarks/bench_flashcard_rows.py --cards 1000 10000 100000
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from src.flashcards.database.csv_db import FLASHCARD_COLUMNS, FLASHCARD_SORT_COLUMNS
+from src.flashcards.database.flashcard_table import FlashcardTable
+from src.flashcards.database.record_log import RecordLog
+
+LANGUAGES = ['english', 'spanish', 'french', 'german', 'italian', 'vietnamese', 'japanese', 'korean']
+PAGE = 48
+
+
+def seed(path, n):
+    log = RecordLog(path).open()
+    log.put_many([
+        dict(zip(FLASHCARD_COLUMNS, [
+            i, f'word{i}', LANGUAGES[i % len(LANGUAGES)], f'translation {i}', f'/w{i}/',
+            f'An example with word{i}|Another one', f'2024-01-01 00:00:{i % 60:02d}', '2024-01-01 00:00:00',
+        ]))
+        for i in range(1, n + 1)
+    ])
+    return log
+
+
+def per_call_us(function, calls):
+    started = time.perf_counter()
+    for i in range(calls):
+        function(i)
+    return round((time.perf_counter() - started) / calls * 1e6, 2)
+
+
+def held_bytes(build):
+    """Memory still allocated once ``build()`` returns, keeping its result alive"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def dataframe_snapshot(log, orders):
+    df = pd.DataFrame(log.records(), columns=FLASHCARD_COLUMNS)
+    sorted_frames = {
+        sort: df.sort_values([sort, 'id'], kind='stable').reset_index(drop=True)
+        for sort in (FLASHCARD_SORT_COLUMNS if orders else ['id'])
+    }
+    return df, sorted_frames
+
+
+def row_table(log, orders):
+    table = FlashcardTable(log).open()
+    for sort in (FLASHCARD_SORT_COLUMNS if orders else ['id']):
+        table.page(sort, limit=1)
+    return table
+
+
+def run(n, calls):
+    path = os.path.join(tempfile.mkdtemp(), 'flashcards.log')
+    log = seed(path, n)
+    rng = random.Random(1)
+    ids = [rng.randint(1, n) for _ in range(calls)]
+    result = {'memory_per_card_bytes': {}}
+
+    for orders, label in ((False, 'id_order'), (True, 'all_orders')):
+        frame_bytes, _ = held_bytes(lambda: dataframe_snapshot(log, orders))
+        table_bytes, _ = held_bytes(lambda: row_table(log, orders))
+        result['memory_per_card_bytes'][label] = {
+            'dataframe': round(frame_bytes / n, 1),
+            'rows': round(table_bytes / n, 1),
+        }
+
+    df, frames = dataframe_snapshot(log, True)
+    table = row_table(log, True)
+
+    def dataframe_get(i):
+        card_id = ids[i]
+        if card_id in df['id'].values:
+            return df[df['id'] == card_id].to_dict('records')[0]
+
+    result['get_us'] = {
+        'dataframe': per_call_us(dataframe_get, max(10, calls // 20)),
+        'record_log': per_call_us(lambda i: log.get(ids[i]), calls),
+        'rows': per_call_us(lambda i: table.sync().get(ids[i]), calls),
+    }
+    result['page_us'] = {
+        'dataframe': per_call_us(lambda i: frames['word'].iloc[:PAGE].to_dict('records'), max(10, calls // 20)),
+        'rows': per_call_us(lambda i: table.sync().page('word', limit=PAGE), calls),
+    }
+
+    def edit(i):
+        card_id = ids[i]
+        log.put(dict(log.get(card_id), word=f'edited{i}', updated_at='2024-06-01 00:00:00'))
+
+    def dataframe_after_write(i):
+        edit(i)
+        dataframe_snapshot(log, False)
+
+    def rows_after_write(i):
+        edit(i)
+        table.sync()
+
+    write_us = per_call_us(edit, 200)
+    result['after_write_us'] = {
+        'dataframe': round(per_call_us(dataframe_after_write, 20) - write_us, 1),
+        'rows': round(per_call_us(rows_after_write, 200) - write_us, 1),
+    }
+    log.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cards', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--calls', type=int, default=2000, help='timed calls per read')
+    args = parser.parse_args()
+
+    print(json.dumps({str(n): run(n, args.calls) for n in args.cards}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+/api/translate latency with a large history and query log
+
+Seeds translate_history.csv and query_log.csv with N rows each, then
+times sequential /api/translate requests against the app, backed by the
+local fake model with no latency, so the time measured is the app's own
+work. --legacy also times one pandas read-modify-write append of the kind
+the history functions used to do per request. Run from the repository root:
+
+    python benchmarks/bench_history_log.py --sizes 1000 1000000 --legacy
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault('AI_PROVIDER', 'fake')
+os.environ['GEMINI_FAKE_LATENCY'] = '0'
+# Times the app's own work, not the per-client rate limit
+os.environ.setdefault('RATE_LIMIT_PER_MINUTE', '0')
+# Times appends to one large file, as before rotation, and keeps the seeded rows
+os.environ.setdefault('HISTORY_SEGMENT_BYTES', '0')
+os.environ.setdefault('HISTORY_SEGMENT_DAYS', '0')
+os.environ.setdefault('HISTORY_RETENTION_DAYS', '0')
+
+from src.flashcards.database import csv_db
+
+
+def seed(n):
+    with open(csv_db.TRANSLATE_HISTORY_CSV, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_db.TRANSLATE_HISTORY_COLUMNS)
+        writer.writerows(
+            [i, f'phrase {i}', 'en', 'vi', f'translated phrase {i}', '2024-01-01 00:00:00']
+            for i in range(1, n + 1)
+        )
+    with open(csv_db.QUERY_LOG_CSV, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_db.QUERY_LOG_COLUMNS)
+        writer.writerows(
+            [i, 'translate', f'phrase {i} (en to vi)', f'translated phrase {i}', '2024-01-01 00:00:00']
+            for i in range(1, n + 1)
+        )
+
+
+def legacy_append_ms():
+    """One append the way the history functions did it before the background writer"""
+    import pandas as pd
+
+    start = time.perf_counter()
+    df = pd.read_csv(csv_db.QUERY_LOG_CSV)
+    row = {'id': df['id'].max() + 1, 'feature': 'translate', 'query': 'q', 'response': 'r', 'created_at': ''}
+    df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
+    df.to_csv(csv_db.QUERY_LOG_CSV, index=False)
+    return (time.perf_counter() - start) * 1e3
+
+
+async def time_requests(requests):
+    import httpx
+    import app
+
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    transport = httpx.ASGITransport(app=app.app)
+    latencies = []
+    async with app.app.router.lifespan_context(app.app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for i in range(requests):
+                start = time.perf_counter()
+                response = await client.post('/api/translate', json={'text': f'bench {i}', 'use_cache': False})
+                latencies.append((time.perf_counter() - start) * 1e3)
+                assert response.status_code == 200, response.text
+    return latencies
+
+
+def run(n, requests, legacy):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs(csv_db.DATA_DIR)
+        for name in ('static', 'templates'):
+            os.symlink(os.path.join(REPO_ROOT, 'app', name), os.path.join('app', name))
+        seed(n)
+        csv_db.init_database()
+
+        latencies = asyncio.run(time_requests(requests))
+        flush_start = time.perf_counter()
+        csv_db.flush_history()
+        flush_ms = (time.perf_counter() - flush_start) * 1e3
+        stats = csv_db.get_history_writer_stats()
+        csv_db.close_history()
+
+        result = {
+            'logged_rows': n,
+            'requests': requests,
+            # The first request reads the tail of each file to find the last id
+            'first_request_ms': round(latencies[0], 2),
+            'translate_ms': {
+                'p50': round(statistics.median(latencies[1:]), 3),
+                'p95': round(sorted(latencies[1:])[int((requests - 1) * 0.95) - 1], 3),
+                'max': round(max(latencies[1:]), 3),
+            },
+            'final_flush_ms': round(flush_ms, 2),
+            'history_writer': stats,
+        }
+        if legacy:
+            result['legacy_append_ms'] = round(legacy_append_ms(), 1)
+        os.chdir('/')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 1000000])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--legacy', action='store_true', help='also time one legacy read-modify-write append')
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    try:
+        results = [run(n, args.requests, args.legacy) for n in args.sizes]
+    finally:
+        os.chdir(cwd)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Query log reads after months of traffic, rotated vs one growing file
+
+Simulates --months of history ending now, --per-day query log rows a day
+(translate, chat and grammar, and summarize for 1 in 2000), written
+through the history writer twice:
+
+- "rotated": with the app's rotation and retention settings
+  (HISTORY_SEGMENT_BYTES, HISTORY_SEGMENT_DAYS, HISTORY_RETENTION_DAYS)
+- "single_file": into one file, as before rotation
+
+It reports the files' size on disk, and the median time to read the
+latest --limit rows of a common and of a rare feature:
+
+- single_file_pandas: pd.read_csv of the whole file, filtered and sorted,
+  as get_query_log once did
+- single_file_csv: the whole file through the csv module
+- rotated_first_read: csv_db's reader on a cold start, parsing the head
+- rotated: the same reader later on, after a translate row was appended
+
+Summarize rows are rare enough that reading --limit of them goes back
+through several segments.
+
+Run from the repository root:
+
+    python benchmarks/bench_history_retention.py --months 6 --per-day 2000
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.flashcards.database import csv_db, history_segments
+from src.flashcards.database.history_writer import HistoryWriter
+
+
+def traffic(months, per_day, seed=1):
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(days=30 * months)
+    step = 86400 / per_day
+    for i in range(30 * months * per_day):
+        feature = 'summarize' if i % 2000 == 0 else rng.choice(['translate', 'chat', 'grammar'])
+        yield {
+            'feature': feature,
+            'query': f'{feature} query {i} ' + 'x' * rng.randint(10, 120),
+            'response': f'{feature} response {i} ' + 'y' * rng.randint(20, 200),
+            'created_at': (start + timedelta(seconds=i * step)).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+
+def write(path, rows, rotation):
+    writer = HistoryWriter(batch_size=256, flush_interval=60, rotation=rotation).start()
+    started = time.perf_counter()
+    for row in rows:
+        writer.log(path, csv_db.QUERY_LOG_COLUMNS, row)
+    writer.close()
+    return round(time.perf_counter() - started, 2), writer.stats()['rotations']
+
+
+def disk_bytes(path):
+    files = [path] + [segment for _, _, segment in history_segments.segments(path)]
+    return sum(os.path.getsize(name) for name in files if os.path.exists(name))
+
+
+def median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 3)
+
+
+def pandas_latest(path, feature, limit):
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    df = df[df['feature'] == feature]
+    return df.sort_values(by='id', ascending=False).head(limit).to_dict('records')
+
+
+def csv_latest(path, feature, limit):
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = [row for row in csv.DictReader(f) if row['feature'] == feature]
+    return heapq.nlargest(limit, rows, key=lambda row: int(row['id']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--months', type=int, default=6)
+    parser.add_argument('--per-day', type=int, default=2000, help='query log rows a day')
+    parser.add_argument('--limit', type=int, default=10, help='rows per read, as GET /api/history/{feature}')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    rotated = os.path.join(directory, 'rotated', 'query_log.csv')
+    single = os.path.join(directory, 'single', 'query_log.csv')
+    os.makedirs(os.path.dirname(rotated))
+    os.makedirs(os.path.dirname(single))
+    policy = csv_db.HISTORY_ROTATION[csv_db.QUERY_LOG_CSV]
+
+    rotated_write_s, rotations = write(rotated, traffic(args.months, args.per_day), {rotated: policy})
+    single_write_s, _ = write(single, traffic(args.months, args.per_day), None)
+
+    result = {
+        'rows_written': 30 * args.months * args.per_day,
+        'segment_bytes': policy.segment_bytes,
+        'segment_days': policy.segment_days,
+        'retention_days': policy.retention_days,
+        'write_s': {'single_file': single_write_s, 'rotated': rotated_write_s},
+        'rotations': rotations,
+        'segments_kept': len(history_segments.segments(rotated)),
+        'disk_bytes': {'single_file': disk_bytes(single), 'rotated': disk_bytes(rotated)},
+        'read_ms': {},
+    }
+    for feature in ('translate', 'summarize'):
+        reader = history_segments.LatestRows(rotated)
+        first_read = median_ms(lambda: reader.latest(args.limit, lambda row: row['feature'] == feature), 1)
+        later = HistoryWriter(batch_size=256, flush_interval=60, rotation={rotated: policy}).start()
+
+        def append_and_read():
+            later.log(rotated, csv_db.QUERY_LOG_COLUMNS, dict(next(traffic(1, 1)), feature='translate'))
+            later.flush()
+            return reader.latest(args.limit, lambda row: row['feature'] == feature)
+
+        warm = median_ms(append_and_read, args.repeat)
+        later.close()
+        result['read_ms'][feature] = {
+            'single_file_pandas': median_ms(lambda: pandas_latest(single, feature, args.limit), max(3, args.repeat // 10)),
+            'single_file_csv': median_ms(lambda: csv_latest(single, feature, args.limit), max(3, args.repeat // 10)),
+            'rotated_first_read': first_read,
+            'rotated': warm,
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
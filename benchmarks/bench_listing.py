@@ -0,0 +1,154 @@
+"""
+Flashcard listing: paged vs whole-deck rendering
+
+Seeds a deck of N flashcards and requests, through the ASGI app:
+
+- "full_render": the home page as it was rendered before pagination,
+  every card converted with get_flashcards().to_dict('records') and
+  handed to index.html
+- "home_page_1": the paged home page
+- "api_page_1": GET /api/flashcards, plus a Spanish-only and a
+  created-this-month page, and a page deep into the deck
+
+and reports the median latency and response size of each. Every storage
+backend runs in its own process, since STORAGE_BACKEND is read at import.
+Run from the repository root:
+
+    python benchmarks/bench_listing.py --cards 100000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+LANGUAGES = ['english', 'spanish', 'french', 'german', 'italian', 'vietnamese', 'japanese', 'korean']
+
+
+def cards(n):
+    for i in range(1, n + 1):
+        created = f'2024-{1 + i * 12 // (n + 1):02d}-{1 + i % 28:02d} 00:00:00'
+        yield [i, f'word{i}', LANGUAGES[i % len(LANGUAGES)], f'translation {i}', f'/w{i}/',
+               f'An example with word{i}|Another one', created, created]
+
+
+def seed(backend, n):
+    from src.flashcards.database import csv_db, sqlite_db
+    from src.flashcards.database.record_log import RecordLog
+
+    if backend == 'sqlite':
+        sqlite_db.init_database()
+        conn = sqlite_db._connect()
+        with conn:
+            conn.executemany(f"INSERT INTO flashcards VALUES ({', '.join('?' * 8)})", cards(n))
+        return
+
+    log = RecordLog(csv_db.FLASHCARDS_LOG).open()
+    batch = []
+    for row in cards(n):
+        batch.append(dict(zip(csv_db.FLASHCARD_COLUMNS, row)))
+        if len(batch) == 50000:
+            log.put_many(batch)
+            batch = []
+    log.put_many(batch)
+    log.close()
+
+
+async def measure(client, url, params, repeat):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(url, params=params)
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+        size = len(response.content)
+    return {'p50_ms': round(statistics.median(timings) * 1000, 2), 'bytes': size}
+
+
+def run(backend, n, repeat):
+    """Seed a fresh data directory and time the listing requests"""
+    os.environ['STORAGE_BACKEND'] = backend
+    os.chdir(tempfile.mkdtemp())
+    os.makedirs('app/data')
+    for name in ('static', 'templates'):
+        os.symlink(os.path.join(REPO_ROOT, 'app', name), os.path.join('app', name))
+    seed(backend, n)
+
+    import httpx
+    from fastapi import Request
+    from fastapi.responses import HTMLResponse
+
+    import app as studywai
+    from src.flashcards.database import db
+    from src.flashcards.utils.template_helper import get_common_context
+
+    @studywai.app.get('/bench/full-render', response_class=HTMLResponse)
+    async def full_render(request: Request):
+        # The home page handler from before pagination
+        flashcards = db.get_flashcards()
+        context = get_common_context()
+        context['nav_info']['current_path'] = '/'
+        context['flashcards'] = flashcards.to_dict('records')
+        return studywai.templates.TemplateResponse('index.html', {'request': request, **context})
+
+    async def requests():
+        transport = httpx.ASGITransport(app=studywai.app)
+        async with studywai.app.router.lifespan_context(studywai.app):
+            async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+                # Warm the csv snapshot, as a running app would have
+                await client.get('/api/flashcards')
+                deep = await client.get('/api/flashcards', params={'limit': 200})
+                cursor = deep.json()['next_cursor']
+                for _ in range(n // 400):
+                    cursor = (await client.get('/api/flashcards', params={'limit': 200, 'cursor': cursor})).json()['next_cursor']
+
+                return {
+                    'full_render': await measure(client, '/bench/full-render', {}, max(1, repeat // 10)),
+                    'home_page_1': await measure(client, '/', {}, repeat),
+                    'api_page_1': await measure(client, '/api/flashcards', {}, repeat),
+                    'api_page_1_spanish': await measure(client, '/api/flashcards', {'language': 'spanish'}, repeat),
+                    'api_page_1_created_june': await measure(client, '/api/flashcards', {
+                        'sort': 'created_at', 'created_from': '2024-06-01', 'created_to': '2024-06-30'
+                    }, repeat),
+                    'api_mid_deck': await measure(client, '/api/flashcards', {'cursor': cursor}, repeat),
+                }
+
+    result = asyncio.run(requests())
+    db.close_history()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cards', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50, help='requests timed per listing')
+    parser.add_argument('--backends', nargs='+', default=['csv', 'sqlite'])
+    parser.add_argument('--backend', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run(args.backend, args.cards, args.repeat)))
+        return
+
+    results = {'cards': args.cards}
+    for backend in args.backends:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--backend', backend,
+             '--cards', str(args.cards), '--repeat', str(args.repeat)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results[backend] = json.loads(output.strip().splitlines()[-1])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
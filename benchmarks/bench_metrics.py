@@ -0,0 +1,119 @@
+"""
+Cost of the metrics instrumentation
+
+Times, per call:
+
+- recording: a Counter.inc, a Histogram.observe and a call through
+  metrics.timed() next to the same call made directly
+- storage: csv_db.get_flashcard with and without its timed() wrapper
+- requests: GET /healthcheck through the app in process, with and without
+  MetricsMiddleware in front of it
+- render: one GET /metrics body once the request metrics are populated
+
+Run from the repository root:
+
+    python benchmarks/bench_metrics.py --calls 100000 --requests 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('AI_PROVIDER', 'fake')
+
+from src.flashcards.utils import metrics
+
+
+def per_call_us(function, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return round((time.perf_counter() - started) / calls * 1e6, 3)
+
+
+def recording(calls):
+    counter = metrics.counter('bench_events_total', 'Bench events', ('kind',))
+    histogram = metrics.histogram('bench_duration_seconds', 'Bench durations', ('kind',))
+    noop = lambda: None
+    return {
+        'plain_call_us': per_call_us(noop, calls),
+        'counter_inc_us': per_call_us(lambda: counter.inc(kind='a'), calls),
+        'histogram_observe_us': per_call_us(lambda: histogram.observe(0.003, kind='a'), calls),
+        'timed_call_us': per_call_us(metrics.timed(histogram, kind='a')(noop), calls),
+    }
+
+
+def storage(calls):
+    from src.flashcards.database import csv_db
+
+    csv_db.init_database()
+    csv_db.save_flashcards([
+        {'word': f'word {i}', 'language': 'english', 'translations': f'meaning {i}', 'pronunciation': '', 'examples': ''}
+        for i in range(1000)
+    ])
+    return {
+        'get_flashcard_us': per_call_us(lambda: csv_db.get_flashcard(500), calls),
+        'get_flashcard_untimed_us': per_call_us(lambda: csv_db.get_flashcard.__wrapped__(500), calls),
+    }
+
+
+async def requests_per_second(asgi_app, requests):
+    import httpx
+
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with asgi_app.router.lifespan_context(asgi_app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for _ in range(50):
+                await client.get('/healthcheck')
+            started = time.perf_counter()
+            for _ in range(requests):
+                await client.get('/healthcheck')
+            return round((time.perf_counter() - started) / requests * 1e6, 1)
+
+
+def http(requests):
+    import logging
+
+    import app
+
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    with_middleware = asyncio.run(requests_per_second(app.app, requests))
+    # The same app with MetricsMiddleware left out of the stack
+    app.app.user_middleware = [m for m in app.app.user_middleware if m.cls is not metrics.MetricsMiddleware]
+    app.app.middleware_stack = app.app.build_middleware_stack()
+    without = asyncio.run(requests_per_second(app.app, requests))
+
+    started = time.perf_counter()
+    body = metrics.render()
+    return {
+        'healthcheck_with_middleware_us': with_middleware,
+        'healthcheck_without_middleware_us': without,
+        'render_ms': round((time.perf_counter() - started) * 1e3, 3),
+        'render_bytes': len(body),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    tmp = tempfile.mkdtemp()
+    # The app resolves app/data and app/static relative to the working directory
+    os.makedirs(os.path.join(tmp, 'app'))
+    for name in ('static', 'templates'):
+        os.symlink(os.path.join(cwd, 'app', name), os.path.join(tmp, 'app', name))
+    os.chdir(tmp)
+    result = {'recording': recording(args.calls), 'storage': storage(args.calls // 10), 'http': http(args.requests)}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
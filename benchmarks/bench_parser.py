@@ -0,0 +1,89 @@
+"""
+Response parsing: shared single-pass parser vs the old per-feature regex chain
+
+The legacy function below is the json.loads -> regex -> per-field regex
+cascade that generate_flashcard_data used before the shared parser. Run
+from the repository root:
+
+    python benchmarks/bench_parser.py
+"""
+
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.flashcards.ai.parser import ParseError, parse_response
+from src.flashcards.models.schemas import FlashcardData
+
+CARD = {
+    'translations': 'correr, huir, funcionar',
+    'pronunciation': '/rʌn/',
+    'examples': 'I run every morning; The program runs fast; She said "run!" to {everyone}',
+}
+
+SAMPLES = {
+    'plain': json.dumps(CARD),
+    'fenced': '```json\n' + json.dumps(CARD, indent=2) + '\n```',
+    'prose': 'Here is your flashcard:\n' + json.dumps(CARD) + '\nHope this helps!',
+    'trailing_comma': json.dumps(CARD)[:-1] + ',}',
+    'garbage': 'I am sorry, I cannot generate that flashcard.',
+}
+
+
+def legacy_parse(response_text):
+    try:
+        try:
+            data = json.loads(response_text)
+        except:
+            json_match = re.search(r'\{[^}]*"translations"[^}]*"pronunciation"[^}]*"examples"[^}]*\}', response_text, re.DOTALL)
+            if json_match:
+                try:
+                    data = json.loads(json_match.group(0))
+                except:
+                    data = {
+                        "translations": "No translations available",
+                        "pronunciation": "No pronunciation available",
+                        "examples": "No examples available"
+                    }
+            else:
+                translations_match = re.search(r'"translations"\s*:\s*"([^"]*)"', response_text)
+                pronunciation_match = re.search(r'"pronunciation"\s*:\s*"([^"]*)"', response_text)
+                examples_match = re.search(r'"examples"\s*:\s*"([^"]*)"', response_text)
+                data = {
+                    "translations": translations_match.group(1) if translations_match else "No translations available",
+                    "pronunciation": pronunciation_match.group(1) if pronunciation_match else "No pronunciation available",
+                    "examples": examples_match.group(1) if examples_match else "No examples available"
+                }
+    except Exception:
+        data = {}
+    return data
+
+
+def shared_parse(response_text):
+    try:
+        return parse_response(response_text, FlashcardData, 'bench')
+    except ParseError:
+        return None
+
+
+def main():
+    number = 20000
+    results = {}
+    for name, text in SAMPLES.items():
+        legacy = timeit.timeit(lambda: legacy_parse(text), number=number) / number * 1e6
+        shared = timeit.timeit(lambda: shared_parse(text), number=number) / number * 1e6
+        results[name] = {
+            'legacy_us': round(legacy, 2),
+            'shared_us': round(shared, 2),
+            'legacy_correct': legacy_parse(text) == CARD,
+            'shared_correct': shared_parse(text) == CARD,
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
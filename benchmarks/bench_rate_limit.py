@@ -0,0 +1,129 @@
+"""
+Rate limiting under a client that floods the model
+
+The fake model answers after --latency seconds, behind a quota of
+--quota calls per minute. One heavy client fires --heavy calls at once
+while --light clients each make a call every half second. It reports,
+per kind of client, how long calls waited for the quota (p50/p95/max):
+
+- "round_robin": the upstream limiter as the app runs it, with waiting
+  calls served one client at a time
+- "fifo": the same quota with every call in one line, first come first
+  served, as a plain shared bucket would do
+
+Then, through the app and its per-client middleware
+(RATE_LIMIT_PER_MINUTE / RATE_LIMIT_BURST), the heavy client sends
+--heavy requests to /api/translate at once and each light client one:
+how many got through and how many were answered 429.
+
+Run from the repository root:
+
+    python benchmarks/bench_rate_limit.py --quota 600 --heavy 100 --light 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('AI_PROVIDER', 'fake')
+
+from src.flashcards.ai import gemini
+from src.flashcards.ai.fake_model import FakeProvider
+from src.flashcards.utils import rate_limit
+
+
+def percentiles(waits):
+    waits = sorted(waits)
+    pick = lambda q: round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 1)
+    return {'calls': len(waits), 'p50_ms': pick(0.5), 'p95_ms': pick(0.95), 'max_ms': round(waits[-1] * 1000, 1)}
+
+
+async def scenario(limiter, heavy, light, fair):
+    waits = {'heavy': [], 'light': []}
+
+    async def call(kind, key):
+        rate_limit.client_key.set(key if fair else 'everyone')
+        started = time.perf_counter()
+        await limiter.acquire(rate_limit.client_key.get(), timeout=600)
+        waits[kind].append(time.perf_counter() - started)
+        await gemini._generate(f'Translate the following text "{key}"', timeout=600)
+
+    async def light_client(index):
+        calls = []
+        for _ in range(10):
+            calls.append(asyncio.create_task(call('light', f'light {index}')))
+            await asyncio.sleep(0.5)
+        await asyncio.gather(*calls)
+
+    flood = [asyncio.create_task(call('heavy', 'heavy')) for _ in range(heavy)]
+    await asyncio.sleep(0.01)
+    await asyncio.gather(*(light_client(i) for i in range(light)))
+    await asyncio.gather(*flood)
+    return {kind: percentiles(kind_waits) for kind, kind_waits in waits.items()}
+
+
+async def through_app(heavy, light):
+    import logging
+
+    import httpx
+    import app
+
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    # Every request comes from the same address; the keys tell the clients apart
+    rate_limit.RATE_LIMIT_API_KEYS.update(['heavy'] + [f'light {i}' for i in range(light)])
+    transport = httpx.ASGITransport(app=app.app)
+    async with app.app.router.lifespan_context(app.app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            def post(key, i):
+                return client.post('/api/translate', json={'text': f'{key} {i}', 'use_cache': False}, headers={'X-API-Key': key})
+
+            heavy_responses, *light_responses = await asyncio.gather(
+                asyncio.gather(*(post('heavy', i) for i in range(heavy))),
+                *(post(f'light {i}', 0) for i in range(light)),
+            )
+    return {
+        'heavy_ok': sum(response.status_code == 200 for response in heavy_responses),
+        'heavy_429': sum(response.status_code == 429 for response in heavy_responses),
+        'light_ok': sum(response.status_code == 200 for response in light_responses),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--quota', type=float, default=600, help='model calls per minute')
+    parser.add_argument('--burst', type=int, default=5)
+    parser.add_argument('--heavy', type=int, default=100, help='calls the heavy client fires at once')
+    parser.add_argument('--light', type=int, default=5, help='clients making a call every 0.5 s')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per fake model call')
+    args = parser.parse_args()
+
+    gemini.provider = FakeProvider(latency=args.latency)
+    result = {'quota_per_minute': args.quota, 'heavy_calls': args.heavy, 'light_clients': args.light}
+    for name, fair in (('round_robin', True), ('fifo', False)):
+        # The scenario takes the quota itself; the app's limiter stays open
+        limiter = rate_limit.FairLimiter(args.quota, args.burst, max_waiting=args.heavy)
+        result[name] = asyncio.run(scenario(limiter, args.heavy, args.light, fair))
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # The app resolves app/static relative to the working directory
+        os.makedirs(os.path.join(tmp, 'app'))
+        for name in ('static', 'templates'):
+            os.symlink(os.path.join(cwd, 'app', name), os.path.join(tmp, 'app', name))
+        os.chdir(tmp)
+        try:
+            result['middleware'] = asyncio.run(through_app(args.heavy, args.light))
+        finally:
+            from src.flashcards.database import db
+            db.close_history()
+            os.chdir(cwd)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Per-operation latency of the flashcard record log
+
+Seeds a log with N cards, then times create/update/get/delete through the
+csv_db functions the routes use. Run from the repository root:
+
+    python benchmarks/bench_record_log.py --sizes 1000 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.flashcards.database import csv_db
+from src.flashcards.database.record_log import RecordLog
+
+
+def seed(n, chunk=50000):
+    log = RecordLog(csv_db.FLASHCARDS_LOG).open()
+    for start in range(1, n + 1, chunk):
+        log.put_many([
+            {
+                'id': i,
+                'word': f'word{i}',
+                'language': 'english',
+                'translations': f'translation {i}',
+                'pronunciation': f'/w{i}/',
+                'examples': f'An example with word{i}|Another one',
+                'created_at': '2024-01-01 00:00:00',
+                'updated_at': '2024-01-01 00:00:00',
+            }
+            for i in range(start, min(start + chunk, n + 1))
+        ])
+
+
+def timed(operation, count):
+    start = time.perf_counter()
+    for i in range(count):
+        operation(i)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def run(n, ops):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs(csv_db.DATA_DIR)
+        seed(n)
+        csv_db._flashcard_log = None
+
+        start = time.perf_counter()
+        csv_db.init_database()
+        open_ms = (time.perf_counter() - start) * 1e3
+
+        result = {
+            'cards': n,
+            'open_ms': round(open_ms, 1),
+            'create_us': timed(lambda i: csv_db.save_flashcard('new', 'english', 't', 'p', 'e'), ops),
+            'update_us': timed(lambda i: csv_db.save_flashcard('upd', 'english', 't', 'p', 'e', flashcard_id=i + 1), ops),
+            'get_us': timed(lambda i: csv_db.get_flashcard(n // 2 + i), ops),
+            'delete_us': timed(lambda i: csv_db.delete_flashcard(i + 1), ops),
+        }
+        csv_db._flashcard_log = None
+        os.chdir('/')
+    return {key: round(value, 1) if isinstance(value, float) else value for key, value in result.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--ops', type=int, default=200, help='operations timed per kind')
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    try:
+        results = [run(n, args.ops) for n in args.sizes]
+    finally:
+        os.chdir(cwd)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
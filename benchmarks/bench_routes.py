@@ -0,0 +1,266 @@
+"""
+End-to-end latency and throughput of the app's routes
+
+Seeds a deck of --cards flashcards and --history query log rows, then
+drives the app through an in-process ASGI client, with the model answered
+by the fake provider (--latency seconds per call, 0 by default so only the
+app's own time is measured). Each route gets --requests requests from
+--concurrency concurrent clients:
+
+- GET /, GET /study, GET /edit/{id} for random cards
+- POST /create with new words (a model call and a flashcard write each)
+- POST /api/translate, uncached
+- POST /api/chat, each client continuing its own session
+- GET /api/history/translate
+
+and reports requests per second and p50/p95/p99/max latency per route as
+JSON. Every backend and deck size runs in a fresh data directory in its own
+process, since STORAGE_BACKEND is read at import.
+
+Save a run with --output and pass it as --compare to a later run (say, on
+another commit) to print the change per route; the script exits with
+status 1 when a route's p95 got slower by more than --threshold.
+
+Run from the repository root:
+
+    python benchmarks/bench_routes.py --cards 1000 100000 --output before.json
+    python benchmarks/bench_routes.py --cards 1000 100000 --compare before.json
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+LANGUAGES = ['english', 'spanish', 'french', 'german', 'italian', 'vietnamese', 'japanese', 'korean']
+ROUTES = ['home', 'study', 'edit', 'create', 'translate', 'chat', 'history']
+
+
+def seed(cards, history):
+    """Write the deck and the query log as the CSV backend stores them; SQLite imports them on first start"""
+    from src.flashcards.database import csv_db
+    from src.flashcards.database.record_log import RecordLog
+
+    log = RecordLog(csv_db.FLASHCARDS_LOG).open()
+    batch = []
+    for i in range(1, cards + 1):
+        created = f'2024-{1 + i * 12 // (cards + 1):02d}-{1 + i % 28:02d} 00:00:00'
+        batch.append(dict(zip(csv_db.FLASHCARD_COLUMNS, [
+            i, f'word{i}', LANGUAGES[i % len(LANGUAGES)], f'translation {i}', f'/w{i}/',
+            f'An example with word{i}|Another one', created, created,
+        ])))
+        if len(batch) == 50000:
+            log.put_many(batch)
+            batch = []
+    log.put_many(batch)
+    log.close()
+
+    with open(csv_db.QUERY_LOG_CSV, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_db.QUERY_LOG_COLUMNS)
+        for i in range(1, history + 1):
+            feature = ('translate', 'grammar', 'summarize', 'chat')[i % 4]
+            writer.writerow([i, feature, f'Query {i}', f'Response {i}', '2024-06-01 12:00:00'])
+
+
+def summarize(timings, elapsed, errors):
+    timings = sorted(timings)
+    pick = lambda q: round(timings[min(len(timings) - 1, int(q * len(timings)))] * 1000, 2)
+    return {
+        'requests_per_s': round(len(timings) / elapsed, 1),
+        'p50_ms': pick(0.50),
+        'p95_ms': pick(0.95),
+        'p99_ms': pick(0.99),
+        'max_ms': round(timings[-1] * 1000, 2),
+        'errors': errors,
+    }
+
+
+async def drive(client, make_request, requests, concurrency):
+    """Send ``requests`` requests from ``concurrency`` clients; returns the route's summary"""
+    timings = []
+    errors = 0
+    sent = 0
+
+    async def worker(index):
+        nonlocal errors, sent
+        state = {}
+        while sent < requests:
+            sent += 1
+            started = time.perf_counter()
+            response = await make_request(index, sent, state)
+            timings.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    return summarize(timings, time.perf_counter() - started, errors)
+
+
+def route_requests(client, cards):
+    """Functions sending one request to each route, called with (client index, request number, client state)"""
+    rng = random.Random(1)
+
+    async def chat(index, sent, state):
+        payload = {'message': f'How do I use word{sent} in a sentence?'}
+        if 'session' in state:
+            payload['session_id'] = state['session']
+        response = await client.post('/api/chat', json=payload)
+        state['session'] = response.json().get('session_id')
+        return response
+
+    return {
+        'home': lambda index, sent, state: client.get('/'),
+        'study': lambda index, sent, state: client.get('/study'),
+        'edit': lambda index, sent, state: client.get(f'/edit/{rng.randint(1, cards)}'),
+        'create': lambda index, sent, state: client.post(
+            '/create', data={'word': f'benchword{sent}x{index}', 'language': 'english'}
+        ),
+        'translate': lambda index, sent, state: client.post(
+            '/api/translate', json={'text': f'phrase {sent} from client {index}', 'use_cache': False}
+        ),
+        'chat': chat,
+        'history': lambda index, sent, state: client.get('/api/history/translate', params={'limit': 20}),
+    }
+
+
+def run(backend, cards, history, requests, concurrency, latency):
+    """Seed a fresh data directory and time every route"""
+    os.environ['STORAGE_BACKEND'] = backend
+    os.environ['AI_PROVIDER'] = 'fake'
+    os.environ['GEMINI_FAKE_LATENCY'] = str(latency)
+    # Measures the app, not the per-client rate limit
+    os.environ['RATE_LIMIT_PER_MINUTE'] = '0'
+    # The seeded history is dated 2024; keep it past the retention
+    os.environ['HISTORY_RETENTION_DAYS'] = '0'
+    os.chdir(tempfile.mkdtemp())
+    os.makedirs('app/data')
+    for name in ('static', 'templates'):
+        os.symlink(os.path.join(REPO_ROOT, 'app', name), os.path.join('app', name))
+    seed(cards, history)
+
+    import logging
+
+    import httpx
+
+    import app as studywai
+    from src.flashcards.database import db
+
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    async def all_routes():
+        transport = httpx.ASGITransport(app=studywai.app)
+        async with studywai.app.router.lifespan_context(studywai.app):
+            async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+                requests_by_route = route_requests(client, cards)
+                results = {}
+                for route in ROUTES:
+                    # A few untimed requests first, as a running app would have served
+                    await drive(client, requests_by_route[route], min(requests, 5), 1)
+                    results[route] = await drive(client, requests_by_route[route], requests, concurrency)
+                return results
+
+    started = time.perf_counter()
+    results = asyncio.run(all_routes())
+    db.close_history()
+    results['total_s'] = round(time.perf_counter() - started, 2)
+    return results
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, threshold):
+    """Print the change per route; returns the routes whose p95 grew by more than ``threshold``"""
+    regressions = []
+    for backend, sizes in current['results'].items():
+        for cards, routes in sizes.items():
+            before_routes = baseline['results'].get(backend, {}).get(cards)
+            if before_routes is None:
+                continue
+            for route in ROUTES:
+                before, after = before_routes.get(route), routes.get(route)
+                if not before or not after:
+                    continue
+                ratio = after['p95_ms'] / max(before['p95_ms'], 0.01)
+                flag = ''
+                if ratio > 1 + threshold:
+                    flag = '  REGRESSION'
+                    regressions.append(f'{backend}/{cards}/{route}')
+                print(
+                    f"{backend:6} {cards:>8} {route:10} p95 {before['p95_ms']:9.2f} -> {after['p95_ms']:9.2f} ms "
+                    f"({ratio:5.2f}x)  rps {before['requests_per_s']:8.1f} -> {after['requests_per_s']:8.1f}{flag}",
+                    file=sys.stderr,
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cards', type=int, nargs='+', default=[1000, 10000], help='deck sizes to seed')
+    parser.add_argument('--history', type=int, default=10000, help='query log rows to seed')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per route')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per fake model call')
+    parser.add_argument('--backends', nargs='+', default=['csv', 'sqlite'])
+    parser.add_argument('--output', help='also write the results to this file')
+    parser.add_argument('--compare', help='results file of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25, help='p95 growth that counts as a regression')
+    parser.add_argument('--backend', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run(args.backend, args.cards[0], args.history, args.requests, args.concurrency, args.latency)))
+        return
+
+    report = {
+        'commit': commit(),
+        'python': platform.python_version(),
+        'history': args.history,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'latency': args.latency,
+        'results': {},
+    }
+    for backend in args.backends:
+        report['results'][backend] = {}
+        for cards in args.cards:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--backend', backend, '--cards', str(cards),
+                 '--history', str(args.history), '--requests', str(args.requests),
+                 '--concurrency', str(args.concurrency), '--latency', str(args.latency)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            report['results'][backend][str(cards)] = json.loads(output.strip().splitlines()[-1])
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            print(f"p95 regressions: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Flashcard full-text search
+
+Seeds N flashcards built from a synthetic vocabulary: each card's word is
+drawn from 200k pseudo-words, its translation and examples from a
+Zipf-distributed vocabulary, so a few example words are very common.
+
+Reports:
+- build, save and load time of the csv backend's index
+- p50/p99 latency of search_flashcards for a query mix, on both backends
+The mix has exact words, 3-letter type-ahead prefixes, two-word queries,
+a very common word, and a language-filtered query.
+
+Run from the repository root:
+
+    python benchmarks/bench_search.py --cards 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.flashcards.database import csv_db, sqlite_db
+from src.flashcards.database.record_log import RecordLog
+from src.flashcards.database.search_index import SearchIndex
+
+LANGUAGES = ['english', 'spanish', 'french', 'german', 'italian', 'vietnamese', 'japanese', 'korean']
+
+
+def vocabulary(size, rng):
+    letters = np.array(list(string.ascii_lowercase))
+    words = set()
+    while len(words) < size:
+        lengths = rng.integers(3, 11, size)
+        chars = letters[rng.integers(0, 26, (size, 10))]
+        words.update(''.join(row[:length]) for row, length in zip(chars, lengths))
+    return sorted(words)[:size]
+
+
+def generate(n, seed=1):
+    rng = np.random.default_rng(seed)
+    headwords = vocabulary(200000, rng)
+    common = np.array(vocabulary(20000, rng), dtype=object)
+    zipf = 1 / np.arange(1, len(common) + 1)
+    # Two translation words and two examples of 7 and 6 words per card
+    picks = common[rng.choice(len(common), (n, 15), p=zipf / zipf.sum())]
+    words = rng.integers(0, len(headwords), n)
+
+    for i in range(n):
+        row = picks[i]
+        yield [i + 1, headwords[words[i]], LANGUAGES[(i + 1) % len(LANGUAGES)], ' '.join(row[:2]), '',
+               f"{' '.join(row[2:9])}|{' '.join(row[9:])}", '2024-01-01 00:00:00', '2024-01-01 00:00:00']
+
+
+def queries(cards, rng, count):
+    sample = rng.sample(cards, count)
+    mix = []
+    for i, card in enumerate(sample):
+        word, examples = card[1], card[5].split()
+        kind = i % 5
+        if kind == 0:
+            mix.append(('exact', word, None))
+        elif kind == 1:
+            mix.append(('prefix', word[:3], None))
+        elif kind == 2:
+            mix.append(('two_words', f'{examples[0]} {examples[1]}', None))
+        elif kind == 3:
+            mix.append(('language', word, card[2]))
+        else:
+            mix.append(('translation', card[3].split()[0], None))
+    return mix
+
+
+def vocabulary_counts(cards):
+    counts = {}
+    for card in cards:
+        for word in set(card[5].replace('|', ' ').split()):
+            counts[word] = counts.get(word, 0) + 1
+    return counts
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return {
+        'p50_ms': round(timings[len(timings) // 2] * 1000, 3),
+        'p99_ms': round(timings[int(len(timings) * 0.99)] * 1000, 3),
+    }
+
+
+def timed_queries(search, mix):
+    by_kind = {}
+    for kind, query, language in mix:
+        start = time.perf_counter()
+        search(query, 20, language)
+        by_kind.setdefault(kind, []).append(time.perf_counter() - start)
+    result = {kind: percentiles(timings) for kind, timings in by_kind.items()}
+    result['all'] = percentiles([t for timings in by_kind.values() for t in timings])
+    return result
+
+
+def run(n, count):
+    rng = random.Random(2)
+    cards = list(generate(n))
+    mix = queries(cards, rng, count)
+    # The most frequent example word
+    common_word = max(vocabulary_counts(cards[:10000]).items(), key=lambda item: item[1])[0]
+    result = {'cards': n}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs(csv_db.DATA_DIR)
+        log = RecordLog(csv_db.FLASHCARDS_LOG).open()
+        for start in range(0, n, 50000):
+            log.put_many([dict(zip(csv_db.FLASHCARD_COLUMNS, row)) for row in cards[start:start + 50000]])
+
+        started = time.perf_counter()
+        index = SearchIndex(log, csv_db.FLASHCARDS_SEARCH_INDEX)
+        index.rebuild()
+        build = time.perf_counter() - started
+        started = time.perf_counter()
+        index.save()
+        save = time.perf_counter() - started
+        started = time.perf_counter()
+        # Searches run on the loaded copy, as after a restart
+        index = SearchIndex(log, csv_db.FLASHCARDS_SEARCH_INDEX).open()
+        load = time.perf_counter() - started
+
+        csv_db._flashcard_log = log
+        csv_db._search_index = index
+        result['csv'] = {
+            'build_s': round(build, 2),
+            'save_s': round(save, 2),
+            'load_s': round(load, 2),
+            'file_mb': round(os.path.getsize(csv_db.FLASHCARDS_SEARCH_INDEX) / 1e6, 1),
+            'terms': index.stats()['terms'],
+            'queries': timed_queries(csv_db.search_flashcards, mix),
+            'common_word': timed_queries(csv_db.search_flashcards, [('common', common_word, None)] * 20)['all'],
+        }
+
+        log.close()
+        csv_db._flashcard_log = None
+        csv_db._search_index = None
+        os.remove(csv_db.FLASHCARDS_LOG)
+
+        started = time.perf_counter()
+        sqlite_db.init_database()
+        conn = sqlite_db._connect()
+        with conn:
+            conn.executemany(f"INSERT INTO flashcards VALUES ({', '.join('?' * 8)})", cards)
+        result['sqlite'] = {
+            'build_s': round(time.perf_counter() - started, 2),
+            'queries': timed_queries(sqlite_db.search_flashcards, mix),
+            'common_word': timed_queries(sqlite_db.search_flashcards, [('common', common_word, None)] * 20)['all'],
+        }
+        sqlite_db.close_history()
+        os.chdir('/')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cards', type=int, nargs='+', default=[1000000])
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    try:
+        results = [run(n, args.queries) for n in args.cards]
+    finally:
+        os.chdir(cwd)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
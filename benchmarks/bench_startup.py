@@ -0,0 +1,115 @@
+"""
+Cold start: importing the app, starting it and serving the first request
+
+Each run is a fresh interpreter started with ``python -X importtime``, in
+a fresh data directory, that:
+
+- imports app.py
+- runs the app's lifespan startup
+- serves GET /healthcheck and GET / through an in-process ASGI client
+
+It reports the median of --runs runs for each step, and the packages that
+took the most import time (cumulative, from the importtime report), so a
+dependency that crept back into the import path shows up by name.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import asyncio, json, os, sys, time
+sys.path.insert(0, os.environ['REPO_ROOT'])
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+print('--- app imported', file=sys.stderr, flush=True)
+# The benchmark's own client, left out of the timings
+import httpx
+client_loaded = time.perf_counter()
+
+async def serve():
+    async with app.app.router.lifespan_context(app.app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            (await client.get('/healthcheck')).raise_for_status()
+            health = time.perf_counter()
+            (await client.get('/')).raise_for_status()
+            home = time.perf_counter()
+    return ready, health, home
+
+ready, health, home = asyncio.run(serve())
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'lifespan_ms': (ready - client_loaded) * 1000,
+    'first_healthcheck_ms': (health - ready) * 1000,
+    'first_page_ms': (home - health) * 1000,
+    'total_ms': (home - started - (client_loaded - imported)) * 1000,
+}))
+'''
+
+
+def import_times(report):
+    """Cumulative import time in ms per top-level package in an importtime report"""
+    totals = defaultdict(float)
+    for line in report.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)', line)
+        if match:
+            # Only the outermost import of each package, so nothing counts twice
+            totals[match.group(3).split('.')[0], len(match.group(2))] += int(match.group(1)) / 1000
+    outermost = {}
+    for (package, depth), ms in sorted(totals.items(), key=lambda item: item[0][1]):
+        outermost.setdefault(package, (depth, 0.0))
+        if outermost[package][0] == depth:
+            outermost[package] = (depth, outermost[package][1] + ms)
+    return {package: ms for package, (depth, ms) in outermost.items()}
+
+
+def run_once():
+    data = tempfile.mkdtemp()
+    os.makedirs(os.path.join(data, 'app'))
+    for name in ('static', 'templates'):
+        os.symlink(os.path.join(REPO_ROOT, 'app', name), os.path.join(data, 'app', name))
+    env = dict(os.environ, REPO_ROOT=REPO_ROOT, AI_PROVIDER='fake')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD], cwd=data, env=env, capture_output=True, text=True, check=True
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    at_import, after_import = result.stderr.split('--- app imported', 1)
+    return timings, import_times(at_import), import_times(after_import)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=12, help='packages listed by import time')
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    steps = {step: round(statistics.median(run[0][step] for run in runs), 1) for step in runs[0][0]}
+    result = {'runs': args.runs, 'median_ms': steps}
+    for index, phase in ((1, 'imported_by_app_ms'), (2, 'imported_after_startup_ms')):
+        packages = defaultdict(list)
+        for run in runs:
+            for package, ms in run[index].items():
+                packages[package].append(ms)
+        slowest = sorted(((statistics.median(ms), package) for package, ms in packages.items()), reverse=True)
+        result[phase] = {package: round(ms, 1) for ms, package in slowest[:args.top]}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+CSV vs SQLite storage backend
+
+Seeds each backend with N flashcards spread over a few languages and N
+query-log rows, then times point lookups (get_flashcard), list-by-language
+(get_flashcards_by_language) and history appends (save_query_log, with the
+final flush included). Run from the repository root:
+
+    python benchmarks/bench_storage_backends.py --sizes 10000 100000
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The seeded history is dated 2024; keep it past the retention
+os.environ.setdefault('HISTORY_RETENTION_DAYS', '0')
+
+from src.flashcards.database import csv_db, sqlite_db
+from src.flashcards.database.record_log import RecordLog
+
+LANGUAGES = ['english', 'spanish', 'french', 'german', 'italian', 'vietnamese', 'japanese', 'korean']
+
+
+def cards(n):
+    for i in range(1, n + 1):
+        yield [i, f'word{i}', LANGUAGES[i % len(LANGUAGES)], f'translation {i}', f'/w{i}/',
+               f'An example with word{i}; Another one', '2024-01-01 00:00:00', '2024-01-01 00:00:00']
+
+
+def queries(n):
+    for i in range(1, n + 1):
+        yield [i, 'translate', f'phrase {i} (en to vi)', f'translated phrase {i}', '2024-01-01 00:00:00']
+
+
+def seed_csv(n):
+    log = RecordLog(csv_db.FLASHCARDS_LOG).open()
+    batch = []
+    for row in cards(n):
+        batch.append(dict(zip(csv_db.FLASHCARD_COLUMNS, row)))
+        if len(batch) == 50000:
+            log.put_many(batch)
+            batch = []
+    log.put_many(batch)
+    log.close()
+    with open(csv_db.QUERY_LOG_CSV, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_db.QUERY_LOG_COLUMNS)
+        writer.writerows(queries(n))
+
+
+def seed_sqlite(n):
+    sqlite_db.init_database()
+    conn = sqlite_db._connect()
+    with conn:
+        conn.executemany(f"INSERT INTO flashcards VALUES ({', '.join('?' * 8)})", cards(n))
+        conn.executemany(f"INSERT INTO query_log VALUES ({', '.join('?' * 5)})", queries(n))
+
+
+def timed(operation, count):
+    start = time.perf_counter()
+    for i in range(count):
+        operation(i)
+    return round((time.perf_counter() - start) / count * 1e6, 1)
+
+
+def measure(backend, n, ops):
+    ids = [random.randint(1, n) for _ in range(ops)]
+    result = {
+        'get_flashcard_us': timed(lambda i: backend.get_flashcard(ids[i]), ops),
+        'list_by_language_us': timed(lambda i: backend.get_flashcards_by_language(LANGUAGES[i % len(LANGUAGES)]), 50),
+    }
+
+    def append(i):
+        backend.save_query_log('translate', f'bench {i}', 'ok')
+        if i == ops - 1:
+            backend.flush_history()
+
+    result['save_query_log_us'] = timed(append, ops)
+    return result
+
+
+def run(n, ops):
+    result = {'rows': n}
+    for name, backend, seed in (('csv', csv_db, seed_csv), ('sqlite', sqlite_db, seed_sqlite)):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            os.makedirs(csv_db.DATA_DIR)
+            seed(n)
+            csv_db._flashcard_log = None
+            backend.init_database()
+            # Build the csv backend's snapshot before timing, as a running app would have
+            backend.get_flashcards()
+            result[name] = measure(backend, n, ops)
+            backend.close_history()
+            csv_db._flashcard_log = None
+            os.chdir('/')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--ops', type=int, default=2000, help='operations timed per kind')
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    try:
+        results = [run(n, args.ops) for n in args.sizes]
+    finally:
+        os.chdir(cwd)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
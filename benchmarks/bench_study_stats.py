@@ -0,0 +1,188 @@
+"""
+Deck-wide study statistics over synthetic review histories
+
+Seeds N flashcards, each reviewed a few times over the last 90 days, so
+every card has a schedule and the review history holds about 2N rows.
+On each storage backend it reports:
+
+- "columns": reading every schedule as column arrays, and again with no
+  write in between ("columns_again"; the sqlite backend reuses them)
+- "forecast_30d", "overdue_by_language", "expected_retention": numpy over
+  those columns, next to "forecast_loop", the same forecast computed card
+  by card in Python
+- "stats_endpoint": study_stats.get_study_stats() end to end
+- "study_streak": the streak shown on every page (the csv backend reads
+  only what was appended to the review history since the last call)
+- "reschedule": moving every card to a new target retention
+
+Run from the repository root:
+
+    python benchmarks/bench_study_stats.py --cards 1000000
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.flashcards.database import csv_db, scheduler, sqlite_db
+from src.flashcards.database.record_log import RecordLog
+from src.flashcards.utils import study_stats
+
+LANGUAGES = ['english', 'spanish', 'french', 'german', 'italian', 'vietnamese', 'japanese', 'korean']
+NOW = datetime(2025, 1, 1, 12, 0, 0)
+
+
+def generate(n, seed=1):
+    """Return card rows, their schedules and review history rows"""
+    rng = np.random.default_rng(seed)
+    stamp = scheduler.TIMESTAMP_FORMAT
+    created = [(NOW - timedelta(days=120, seconds=int(s))).strftime(stamp) for s in rng.integers(0, 86400 * 30, n)]
+    cards = [[i + 1, f'word{i + 1}', LANGUAGES[i % len(LANGUAGES)], '', '', '', created[i], created[i]] for i in range(n)]
+
+    schedules = []
+    history = []
+    reviews = rng.integers(1, 4, n)
+    first = rng.integers(0, 86400 * 60, n)
+    grades = rng.choice([1, 3, 4, 5], size=(n, 3), p=[0.1, 0.2, 0.5, 0.2])
+    for i in range(n):
+        schedule = scheduler.new_schedule(created[i])
+        reviewed = NOW - timedelta(days=90) + timedelta(seconds=int(first[i]))
+        for r in range(reviews[i]):
+            schedule = scheduler.next_review(schedule, int(grades[i, r]), reviewed)
+            history.append([len(history) + 1, i + 1, int(grades[i, r]), schedule['ease'], schedule['interval'],
+                            schedule['due'], schedule['last_reviewed']])
+            reviewed = datetime.strptime(schedule['due'], stamp)
+            if reviewed >= NOW:
+                break
+        schedules.append(schedule)
+    return cards, schedules, history
+
+
+def timed(function, repeat=5):
+    """Run ``function`` and return its median time in ms and its last result"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return round(sorted(timings)[len(timings) // 2] * 1000, 2), result
+
+
+def forecast_loop(schedules, now, days=30):
+    """The forecast without column arrays"""
+    start = datetime.strptime(now[:10], '%Y-%m-%d')
+    counts = [0] * days
+    for schedule in schedules:
+        day = max((datetime.strptime(schedule['due'], scheduler.TIMESTAMP_FORMAT) - start).days, 0)
+        if day < days:
+            counts[day] += 1
+    return counts
+
+
+def measure(backend, schedules, now):
+    result = {}
+    result['columns_ms'], columns = timed(backend.get_schedule_columns, repeat=1)
+    result['columns_again_ms'], _ = timed(backend.get_schedule_columns)
+    result['forecast_30d_ms'], _ = timed(lambda: scheduler.forecast(columns, now, 30))
+    result['overdue_by_language_ms'], _ = timed(lambda: scheduler.overdue_by_language(columns, now))
+    result['expected_retention_ms'], _ = timed(lambda: scheduler.expected_retention(columns, now))
+    result['forecast_loop_ms'], _ = timed(lambda: forecast_loop(schedules, now), repeat=1)
+    result['stats_endpoint_ms'], _ = timed(lambda: study_stats.get_study_stats(now), repeat=3)
+    result['study_streak_ms'], _ = timed(lambda: study_stats.get_study_streak(now[:10]))
+    result['reschedule_ms'], rescheduled = timed(lambda: backend.reschedule_flashcards(0.85), repeat=1)
+    result['rescheduled'] = rescheduled
+    return result
+
+
+def run_csv(cards, schedules, history, now):
+    log = RecordLog(csv_db.FLASHCARDS_LOG).open()
+    schedule_log = RecordLog(csv_db.SCHEDULES_LOG).open()
+    for start in range(0, len(cards), 50000):
+        log.put_many([dict(zip(csv_db.FLASHCARD_COLUMNS, row)) for row in cards[start:start + 50000]])
+        schedule_log.put_many([
+            {'id': start + i + 1, **schedule} for i, schedule in enumerate(schedules[start:start + 50000])
+        ])
+    with open(csv_db.REVIEW_HISTORY_CSV, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_db.REVIEW_HISTORY_COLUMNS)
+        writer.writerows(history)
+    csv_db._flashcard_log = log
+    csv_db._schedule_log = schedule_log
+
+    started = time.perf_counter()
+    csv_db._flashcard_due_queue()
+    result = {'queue_build_s': round(time.perf_counter() - started, 2)}
+    started = time.perf_counter()
+    csv_db.get_review_days()
+    result['review_days_first_read_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    result.update(measure(csv_db, schedules, now))
+
+    csv_db.close_history()
+    for record_log in (log, schedule_log):
+        # Rescheduling rewrites every schedule, which starts a compaction
+        if record_log._compaction is not None:
+            record_log._compaction.join()
+        record_log.close()
+    csv_db._flashcard_log = csv_db._schedule_log = csv_db._due_queue = None
+    # Otherwise the sqlite backend imports them on first start
+    for path in (csv_db.FLASHCARDS_LOG, csv_db.SCHEDULES_LOG, csv_db.REVIEW_HISTORY_CSV):
+        os.remove(path)
+    return result
+
+
+def run_sqlite(cards, schedules, history, now):
+    sqlite_db.init_database()
+    conn = sqlite_db._connect()
+    with conn:
+        conn.executemany(f"INSERT INTO flashcards VALUES ({', '.join('?' * 8)})", cards)
+        conn.executemany(
+            f"UPDATE schedules SET {', '.join(column + ' = ?' for column in csv_db.SCHEDULE_COLUMNS)} WHERE flashcard_id = ?",
+            [[schedule[column] for column in csv_db.SCHEDULE_COLUMNS] + [i + 1] for i, schedule in enumerate(schedules)],
+        )
+        conn.executemany(f"INSERT INTO review_history VALUES ({', '.join('?' * 7)})", history)
+    study_stats.db = sqlite_db
+    try:
+        return measure(sqlite_db, schedules, now)
+    finally:
+        study_stats.db = csv_db
+        sqlite_db.close_history()
+
+
+def run(n):
+    cards, schedules, history = generate(n)
+    now = NOW.strftime(scheduler.TIMESTAMP_FORMAT)
+    result = {'cards': n, 'reviews': len(history)}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs(csv_db.DATA_DIR)
+        study_stats.db = csv_db
+        result['csv'] = run_csv(cards, schedules, history, now)
+        result['sqlite'] = run_sqlite(cards, schedules, history, now)
+        os.chdir('/')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cards', type=int, nargs='+', default=[1000000])
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    try:
+        results = [run(n) for n in args.cards]
+    finally:
+        os.chdir(cwd)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Long-document summarization: one prompt versus map-reduce over chunks
+
+Uses a fake model whose latency grows with the prompt and the reply, like
+a hosted model's: a fixed round trip, a cost per input token (prefill) and
+a cost per output token (decoding). Documents are built from paragraphs of
+ordinary sentences. For each document size it times:
+
+- "single_prompt": the whole document in one prompt, as summarize() did
+  before; "fits_context" tells whether it would fit a 30k-token window
+- "map_reduce": chunks summarized concurrently, then the summaries combined
+- "edited": map_reduce again after one paragraph in the middle changed,
+  so only the chunks around it go back to the model
+
+Run from the repository root:
+
+    python benchmarks/bench_summarize_long.py --tokens 10000 40000 160000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('AI_PROVIDER', 'fake')
+
+from src.flashcards.ai import gemini
+from src.flashcards.ai.cache import ResponseCache
+from src.flashcards.ai.chunking import chunk_text, estimate_tokens
+from src.flashcards.ai.fake_model import FakeProvider, respond
+from src.flashcards.database import db
+
+CONTEXT_WINDOW = 30720
+WORDS = ('light water plants energy cells carbon oxygen sugar leaves roots soil growth season climate '
+         'process chemical reaction membrane protein structure system').split()
+
+
+class TimedModel(FakeProvider):
+    """FakeProvider whose latency depends on the prompt and reply lengths"""
+
+    def __init__(self, round_trip, prefill_ms, decode_ms):
+        super().__init__()
+        self.round_trip = round_trip
+        self.prefill = prefill_ms / 1000
+        self.decode = decode_ms / 1000
+
+    def generate(self, prompt):
+        self.calls += 1
+        text = respond(prompt)
+        time.sleep(self.round_trip + estimate_tokens(prompt) * self.prefill + estimate_tokens(text) * self.decode)
+        return text
+
+
+def document(tokens, seed=1, edited=False):
+    rng = random.Random(seed)
+    paragraphs = []
+    while estimate_tokens('\n\n'.join(paragraphs)) < tokens:
+        sentences = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + '.'
+                     for _ in range(rng.randint(3, 8))]
+        paragraphs.append(' '.join(sentences))
+    if edited:
+        middle = len(paragraphs) // 2
+        paragraphs[middle] = 'Edited. ' + paragraphs[middle]
+    return '\n\n'.join(paragraphs)
+
+
+async def single_prompt(text):
+    # The prompt summarize() sent for any length of text
+    return await gemini._generate(f"""
+    Summarize the following text into a moderate length summary (3-5 sentences) using a factual and informative style:
+
+    "{text}"
+
+    Return your response in the following JSON format:
+    {{
+        "summary": "the summary of the text"
+    }}
+
+    Only respond with the JSON, no other text.
+    """, timeout=3600)
+
+
+def timed(coroutine):
+    started = time.perf_counter()
+    asyncio.run(coroutine)
+    return round(time.perf_counter() - started, 2)
+
+
+def run(tokens, model):
+    text = document(tokens)
+    gemini.response_cache = ResponseCache()
+    result = {
+        'tokens': estimate_tokens(text),
+        'chunks': len(chunk_text(text, gemini.SUMMARY_CHUNK_TOKENS)),
+        'fits_context': estimate_tokens(text) <= CONTEXT_WINDOW,
+    }
+    result['single_prompt_s'] = timed(single_prompt(text))
+    calls = model.calls
+    result['map_reduce_s'] = timed(gemini.summarize(text))
+    result['map_reduce_calls'] = model.calls - calls
+    calls = model.calls
+    result['edited_s'] = timed(gemini.summarize(document(tokens, edited=True)))
+    result['edited_calls'] = model.calls - calls
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tokens', type=int, nargs='+', default=[10000, 40000, 160000])
+    parser.add_argument('--round-trip', type=float, default=0.3, help='seconds of fixed latency per call')
+    parser.add_argument('--prefill-ms', type=float, default=0.2, help='ms per input token')
+    parser.add_argument('--decode-ms', type=float, default=20, help='ms per output token')
+    args = parser.parse_args()
+
+    model = TimedModel(args.round_trip, args.prefill_ms, args.decode_ms)
+    gemini.provider = model
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # summarize() saves its history under app/data
+        os.chdir(tmp)
+        db.init_database()
+        try:
+            results = [run(tokens, model) for tokens in args.tokens]
+        finally:
+            db.close_history()
+            os.chdir(cwd)
+    print(json.dumps({
+        'chunk_tokens': gemini.SUMMARY_CHUNK_TOKENS,
+        'max_parallel': gemini.SUMMARY_MAX_PARALLEL,
+        'pool_size': gemini.GEMINI_MAX_CONCURRENCY,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Event-loop responsiveness while model calls are pending
+
+Fires N concurrent /api/translate requests at the app, backed by the local
+fake model, and measures /healthcheck latency while they wait. Run from the
+repository root:
+
+    python benchmarks/load_healthcheck.py --requests 50 --latency 1.0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('AI_PROVIDER', 'fake')
+# Measures the event loop, not the per-client rate limit
+os.environ.setdefault('RATE_LIMIT_PER_MINUTE', '0')
+
+
+async def run(requests, probes):
+    import httpx
+    import app
+
+    transport = httpx.ASGITransport(app=app.app)
+    async with app.app.router.lifespan_context(app.app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            start = time.perf_counter()
+            pending = [
+                asyncio.create_task(client.post('/api/translate', json={'text': f'phrase {i}', 'use_cache': False}))
+                for i in range(requests)
+            ]
+            await asyncio.sleep(0.05)
+
+            latencies = []
+            for _ in range(probes):
+                probe_start = time.perf_counter()
+                await client.get('/healthcheck')
+                latencies.append((time.perf_counter() - probe_start) * 1e3)
+                await asyncio.sleep(0.01)
+            stats_during = (await client.get('/api/stats')).json()['ai']
+
+            responses = await asyncio.gather(*pending)
+            elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'translate_requests': requests,
+        'translate_ok': sum(response.status_code == 200 for response in responses),
+        'translate_total_s': round(elapsed, 2),
+        'healthcheck_ms': {
+            'p50': round(statistics.median(latencies), 2),
+            'p99': round(latencies[int(len(latencies) * 0.99) - 1], 2),
+            'max': round(latencies[-1], 2),
+        },
+        'pool_during_load': stats_during,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=1.0, help='fake model latency in seconds')
+    parser.add_argument('--probes', type=int, default=100)
+    args = parser.parse_args()
+
+    os.environ['GEMINI_FAKE_LATENCY'] = str(args.latency)
+    print(json.dumps(asyncio.run(run(args.requests, args.probes)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Bulk flashcard generation jobs
+
+A job first leaves out words that already have a card or a near duplicate
+(see duplicate_index.py), so they cost no model call. It packs the rest
+into batched prompts, runs the batches concurrently under a limit, retries
+any word a batch failed to answer on its own, and finally writes every
+generated card to storage in one append. Jobs are kept in memory so their
+progress can be polled by id.
+"""
+
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from src.flashcards.ai import gemini
+from src.flashcards.database import db
+from src.flashcards.database.duplicate_index import normalize
+
+BATCH_SIZE = int(os.getenv('FLASHCARD_BATCH_SIZE', '20'))
+BATCH_CONCURRENCY = int(os.getenv('FLASHCARD_BATCH_CONCURRENCY', '4'))
+WORD_RETRIES = 2
+MAX_JOBS = 100
+
+_jobs = OrderedDict()
+
+
+def parse_word_list(text):
+    """
+    Split an uploaded word list on newlines and commas, dropping blanks and repeats
+
+    Words equal but for case, diacritics or spacing are repeats.
+    """
+    words = []
+    seen = set()
+    for line in text.splitlines():
+        for word in line.split(','):
+            word = word.strip()
+            if word and normalize(word) not in seen:
+                seen.add(normalize(word))
+                words.append(word)
+    return words
+
+
+def start_job(words, language, skip_duplicates=True):
+    """
+    Start generating flashcards for ``words`` in the background
+
+    Args:
+        words (list): Words to generate cards for
+        language (str): Language of the words
+        skip_duplicates (bool): Leave out words with an existing card or a
+            near duplicate; they are listed in the job's ``duplicates``
+
+    Returns:
+        dict: The public view of the new job (see get_job)
+    """
+    words = parse_word_list('\n'.join(words))
+    job_id = uuid.uuid4().hex
+    job = {
+        'job_id': job_id,
+        'status': 'pending',
+        'language': language,
+        'total': len(words),
+        'generated': 0,
+        'failed': [],
+        'retried': [],
+        'flashcard_ids': [],
+        'duplicates': [],
+        'prompts': 0,
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'finished_at': None,
+        'error': None,
+    }
+    _jobs[job_id] = job
+    while len(_jobs) > MAX_JOBS:
+        _jobs.popitem(last=False)
+
+    job['_task'] = asyncio.get_running_loop().create_task(_run_job(job, words, language, skip_duplicates))
+    return get_job(job_id)
+
+
+def get_job(job_id):
+    """Get the progress of a job, or None if the id is unknown"""
+    job = _jobs.get(job_id)
+    if job is None:
+        return None
+    return {key: value for key, value in job.items() if not key.startswith('_')}
+
+
+def _without_duplicates(job, words, language):
+    """Return the words with no similar card, listing the others in the job"""
+    kept = []
+    for word in words:
+        matches = db.find_duplicate_flashcards(word, language, limit=1)
+        if matches:
+            job['duplicates'].append({
+                'word': word,
+                'flashcard_id': matches[0]['id'],
+                'match': matches[0]['word'],
+                'similarity': matches[0]['similarity'],
+            })
+        else:
+            kept.append(word)
+    return kept
+
+
+async def _run_job(job, words, language, skip_duplicates=True):
+    job['status'] = 'running'
+    cards = {}
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run_batch(batch):
+        async with semaphore:
+            try:
+                job['prompts'] += 1
+                results = await gemini.generate_flashcard_batch(batch, language)
+            except Exception:
+                results = {}
+            for word in batch:
+                if word not in results:
+                    # Retry only the words this batch didn't answer
+                    job['retried'].append(word)
+                    results[word] = await _generate_single(job, word, language)
+                if results[word] is None:
+                    job['failed'].append(word)
+                else:
+                    cards[word] = results[word]
+                    job['generated'] += 1
+
+    try:
+        if skip_duplicates:
+            words = await asyncio.to_thread(_without_duplicates, job, words, language)
+        batches = [words[i:i + BATCH_SIZE] for i in range(0, len(words), BATCH_SIZE)]
+        await asyncio.gather(*(run_batch(batch) for batch in batches))
+
+        flashcards = [
+            {'word': word, 'language': language, **cards[word]}
+            for word in words if word in cards
+        ]
+        job['flashcard_ids'] = db.save_flashcards(flashcards)
+        job['status'] = 'completed'
+        
+        if job['retried']:
+            query = f"Retried {len(job['retried'])} words one by one in {language}: {', '.join(job['retried'])}"
+            response = f"Generated {job['generated']} of {job['total']}; failed: {', '.join(job['failed']) or 'none'}"
+            db.save_query_log("flashcard_generation", query, response)
+    except asyncio.CancelledError:
+        job['status'] = 'failed'
+        job['error'] = 'Job was cancelled'
+        raise
+    except Exception as e:
+        job['status'] = 'failed'
+        job['error'] = str(e)
+    finally:
+        job['finished_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+async def _generate_single(job, word, language):
+    """
+    Generate one card on its own, returning None after WORD_RETRIES failures
+
+    A malformed reply raises ParseError and counts as a failure. Retries
+    are logged once per job, not once per word.
+    """
+    for attempt in range(WORD_RETRIES):
+        try:
+            job['prompts'] += 1
+            return await gemini.generate_flashcard_data(
+                word,
+                language,
+                use_cache=attempt == 0,
+                log=False
+            )
+        except Exception:
+            continue
+    return None
@@ -0,0 +1,255 @@
+"""
+Result cache for deterministic AI features
+
+Responses are keyed on the feature name, the normalized input text and the
+parameters that shape the prompt. Entries live in an in-memory LRU with a
+TTL and, optionally, in an SQLite file that survives restarts. Concurrent
+identical requests are coalesced so only one of them reaches the model.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_MISSING = object()
+
+# Bump when the shape of cached values changes so stale disk entries are ignored
+CACHE_VERSION = 2
+
+
+def normalize_text(text):
+    """Normalize text for cache keys: Unicode NFC and collapsed whitespace"""
+    return unicodedata.normalize('NFC', ' '.join((text or '').split()))
+
+
+def make_key(feature, text, **params):
+    """
+    Build a cache key for a feature call
+
+    Args:
+        feature (str): Feature name, e.g. "translate"
+        text (str): Input text; whitespace and Unicode form are normalized
+        **params: Prompt parameters such as source/target language
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    normalized_params = {name: normalize_text(str(value)).lower() for name, value in params.items() if value is not None}
+    payload = json.dumps([CACHE_VERSION, feature, normalize_text(text), normalized_params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _DiskTier:
+    """SQLite-backed second tier so cached results survive restarts"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Opened on first use, so importing the app doesn't touch the disk
+        self._conn = None
+
+    def _connection(self):
+        """The database connection, opened on first use; call with the lock held"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection().execute('SELECT value, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return _MISSING
+        value, expires_at = row
+        if expires_at < time.time():
+            self.delete(key)
+            return _MISSING
+        return json.loads(value)
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value, ensure_ascii=False), expires_at),
+            )
+            conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            conn.commit()
+
+    def stats(self):
+        with self._lock:
+            count, size = self._connection().execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM responses').fetchone()
+        return {'entries': count, 'bytes': size}
+
+
+class ResponseCache:
+    """
+    In-memory LRU + TTL cache with an optional on-disk tier
+
+    Args:
+        max_entries (int): Entries kept in memory before evicting the least recently used
+        ttl (float): Seconds an entry stays valid
+        disk_path (str, optional): SQLite file for the persistent tier; disabled when None
+    """
+
+    def __init__(self, max_entries=10000, ttl=86400, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._disk = _DiskTier(disk_path) if disk_path else None
+        self._inflight = {}
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'coalesced': 0, 'bypassed': 0, 'evictions': 0}
+
+    def get(self, key):
+        """Return the cached value for ``key``, or None if absent or expired"""
+        value = self._get_memory(key)
+        if value is _MISSING:
+            value = self._get_disk(key)
+        return None if value is _MISSING else value
+
+    def _get_memory(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, size, expires_at = entry
+                if expires_at >= now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return value
+                self._remove(key)
+            if self._disk is None:
+                self._stats['misses'] += 1
+        return _MISSING
+
+    def _get_disk(self, key):
+        """Look ``key`` up in the disk tier (blocking; call off the event loop)"""
+        if self._disk is None:
+            return _MISSING
+        value = self._disk.get(key)
+        if value is _MISSING:
+            with self._lock:
+                self._stats['misses'] += 1
+            return _MISSING
+        self._store(key, value, time.time() + self.ttl)
+        with self._lock:
+            self._stats['disk_hits'] += 1
+        return value
+
+    def set(self, key, value):
+        """Store a JSON-serializable value in every tier (blocking)"""
+        expires_at = time.time() + self.ttl
+        self._store(key, value, expires_at)
+        if self._disk is not None:
+            self._disk.set(key, value, expires_at)
+
+    async def store(self, key, value):
+        """Store a value in every tier, writing the disk tier off the event loop"""
+        expires_at = time.time() + self.ttl
+        self._store(key, value, expires_at)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.set, key, value, expires_at)
+
+    def _store(self, key, value, expires_at):
+        size = len(key) + len(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def clear(self):
+        """Drop every in-memory entry (the disk tier is left untouched)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    async def get_or_compute(self, key, compute, bypass=False, cacheable=None):
+        """
+        Return the cached value for ``key`` or compute and cache it
+
+        The computation runs as its own task. Concurrent callers asking for
+        the same key wait on that single task, and a caller that goes away
+        (client disconnect) doesn't cancel it for the others.
+
+        Args:
+            key (str): Cache key from make_key()
+            compute (callable): Coroutine function producing the value
+            bypass (bool): Skip the cache entirely for this call
+            cacheable (callable, optional): Predicate deciding whether a
+                computed value may be stored; all values are stored when None
+        """
+        if bypass:
+            with self._lock:
+                self._stats['bypassed'] += 1
+            return await compute()
+
+        value = self._get_memory(key)
+        if value is _MISSING and self._disk is not None:
+            value = await asyncio.to_thread(self._get_disk, key)
+        if value is not _MISSING:
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            with self._lock:
+                self._stats['coalesced'] += 1
+        else:
+            task = asyncio.ensure_future(self._compute(key, compute, cacheable))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    async def _compute(self, key, compute, cacheable):
+        value = await compute()
+        if cacheable is None or cacheable(value):
+            await self.store(key, value)
+        return value
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved when every caller went away
+            task.exception()
+
+    def stats(self):
+        """Get hit/miss counters, hit rate and bytes used"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        # Coalesced requests were counted as misses before joining the pending call
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['disk_hits'] + stats['coalesced']) / lookups if lookups else 0.0
+        if self._disk is not None:
+            stats['disk'] = self._disk.stats()
+        return stats
@@ -0,0 +1,141 @@
+"""
+Split long documents into chunks that fit a prompt
+
+Chunks end on paragraph boundaries where possible, then on sentence
+boundaries; only a single sentence longer than the budget is split between
+words. Token counts are estimated at about four characters per token, which
+is close enough for Gemini to stay within the budget without a tokenizer.
+
+Where a chunk ends depends on the text around the boundary, not on where
+the document starts. Once a chunk holds half its budget, it ends after the
+first piece (paragraph or sentence) whose hash picks it as a boundary. An
+edit therefore changes the chunk it falls in, and maybe the next one, but
+the chunks after that line up with the old ones again. Summaries of chunks
+are cached by content, so re-summarizing an edited document only asks the
+model about the chunks that changed.
+
+sentence_spans() finds the sentences of a text by their offsets, for
+checks that work sentence by sentence.
+"""
+
+import re
+import zlib
+
+# About four characters per token for English text
+CHARS_PER_TOKEN = 4
+
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_SENTENCE_END = re.compile(r'(?<=[.!?。！？])["\')\]]*\s+')
+# A sentence ends at whitespace after its closing punctuation (but not after
+# an initial such as "J." or a common abbreviation) or at a line break
+_SENTENCE_GAP = re.compile(
+    r'(?<=[.!?。！？])(?<![A-Z]\.)(?<!\bMr\.)(?<!\bMs\.)(?<!\bDr\.)(?<!\bSt\.)(?<!\bvs\.)(?<!\bMrs\.)'
+    r'(?<!\be\.g\.)(?<!\bi\.e\.)["\')\]]*(?P<gap>\s+)|(?P<line>[ \t]*\n\s*)'
+)
+
+
+def estimate_tokens(text):
+    """Estimate how many tokens ``text`` takes up in a prompt"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_sentences(text):
+    """Split ``text`` after sentence-ending punctuation"""
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def sentence_spans(text):
+    """
+    Find the sentences of ``text``, which also end at line breaks
+
+    Returns:
+        list: (start, end) character offsets of each sentence, without the
+            whitespace around it
+    """
+    spans = []
+    start = 0
+    for match in _SENTENCE_GAP.finditer(text):
+        gap = 'gap' if match.group('gap') else 'line'
+        spans.append((start, match.start(gap)))
+        start = match.end()
+    spans.append((start, len(text)))
+    trimmed = []
+    for start, end in spans:
+        sentence = text[start:end]
+        if sentence.strip():
+            start += len(sentence) - len(sentence.lstrip())
+            end -= len(sentence) - len(sentence.rstrip())
+            trimmed.append((start, end))
+    return trimmed
+
+
+def _split_words(text, max_tokens):
+    """Split one overlong sentence between words"""
+    budget = max_tokens * CHARS_PER_TOKEN
+    parts = []
+    current = []
+    size = -1
+    for word in text.split():
+        if current and size + len(word) + 1 > budget:
+            parts.append(' '.join(current))
+            current, size = [], -1
+        current.append(word)
+        size += len(word) + 1
+    if current:
+        parts.append(' '.join(current))
+    return parts
+
+
+def _pieces(text, max_tokens):
+    """Yield (piece, separator) pairs: paragraphs, or sentences of long ones"""
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = ' '.join(paragraph.split())
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            yield paragraph, '\n\n'
+            continue
+        sentences = split_sentences(paragraph)
+        for index, sentence in enumerate(sentences):
+            separator = '\n\n' if index == 0 else ' '
+            if estimate_tokens(sentence) <= max_tokens:
+                yield sentence, separator
+            else:
+                for part in _split_words(sentence, max_tokens):
+                    yield part, separator
+                    separator = ' '
+
+
+def _is_boundary(piece):
+    # About one piece in four
+    return zlib.crc32(piece.encode('utf-8')) % 4 == 0
+
+
+def chunk_text(text, max_tokens):
+    """
+    Split ``text`` into chunks of at most ``max_tokens`` estimated tokens
+
+    Args:
+        text (str): The document
+        max_tokens (int): Token budget of one chunk
+
+    Returns:
+        list: The chunks, in order; paragraphs inside a chunk are separated
+            by blank lines
+    """
+    chunks = []
+    current = []
+    size = 0
+    for piece, separator in _pieces(text, max_tokens):
+        tokens = estimate_tokens(piece) + 1
+        if current and size + tokens > max_tokens:
+            chunks.append(''.join(current).strip())
+            current, size = [], 0
+        current.append(separator + piece if current else piece)
+        size += tokens
+        if size >= max_tokens // 2 and _is_boundary(piece):
+            chunks.append(''.join(current).strip())
+            current, size = [], 0
+    if current:
+        chunks.append(''.join(current).strip())
+    return chunks
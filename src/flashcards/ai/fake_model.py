@@ -0,0 +1,207 @@
+"""
+Local stand-in for the Gemini model
+
+FakeProvider answers every prompt the app sends with a canned, well-formed
+response after a configurable delay, without touching the network. It is
+used for tests, load tests and running the app offline (AI_PROVIDER=fake
+or GEMINI_FAKE_MODEL=1). Streaming calls yield the response word by word.
+
+For load tests the delay can follow a distribution, and a share of calls
+can fail or come back malformed. Draws are seeded from the prompt and how
+many times it was sent before, so a run makes the same draws for the same
+requests whatever order the pool threads run them in.
+
+Settings (all optional):
+
+- GEMINI_FAKE_LATENCY: mean seconds per call
+- GEMINI_FAKE_CHUNK_LATENCY: seconds between chunks of a streaming call
+- GEMINI_FAKE_LATENCY_DISTRIBUTION: constant, uniform (0 to twice the
+  mean), exponential or lognormal
+- GEMINI_FAKE_ERROR_RATE: share of calls raising FakeProviderError
+- GEMINI_FAKE_MALFORMED_RATE: share of calls answering with text that
+  isn't JSON
+- GEMINI_FAKE_SEED: seed for the draws
+"""
+
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+
+from src.flashcards.ai.providers import Provider
+
+DISTRIBUTIONS = ('constant', 'uniform', 'exponential', 'lognormal')
+# Spread of the lognormal distribution; its mean stays the configured latency
+LOGNORMAL_SIGMA = 0.8
+MALFORMED_RESPONSE = 'Sorry, I am not able to help with that right now.'
+
+
+class FakeProviderError(RuntimeError):
+    """An injected model failure"""
+
+
+class FakeProvider(Provider):
+    """
+    Deterministic provider answering from respond()
+
+    Args:
+        latency (float): Mean seconds each call blocks, simulating the model round-trip
+        chunk_latency (float): Seconds between chunks of a streaming call
+        distribution (str): How the delay varies around ``latency``; one of DISTRIBUTIONS
+        error_rate (float): Share of calls that raise FakeProviderError
+        malformed_rate (float): Share of calls answered with MALFORMED_RESPONSE
+        seed (int): Seed for the latency and failure draws
+    """
+
+    name = 'fake'
+
+    def __init__(self, latency=0.0, chunk_latency=0.0, distribution='constant', error_rate=0.0,
+                 malformed_rate=0.0, seed=0):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f'Unknown latency distribution {distribution!r}; use one of {", ".join(DISTRIBUTIONS)}')
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.distribution = distribution
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+        self.calls = 0
+        self._sent = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Create a FakeProvider from the GEMINI_FAKE_* settings"""
+        return cls(
+            latency=float(os.getenv('GEMINI_FAKE_LATENCY', '0')),
+            chunk_latency=float(os.getenv('GEMINI_FAKE_CHUNK_LATENCY', '0')),
+            distribution=os.getenv('GEMINI_FAKE_LATENCY_DISTRIBUTION', 'constant'),
+            error_rate=float(os.getenv('GEMINI_FAKE_ERROR_RATE', '0')),
+            malformed_rate=float(os.getenv('GEMINI_FAKE_MALFORMED_RATE', '0')),
+            seed=int(os.getenv('GEMINI_FAKE_SEED', '0')),
+        )
+
+    def _draw(self, prompt):
+        """Random numbers for this call, the same on every run"""
+        # Counted by checksum so a long load test doesn't hold on to every prompt
+        checksum = zlib.crc32(prompt.encode())
+        with self._lock:
+            self.calls += 1
+            sent = self._sent[checksum]
+            self._sent[checksum] += 1
+        return random.Random(f'{self.seed}:{checksum}:{sent}')
+
+    def _delay(self, rng):
+        if not self.latency or self.distribution == 'constant':
+            return self.latency
+        if self.distribution == 'uniform':
+            return rng.uniform(0, 2 * self.latency)
+        if self.distribution == 'exponential':
+            return rng.expovariate(1 / self.latency)
+        return rng.lognormvariate(math.log(self.latency) - LOGNORMAL_SIGMA ** 2 / 2, LOGNORMAL_SIGMA)
+
+    def _call(self, key):
+        """
+        Wait out the drawn delay; returns whether the answer is malformed
+
+        Raises:
+            FakeProviderError: For the drawn share of injected failures
+        """
+        rng = self._draw(key)
+        delay = self._delay(rng)
+        if delay:
+            time.sleep(delay)
+        outcome = rng.random()
+        if outcome < self.error_rate:
+            raise FakeProviderError('Injected model failure')
+        return outcome < self.error_rate + self.malformed_rate
+
+    def respond(self, prompt):
+        """The response text; subclasses override it to change what the model says"""
+        return respond(prompt)
+
+    def generate(self, prompt):
+        return MALFORMED_RESPONSE if self._call(prompt) else self.respond(prompt)
+
+    def stream(self, prompt):
+        for index, chunk in enumerate(re.findall(r'\s*\S+', self.generate(prompt))):
+            if index and self.chunk_latency:
+                time.sleep(self.chunk_latency)
+            yield chunk
+
+    def batch(self, prompts):
+        # One round-trip and one draw for the whole batch, as a batch endpoint would take
+        malformed = self._call('\n'.join(prompts))
+        return [MALFORMED_RESPONSE if malformed else self.respond(prompt) for prompt in prompts]
+
+
+def _quoted(prompt):
+    match = re.search(r'"(.*?)"', prompt, re.DOTALL)
+    return match.group(1) if match else ''
+
+
+def _check_sentence(index, sentence):
+    """Flag a repeated word ("the the"), the one mistake the fake model knows"""
+    repeated = re.search(r'\b(\w+) \1\b', sentence, re.IGNORECASE)
+    if not repeated:
+        return {'index': index, 'corrected': sentence, 'issues': []}
+    return {
+        'index': index,
+        'corrected': sentence[:repeated.start()] + repeated.group(1) + sentence[repeated.end():],
+        'issues': [{
+            'type': 'grammar',
+            'severity': 'error',
+            'original': repeated.group(0),
+            'suggestion': repeated.group(1),
+            'explanation': f'"{repeated.group(1)}" is repeated',
+        }],
+    }
+
+
+def _chat_summary(prompt):
+    """The previous summary followed by the learner's new messages, cut to the last 400 characters"""
+    previous = re.search(r'Summary so far:\s*\n\s*(.*?)\n', prompt).group(1).strip()
+    asked = re.findall(r'^\s*User: (.+)$', prompt, re.MULTILINE)
+    return '; '.join(([previous] if previous != '(none)' else []) + asked)[-400:]
+
+
+def respond(prompt):
+    """Build a deterministic response for one of the app's prompts"""
+    # Checked first, since the turns being summarized may contain any text
+    if 'Update the summary of this conversation' in prompt:
+        return _chat_summary(prompt)
+    if 'Generate flashcard data for each' in prompt:
+        words = re.findall(r'^\s*\d+\. (.+)$', prompt, re.MULTILINE)
+        return json.dumps([
+            {
+                'word': word,
+                'translations': f'{word} (translated)',
+                'pronunciation': f'/{word}/',
+                'examples': f'An example with {word}; Another {word}; A third {word}',
+            }
+            for word in words
+        ])
+    if 'Generate flashcard data' in prompt:
+        word = _quoted(prompt)
+        return json.dumps({
+            'translations': f'{word} (translated)',
+            'pronunciation': f'/{word}/',
+            'examples': f'An example with {word}; Another {word}; A third {word}',
+        })
+    if 'Check the grammar of each' in prompt:
+        return json.dumps([
+            _check_sentence(int(index), sentence)
+            for index, sentence in re.findall(r'^\s*(\d+)\. (.+)$', prompt, re.MULTILINE)
+        ])
+    if 'Translate the following' in prompt:
+        return json.dumps({'translated_text': f'[translated] {_quoted(prompt)}'})
+    if 'Respond with the summary text only' in prompt:
+        return _quoted(prompt)[:200]
+    if 'Summarize the following' in prompt:
+        return json.dumps({'summary': _quoted(prompt)[:200]})
+    return 'This is a response from the local fake model.'
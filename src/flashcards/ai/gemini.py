@@ -1,27 +1,289 @@
 import os
 import json
-import re
-import google.generativeai as genai
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 from dotenv import load_dotenv
-from src.flashcards.database import csv_db
+from src.flashcards.database import db
+from src.flashcards.ai.cache import ResponseCache, make_key
+from src.flashcards.ai.chunking import chunk_text, estimate_tokens, sentence_spans
+from src.flashcards.ai.parser import ParseError, parse_response
+from src.flashcards.ai.providers import create_provider, provider_name
+from src.flashcards.utils import metrics, rate_limit
+from src.flashcards.models.schemas import (
+    FlashcardData,
+    FlashcardBatchItem,
+    GrammarSentence,
+    TranslationResponse,
+    SummaryResponse
+)
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Gemini API
-gemini_api_key = os.getenv('GEMINI_API_KEY')
-if not gemini_api_key:
-    gemini_api_key = os.getenv('GOOGLE_AI_API_KEY')  # Try alternative name
+# The provider is created on the first model call (see providers.py), so
+# the app starts without an API key; tests and benchmarks assign their own.
+provider = None
+_provider_lock = threading.Lock()
+
+def get_provider():
+    """
+    Get the model provider, creating the configured one on first use
+
+    Raises:
+        ProviderError: If the configured provider can't be set up
+    """
+    global provider
+    if provider is None:
+        with _provider_lock:
+            if provider is None:
+                provider = create_provider()
+    return provider
+
+# Model calls are blocking, so they run on a dedicated bounded pool instead
+# of the event loop. GEMINI_MAX_CONCURRENCY caps the calls in flight; the
+# rest wait in the pool's queue until GEMINI_TIMEOUT expires.
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '8'))
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '60'))
+
+# Calls go through one token bucket for the provider's quota, shared by
+# every client of this process; calls waiting for it are served round-robin
+# by client (see rate_limit.py). The fake model has no quota by default.
+GEMINI_RATE_PER_MINUTE = float(os.getenv('GEMINI_RATE_PER_MINUTE', '0' if provider_name() == 'fake' else '60'))
+GEMINI_RATE_BURST = int(os.getenv('GEMINI_RATE_BURST', '10'))
+GEMINI_QUEUE_PER_CLIENT = int(os.getenv('GEMINI_QUEUE_PER_CLIENT', '20'))
+
+upstream_limiter = rate_limit.FairLimiter(GEMINI_RATE_PER_MINUTE, GEMINI_RATE_BURST, GEMINI_QUEUE_PER_CLIENT)
+
+_stage_duration = metrics.histogram(
+    'gemini_stage_duration_seconds', 'Time a model call spends waiting for the quota, in the pool queue and in the model',
+    ('feature', 'stage'),
+)
+_call_outcomes = metrics.counter('gemini_calls_total', 'Model calls by outcome', ('feature', 'outcome'))
+_prompt_tokens = metrics.counter('gemini_prompt_tokens_total', 'Estimated tokens sent to the model', ('feature',))
+_response_tokens = metrics.counter('gemini_response_tokens_total', 'Estimated tokens received from the model', ('feature',))
+
+_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix='gemini')
+_stats_lock = threading.Lock()
+_call_stats = {
+    'queued': 0,
+    'in_flight': 0,
+    'max_queued': 0,
+    'completed': 0,
+    'errors': 0,
+    'timeouts': 0,
+}
+
+def _count(**deltas):
+    with _stats_lock:
+        for key, delta in deltas.items():
+            _call_stats[key] += delta
+        _call_stats['max_queued'] = max(_call_stats['max_queued'], _call_stats['queued'])
+
+def _run_model(prompt, call):
+    """Executed on a pool thread: the call has left the queue and is in flight"""
+    _start(call)
+    try:
+        return get_provider().generate(prompt)
+    finally:
+        _count(in_flight=-1)
+        _stage_duration.observe(time.perf_counter() - call['started'], feature=call['feature'], stage='model')
+
+def _start(call):
+    call['started'] = time.perf_counter()
+    _stage_duration.observe(call['started'] - call['submitted'], feature=call['feature'], stage='queue')
+    _dequeue(call, in_flight=1)
+
+def _dequeue(call, **deltas):
+    """Take a call off the queue counter exactly once, whether it ran or was cancelled"""
+    with _stats_lock:
+        if call['dequeued']:
+            return
+        call['dequeued'] = True
+        _call_stats['queued'] -= 1
+        for key, delta in deltas.items():
+            _call_stats[key] += delta
+
+async def _acquire(feature, timeout):
+    """
+    Wait for the quota; returns the seconds left of ``timeout``
+
+    Raises:
+        RateLimitExceeded: If the quota has too many calls of this client waiting
+    """
+    started = time.perf_counter()
+    try:
+        await upstream_limiter.acquire(rate_limit.client_key.get(), timeout)
+    except rate_limit.RateLimitExceeded:
+        _call_outcomes.inc(feature=feature, outcome='rate_limited')
+        raise
+    waited = time.perf_counter() - started
+    _stage_duration.observe(waited, feature=feature, stage='rate_limit')
+    return max(timeout - waited, 0.001)
+
+async def _generate(prompt, timeout=None, feature='other'):
+    """
+    Run a model call on the bounded pool without blocking the event loop
+
+    Args:
+        prompt (str): Prompt to send to the model
+        timeout (float, optional): Seconds to wait, waiting for the quota
+            and queueing included. Defaults to GEMINI_TIMEOUT.
+        feature (str): Feature name for the metrics
+
+    Returns:
+        str: The response text
+    """
+    remaining = await _acquire(feature, timeout or GEMINI_TIMEOUT)
+    _prompt_tokens.inc(estimate_tokens(prompt), feature=feature)
+    call = {'dequeued': False, 'feature': feature, 'submitted': time.perf_counter()}
+    _count(queued=1)
+    future = _executor.submit(_run_model, prompt, call)
+    # Fires when a call still waiting in the queue is cancelled, too (timeout,
+    # client disconnect); awaiting the wrapped future cancels it in that case
+    future.add_done_callback(lambda _: _dequeue(call))
+    try:
+        text = await asyncio.wait_for(asyncio.wrap_future(future), remaining)
+    except asyncio.TimeoutError:
+        _count(timeouts=1)
+        _call_outcomes.inc(feature=feature, outcome='timeout')
+        raise TimeoutError("Timed out waiting for the Gemini model")
+    except Exception:
+        _count(errors=1)
+        _call_outcomes.inc(feature=feature, outcome='error')
+        raise
+    _count(completed=1)
+    _call_outcomes.inc(feature=feature, outcome='ok')
+    _response_tokens.inc(estimate_tokens(text or ''), feature=feature)
+    return text
+
+_STREAM_END = object()
+
+def _run_stream(prompt, call, loop, queue):
+    """Executed on a pool thread: forward each chunk to the event loop as it arrives"""
+    def put(item):
+        if call['closed']:
+            return
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # The loop has shut down; nobody is listening anymore
+            call['closed'] = True
     
-if not gemini_api_key:
-    raise ValueError("No Gemini API key found. Please set GEMINI_API_KEY or GOOGLE_AI_API_KEY in .env file")
+    _start(call)
+    try:
+        for chunk in get_provider().stream(prompt):
+            if call['closed']:
+                break
+            if chunk:
+                put(chunk)
+    except Exception as e:
+        put(e)
+    finally:
+        _count(in_flight=-1)
+        _stage_duration.observe(time.perf_counter() - call['started'], feature=call['feature'], stage='model')
+        put(_STREAM_END)
 
-genai.configure(api_key=gemini_api_key)
-model = genai.GenerativeModel('gemini-pro')  # Updated to use latest model
+async def _stream(prompt, timeout=None, feature='other'):
+    """
+    Stream a model call from the bounded pool, yielding text chunks as they arrive
 
-async def generate_flashcard_data(word, language):
+    Args:
+        prompt (str): Prompt to send to the model
+        timeout (float, optional): Seconds to wait for each chunk, queueing
+            included; the first chunk's wait includes waiting for the quota.
+            Defaults to GEMINI_TIMEOUT.
+        feature (str): Feature name for the metrics
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    await _acquire(feature, timeout or GEMINI_TIMEOUT)
+    _prompt_tokens.inc(estimate_tokens(prompt), feature=feature)
+    call = {'dequeued': False, 'closed': False, 'feature': feature, 'submitted': time.perf_counter()}
+    _count(queued=1)
+    future = _executor.submit(_run_stream, prompt, call, loop, queue)
+    future.add_done_callback(lambda _: _dequeue(call))
+    received = []
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout or GEMINI_TIMEOUT)
+            except asyncio.TimeoutError:
+                _count(timeouts=1)
+                _call_outcomes.inc(feature=feature, outcome='timeout')
+                raise TimeoutError("Timed out waiting for the Gemini model")
+            if item is _STREAM_END:
+                break
+            if isinstance(item, Exception):
+                _count(errors=1)
+                _call_outcomes.inc(feature=feature, outcome='error')
+                raise item
+            received.append(item)
+            yield item
+        _count(completed=1)
+        _call_outcomes.inc(feature=feature, outcome='ok')
+        _response_tokens.inc(estimate_tokens(''.join(received)), feature=feature)
+    finally:
+        # Stops the pool thread after its current chunk if the reader went away
+        call['closed'] = True
+        future.cancel()
+
+# Deterministic features (everything but chat) share one result cache.
+# AI_CACHE_PATH enables the on-disk tier that survives restarts.
+response_cache = ResponseCache(
+    max_entries=int(os.getenv('AI_CACHE_MAX_ENTRIES', '10000')),
+    ttl=float(os.getenv('AI_CACHE_TTL', '86400')),
+    disk_path=os.getenv('AI_CACHE_PATH') or None,
+)
+
+async def _generate_parsed(feature, key, prompt, schema, use_cache=True):
+    """
+    Run a model call and parse the reply into ``schema``
+
+    Only replies that validate are cached; a malformed reply raises
+    ParseError and the next request asks the model again.
+    """
+    async def compute():
+        return parse_response(await _generate(prompt, feature=feature), schema, feature)
+    
+    return await response_cache.get_or_compute(key, compute, bypass=not use_cache)
+
+@metrics.register_collector
+def _call_gauges():
+    """Model calls in the pool and waiting for the quota, read when metrics are scraped"""
+    with _stats_lock:
+        queued, in_flight = _call_stats['queued'], _call_stats['in_flight']
+    return [
+        ('gemini_calls_queued', 'gauge', 'Model calls waiting for a pool thread', [({}, queued)]),
+        ('gemini_calls_in_flight', 'gauge', 'Model calls running', [({}, in_flight)]),
+        ('gemini_calls_waiting_for_quota', 'gauge', 'Model calls waiting for the rate limit', [({}, upstream_limiter.waiting())]),
+    ]
+
+def get_call_stats():
+    """Get queue depth and outcome counters for model calls"""
+    with _stats_lock:
+        stats = dict(_call_stats)
+    stats['max_concurrency'] = GEMINI_MAX_CONCURRENCY
+    stats['provider'] = provider.name if provider is not None else provider_name()
+    stats['rate_limit'] = dict(
+        upstream_limiter.stats, waiting=upstream_limiter.waiting(), per_minute=GEMINI_RATE_PER_MINUTE,
+    )
+    return stats
+
+async def generate_flashcard_data(word, language, use_cache=True, log=True):
     """
     Generate flashcard data for a given word using Gemini AI
+
+    Args:
+        word (str): Word to generate a card for
+        language (str): Language of the word
+        use_cache (bool): Serve repeated requests from the response cache
+        log (bool): Record the interaction in the query log
+
+    Raises:
+        ParseError: If the model's reply doesn't contain the card fields
     """
     prompt = f"""
     Generate flashcard data for the {language} word: "{word}"
@@ -36,110 +298,220 @@ async def generate_flashcard_data(word, language):
     Only respond with the JSON, no other text.
     """
     
-    response = model.generate_content(prompt)
-    response_text = response.text
-    
-    # Process response to extract the JSON
-    try:
-        # Try to parse as JSON directly
-        try:
-            data = json.loads(response_text)
-        except:
-            # If direct parsing fails, try to extract JSON using regex
-            json_match = re.search(r'\{[^}]*"translations"[^}]*"pronunciation"[^}]*"examples"[^}]*\}', response_text, re.DOTALL)
-            if json_match:
-                try:
-                    data = json.loads(json_match.group(0))
-                except:
-                    # Fallback to manual extraction
-                    data = {
-                        "translations": "No translations available",
-                        "pronunciation": "No pronunciation available",
-                        "examples": "No examples available"
-                    }
-            else:
-                # Manual extraction
-                translations_match = re.search(r'"translations"\s*:\s*"([^"]*)"', response_text)
-                pronunciation_match = re.search(r'"pronunciation"\s*:\s*"([^"]*)"', response_text)
-                examples_match = re.search(r'"examples"\s*:\s*"([^"]*)"', response_text)
-                
-                data = {
-                    "translations": translations_match.group(1) if translations_match else "No translations available",
-                    "pronunciation": pronunciation_match.group(1) if pronunciation_match else "No pronunciation available",
-                    "examples": examples_match.group(1) if examples_match else "No examples available"
-                }
-    except Exception as e:
-        print(f"Error parsing Gemini response: {e}")
-        data = {
-            "translations": "Error retrieving translations",
-            "pronunciation": "Error retrieving pronunciation",
-            "examples": "Error retrieving examples"
-        }
+    data = await _generate_parsed(
+        'flashcard_generation',
+        make_key('flashcard_generation', word, language=language),
+        prompt,
+        FlashcardData,
+        use_cache
+    )
     
     # Log the query and response
-    query = f"Generate flashcard for '{word}' in {language}"
-    response_str = json.dumps(data)
-    csv_db.save_query_log("flashcard_generation", query, response_str)
+    if log:
+        query = f"Generate flashcard for '{word}' in {language}"
+        response_str = json.dumps(data)
+        db.save_query_log("flashcard_generation", query, response_str)
         
     return data
 
-async def check_grammar(text):
+async def generate_flashcard_batch(words, language, use_cache=True):
     """
-    Check grammar for given text using Gemini AI
+    Generate flashcard data for several words with a single model call
+
+    Args:
+        words (list): Words to generate cards for
+        language (str): Language of the words
+
+    Returns:
+        dict: Flashcard data keyed by word, for every word the model answered.
+            Missing words are left out so the caller can retry them one by one.
     """
+    word_list = "\n".join(f"{i}. {word}" for i, word in enumerate(words, 1))
     prompt = f"""
-    Check the grammar of the following text and provide corrections:
+    Generate flashcard data for each of the following {language} words:
     
-    "{text}"
+    {word_list}
     
-    Return your response in the following JSON format:
-    {{
-        "corrected_text": "text with corrections",
-        "errors": "list of errors found, separated by semicolons"
-    }}
+    Return your response as a JSON array with one object per word, in the same order:
+    [
+        {{
+            "word": "the word exactly as given",
+            "translations": "comma-separated list of translations",
+            "pronunciation": "phonetic pronunciation",
+            "examples": "3 example sentences using the word, separated by semicolons"
+        }}
+    ]
     
     Only respond with the JSON, no other text.
     """
     
-    response = model.generate_content(prompt)
-    response_text = response.text
-    
     try:
-        # Try to parse as JSON directly
-        try:
-            data = json.loads(response_text)
-        except:
-            # If direct parsing fails, try to extract JSON using regex
-            json_match = re.search(r'\{[^}]*"corrected_text"[^}]*"errors"[^}]*\}', response_text, re.DOTALL)
-            if json_match:
-                try:
-                    data = json.loads(json_match.group(0))
-                except:
-                    # Fallback to manual extraction
-                    corrected_match = re.search(r'"corrected_text"\s*:\s*"([^"]*)"', response_text)
-                    errors_match = re.search(r'"errors"\s*:\s*"([^"]*)"', response_text)
-                    
-                    data = {
-                        "corrected_text": corrected_match.group(1) if corrected_match else text,
-                        "errors": errors_match.group(1) if errors_match else "No errors found"
-                    }
+        items = await _generate_parsed(
+            'flashcard_batch',
+            make_key('flashcard_batch', "\n".join(words), language=language),
+            prompt,
+            List[FlashcardBatchItem],
+            use_cache
+        )
+    except ParseError:
+        items = []
+    
+    requested = {word.strip().lower(): word for word in words}
+    results = {}
+    for item in items:
+        word = requested.get(item.pop("word").strip().lower())
+        if word is None or not all(item.values()):
+            continue
+        results[word] = item
+        # Later single-word requests for the same card are served from the cache
+        await response_cache.store(make_key('flashcard_generation', word, language=language), item)
+    
+    query = f"Generate {len(words)} flashcards in {language}: {', '.join(words)}"
+    db.save_query_log("flashcard_generation", query, json.dumps(results))
+    
+    return results
+
+# How much one issue lowers its sentence's share of the overall score
+_SEVERITY_WEIGHTS = {"error": 1.0, "warning": 0.5, "suggestion": 0.2}
+
+def _grammar_prompt(sentences, language, check_types):
+    numbered = "\n".join(f"{i}. {' '.join(sentence.split())}" for i, sentence in enumerate(sentences, 1))
+    checks = ", ".join(check_types) if check_types else "grammar, spelling, style and punctuation"
+    return f"""
+    Check the grammar of each of the following numbered {language + ' ' if language else ''}sentences, looking for {checks} problems:
+    
+    {numbered}
+    
+    Return your response as a JSON array with one object per sentence, in the same order:
+    [
+        {{
+            "index": the sentence number,
+            "corrected": "the sentence with its problems fixed, or unchanged if it has none",
+            "issues": [
+                {{
+                    "type": "grammar, spelling, style or punctuation",
+                    "severity": "error, warning or suggestion",
+                    "original": "the words of the sentence that have the problem",
+                    "suggestion": "the words to use instead",
+                    "explanation": "a short explanation"
+                }}
+            ]
+        }}
+    ]
+    
+    Only respond with the JSON, no other text.
+    """
+
+async def _check_sentences(sentences, language, check_types):
+    """
+    Check several sentences with a single model call
+
+    Returns:
+        dict: Sentence position in ``sentences`` -> {"corrected", "issues"},
+            for every sentence the model answered
+    """
+    items = parse_response(
+        await _generate(_grammar_prompt(sentences, language, check_types), feature='grammar'),
+        List[GrammarSentence],
+        'grammar'
+    )
+    results = {}
+    for item in items:
+        position = item["index"] - 1
+        if 0 <= position < len(sentences):
+            results[position] = {
+                "corrected": item["corrected"].strip() or sentences[position],
+                "issues": [
+                    {name: value for name, value in issue.items() if name not in ("start", "end")}
+                    for issue in item["issues"]
+                ],
+            }
+    return results
+
+async def check_grammar(text, use_cache=True, language=None, check_types=None):
+    """
+    Check grammar for given text using Gemini AI
+    
+    The text is checked sentence by sentence. Each sentence's result is
+    cached on the sentence, so when a text is checked again after an edit,
+    only its new or changed sentences are sent to the model, together in
+    one prompt. The corrections are then put back in place.
+    
+    Args:
+        text (str): The text to check
+        use_cache (bool): Reuse the results of sentences checked before
+        language (str, optional): Language of the text
+        check_types (list, optional): Kinds of problems to look for
+    
+    Returns:
+        dict: GrammarResponse fields; each issue has the offsets of its
+            words in ``text``
+    """
+    spans = sentence_spans(text)
+    sentences = [text[start:end] for start, end in spans]
+    check_types = sorted(set(check_types)) if check_types else None
+    keys = [
+        make_key('grammar_sentence', sentence, language=language, checks=",".join(check_types) if check_types else None)
+        for sentence in sentences
+    ]
+    
+    results = {}
+    if use_cache:
+        cached = await asyncio.to_thread(lambda: [response_cache.get(key) for key in keys])
+        results = {key: value for key, value in zip(keys, cached) if value is not None}
+    # Each unseen sentence once, even if the text repeats it
+    pending = {}
+    for key, sentence in zip(keys, sentences):
+        if key not in results:
+            pending.setdefault(key, sentence)
+    if pending:
+        pending_keys = list(pending)
+        checked = await _check_sentences(list(pending.values()), language, check_types)
+        for position, result in checked.items():
+            results[pending_keys[position]] = result
+            if use_cache:
+                await response_cache.store(pending_keys[position], result)
+    
+    parts = []
+    issues = []
+    position = 0
+    penalty = 0.0
+    for (start, end), key, sentence in zip(spans, keys, sentences):
+        # A sentence the model skipped is left as it is, and checked again next time
+        result = results.get(key) or {"corrected": sentence, "issues": []}
+        parts.append(text[position:start])
+        parts.append(result["corrected"])
+        position = end
+        weight = 0.0
+        for issue in result["issues"]:
+            found = text.find(issue["original"], start, end) if issue["original"] else -1
+            if found >= 0:
+                issues.append(dict(issue, start=found, end=found + len(issue["original"])))
             else:
-                data = {
-                    "corrected_text": text,
-                    "errors": "Could not analyze text"
-                }
-    except Exception as e:
-        data = {
-            "corrected_text": text,
-            "errors": f"Error analyzing text: {str(e)}"
-        }
+                issues.append(dict(issue, start=start, end=end))
+            weight += _SEVERITY_WEIGHTS.get(issue["severity"], _SEVERITY_WEIGHTS["suggestion"])
+        penalty += min(weight, 1.0)
+    parts.append(text[position:])
+    corrected_text = "".join(parts)
+    
+    data = {
+        "corrected_text": corrected_text,
+        "errors": "; ".join(
+            issue["explanation"] or f"{issue['original']} -> {issue['suggestion']}" for issue in issues
+        ) or "No errors found",
+        "improved_text": corrected_text,
+        "overall_score": round(100 * (1 - penalty / len(spans))) if spans else 100,
+        "issues": issues,
+        "sentences": len(spans),
+        "sentences_checked": len(pending),
+    }
     
     # Save to grammar history database and log
-    csv_db.save_grammar_history(text, data.get("corrected_text", ""))
+    db.save_grammar_history(text, corrected_text)
         
     return data
 
-async def translate(text, source_lang, target_lang):
+async def translate(text, source_lang, target_lang, use_cache=True):
     """
     Translate text from source language to target language using Gemini AI
     """
@@ -156,37 +528,16 @@ async def translate(text, source_lang, target_lang):
     Only respond with the JSON, no other text.
     """
     
-    response = model.generate_content(prompt)
-    response_text = response.text
-    
-    try:
-        # Try to parse as JSON directly
-        try:
-            data = json.loads(response_text)
-        except:
-            # If direct parsing fails, try to extract JSON using regex
-            json_match = re.search(r'\{[^}]*"translated_text"[^}]*\}', response_text, re.DOTALL)
-            if json_match:
-                try:
-                    data = json.loads(json_match.group(0))
-                except:
-                    # Fallback to manual extraction
-                    translated_match = re.search(r'"translated_text"\s*:\s*"([^"]*)"', response_text)
-                    
-                    data = {
-                        "translated_text": translated_match.group(1) if translated_match else "Translation failed"
-                    }
-            else:
-                data = {
-                    "translated_text": "Translation failed"
-                }
-    except Exception as e:
-        data = {
-            "translated_text": f"Error translating text: {str(e)}"
-        }
+    data = await _generate_parsed(
+        'translate',
+        make_key('translate', text, source_lang=source_lang, target_lang=target_lang),
+        prompt,
+        TranslationResponse,
+        use_cache
+    )
     
     # Save to translation history database
-    csv_db.save_translation_history(
+    db.save_translation_history(
         text, 
         data.get("translated_text", ""), 
         source_lang, 
@@ -195,15 +546,8 @@ async def translate(text, source_lang, target_lang):
         
     return data
 
-async def summarize(text, length=None, style=None):
-    """
-    Summarize text using Gemini AI
-    
-    Args:
-        text (str): The text to summarize
-        length (str): "short", "medium", or "long"
-        style (str): "informative", "academic", or "simplified"
-    """
+def _summary_params(length, style):
+    """Describe the requested summary length and style for the prompt"""
     # Define length parameters
     length_desc = {
         "short": "a very concise summary (1-2 sentences)",
@@ -220,6 +564,117 @@ async def summarize(text, length=None, style=None):
     
     length_param = length_desc.get(length, length_desc["medium"]) if length else length_desc["medium"]
     style_param = style_desc.get(style, style_desc["informative"]) if style else style_desc["informative"]
+    return length_param, style_param
+
+# Texts longer than SUMMARY_CHUNK_TOKENS are split into chunks that are
+# summarized concurrently, at most SUMMARY_MAX_PARALLEL at a time per text,
+# and the partial summaries are then summarized together.
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '3000'))
+SUMMARY_MAX_PARALLEL = int(os.getenv('SUMMARY_MAX_PARALLEL', '4'))
+
+def _chunk_prompt(chunk, style_param):
+    return f"""
+    Summarize the following section of a longer document using a {style_param} style.
+    Keep its key facts, names, numbers and terms, since this summary will be
+    combined with the summaries of the other sections:
+    
+    "{chunk}"
+    
+    Return your response in the following JSON format:
+    {{
+        "summary": "the summary of the section"
+    }}
+    
+    Only respond with the JSON, no other text.
+    """
+
+def _combine_prompt(summaries, length_param, style_param, stream=False):
+    answer = """
+    Respond with the summary text only, no JSON and no other text.
+    """ if stream else """
+    Return your response in the following JSON format:
+    {
+        "summary": "the summary of the document"
+    }
+    
+    Only respond with the JSON, no other text.
+    """
+    return f"""
+    Summarize the following summaries of consecutive sections of one document
+    into {length_param} of the whole document using a {style_param} style:
+    
+    "{summaries}"
+    {answer}"""
+
+async def _summarize_chunks(text, style, use_cache=True):
+    """
+    Map step: summarize ``text`` chunk by chunk until the result fits one prompt
+
+    Each chunk's summary is cached on the chunk's content, so an edited
+    document only sends its changed chunks to the model.
+
+    Returns:
+        str: The partial summaries in document order, separated by blank lines
+    """
+    _, style_param = _summary_params(None, style)
+    limit = asyncio.Semaphore(SUMMARY_MAX_PARALLEL)
+    
+    async def summarize_chunk(chunk):
+        async with limit:
+            data = await _generate_parsed(
+                'summarize_chunk',
+                make_key('summarize_chunk', chunk, style=style or 'informative'),
+                _chunk_prompt(chunk, style_param),
+                SummaryResponse,
+                use_cache
+            )
+        return data['summary']
+    
+    while estimate_tokens(text) > SUMMARY_CHUNK_TOKENS:
+        summaries = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunk_text(text, SUMMARY_CHUNK_TOKENS)))
+        combined = '\n\n'.join(summaries)
+        if len(combined) >= len(text):
+            # Not getting any shorter; the reduce prompt takes it as is
+            return combined
+        text = combined
+    return text
+
+async def _summarize_long(text, length, style, use_cache=True):
+    """Summarize a text too long for one prompt: map over chunks, then reduce"""
+    length_param, style_param = _summary_params(length, style)
+    summaries = await _summarize_chunks(text, style, use_cache)
+    return await _generate_parsed(
+        'summarize',
+        make_key('summarize_reduce', summaries, length=length or 'medium', style=style or 'informative'),
+        _combine_prompt(summaries, length_param, style_param),
+        SummaryResponse,
+        use_cache
+    )
+
+async def summarize(text, length=None, style=None, use_cache=True):
+    """
+    Summarize text using Gemini AI
+    
+    Texts longer than SUMMARY_CHUNK_TOKENS are summarized in chunks
+    first (see _summarize_chunks).
+    
+    Args:
+        text (str): The text to summarize
+        length (str): "short", "medium", or "long"
+        style (str): "informative", "academic", or "simplified"
+        use_cache (bool): Serve repeated requests from the response cache
+    """
+    key = make_key('summarize', text, length=length or 'medium', style=style or 'informative')
+    if estimate_tokens(text) > SUMMARY_CHUNK_TOKENS:
+        data = await response_cache.get_or_compute(
+            key,
+            lambda: _summarize_long(text, length, style, use_cache),
+            bypass=not use_cache
+        )
+        db.save_summarize_history(text, data.get("summary", ""), length or "medium", style or "informative")
+        return data
+    
+    length_param, style_param = _summary_params(length, style)
     
     prompt = f"""
     Summarize the following text into {length_param} using a {style_param} style:
@@ -234,37 +689,16 @@ async def summarize(text, length=None, style=None):
     Only respond with the JSON, no other text.
     """
     
-    response = model.generate_content(prompt)
-    response_text = response.text
-    
-    try:
-        # Try to parse as JSON directly
-        try:
-            data = json.loads(response_text)
-        except:
-            # If direct parsing fails, try to extract JSON using regex
-            json_match = re.search(r'\{[^}]*"summary"[^}]*\}', response_text, re.DOTALL)
-            if json_match:
-                try:
-                    data = json.loads(json_match.group(0))
-                except:
-                    # Fallback to manual extraction
-                    summary_match = re.search(r'"summary"\s*:\s*"([^"]*)"', response_text)
-                    
-                    data = {
-                        "summary": summary_match.group(1) if summary_match else "Summarization failed"
-                    }
-            else:
-                data = {
-                    "summary": "Summarization failed"
-                }
-    except Exception as e:
-        data = {
-            "summary": f"Error summarizing text: {str(e)}"
-        }
+    data = await _generate_parsed(
+        'summarize',
+        key,
+        prompt,
+        SummaryResponse,
+        use_cache
+    )
     
     # Save to summarize history database
-    csv_db.save_summarize_history(
+    db.save_summarize_history(
         text,
         data.get("summary", ""),
         length or "medium",
@@ -273,28 +707,158 @@ async def summarize(text, length=None, style=None):
         
     return data
 
-async def chat_with_ai(message, context=None):
+def stream_summary(text, length=None, style=None):
     """
-    Chat with the AI assistant
+    Stream a summary of ``text`` as plain-text chunks
+    
+    Unlike summarize(), the summary is not cached or saved here: the caller
+    has it only once the stream ends and saves the history then. For a long
+    text, the chunk summaries are computed (and cached) first and only the
+    combined summary is streamed.
     
     Args:
-        message (str): User message
-        context (str, optional): Additional context
+        text (str): The text to summarize
+        length (str): "short", "medium", or "long"
+        style (str): "informative", "academic", or "simplified"
     """
+    length_param, style_param = _summary_params(length, style)
+    if estimate_tokens(text) > SUMMARY_CHUNK_TOKENS:
+        return _stream_long_summary(text, length_param, style_param, style)
+    
     prompt = f"""
+    Summarize the following text into {length_param} using a {style_param} style:
+    
+    "{text}"
+    
+    Respond with the summary text only, no JSON and no other text.
+    """
+    
+    return _stream(prompt, feature='summarize')
+
+async def _stream_long_summary(text, length_param, style_param, style):
+    """Summarize the chunks of a long text, then stream the combined summary"""
+    summaries = await _summarize_chunks(text, style)
+    stream = _stream(_combine_prompt(summaries, length_param, style_param, stream=True), feature='summarize')
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        # Frees the pool thread right away if the reader went away
+        await stream.aclose()
+
+# Chat sessions keep their older turns as a rolling summary. A prompt
+# carries the summary and the turns after it, which together stay within
+# CHAT_HISTORY_TOKENS; when they would not, or when the turns would no
+# longer fit the session's ring of recent turns, the oldest turns are first
+# folded into the summary, so the prompt stops growing with the conversation.
+CHAT_HISTORY_TOKENS = int(os.getenv('CHAT_HISTORY_TOKENS', '1500'))
+CHAT_SUMMARY_WORDS = int(os.getenv('CHAT_SUMMARY_WORDS', '150'))
+
+def _format_turns(turns):
+    return "\n".join(f"User: {turn['user_message']}\nAssistant: {turn['ai_response']}" for turn in turns)
+
+def _chat_prompt(message, context, summary="", turns=()):
+    history = ""
+    if summary:
+        history += f"Summary of the earlier conversation:\n{summary}\n\n"
+    if turns:
+        history += f"{_format_turns(turns)}\n\n"
+    return f"""
     You are an AI language learning assistant for the StudyWAI flashcard application.
     
     {context or ""}
     
-    User: {message}
+    {history}User: {message}
     
     Response:
     """
+
+def _chat_summary_prompt(summary, turns):
+    return f"""
+    Update the summary of this conversation between a language learner and an AI assistant.
+    Keep the learner's goals, what they are studying and anything the assistant should remember, in at most {CHAT_SUMMARY_WORDS} words.
+    
+    Summary so far:
+    {summary or "(none)"}
+    
+    New turns:
+    {_format_turns(turns)}
+    
+    Respond with the updated summary only.
+    """
+
+def _history_tokens(summary, turns):
+    return estimate_tokens(summary) + estimate_tokens(_format_turns(turns))
+
+async def _chat_history(session_id):
+    """
+    Get the summary and the turns after it for the next prompt of a session
+    
+    Folds the oldest turns into the summary first when the history is over
+    its budget, keeping about half the budget and half the ring verbatim.
+    If the model fails to summarize, the folded turns are left out of this
+    prompt and the next turn tries again.
+    
+    Returns:
+        tuple: (summary, turns), turns oldest first
+    """
+    session = db.get_chat_session(session_id)
+    if session is None:
+        return "", []
+    summary = session['summary']
+    turns = [turn for turn in db.get_recent_chat_turns(session_id) if turn['id'] > session['summarized_through']]
+    # The turn about to be saved must still fit the ring
+    if len(turns) < db.CHAT_RECENT_TURNS and _history_tokens(summary, turns) <= CHAT_HISTORY_TOKENS:
+        return summary, turns
+    
+    keep = len(turns)
+    while keep and (keep > db.CHAT_RECENT_TURNS // 2 or _history_tokens(summary, turns[-keep:]) > CHAT_HISTORY_TOKENS // 2):
+        keep -= 1
+    folded, turns = turns[:len(turns) - keep], turns[len(turns) - keep:]
+    if not folded:
+        return summary, turns
+    try:
+        updated = await _generate(_chat_summary_prompt(summary, folded), feature='chat_summary')
+    except Exception:
+        return summary, turns
+    # Bounded even if the model ignores the word limit
+    summary = " ".join(updated.split()[:CHAT_SUMMARY_WORDS * 2])
+    db.update_chat_summary(session_id, summary, folded[-1]['id'])
+    return summary, turns
+
+async def stream_chat(message, context=None, session_id=None):
+    """
+    Stream the assistant's reply as text chunks; the caller saves the history
+    
+    Args:
+        message (str): User message
+        context (str, optional): Additional context
+        session_id (int, optional): Chat session whose history to include
+    """
+    summary, turns = await _chat_history(session_id) if session_id is not None else ("", [])
+    stream = _stream(_chat_prompt(message, context, summary, turns), feature='chat')
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        await stream.aclose()
+
+async def chat_with_ai(message, context=None, session_id=None):
+    """
+    Chat with the AI assistant
+    
+    Args:
+        message (str): User message
+        context (str, optional): Additional context
+        session_id (int, optional): Chat session to continue; the exchange
+            is saved to it
+    """
+    summary, turns = await _chat_history(session_id) if session_id is not None else ("", [])
+    prompt = _chat_prompt(message, context, summary, turns)
     
-    response = model.generate_content(prompt)
-    response_text = response.text
+    response_text = await _generate(prompt, feature='chat')
     
     # Log the chat conversation
-    csv_db.save_chat_history(message, response_text)
+    db.save_chat_history(message, response_text, session_id)
     
-    return response_text 
\ No newline at end of file
+    return response_text
@@ -0,0 +1,220 @@
+"""
+Structured parsing of model responses
+
+Every AI feature asks the model for JSON but gets it wrapped in markdown
+fences, preceded by chatter, or with small syntax slips. extract_json()
+decodes the first JSON value in the text, falling back to a bracket
+scanner that repairs trailing commas, and parse_response() validates it
+against a Pydantic schema, counting successes and failures per feature.
+"""
+
+import json
+import re
+import threading
+from collections import defaultdict
+
+from pydantic import TypeAdapter, ValidationError
+
+from src.flashcards.utils import metrics
+
+_OPENERS = {'{': '}', '[': ']'}
+
+# strict=False accepts literal newlines inside strings, which models emit
+_DECODER = json.JSONDecoder(strict=False)
+
+
+class ParseError(ValueError):
+    """Raised when a model response can't be turned into the expected schema"""
+
+    def __init__(self, feature, reason, text):
+        self.feature = feature
+        self.reason = reason
+        self.text = text
+        super().__init__(f"Could not parse {feature} response: {reason}")
+
+
+_STRUCTURAL = re.compile(r'[{}\[\]",\\]')
+_WHITESPACE = re.compile(r'\s*')
+
+
+def _scan_from(text, start):
+    """
+    Scan one JSON value starting at ``text[start]``
+
+    Jumps from one structural character to the next, so the text between
+    them is only looked at by the regex engine. Returns ``(end, cleaned,
+    resume)``: ``end`` is the index just past the closing bracket and
+    ``cleaned`` the value with trailing commas removed, or both are None
+    if the brackets never balance. ``resume`` is where the next start
+    worth trying can be searched from, or None if there is none.
+
+    The next candidates are a later opener that the scan saw close, and
+    one inside what the scan took for a string (from there quotes pair
+    up the other way). Any other opener passed on the way would fail the
+    same way, meeting the same mismatched bracket or end of text, so it
+    is not scanned again.
+    """
+    pieces = []
+    piece_start = start
+    # (expected closer, index of its opener)
+    stack = []
+    in_string = False
+    # Earliest later opener worth a scan of its own
+    candidate = None
+    position = start
+    while True:
+        match = _STRUCTURAL.search(text, position)
+        if match is None:
+            return None, None, candidate
+        i = match.start()
+        char = text[i]
+        position = i + 1
+        if in_string:
+            if char == '\\':
+                # Skip the escaped character, whatever it is
+                position += 1
+                # An escaped bracket is still a start worth trying
+                i += 1
+                char = text[i:position]
+            elif char == '"':
+                in_string = False
+            if char in _OPENERS and (candidate is None or i < candidate):
+                candidate = i
+        elif char == '"':
+            in_string = True
+        elif char == ',':
+            following = _WHITESPACE.match(text, position).end()
+            if following < len(text) and text[following] in '}]':
+                # Drop the trailing comma
+                pieces.append(text[piece_start:i])
+                piece_start = position
+        elif char in _OPENERS:
+            stack.append((_OPENERS[char], i))
+        elif char in '}]':
+            if not stack:
+                return None, None, position if candidate is None else candidate
+            closer, opened = stack.pop()
+            if char != closer:
+                return None, None, position if candidate is None else candidate
+            if stack:
+                if candidate is None or opened < candidate:
+                    candidate = opened
+            else:
+                pieces.append(text[piece_start:position])
+                return position, ''.join(pieces), position if candidate is None else candidate
+
+
+def extract_json(text):
+    """
+    Return the first balanced JSON object or array found in ``text``
+
+    Handles markdown code fences and surrounding prose (they are skipped),
+    trailing commas, escaped quotes and literal newlines inside strings.
+    Stray brackets in prose don't make it rescan the text from each one.
+
+    Raises:
+        ValueError: If no decodable JSON value is present
+    """
+    position = 0
+    while position is not None:
+        starts = [index for index in (text.find('{', position), text.find('[', position)) if index != -1]
+        if not starts:
+            break
+        start = min(starts)
+        try:
+            # Well-formed JSON is decoded in one pass by the C decoder
+            return _DECODER.raw_decode(text, start)[0]
+        except ValueError:
+            pass
+        end, cleaned, position = _scan_from(text, start)
+        if cleaned is not None:
+            try:
+                return _DECODER.decode(cleaned)
+            except ValueError:
+                pass
+    raise ValueError("no JSON value found")
+
+
+def _coerce(value):
+    """Models sometimes answer a string field with a list; join it the way the prompts ask"""
+    if isinstance(value, dict):
+        return {
+            key: '; '.join(map(str, item)) if isinstance(item, list) and not any(isinstance(x, dict) for x in item)
+            else _coerce(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_coerce(item) for item in value]
+    return value
+
+
+_adapters = {}
+_stats_lock = threading.Lock()
+_parse_stats = defaultdict(lambda: {'ok': 0, 'failed': 0, 'reasons': defaultdict(int)})
+_parse_results = metrics.counter('ai_parse_total', 'Parsed model responses by outcome', ('feature', 'outcome'))
+_parse_fallbacks = metrics.counter(
+    'ai_parse_fallbacks_total', 'Responses that failed validation as sent and were coerced', ('feature',),
+)
+
+
+def _adapter(schema):
+    adapter = _adapters.get(schema)
+    if adapter is None:
+        adapter = _adapters[schema] = TypeAdapter(schema)
+    return adapter
+
+
+def _record(feature, reason=None):
+    _parse_results.inc(feature=feature, outcome=reason or 'ok')
+    with _stats_lock:
+        stats = _parse_stats[feature]
+        if reason is None:
+            stats['ok'] += 1
+        else:
+            stats['failed'] += 1
+            stats['reasons'][reason] += 1
+
+
+def parse_response(text, schema, feature):
+    """
+    Parse a model response into ``schema``
+
+    Args:
+        text (str): Raw response text
+        schema: A Pydantic model, or a type such as ``List[Model]``
+        feature (str): Feature name used for the counters and errors
+
+    Returns:
+        The validated value as plain Python data (dicts and lists)
+
+    Raises:
+        ParseError: With ``reason`` "no_json" or "invalid_schema"
+    """
+    try:
+        value = extract_json(text or '')
+    except ValueError:
+        _record(feature, 'no_json')
+        raise ParseError(feature, 'no_json', text)
+
+    adapter = _adapter(schema)
+    try:
+        validated = adapter.validate_python(value)
+    except ValidationError:
+        _parse_fallbacks.inc(feature=feature)
+        try:
+            validated = adapter.validate_python(_coerce(value))
+        except ValidationError as e:
+            _record(feature, 'invalid_schema')
+            raise ParseError(feature, 'invalid_schema', text) from e
+
+    _record(feature)
+    return adapter.dump_python(validated)
+
+
+def get_parse_stats():
+    """Get parse success/failure counters per feature"""
+    with _stats_lock:
+        return {
+            feature: {'ok': stats['ok'], 'failed': stats['failed'], 'reasons': dict(stats['reasons'])}
+            for feature, stats in _parse_stats.items()
+        }
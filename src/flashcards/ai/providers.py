@@ -0,0 +1,100 @@
+"""
+Model providers behind the AI features
+
+gemini.py sends every prompt through one Provider, picked by AI_PROVIDER:
+
+- "gemini" (default): Google Gemini, configured on the first model call,
+  so the app starts without an API key and only the AI features fail
+- "fake": FakeProvider (see fake_model.py), canned responses with
+  configurable latency and injected failures, for tests, load tests and
+  running offline. GEMINI_FAKE_MODEL=1 selects it too.
+
+Provider methods block; gemini.py runs them on its bounded thread pool.
+"""
+
+import os
+
+DEFAULT_GEMINI_MODEL = 'gemini-pro'
+
+
+class ProviderError(ValueError):
+    """Raised when the configured provider can't be set up"""
+
+
+class Provider:
+    """
+    A model that turns prompts into text
+
+    Subclasses implement generate(); stream() and batch() fall back to it.
+    """
+
+    name = 'provider'
+
+    def generate(self, prompt):
+        """Return the full response to ``prompt``"""
+        raise NotImplementedError
+
+    def stream(self, prompt):
+        """Yield the response to ``prompt`` in chunks as they arrive"""
+        yield self.generate(prompt)
+
+    def batch(self, prompts):
+        """Return the responses to several prompts, in order"""
+        return [self.generate(prompt) for prompt in prompts]
+
+
+class GeminiProvider(Provider):
+    """
+    Google Gemini through the google-generativeai SDK
+
+    Args:
+        api_key (str): Gemini API key
+        model_name (str): Gemini model to call
+    """
+
+    name = 'gemini'
+
+    def __init__(self, api_key, model_name=DEFAULT_GEMINI_MODEL):
+        # Imported here: the SDK is slow to import and unused by the fake provider
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text
+
+    def stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+def provider_name():
+    """Get the name of the configured provider (gemini or fake)"""
+    if os.getenv('AI_PROVIDER'):
+        return os.getenv('AI_PROVIDER').strip().lower()
+    return 'fake' if os.getenv('GEMINI_FAKE_MODEL') else 'gemini'
+
+
+def create_provider(name=None):
+    """
+    Create the provider named ``name``, or the configured one
+
+    Raises:
+        ProviderError: If the name is unknown, or Gemini has no API key
+    """
+    name = name or provider_name()
+    if name == 'fake':
+        from src.flashcards.ai.fake_model import FakeProvider
+
+        return FakeProvider.from_env()
+    if name == 'gemini':
+        api_key = os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_AI_API_KEY')
+        if not api_key:
+            raise ProviderError(
+                "No Gemini API key found. Please set GEMINI_API_KEY or GOOGLE_AI_API_KEY in .env file, "
+                "or AI_PROVIDER=fake to run without one"
+            )
+        return GeminiProvider(api_key, os.getenv('GEMINI_MODEL', DEFAULT_GEMINI_MODEL))
+    raise ProviderError(f"Unknown AI_PROVIDER {name!r}; use 'gemini' or 'fake'")
@@ -0,0 +1,17 @@
+"""
+Storage backends
+
+``db`` is the backend selected by STORAGE_BACKEND: "csv" (the default,
+csv_db) or "sqlite" (sqlite_db). Both expose the same functions.
+"""
+
+import os
+
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'csv').lower()
+
+if STORAGE_BACKEND == 'sqlite':
+    from src.flashcards.database import sqlite_db as db
+elif STORAGE_BACKEND == 'csv':
+    from src.flashcards.database import csv_db as db
+else:
+    raise ValueError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}; use 'csv' or 'sqlite'")
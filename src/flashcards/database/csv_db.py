@@ -1,134 +1,643 @@
 import os
 import csv
-import pandas as pd
+import atexit
+import threading
+import math
 from datetime import datetime
 
+from src.flashcards.database.history_writer import HistoryWriter
+from src.flashcards.database.history_segments import LatestRows, RotationPolicy
+from src.flashcards.database import scheduler
+from src.flashcards.database.record_log import RecordLog
+from src.flashcards.database.flashcard_table import FlashcardTable
+from src.flashcards.database.search_index import SearchIndex
+from src.flashcards.database.duplicate_index import DuplicateIndex
+from src.flashcards.utils import metrics
+
 # Data paths
 DATA_DIR = 'app/data'
 FLASHCARDS_CSV = os.path.join(DATA_DIR, 'flashcards.csv')
+FLASHCARDS_LOG = os.path.join(DATA_DIR, 'flashcards.log')
+FLASHCARDS_SEARCH_INDEX = os.path.join(DATA_DIR, 'flashcards.search')
+SCHEDULES_LOG = os.path.join(DATA_DIR, 'schedules.log')
+REVIEW_HISTORY_CSV = os.path.join(DATA_DIR, 'review_history.csv')
 GRAMMAR_HISTORY_CSV = os.path.join(DATA_DIR, 'grammar_history.csv')
 TRANSLATE_HISTORY_CSV = os.path.join(DATA_DIR, 'translate_history.csv')
 SUMMARIZE_HISTORY_CSV = os.path.join(DATA_DIR, 'summarize_history.csv')
 CHAT_HISTORY_CSV = os.path.join(DATA_DIR, 'chat_history.csv')
+CHAT_TURNS_LOG = os.path.join(DATA_DIR, 'chat_turns.log')
+CHAT_SESSIONS_LOG = os.path.join(DATA_DIR, 'chat_sessions.log')
 QUERY_LOG_CSV = os.path.join(DATA_DIR, 'query_log.csv')
 
+FLASHCARD_COLUMNS = ['id', 'word', 'language', 'translations', 'pronunciation', 'examples', 'created_at', 'updated_at']
+GRAMMAR_HISTORY_COLUMNS = ['id', 'original_text', 'corrected_text', 'created_at']
+TRANSLATE_HISTORY_COLUMNS = ['id', 'original_text', 'source_lang', 'target_lang', 'translated_text', 'created_at']
+SUMMARIZE_HISTORY_COLUMNS = ['id', 'original_text', 'summary', 'length', 'style', 'created_at']
+CHAT_HISTORY_COLUMNS = ['id', 'user_message', 'ai_response', 'created_at']
+QUERY_LOG_COLUMNS = ['id', 'feature', 'query', 'response', 'created_at']
+REVIEW_HISTORY_COLUMNS = ['id', 'flashcard_id', 'grade', 'ease', 'interval', 'due', 'reviewed_at']
+CHAT_SESSION_COLUMNS = ['id', 'summary', 'summarized_through', 'turns', 'created_at', 'updated_at']
+SCHEDULE_COLUMNS = ['due', 'ease', 'interval', 'repetitions', 'lapses', 'last_reviewed']
+
+# Columns list_flashcards can order by; ties are broken by id
+FLASHCARD_SORT_COLUMNS = ['id', 'word', 'created_at', 'updated_at']
+
+# History rows are appended in batches by a background thread (see
+# history_writer.py); the save_* functions only queue them
+HISTORY_BATCH_SIZE = int(os.getenv('HISTORY_BATCH_SIZE', '256'))
+HISTORY_FLUSH_INTERVAL = float(os.getenv('HISTORY_FLUSH_INTERVAL', '0.5'))
+HISTORY_QUEUE_SIZE = int(os.getenv('HISTORY_QUEUE_SIZE', '10000'))
+
+# History files rotate into gzip segments (see history_segments.py) once
+# they reach HISTORY_SEGMENT_BYTES or span HISTORY_SEGMENT_DAYS; segments
+# are deleted after HISTORY_RETENTION_DAYS (0 keeps them), which
+# HISTORY_RETENTION_DAYS_<FILE> overrides per file. The review history is
+# not rotated: the study streak counts every day in it.
+HISTORY_SEGMENT_BYTES = int(os.getenv('HISTORY_SEGMENT_BYTES', str(1024 * 1024)))
+HISTORY_SEGMENT_DAYS = float(os.getenv('HISTORY_SEGMENT_DAYS', '7'))
+HISTORY_RETENTION_DAYS = float(os.getenv('HISTORY_RETENTION_DAYS', '365'))
+
+def _rotation(name):
+    retention = float(os.getenv(f'HISTORY_RETENTION_DAYS_{name}', str(HISTORY_RETENTION_DAYS)))
+    return RotationPolicy(HISTORY_SEGMENT_BYTES, HISTORY_SEGMENT_DAYS, retention)
+
+HISTORY_ROTATION = {
+    GRAMMAR_HISTORY_CSV: _rotation('GRAMMAR'),
+    TRANSLATE_HISTORY_CSV: _rotation('TRANSLATE'),
+    SUMMARIZE_HISTORY_CSV: _rotation('SUMMARIZE'),
+    QUERY_LOG_CSV: _rotation('QUERY_LOG'),
+}
+
+# Each chat session keeps the ids of its last CHAT_RECENT_TURNS turns
+CHAT_RECENT_TURNS = int(os.getenv('CHAT_RECENT_TURNS', '12'))
+
+# Flashcards live in an append-only record log (see record_log.py)
+_flashcard_log = None
+_history_writer = None
+_history_lock = threading.Lock()
+# Newest-first readers of the history files, by path
+_history_readers = {}
+# Full-text index over the flashcard log (see search_index.py), loaded on first search
+_search_index = None
+_search_lock = threading.Lock()
+# Word vectors for near-duplicate checks (see duplicate_index.py), built on first check
+_duplicate_index = None
+_duplicate_lock = threading.Lock()
+# Review schedules, keyed by flashcard id, and the due-card queue over them (see scheduler.py)
+_schedule_log = None
+_due_queue = None
+_due_lock = threading.Lock()
+# Dates with a review, read incrementally from the review history
+_review_days = {'inode': None, 'offset': 0, 'days': set()}
+_review_days_lock = threading.Lock()
+# Chat turns and chat sessions, each in a record log
+_chat_turn_log = None
+_chat_session_log = None
+
+# Every flashcard in memory as compact rows (see flashcard_table.py),
+# shared by all read paths and updated card by card after writes
+_flashcard_table = None
+_flashcard_table_lock = threading.Lock()
+
+def _timed(operation):
+    """Record the duration of each call in the storage metrics"""
+    return metrics.timed(metrics.storage_duration, backend='csv', operation=operation)
+
+@metrics.register_collector
+def _file_sizes():
+    """Size of every file in the data directory, read when metrics are scraped"""
+    sizes = []
+    if os.path.isdir(DATA_DIR):
+        for entry in sorted(os.scandir(DATA_DIR), key=lambda entry: entry.name):
+            if entry.is_file():
+                sizes.append(({'file': entry.name}, entry.stat().st_size))
+    return [('storage_file_bytes', 'gauge', 'Size of a file in the data directory', sizes)]
+
 # Ensure data directory and files exist
 def init_database():
     """Initialize the database files and directories"""
     os.makedirs(DATA_DIR, exist_ok=True)
     
-    # Initialize flashcards database
-    if not os.path.exists(FLASHCARDS_CSV):
-        with open(FLASHCARDS_CSV, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'word', 'language', 'translations', 'pronunciation', 'examples', 'created_at', 'updated_at'])
+    # Initialize flashcards database, migrating the legacy CSV layout once.
+    # Workers starting together check under the store's lock so only one imports.
+    store = _flashcard_store()
+    with store.transaction():
+        if len(store) == 0 and os.path.exists(FLASHCARDS_CSV):
+            migrate_flashcards_csv(FLASHCARDS_CSV)
     
     # Initialize grammar check history
-    if not os.path.exists(GRAMMAR_HISTORY_CSV):
-        with open(GRAMMAR_HISTORY_CSV, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'original_text', 'corrected_text', 'created_at'])
+    _create_csv(GRAMMAR_HISTORY_CSV, GRAMMAR_HISTORY_COLUMNS)
     
     # Initialize translation history
-    if not os.path.exists(TRANSLATE_HISTORY_CSV):
-        with open(TRANSLATE_HISTORY_CSV, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'original_text', 'source_lang', 'target_lang', 'translated_text', 'created_at'])
+    _create_csv(TRANSLATE_HISTORY_CSV, TRANSLATE_HISTORY_COLUMNS)
     
     # Initialize summarization history
-    if not os.path.exists(SUMMARIZE_HISTORY_CSV):
-        with open(SUMMARIZE_HISTORY_CSV, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'original_text', 'summary', 'length', 'style', 'created_at'])
+    _create_csv(SUMMARIZE_HISTORY_CSV, SUMMARIZE_HISTORY_COLUMNS)
     
-    # Initialize chat history
-    if not os.path.exists(CHAT_HISTORY_CSV):
-        with open(CHAT_HISTORY_CSV, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'user_message', 'ai_response', 'created_at'])
+    # Initialize chat history, migrating the legacy CSV once
+    turns = _chat_turn_store()
+    with turns.transaction():
+        if len(turns) == 0 and os.path.exists(CHAT_HISTORY_CSV):
+            migrate_chat_history_csv(CHAT_HISTORY_CSV)
     
     # Initialize query log - generic log for all AI interactions
-    if not os.path.exists(QUERY_LOG_CSV):
-        with open(QUERY_LOG_CSV, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id', 'feature', 'query', 'response', 'created_at'])
+    _create_csv(QUERY_LOG_CSV, QUERY_LOG_COLUMNS)
+    
+    # Initialize review history
+    _create_csv(REVIEW_HISTORY_CSV, REVIEW_HISTORY_COLUMNS)
+
+def _create_csv(path, columns):
+    """Create a CSV file with its header row unless it exists (atomic, so workers can race)"""
+    try:
+        with open(path, 'x', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(columns)
+    except FileExistsError:
+        pass
 
+def _history():
+    """Return the background history writer, starting it on first use"""
+    global _history_writer
+    with _history_lock:
+        if _history_writer is None:
+            _history_writer = HistoryWriter(
+                HISTORY_BATCH_SIZE, HISTORY_FLUSH_INTERVAL, HISTORY_QUEUE_SIZE, HISTORY_ROTATION
+            ).start()
+        return _history_writer
+
+def _latest_rows(path):
+    """Return the newest-first reader of a history file, creating it on first use"""
+    with _history_lock:
+        reader = _history_readers.get(path)
+        if reader is None:
+            reader = _history_readers[path] = LatestRows(path)
+        return reader
+
+def flush_history():
+    """Write every queued history row to disk"""
+    if _history_writer is not None:
+        _history_writer.flush()
+
+def close_history():
+    """Write every queued history row and stop the writer thread (call at shutdown)"""
+    global _history_writer
+    if _history_writer is not None:
+        _history_writer.close()
+        _history_writer = None
+
+# Scripts that never run the app's shutdown handler still get their rows written
+atexit.register(close_history)
+
+def get_history_writer_stats():
+    """Get queue depth and write counters of the history writer"""
+    return _history().stats()
+
+def _flashcard_store():
+    """Return the flashcard record log, opening it on first use"""
+    global _flashcard_log
+    if _flashcard_log is None:
+        _flashcard_log = RecordLog(FLASHCARDS_LOG).open()
+    return _flashcard_log
+
+def migrate_flashcards_csv(csv_path=FLASHCARDS_CSV):
+    """
+    Import flashcards from the legacy whole-file CSV layout into the record log
+
+    The CSV is renamed to ``<name>.migrated`` afterwards so the import only
+    happens once. Returns the number of imported flashcards.
+    """
+    store = _flashcard_store()
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    
+    records = []
+    for row in rows:
+        if not row.get('id'):
+            continue
+        record = {column: row.get(column) or '' for column in FLASHCARD_COLUMNS}
+        record['id'] = int(float(row['id']))
+        records.append(record)
+    
+    store.put_many(records)
+    os.replace(csv_path, csv_path + '.migrated')
+    return len(records)
+
+def is_missing_id(value):
+    """Whether ``value`` is no flashcard id: None, or NaN from a DataFrame row"""
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+def _flashcard_rows():
+    """Return the in-memory flashcard table, brought up to date with the store"""
+    global _flashcard_table
+    with _flashcard_table_lock:
+        if _flashcard_table is None:
+            _flashcard_table = FlashcardTable(_flashcard_store()).open()
+            return _flashcard_table
+    return _flashcard_table.sync()
+
+@_timed('get_flashcards')
 def get_flashcards():
-    """Get all flashcards from the CSV database"""
+    """
+    Get all flashcards from the flashcard store as a DataFrame
+
+    The DataFrame is a shared cached snapshot; treat it as read-only. The
+    app's pages use list_flashcards and get_flashcard, which don't build it.
+    """
+    import pandas as pd
     try:
-        return pd.read_csv(FLASHCARDS_CSV)
+        return _flashcard_rows().frame()
     except:
-        return pd.DataFrame(columns=['id', 'word', 'language', 'translations', 'pronunciation', 'examples', 'created_at', 'updated_at'])
+        return pd.DataFrame(columns=FLASHCARD_COLUMNS)
+
+def get_flashcards_by_language(language):
+    """Get the flashcards of one language as a list of dicts, ordered by id"""
+    return _flashcard_rows().by_language(language)
 
+def _flashcard_filter(language, created_from, created_to, updated_from, updated_to):
+    """Return a function telling whether a Flashcard row passes the filters, or None without filters"""
+    if not any((language, created_from, created_to, updated_from, updated_to)):
+        return None
+    
+    def keep(row):
+        if language and row.language != language:
+            return False
+        for value, low, high in ((row.created_at, created_from, created_to), (row.updated_at, updated_from, updated_to)):
+            value = value or ''
+            if (low and value < low) or (high and value > high):
+                return False
+        return True
+    return keep
+
+@_timed('list_flashcards')
+def list_flashcards(sort='id', descending=False, after=None, limit=50, language=None,
+                    created_from=None, created_to=None, updated_from=None, updated_to=None):
+    """
+    Get one page of flashcards in (sort, id) order
+
+    Pages are keyset-based: pass the (sort value, id) of the last card of
+    the previous page as ``after``. The table keeps its rows ordered per
+    sort column, so a page is found by binary search and filters only look
+    at the rows that can still end up on it.
+
+    Args:
+        sort (str): One of FLASHCARD_SORT_COLUMNS
+        descending (bool): Order from the largest key down
+        after (tuple): (sort value, id) to continue after, or None
+        limit (int): Maximum number of cards to return
+        language (str): Only cards of this language
+        created_from, created_to, updated_from, updated_to (str): Inclusive
+            'YYYY-MM-DD HH:MM:SS' bounds on the timestamps
+
+    Returns:
+        list: Flashcard dicts
+    """
+    if sort not in FLASHCARD_SORT_COLUMNS:
+        raise ValueError(f"Unknown sort column {sort!r}")
+    try:
+        table = _flashcard_rows()
+    except:
+        return []
+    
+    # A date range on the sort column is a contiguous slice
+    bounds = {'created_at': (created_from, created_to), 'updated_at': (updated_from, updated_to)}
+    low, high = bounds.get(sort, (None, None))
+    keep = _flashcard_filter(language, created_from, created_to, updated_from, updated_to)
+    return table.page(sort, descending, after, limit, low, high, keep)
+
+def _flashcard_search_index():
+    """Return the flashcard search index, loading or building it on first use"""
+    global _search_index
+    with _search_lock:
+        if _search_index is None:
+            _search_index = SearchIndex(_flashcard_store(), FLASHCARDS_SEARCH_INDEX).open()
+        return _search_index
+
+@_timed('search_flashcards')
+def search_flashcards(query, limit=20, language=None):
+    """
+    Full-text search over flashcard words, translations and examples
+    
+    Args:
+        query (str): Words to find; case and diacritics are ignored and the
+            last word also matches as a prefix
+        limit (int): Maximum number of results
+        language (str): Only cards of this language
+        
+    Returns:
+        list: Flashcard dicts with a ``score``, best match first
+    """
+    index = _flashcard_search_index()
+    store = _flashcard_store()
+    results = []
+    for card_id, score in index.search(query, limit, language):
+        record = store.get(card_id)
+        if record is not None:
+            results.append(dict(record, score=round(score, 4)))
+    return results
+
+def close_search_index():
+    """Save the search index so the next start only indexes newer cards (call at shutdown)"""
+    global _search_index
+    with _search_lock:
+        if _search_index is not None:
+            _search_index.sync()
+            _search_index.save()
+            _search_index = None
+
+atexit.register(close_search_index)
+
+def _flashcard_duplicate_index():
+    """Return the near-duplicate index, building it on first use"""
+    global _duplicate_index
+    with _duplicate_lock:
+        if _duplicate_index is None:
+            _duplicate_index = DuplicateIndex(_flashcard_store()).open()
+        return _duplicate_index
+
+@_timed('find_duplicate_flashcards')
+def find_duplicate_flashcards(word, language, limit=5, threshold=None):
+    """
+    Find existing flashcards that are the same as or close to a new word
+    
+    Args:
+        word (str): The word about to be added
+        language (str): Only cards of this language are compared
+        limit (int): Maximum number of matches
+        threshold (float): Minimum similarity, defaults to
+            duplicate_index.DUPLICATE_THRESHOLD
+        
+    Returns:
+        list: Flashcard dicts with a ``similarity`` (1.0 for the same
+            normalized word) and ``exact``, exact matches first
+    """
+    store = _flashcard_store()
+    results = []
+    for card_id, similarity, exact in _flashcard_duplicate_index().find(word, language, limit, threshold):
+        record = store.get(card_id)
+        if record is not None:
+            results.append(dict(record, similarity=round(similarity, 4), exact=exact))
+    return results
+
+def _schedule_store():
+    """Return the review schedule log, opening it on first use"""
+    global _schedule_log
+    if _schedule_log is None:
+        _schedule_log = RecordLog(SCHEDULES_LOG).open()
+    return _schedule_log
+
+def _flashcard_due_queue():
+    """Return the due-card queue, building it on first use"""
+    global _due_queue
+    with _due_lock:
+        if _due_queue is None:
+            _due_queue = scheduler.DueQueue(_flashcard_store(), _schedule_store()).open()
+        return _due_queue
+
+def _with_schedule(card, schedule):
+    """Return ``card`` with its review schedule fields"""
+    schedule = schedule or scheduler.new_schedule(card['created_at'])
+    return dict(card, **{column: schedule[column] for column in SCHEDULE_COLUMNS})
+
+@_timed('get_due_flashcards')
+def get_due_flashcards(limit=20, language=None, now=None):
+    """
+    Get the flashcards due for review, most overdue first
+    
+    Cards never reviewed are due from their creation. The queue is a heap
+    per language, so this doesn't scan the deck.
+    
+    Args:
+        limit (int): Maximum number of cards
+        language (str): Only cards of this language
+        now (str): 'YYYY-MM-DD HH:MM:SS' to check against, defaults to now
+        
+    Returns:
+        list: Flashcard dicts with their schedule (due, ease, interval,
+            repetitions, lapses, last_reviewed)
+    """
+    now = now or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    store = _flashcard_store()
+    schedules = _schedule_store()
+    results = []
+    for card_id, _ in _flashcard_due_queue().due(now, limit, language):
+        card = store.get(card_id)
+        if card is not None:
+            results.append(_with_schedule(card, schedules.get(card_id)))
+    return results
+
+@_timed('review_flashcard')
+def review_flashcard(flashcard_id, grade):
+    """
+    Record a review of a flashcard and schedule its next one
+    
+    Args:
+        flashcard_id (int): The reviewed card
+        grade (int): Recall quality, 0 (forgot) to 5 (perfect); 3 and up pass
+        
+    Returns:
+        dict: The card with its new schedule, or None if there is no such card
+        
+    Raises:
+        ValueError: On a grade out of range
+    """
+    schedules = _schedule_store()
+    
+    # Under the schedule log's lock so concurrent reviews of a card don't overwrite each other
+    with schedules.transaction():
+        card = _flashcard_store().refresh().get(flashcard_id)
+        if card is None:
+            return None
+        current = schedules.get(flashcard_id) or scheduler.new_schedule(card['created_at'])
+        schedule = scheduler.next_review(current, grade)
+        schedules.put({'id': int(flashcard_id), **schedule})
+    
+    _history().log(REVIEW_HISTORY_CSV, REVIEW_HISTORY_COLUMNS, {
+        'flashcard_id': int(flashcard_id),
+        'grade': grade,
+        'ease': schedule['ease'],
+        'interval': schedule['interval'],
+        'due': schedule['due'],
+        'reviewed_at': schedule['last_reviewed']
+    })
+    return _with_schedule(card, schedule)
+
+@_timed('get_schedule_columns')
+def get_schedule_columns():
+    """
+    Get every card's schedule as column arrays, for deck-wide statistics
+    
+    Returns:
+        dict: See scheduler.schedule_columns
+    """
+    return _flashcard_due_queue().columns()
+
+@_timed('reschedule_flashcards')
+def reschedule_flashcards(retention):
+    """
+    Move the due time of every reviewed card to match a new target retention
+    
+    Args:
+        retention (float): Probability of recall to schedule for
+        
+    Returns:
+        int: Number of rescheduled cards
+        
+    Raises:
+        ValueError: On a retention out of range
+    """
+    queue = _flashcard_due_queue()
+    schedules = _schedule_store()
+    
+    with schedules.transaction():
+        ids, due = scheduler.rescheduled_due(queue.columns(), retention)
+        current = {int(schedule['id']): schedule for schedule in schedules.records()}
+        records = [
+            dict(current[card_id], due=timestamp)
+            for card_id, timestamp in zip(ids.tolist(), due.tolist()) if card_id in current
+        ]
+        schedules.put_many(records)
+        # One heap rebuild instead of re-reading every changed schedule
+        queue.set_due(ids, due)
+    return len(records)
+
+def get_review_days():
+    """
+    Get the dates with at least one review, oldest first
+    
+    Only the part of the review history appended since the last call is
+    read. Reviews still queued for the history file show up once written.
+    
+    Returns:
+        list: 'YYYY-MM-DD' strings
+    """
+    cache = _review_days
+    column = REVIEW_HISTORY_COLUMNS.index('reviewed_at')
+    with _review_days_lock:
+        try:
+            with open(REVIEW_HISTORY_CSV, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                size = f.seek(0, os.SEEK_END)
+                if inode != cache['inode'] or size < cache['offset']:
+                    # A new or rewritten file
+                    cache.update(inode=inode, offset=0, days=set())
+                f.seek(cache['offset'])
+                chunk = f.read(size - cache['offset'])
+        except OSError:
+            return []
+        # A row still being appended is read next time
+        end = chunk.rfind(b'\n') + 1
+        for row in csv.reader(chunk[:end].decode('utf-8').splitlines()):
+            if len(row) > column and row[0] != 'id':
+                cache['days'].add(row[column][:10])
+        cache['offset'] += end
+        return sorted(cache['days'])
+
+def get_flashcard_stats():
+    """Get the flashcard count and list of languages from the in-memory table"""
+    try:
+        return _flashcard_rows().stats()
+    except:
+        return {'count': 0, 'languages': []}
+
+def get_flashcard_cache_stats():
+    """Get how often reads found the flashcard table current (hits) or applied changes first (misses)"""
+    table = _flashcard_table
+    if table is None:
+        return {'hits': 0, 'misses': 0}
+    return {'hits': table.hits, 'misses': table.misses}
+
+@_timed('save_flashcard')
 def save_flashcard(word, language, translations, pronunciation, examples, flashcard_id=None):
-    """Save a flashcard to the CSV database"""
-    df = get_flashcards()
+    """Save a flashcard, appending a single record to the flashcard store"""
+    store = _flashcard_store()
     
     now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
-    if flashcard_id is not None and not pd.isna(flashcard_id) and int(flashcard_id) in df['id'].values:
-        # Update existing flashcard
-        idx = df.index[df['id'] == int(flashcard_id)].tolist()[0]
-        df.at[idx, 'word'] = word
-        df.at[idx, 'language'] = language
-        df.at[idx, 'translations'] = translations
-        df.at[idx, 'pronunciation'] = pronunciation
-        df.at[idx, 'examples'] = examples
-        df.at[idx, 'updated_at'] = now
-    else:
-        # Create new flashcard
-        new_id = 1 if df.empty else df['id'].max() + 1
-        new_row = {
-            'id': new_id,
-            'word': word,
-            'language': language,
-            'translations': translations,
-            'pronunciation': pronunciation,
-            'examples': examples,
-            'created_at': now,
-            'updated_at': now
-        }
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    
-    df.to_csv(FLASHCARDS_CSV, index=False)
+    # Read, allocate and append under the store's lock so concurrent
+    # writers (threads or worker processes) never share an id
+    with store.transaction():
+        existing = None
+        if not is_missing_id(flashcard_id):
+            existing = store.get(flashcard_id)
+        
+        if existing is not None:
+            # Update existing flashcard
+            record = dict(existing)
+            record.update({
+                'word': word,
+                'language': language,
+                'translations': translations,
+                'pronunciation': pronunciation,
+                'examples': examples,
+                'updated_at': now
+            })
+        else:
+            # Create new flashcard
+            record = {
+                'id': store.next_id(),
+                'word': word,
+                'language': language,
+                'translations': translations,
+                'pronunciation': pronunciation,
+                'examples': examples,
+                'created_at': now,
+                'updated_at': now
+            }
+        
+        store.put(record)
     return True
 
+@_timed('save_flashcards')
+def save_flashcards(flashcards):
+    """
+    Create several flashcards with a single append to the flashcard store
+
+    Args:
+        flashcards (list): Dicts with word, language, translations,
+            pronunciation and examples
+
+    Returns:
+        list: The ids of the created flashcards, in input order
+    """
+    store = _flashcard_store()
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    with store.transaction():
+        records = []
+        for flashcard in flashcards:
+            records.append({
+                'id': store.next_id(),
+                'word': flashcard['word'],
+                'language': flashcard['language'],
+                'translations': flashcard['translations'],
+                'pronunciation': flashcard['pronunciation'],
+                'examples': flashcard['examples'],
+                'created_at': now,
+                'updated_at': now
+            })
+        
+        store.put_many(records)
+    return [record['id'] for record in records]
+
+@_timed('delete_flashcard')
 def delete_flashcard(flashcard_id):
-    """Delete a flashcard from the CSV database"""
-    df = get_flashcards()
-    if int(flashcard_id) in df['id'].values:
-        df = df[df['id'] != int(flashcard_id)]
-        df.to_csv(FLASHCARDS_CSV, index=False)
-        return True
-    return False
+    """Delete a flashcard and its review schedule"""
+    deleted = _flashcard_store().delete(flashcard_id)
+    _schedule_store().delete(flashcard_id)
+    return deleted
 
+@_timed('get_flashcard')
 def get_flashcard(flashcard_id):
     """Get a specific flashcard by ID"""
-    df = get_flashcards()
-    if int(flashcard_id) in df['id'].values:
-        return df[df['id'] == int(flashcard_id)].to_dict('records')[0]
-    return None
+    return _flashcard_rows().get(flashcard_id)
 
 # Grammar check history functions
 def save_grammar_history(original_text, corrected_text):
-    """Save grammar check history to CSV database"""
-    try:
-        df = pd.read_csv(GRAMMAR_HISTORY_CSV)
-    except:
-        df = pd.DataFrame(columns=['id', 'original_text', 'corrected_text', 'created_at'])
-    
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    new_id = 1 if df.empty else df['id'].max() + 1
-    
-    new_row = {
-        'id': new_id,
+    """Queue a grammar check for the history CSV"""
+    _history().log(GRAMMAR_HISTORY_CSV, GRAMMAR_HISTORY_COLUMNS, {
         'original_text': original_text[:500],  # Limit text length
         'corrected_text': corrected_text[:500],  # Limit text length
-        'created_at': now
-    }
-    
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    df.to_csv(GRAMMAR_HISTORY_CSV, index=False)
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
     
     # Also log this interaction in the general query log
     save_query_log("grammar", original_text, corrected_text)
@@ -137,26 +646,14 @@ def save_grammar_history(original_text, corrected_text):
 
 # Translation history functions
 def save_translation_history(original_text, translated_text, source_lang, target_lang):
-    """Save translation history to CSV database"""
-    try:
-        df = pd.read_csv(TRANSLATE_HISTORY_CSV)
-    except:
-        df = pd.DataFrame(columns=['id', 'original_text', 'source_lang', 'target_lang', 'translated_text', 'created_at'])
-    
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    new_id = 1 if df.empty else df['id'].max() + 1
-    
-    new_row = {
-        'id': new_id,
+    """Queue a translation for the history CSV"""
+    _history().log(TRANSLATE_HISTORY_CSV, TRANSLATE_HISTORY_COLUMNS, {
         'original_text': original_text[:500],  # Limit text length
         'source_lang': source_lang,
         'target_lang': target_lang,
         'translated_text': translated_text[:500],  # Limit text length
-        'created_at': now
-    }
-    
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    df.to_csv(TRANSLATE_HISTORY_CSV, index=False)
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
     
     # Also log this interaction in the general query log
     query_info = f"{original_text} ({source_lang} to {target_lang})"
@@ -166,26 +663,14 @@ def save_translation_history(original_text, translated_text, source_lang, target
 
 # Summarization history functions
 def save_summarize_history(original_text, summary, length, style):
-    """Save summarization history to CSV database"""
-    try:
-        df = pd.read_csv(SUMMARIZE_HISTORY_CSV)
-    except:
-        df = pd.DataFrame(columns=['id', 'original_text', 'summary', 'length', 'style', 'created_at'])
-    
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    new_id = 1 if df.empty else df['id'].max() + 1
-    
-    new_row = {
-        'id': new_id,
+    """Queue a summary for the history CSV"""
+    _history().log(SUMMARIZE_HISTORY_CSV, SUMMARIZE_HISTORY_COLUMNS, {
         'original_text': original_text[:500],  # Limit text length
         'summary': summary[:500],  # Limit text length
         'length': length or 'medium',
         'style': style or 'informative',
-        'created_at': now
-    }
-    
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    df.to_csv(SUMMARIZE_HISTORY_CSV, index=False)
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
     
     # Also log this interaction in the general query log
     query_info = f"{original_text[:100]}... (length: {length}, style: {style})"
@@ -194,68 +679,174 @@ def save_summarize_history(original_text, summary, length, style):
     return True
 
 # Chat history functions
-def save_chat_history(user_message, ai_response):
-    """Save chat conversation to CSV database"""
-    try:
-        df = pd.read_csv(CHAT_HISTORY_CSV)
-    except:
-        df = pd.DataFrame(columns=['id', 'user_message', 'ai_response', 'created_at'])
-    
+def _chat_turn_store():
+    """Return the chat turn log, opening it on first use"""
+    global _chat_turn_log
+    if _chat_turn_log is None:
+        _chat_turn_log = RecordLog(CHAT_TURNS_LOG).open()
+    return _chat_turn_log
+
+def _chat_session_store():
+    """Return the chat session log, opening it on first use"""
+    global _chat_session_log
+    if _chat_session_log is None:
+        _chat_session_log = RecordLog(CHAT_SESSIONS_LOG).open()
+    return _chat_session_log
+
+def migrate_chat_history_csv(csv_path=CHAT_HISTORY_CSV):
+    """
+    Import chat exchanges from the legacy history CSV into the turn log
+
+    They belong to no session. The CSV is renamed to ``<name>.migrated``
+    afterwards. Returns the number of imported exchanges.
+    """
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    
+    records = []
+    for row in rows:
+        if not row.get('id'):
+            continue
+        record = {column: row.get(column) or '' for column in CHAT_HISTORY_COLUMNS}
+        record['id'] = int(float(row['id']))
+        record['session_id'] = None
+        records.append(record)
+    
+    _chat_turn_store().put_many(records)
+    os.replace(csv_path, csv_path + '.migrated')
+    return len(records)
+
+def create_chat_session():
+    """Start an empty chat session and return it"""
+    sessions = _chat_session_store()
     now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    new_id = 1 if df.empty else df['id'].max() + 1
     
-    new_row = {
-        'id': new_id,
-        'user_message': user_message[:500],  # Limit text length
-        'ai_response': ai_response[:500],  # Limit text length
-        'created_at': now
-    }
+    with sessions.transaction():
+        session = {
+            'id': sessions.next_id(),
+            'summary': '',
+            'summarized_through': 0,
+            'turns': 0,
+            'recent': [],
+            'created_at': now,
+            'updated_at': now
+        }
+        sessions.put(session)
+    return session
+
+@_timed('get_chat_session')
+def get_chat_session(session_id):
+    """
+    Get a chat session, or None if there is no such session
+
+    Returns:
+        dict: id, summary (of the turns up to summarized_through), turns
+            (how many exchanges so far), recent (ids of the last
+            CHAT_RECENT_TURNS turns, oldest first), created_at, updated_at
+    """
+    return _chat_session_store().refresh().get(session_id)
+
+@_timed('save_chat_history')
+def save_chat_history(user_message, ai_response, session_id=None):
+    """Append a chat exchange to the turn log and to its session's recent turns"""
+    turns = _chat_turn_store()
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    df.to_csv(CHAT_HISTORY_CSV, index=False)
+    with turns.transaction():
+        turn = {
+            'id': turns.next_id(),
+            'session_id': session_id,
+            'user_message': user_message,
+            'ai_response': ai_response,
+            'created_at': now
+        }
+        turns.put(turn)
+    
+    if session_id is not None:
+        sessions = _chat_session_store()
+        with sessions.transaction():
+            session = sessions.get(session_id)
+            if session is not None:
+                # The oldest turn id drops out once the ring is full
+                session['recent'] = (session['recent'] + [turn['id']])[-CHAT_RECENT_TURNS:]
+                session['turns'] += 1
+                session['updated_at'] = now
+                sessions.put(session)
     
     # Also log this interaction in the general query log
     save_query_log("chat", user_message, ai_response)
     
     return True
 
+@_timed('get_recent_chat_turns')
+def get_recent_chat_turns(session_id, limit=CHAT_RECENT_TURNS):
+    """
+    Get the last ``limit`` turns of a chat session, oldest first
+
+    Reads the session's ring of turn ids and then each turn by id, so the
+    cost doesn't grow with the length of the conversation. At most
+    CHAT_RECENT_TURNS turns are kept in the ring.
+    """
+    session = get_chat_session(session_id)
+    if session is None or limit <= 0:
+        return []
+    turns = _chat_turn_store().refresh()
+    return [turn for turn in map(turns.get, session['recent'][-limit:]) if turn is not None]
+
+def update_chat_summary(session_id, summary, summarized_through):
+    """
+    Replace a chat session's summary of its older turns
+
+    Args:
+        session_id (int): The session
+        summary (str): Summary of every turn up to ``summarized_through``
+        summarized_through (int): Id of the last turn the summary covers
+
+    Returns:
+        bool: False if there is no such session or its summary already
+            covers that turn (a concurrent request summarized first)
+    """
+    sessions = _chat_session_store()
+    with sessions.transaction():
+        session = sessions.get(session_id)
+        if session is None or summarized_through <= session['summarized_through']:
+            return False
+        session['summary'] = summary
+        session['summarized_through'] = summarized_through
+        session['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        sessions.put(session)
+    return True
+
+@_timed('get_chat_history')
 def get_chat_history(limit=10):
-    """Get recent chat history entries"""
+    """Get recent chat history entries, newest first"""
     try:
-        df = pd.read_csv(CHAT_HISTORY_CSV)
-        return df.sort_values(by='id', ascending=False).head(limit).to_dict('records')
+        return _chat_turn_store().refresh().latest(limit)
     except:
         return []
 
 # General query log
 def save_query_log(feature, query, response):
-    """Log all AI interactions in a generic log"""
-    try:
-        df = pd.read_csv(QUERY_LOG_CSV)
-    except:
-        df = pd.DataFrame(columns=['id', 'feature', 'query', 'response', 'created_at'])
-    
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    new_id = 1 if df.empty else df['id'].max() + 1
-    
-    new_row = {
-        'id': new_id,
+    """Queue an AI interaction for the generic query log"""
+    _history().log(QUERY_LOG_CSV, QUERY_LOG_COLUMNS, {
         'feature': feature,
         'query': query[:500],  # Limit text length
         'response': response[:500],  # Limit text length
-        'created_at': now
-    }
-    
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    df.to_csv(QUERY_LOG_CSV, index=False)
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
     return True
 
+@_timed('get_query_log')
 def get_query_log(feature=None, limit=50):
-    """Get recent query log entries, optionally filtered by feature"""
+    """
+    Get recent query log entries, newest first, optionally filtered by feature
+
+    Served from the current query log file, kept parsed in memory; rotated
+    segments are only read when it holds fewer than ``limit`` matches.
+    """
+    flush_history()
+    match = (lambda row: row['feature'] == feature) if feature else None
     try:
-        df = pd.read_csv(QUERY_LOG_CSV)
-        if feature:
-            df = df[df['feature'] == feature]
-        return df.sort_values(by='id', ascending=False).head(limit).to_dict('records')
+        return _latest_rows(QUERY_LOG_CSV).latest(limit, match)
     except:
         return [] 
\ No newline at end of file
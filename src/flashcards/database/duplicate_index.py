@@ -0,0 +1,293 @@
+"""
+Near-duplicate detection for flashcard words
+
+A word is checked in two steps, before any model call is made for it.
+First, its normalized form is looked up exactly. Normalizing ignores case,
+diacritics and spacing, so "Run", " run" and "rún" are the same word.
+Then comes an approximate nearest-neighbour search. Each card's word is
+hashed into a small vector of its character 2- and 3-grams, with the grams
+at the start of the word weighing double so that inflections of a stem
+stay close: "run" and "running" score about 0.69. The vector is
+L2-normalized and stored as int8. The candidates are the cards of the same
+language that share a 3-gram with the word. 3-grams are probed rarest
+first, up to MAX_CANDIDATES cards, and the candidates are ranked by the
+cosine similarity of their vectors.
+
+Everything is computed locally, so it works offline. csv_db keeps a
+DuplicateIndex in memory, which follows the flashcard RecordLog the same
+way SearchIndex does. sqlite_db keeps the 3-grams and vectors in tables
+filled by triggers, with grams() and vector() registered as SQL functions.
+"""
+
+import os
+import threading
+import zlib
+from array import array
+
+import numpy as np
+
+from src.flashcards.database.search_index import fold
+
+# Cards at least this similar to a new word are reported as near duplicates
+DUPLICATE_THRESHOLD = float(os.getenv('DUPLICATE_THRESHOLD', '0.6'))
+# Size of a word vector: one signed byte per dimension
+DIMS = 128
+# Candidates scored per lookup at most; the rarest 3-grams are probed first
+MAX_CANDIDATES = 5000
+
+_SCALE = 127.0
+
+
+def normalize(word):
+    """Fold ``word`` (see search_index.fold) and collapse its whitespace"""
+    return ' '.join(fold(word).split())
+
+
+def _key(language, text):
+    """A 63-bit key for ``text`` in ``language``, the same in every process"""
+    return (zlib.crc32(fold(language).encode()) & 0x7fffffff) << 32 | zlib.crc32(text.encode())
+
+
+def exact_key(word, language):
+    """Key of the normalized word; equal words share it, but so may a few others"""
+    return _key(language, '\0' + normalize(word))
+
+
+def _trigrams(word):
+    padded = f'<{word}>'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)} if word else set()
+
+
+def grams(word, language):
+    """Keys of the 3-grams of ``word``, with the start and end marked"""
+    return sorted({_key(language, gram) for gram in _trigrams(normalize(word))})
+
+
+def vector(word):
+    """
+    Hash the 2- and 3-grams of ``word`` into a unit vector
+
+    Returns:
+        np.ndarray: DIMS int8 values, the unit vector scaled by 127
+    """
+    values = np.zeros(DIMS, dtype=np.float32)
+    word = normalize(word)
+    if not word:
+        return values.astype(np.int8)
+    padded = f'<{word}>'
+    for size in (2, 3):
+        for i in range(len(padded) - size + 1):
+            gram = padded[i:i + size]
+            code = zlib.crc32(gram.encode())
+            weight = 2.0 if i == 0 else 1.0
+            # The sign bit keeps colliding grams from always adding up
+            values[code % DIMS] += weight if code >> 31 else -weight
+    norm = np.linalg.norm(values)
+    if norm:
+        values *= _SCALE / norm
+    return np.round(values).astype(np.int8)
+
+
+def similarities(query, vectors):
+    """Cosine similarity of the ``query`` vector with each row of ``vectors``"""
+    return (vectors.astype(np.float32) @ query.astype(np.float32)) / (_SCALE * _SCALE)
+
+
+def probe(counts):
+    """
+    Choose which 3-grams to read candidates from
+
+    Args:
+        counts (list): (gram, number of cards) pairs
+
+    Returns:
+        list: The rarest grams, while their cards add up to MAX_CANDIDATES
+    """
+    chosen = []
+    total = 0
+    for gram, count in sorted(counts, key=lambda pair: pair[1]):
+        if chosen and total + count > MAX_CANDIDATES:
+            break
+        chosen.append(gram)
+        total += count
+    return chosen
+
+
+def rank(exact_ids, ids, scores, limit=5, threshold=None):
+    """
+    Merge exact and approximate matches
+
+    Args:
+        exact_ids (list): Cards whose normalized word is the same
+        ids (np.ndarray): Candidate card ids
+        scores (np.ndarray): Their similarity to the word
+        limit (int): Maximum number of matches
+        threshold (float): Minimum similarity, defaults to DUPLICATE_THRESHOLD
+
+    Returns:
+        list: (card id, similarity, exact) tuples, exact matches first, then
+            most similar first
+    """
+    threshold = DUPLICATE_THRESHOLD if threshold is None else threshold
+    matches = [(card_id, 1.0, True) for card_id in sorted(exact_ids)[:limit]]
+    keep = (scores >= threshold) & ~np.isin(ids, exact_ids)
+    ids, scores = ids[keep], scores[keep]
+    order = np.lexsort((ids, -scores))[:limit - len(matches)]
+    matches.extend((int(ids[i]), min(float(scores[i]), 1.0), False) for i in order)
+    return matches
+
+
+class DuplicateIndex:
+    """
+    Word vectors and 3-gram postings kept in step with a RecordLog of flashcards
+
+    Postings are only appended to. When a card changes or goes away, its
+    old entries are skipped at lookup time, because the card's language no
+    longer matches. The postings are rebuilt once stale entries outnumber
+    the live ones.
+
+    Args:
+        store (RecordLog): The flashcard log to index
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.RLock()
+        # Guards only _dirty; the log calls in while holding its own lock
+        self._dirty_lock = threading.Lock()
+        self._dirty = set()
+        self._reloaded = False
+        self._reset()
+
+    def _reset(self):
+        self._languages = {}
+        # Card id -> (language code, normalized word)
+        self._words = {}
+        # (language code, normalized word) -> card ids
+        self._exact = {}
+        # 3-gram key -> card ids, including stale entries
+        self._postings = {}
+        self._entries = 0
+        self._stale = 0
+        # Indexed by card id; language code -1 where there is no card
+        self._language_codes = np.full(0, -1, dtype=np.int32)
+        self._vectors = np.zeros((0, DIMS), dtype=np.int8)
+
+    def open(self):
+        """Index every card, then follow the log's changes"""
+        with self._lock:
+            self.store.subscribe(self._changed)
+            self.rebuild()
+        return self
+
+    def rebuild(self):
+        """Index every card of the log from scratch"""
+        with self._lock:
+            with self._dirty_lock:
+                self._dirty.clear()
+                self._reloaded = False
+            self._reset()
+            for record in self.store.records():
+                self._add(record)
+
+    def _changed(self, record_id):
+        """RecordLog callback: ``record_id`` changed, or None after a full reload"""
+        with self._dirty_lock:
+            if record_id is None:
+                self._reloaded = True
+            else:
+                self._dirty.add(record_id)
+
+    def sync(self):
+        """Index the cards changed since the last sync, from any process"""
+        with self._lock:
+            self.store.refresh()
+            with self._dirty_lock:
+                dirty, self._dirty = self._dirty, set()
+                reloaded, self._reloaded = self._reloaded, False
+            if reloaded or self._stale > max(10000, self._entries - self._stale):
+                self.rebuild()
+                return
+            for card_id in sorted(dirty):
+                record = self.store.get(card_id)
+                indexed = self._words.get(card_id)
+                if record is not None and indexed == (self._language_code(record.get('language')), normalize(record.get('word'))):
+                    # Edited, but not its word or language
+                    continue
+                self._remove(card_id)
+                if record is not None:
+                    self._add(record)
+
+    def _language_code(self, language):
+        language = fold(language)
+        code = self._languages.get(language)
+        if code is None:
+            code = self._languages[language] = len(self._languages)
+        return code
+
+    def _grow(self, card_id):
+        size = len(self._language_codes)
+        if card_id < size:
+            return
+        size = max(card_id + 1, size * 2, 1024)
+        codes = np.full(size, -1, dtype=np.int32)
+        codes[:len(self._language_codes)] = self._language_codes
+        vectors = np.zeros((size, DIMS), dtype=np.int8)
+        vectors[:len(self._vectors)] = self._vectors
+        self._language_codes = codes
+        self._vectors = vectors
+
+    def _add(self, record):
+        card_id = int(record['id'])
+        language = record.get('language')
+        code = self._language_code(language)
+        word = normalize(record.get('word'))
+        self._words[card_id] = (code, word)
+        self._exact.setdefault((code, word), set()).add(card_id)
+        for gram in grams(word, language):
+            self._postings.setdefault(gram, array('i')).append(card_id)
+            self._entries += 1
+        self._grow(card_id)
+        self._language_codes[card_id] = code
+        self._vectors[card_id] = vector(word)
+
+    def _remove(self, card_id):
+        indexed = self._words.pop(card_id, None)
+        if indexed is None:
+            return
+        same = self._exact[indexed]
+        same.discard(card_id)
+        if not same:
+            del self._exact[indexed]
+        self._language_codes[card_id] = -1
+        self._stale += len(_trigrams(indexed[1]))
+
+    def __len__(self):
+        return len(self._words)
+
+    def find(self, word, language, limit=5, threshold=None):
+        """
+        Find the cards of ``language`` whose word is the same as or close to ``word``
+
+        Returns:
+            list: (card id, similarity, exact) tuples (see rank)
+        """
+        word = normalize(word)
+        if not word:
+            return []
+        self.sync()
+
+        with self._lock:
+            code = self._languages.get(fold(language))
+            if code is None:
+                return []
+            exact_ids = sorted(self._exact.get((code, word), ()))
+            postings = {gram: self._postings[gram] for gram in grams(word, language) if gram in self._postings}
+            chosen = probe([(gram, len(posting)) for gram, posting in postings.items()])
+            if not chosen:
+                return rank(exact_ids, np.zeros(0, dtype=np.int32), np.zeros(0), limit, threshold)
+            ids = np.unique(np.concatenate([np.frombuffer(postings[gram], dtype=np.int32) for gram in chosen]))
+            # Drops stale entries of cards since deleted or moved to another language
+            ids = ids[self._language_codes[ids] == code]
+            scores = similarities(vector(word), self._vectors[ids])
+            return rank(exact_ids, ids, scores, limit, threshold)
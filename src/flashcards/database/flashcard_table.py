@@ -0,0 +1,238 @@
+"""
+Flashcards kept in memory as compact rows, for listings and page renders
+
+csv_db serves the listing pages, GET /api/flashcards, single-card reads and
+the deck statistics shown on every page from a FlashcardTable:
+
+- one Flashcard per card, a ``__slots__`` object instead of a dict or a
+  DataFrame row, in a dict keyed by id
+- per sort column, the rows in (value, id) order with their sort values
+  and ids in parallel lists, so a page or a cursor is found by bisection
+- the number of cards per language
+
+The table follows the flashcard RecordLog the same way DuplicateIndex
+does: a write marks its card dirty, and the next read re-reads only the
+dirty cards and moves them within the sort orders already built. A read
+allocates dicts only for the rows it returns.
+"""
+
+import bisect
+import threading
+
+FIELDS = ('id', 'word', 'language', 'translations', 'pronunciation', 'examples', 'created_at', 'updated_at')
+
+
+class Flashcard:
+    """
+    One flashcard, with a record's keys as attributes
+
+    Args:
+        record (dict): A flashcard record from the log
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, record):
+        self.id = int(record['id'])
+        self.word = record.get('word')
+        self.language = record.get('language')
+        self.translations = record.get('translations')
+        self.pronunciation = record.get('pronunciation')
+        self.examples = record.get('examples')
+        self.created_at = record.get('created_at')
+        self.updated_at = record.get('updated_at')
+
+    def sort_key(self, column):
+        """The value ordered by for ``column``; missing text sorts first"""
+        value = getattr(self, column)
+        if column == 'id':
+            return value
+        return '' if value is None else str(value)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in FIELDS}
+
+
+class FlashcardTable:
+    """
+    Every flashcard of a RecordLog as Flashcard rows, kept in step with the log
+
+    Args:
+        store (RecordLog): The flashcard log to follow
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.RLock()
+        # Guards only _dirty; the log calls in while holding its own lock
+        self._dirty_lock = threading.Lock()
+        self._dirty = set()
+        self._reloaded = False
+        self._rows = {}
+        self._languages = {}
+        # Sort column -> (sort values, ids, rows), all in (value, id) order
+        self._orders = {}
+        self._frame = None
+        # Reads that found the table current, and loads or syncs that applied changes
+        self.hits = 0
+        self.misses = 0
+
+    def open(self):
+        """Load every card, then follow the log's changes"""
+        with self._lock:
+            self.store.refresh()
+            self.store.subscribe(self._changed)
+            self.rebuild()
+        return self
+
+    def rebuild(self):
+        """Load every card of the log from scratch"""
+        with self._lock:
+            with self._dirty_lock:
+                self._dirty.clear()
+                self._reloaded = False
+            self._rows = {}
+            self._languages = {}
+            self._orders = {}
+            self._frame = None
+            self.misses += 1
+            for record in self.store.records():
+                self._add(Flashcard(record))
+
+    def _changed(self, record_id):
+        """RecordLog callback: ``record_id`` changed, or None after a full reload"""
+        with self._dirty_lock:
+            if record_id is None:
+                self._reloaded = True
+            else:
+                self._dirty.add(record_id)
+
+    def sync(self):
+        """Apply the cards changed since the last sync, from any process"""
+        with self._lock:
+            self.store.refresh()
+            with self._dirty_lock:
+                dirty, self._dirty = self._dirty, set()
+                reloaded, self._reloaded = self._reloaded, False
+            if not dirty and not reloaded:
+                self.hits += 1
+                return self
+            if reloaded:
+                self.rebuild()
+                return self
+            self.misses += 1
+            self._frame = None
+            for card_id in sorted(dirty):
+                self._remove(card_id)
+                record = self.store.get(card_id)
+                if record is not None:
+                    self._add(Flashcard(record))
+        return self
+
+    def _add(self, row):
+        self._rows[row.id] = row
+        self._languages[row.language] = self._languages.get(row.language, 0) + 1
+        for column, (keys, ids, rows) in self._orders.items():
+            key = row.sort_key(column)
+            low = bisect.bisect_left(keys, key)
+            position = bisect.bisect_left(ids, row.id, low, bisect.bisect_right(keys, key, low))
+            keys.insert(position, key)
+            ids.insert(position, row.id)
+            rows.insert(position, row)
+
+    def _remove(self, card_id):
+        row = self._rows.pop(card_id, None)
+        if row is None:
+            return
+        self._languages[row.language] -= 1
+        if not self._languages[row.language]:
+            del self._languages[row.language]
+        for column, (keys, ids, rows) in self._orders.items():
+            key = row.sort_key(column)
+            low = bisect.bisect_left(keys, key)
+            position = bisect.bisect_left(ids, card_id, low, bisect.bisect_right(keys, key, low))
+            del keys[position], ids[position], rows[position]
+
+    def _order(self, column):
+        """Return (sort values, ids, rows) ordered by (column, id), building it on first use"""
+        order = self._orders.get(column)
+        if order is None:
+            rows = sorted(self._rows.values(), key=lambda row: (row.sort_key(column), row.id))
+            order = self._orders[column] = ([row.sort_key(column) for row in rows], [row.id for row in rows], rows)
+        return order
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get(self, card_id):
+        """Return a card as a dict, or None if there is no such card"""
+        with self._lock:
+            row = self._rows.get(int(card_id))
+            return row.as_dict() if row is not None else None
+
+    def stats(self):
+        """Return the number of cards and their languages, in order of first appearance"""
+        with self._lock:
+            return {'count': len(self._rows), 'languages': list(self._languages)}
+
+    def by_language(self, language):
+        """Return the cards of one language as dicts, ordered by id"""
+        with self._lock:
+            return [row.as_dict() for row in self._order('id')[2] if row.language == language]
+
+    def page(self, column, descending=False, after=None, limit=50, low=None, high=None, keep=None):
+        """
+        Return up to ``limit`` cards in (column, id) order as dicts
+
+        Args:
+            column (str): Field to order by
+            descending (bool): Order from the largest key down
+            after (tuple): (sort value, id) to continue after, or None
+            limit (int): Maximum number of cards
+            low, high: Inclusive bounds on the sort value
+            keep (callable): Called with each Flashcard; False leaves it out
+
+        Returns:
+            list: Flashcard dicts
+        """
+        with self._lock:
+            keys, ids, rows = self._order(column)
+            start, stop = 0, len(rows)
+            if low:
+                start = bisect.bisect_left(keys, low)
+            if high:
+                stop = bisect.bisect_right(keys, high)
+            if after is not None:
+                value, after_id = after
+                first = bisect.bisect_left(keys, value)
+                last = bisect.bisect_right(keys, value, first)
+                # Rows with the cursor's sort value are ordered by id
+                if descending:
+                    stop = min(stop, bisect.bisect_left(ids, after_id, first, last))
+                else:
+                    start = max(start, bisect.bisect_right(ids, after_id, first, last))
+
+            page = []
+            for index in (range(stop - 1, start - 1, -1) if descending else range(start, stop)):
+                if len(page) >= limit:
+                    break
+                row = rows[index]
+                if keep is None or keep(row):
+                    page.append(row.as_dict())
+            return page
+
+    def frame(self):
+        """
+        Return every card as a DataFrame ordered by id
+
+        Built on first call after a change and shared; treat it as read-only.
+        """
+        import pandas as pd
+
+        with self._lock:
+            if self._frame is None:
+                rows = self._order('id')[2]
+                self._frame = pd.DataFrame(
+                    [[getattr(row, field) for field in FIELDS] for row in rows], columns=list(FIELDS)
+                )
+            return self._frame
@@ -0,0 +1,277 @@
+"""
+Rotation of the history CSV files into compressed segments
+
+A history file such as query_log.csv (the "head") takes appends until it
+holds ``segment_bytes``, or until the next batch would make its rows span
+``segment_days``. The history writer then compresses it into a segment next to it,
+``query_log.<first id>-<last id>.csv.gz``, and starts a new head with just
+the header. Segments whose newest row is more than ``retention_days``
+old are deleted at the same time. Rotation runs on the writer thread
+under the file's lock, so no request waits for it, and ids keep counting
+up across segments.
+
+A segment's modification time is set to its newest row's created_at, so
+retention goes by when rows were written even for imported history.
+
+LatestRows serves "the latest N rows" reads. It keeps the head parsed in
+memory, which is bounded by the rotation and caught up by reading only
+what was appended since the last read. Segments are decompressed newest
+first, and only when the head holds fewer than N matching rows.
+"""
+
+import csv
+import gzip
+import io
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+_SEGMENT = re.compile(r'\.(\d+)-(\d+)\.csv\.gz$')
+
+# Enough for the header and the first row of a history file
+_FIRST_ROW_BYTES = 64 * 1024
+
+
+class RotationPolicy:
+    """
+    When a history file rotates and how long its segments are kept
+
+    Args:
+        segment_bytes (int): Size at which the head rotates; 0 for no limit
+        segment_days (float): Span of created_at in the head at which it
+            rotates; 0 for no limit
+        retention_days (float): Age at which segments are deleted; 0 keeps
+            them forever
+    """
+
+    def __init__(self, segment_bytes=0, segment_days=0, retention_days=0):
+        self.segment_bytes = segment_bytes
+        self.segment_days = segment_days
+        self.retention_days = retention_days
+
+
+def _timestamp(value):
+    """Seconds since the epoch of a 'YYYY-MM-DD HH:MM:SS' value, or now if it isn't one"""
+    try:
+        return time.mktime(datetime.strptime(value, '%Y-%m-%d %H:%M:%S').timetuple())
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def segments(path):
+    """
+    List the segments of the history file at ``path``
+
+    Returns:
+        list: (first id, last id, segment path) tuples, newest first
+    """
+    directory = os.path.dirname(path) or '.'
+    stem = os.path.basename(path)[:-len('.csv')] if path.endswith('.csv') else os.path.basename(path)
+    found = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    for name in names:
+        match = _SEGMENT.search(name)
+        if match and name[:match.start()] == stem:
+            found.append((int(match.group(1)), int(match.group(2)), os.path.join(directory, name)))
+    return sorted(found, reverse=True)
+
+
+def last_segment_id(path):
+    """Return the highest row id in the segments of ``path``, or 0 if it has none"""
+    found = segments(path)
+    return found[0][1] if found else 0
+
+
+def _first_row(path):
+    """Return the first data row of a CSV file as a list, or None if it has none"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(_FIRST_ROW_BYTES)
+    except FileNotFoundError:
+        return None
+    rows = csv.reader(io.StringIO(head.decode('utf-8', errors='replace'), newline=''))
+    next(rows, None)
+    return next(rows, None)
+
+
+def needs_rotation(path, columns, policy, newest):
+    """
+    Whether the head at ``path`` is due to rotate before the next append
+
+    Args:
+        path (str): The history file
+        columns (list): Its columns
+        policy (RotationPolicy): When to rotate
+        newest (str): created_at of the newest row about to be appended
+    """
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return False
+    if policy.segment_bytes and size >= policy.segment_bytes:
+        return True
+    if policy.segment_days and 'created_at' in columns:
+        first = _first_row(path)
+        column = columns.index('created_at')
+        if first is not None and len(first) > column:
+            return _timestamp(newest) - _timestamp(first[column]) >= policy.segment_days * 86400
+    return False
+
+
+def rotate(path, columns, policy):
+    """
+    Compress the head into a segment, start an empty head and drop expired segments
+
+    Call it while holding the file's lock. A crash between writing the
+    segment and replacing the head leaves rows in both; readers skip the
+    copies (see LatestRows).
+
+    Returns:
+        str: The new segment, or None if the head had no rows
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    rows = [row for row in csv.reader(io.StringIO(data.decode('utf-8'), newline='')) if row and row[0].isdigit()]
+    if not rows:
+        return None
+
+    ids = [int(row[0]) for row in rows]
+    stem = path[:-len('.csv')] if path.endswith('.csv') else path
+    segment = f'{stem}.{min(ids):010d}-{max(ids):010d}.csv.gz'
+    column = columns.index('created_at') if 'created_at' in columns else None
+    newest_time = _timestamp(rows[-1][column] if column is not None and len(rows[-1]) > column else None)
+    with gzip.open(segment + '.tmp', 'wb') as f:
+        f.write(data)
+    os.utime(segment + '.tmp', (newest_time, newest_time))
+    os.replace(segment + '.tmp', segment)
+
+    with open(path + '.tmp', 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerow(columns)
+    os.replace(path + '.tmp', path)
+
+    if policy.retention_days:
+        cutoff = time.time() - policy.retention_days * 86400
+        for _, _, older in segments(path):
+            if os.path.getmtime(older) < cutoff:
+                os.remove(older)
+    return segment
+
+
+def _read_segment(segment):
+    with gzip.open(segment, 'rt', newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def read_rows(path):
+    """Return every row of a history file and its segments, oldest first, as dicts"""
+    rows = []
+    for _, _, segment in reversed(segments(path)):
+        rows.extend(_read_segment(segment))
+    if os.path.exists(path):
+        with open(path, newline='', encoding='utf-8') as f:
+            rows.extend(csv.DictReader(f))
+    # A crash mid-rotation can leave a row in two places
+    unique = {}
+    for row in rows:
+        if row.get('id'):
+            unique.setdefault(row['id'], row)
+    return list(unique.values())
+
+
+def _complete_rows_end(chunk):
+    """Return the length of the part of ``chunk`` made of whole CSV rows"""
+    end = chunk.rfind(b'\n') + 1
+    # A newline inside a quoted field doesn't end a row
+    while end and chunk.count(b'"', 0, end) % 2:
+        end = chunk.rfind(b'\n', 0, end - 1) + 1
+    return end
+
+
+class LatestRows:
+    """
+    Newest-first reads of one history file and its segments
+
+    Args:
+        path (str): The history file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._inode = None
+        self._offset = 0
+        self._header = None
+        # The head's rows in file order, i.e. by id
+        self._rows = []
+
+    def _catch_up(self):
+        """Parse what was appended to the head since the last read"""
+        try:
+            with open(self.path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                size = f.seek(0, os.SEEK_END)
+                if inode != self._inode or size < self._offset:
+                    # Rotated or rewritten
+                    self._inode, self._offset, self._header, self._rows = inode, 0, None, []
+                f.seek(self._offset)
+                chunk = f.read(size - self._offset)
+        except FileNotFoundError:
+            self._inode, self._offset, self._header, self._rows = None, 0, None, []
+            return
+        end = _complete_rows_end(chunk)
+        reader = csv.reader(io.StringIO(chunk[:end].decode('utf-8'), newline=''))
+        for row in reader:
+            if self._header is None:
+                self._header = row
+            elif row and row[0].isdigit():
+                self._rows.append(dict(zip(self._header, row)))
+        self._offset += end
+
+    def latest(self, limit, match=None):
+        """
+        Return the newest ``limit`` rows, newest first
+
+        Args:
+            limit (int): Maximum number of rows
+            match (callable): Called with each row dict; False leaves it out
+
+        Returns:
+            list: Row dicts with an int id
+        """
+        with self._lock:
+            self._catch_up()
+            result = []
+            floor = None
+            for row in reversed(self._rows):
+                if len(result) >= limit:
+                    return result
+                floor = int(row['id'])
+                if match is None or match(row):
+                    result.append(dict(row, id=floor))
+
+        for first, last, segment in segments(self.path):
+            if len(result) >= limit:
+                break
+            if floor is not None and first >= floor:
+                # Left behind by a crash mid-rotation; the head has these rows
+                continue
+            try:
+                rows = _read_segment(segment)
+            except FileNotFoundError:
+                # Expired since it was listed
+                continue
+            for row in reversed(rows):
+                row_id = int(row['id'])
+                if floor is not None and row_id >= floor:
+                    continue
+                floor = row_id
+                if match is None or match(row):
+                    result.append(dict(row, id=row_id))
+                    if len(result) >= limit:
+                        break
+        return result
@@ -0,0 +1,245 @@
+"""
+Background writer for the history and query-log CSV files
+
+Request handlers hand each history row to log(), which puts it on an
+in-process queue. A single writer thread collects rows into batches and
+appends them to the CSV files, so a request never re-reads or rewrites a
+file. Ids are assigned when a batch is written, under a file lock shared
+with other worker processes appending to the same file. A batch is written once it holds ``batch_size`` rows or
+``flush_interval`` seconds after its first row arrived, whichever comes
+first; flush() and close() write everything still pending.
+
+When the queue is full the producer writes a batch itself instead of
+waiting for the thread, so a burst slows callers down but no row is lost.
+
+Files with a RotationPolicy are rotated into compressed segments before
+a batch is appended, once they are due (see history_segments.py).
+"""
+
+import csv
+import os
+import queue
+import re
+import threading
+import time
+
+from src.flashcards.database import history_segments
+from src.flashcards.database.locking import FileLock
+from src.flashcards.utils import metrics
+
+_FLUSH = object()
+_STOP = object()
+
+
+class HistoryWriter:
+    """
+    Queue-fed, batching appender for CSV history files
+
+    Args:
+        batch_size (int): Rows written per append at most
+        flush_interval (float): Seconds a row may wait before its batch is written
+        max_queue (int): Rows held in the queue before producers write themselves
+        rotation (dict): RotationPolicy per file path; other files grow unbounded
+    """
+
+    def __init__(self, batch_size=256, flush_interval=0.5, max_queue=10000, rotation=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rotation = rotation or {}
+        self._queue = queue.Queue(max_queue)
+        self._write_lock = threading.Lock()
+        # path -> (FileLock, last id written, file size after that write)
+        self._files = {}
+        self._thread = None
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._stats = {'enqueued': 0, 'written': 0, 'batches': 0, 'producer_writes': 0, 'errors': 0, 'rotations': 0}
+
+    def start(self):
+        """Start the writer thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def log(self, path, columns, row):
+        """
+        Queue ``row`` for appending to the CSV file at ``path``
+
+        Args:
+            path (str): CSV file; created with a ``columns`` header if missing
+            columns (list): Column order, starting with "id"
+            row (dict): Values for every column except "id", which is
+                assigned when the row is written
+        """
+        item = (path, columns, row)
+        self._count(enqueued=1)
+        if self._closed:
+            self._write([item])
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Backpressure: the producer pays for a batch instead of dropping rows
+            self._count(producer_writes=1)
+            self._write_drained(self.batch_size, [item])
+
+    def flush(self):
+        """Block until every row queued so far is on disk"""
+        if self._thread is None or not self._thread.is_alive():
+            self._write_drained(self._queue.qsize())
+            return
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self):
+        """Write everything pending and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._write_drained(self._queue.qsize())
+
+    def stats(self):
+        """Get queue depth and write counters"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def _run(self):
+        while True:
+            batch, marker = self._collect()
+            self._write(batch)
+            for _ in range(len(batch) + (marker is not None)):
+                self._queue.task_done()
+            if marker is _STOP:
+                return
+
+    def _collect(self):
+        """
+        Wait for the next batch of rows
+
+        Returns ``(rows, marker)``: the batch ends when it is full, when
+        ``flush_interval`` has passed since its first row, or early at a
+        flush/stop marker, which is returned alongside.
+        """
+        batch = []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is _FLUSH or item is _STOP:
+                return batch, item
+            batch.append(item)
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.batch_size or remaining <= 0:
+                return batch, None
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return batch, None
+
+    def _write_drained(self, limit, extra=()):
+        """Take up to ``limit`` entries off the queue and write them on this thread"""
+        items = []
+        taken = 0
+        stop = False
+        while taken < limit:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            taken += 1
+            if item is _STOP:
+                stop = True
+            elif item is not _FLUSH:
+                items.append(item)
+        self._write(items + list(extra))
+        # Only now, so a concurrent flush() can't return before these are on disk
+        for _ in range(taken):
+            self._queue.task_done()
+        if stop:
+            # Raced with close(); hand the stop marker back to the writer thread
+            self._queue.put(_STOP)
+
+    def _write(self, items):
+        if not items:
+            return
+        by_path = {}
+        for path, columns, row in items:
+            by_path.setdefault((path, tuple(columns)), []).append(row)
+        with self._write_lock:
+            for (path, columns), rows in by_path.items():
+                try:
+                    with metrics.storage_duration.time(backend='csv', operation='history_write'):
+                        self._append(path, columns, rows)
+                except Exception:
+                    self._count(errors=1)
+                    continue
+                self._count(written=len(rows), batches=1)
+
+    def _append(self, path, columns, rows):
+        """Number ``rows`` after the last id in the file and append them"""
+        file_lock, last_id, known_size = self._files.get(path) or (FileLock(path + '.lock'), None, None)
+        with file_lock:
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                size = 0
+            if size != known_size:
+                # First write, or another process appended since ours
+                last_id = max(last_id or 0, _max_id(path))
+            policy = self.rotation.get(path)
+            # Before appending, so a segment doesn't take rows past its span
+            if policy is not None and history_segments.needs_rotation(path, columns, policy, rows[-1].get('created_at')):
+                with metrics.storage_duration.time(backend='csv', operation='history_rotate'):
+                    history_segments.rotate(path, columns, policy)
+                self._count(rotations=1)
+            for row in rows:
+                last_id += 1
+                row['id'] = last_id
+            _append_rows(path, columns, rows)
+            self._files[path] = (file_lock, last_id, os.path.getsize(path))
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self._stats[key] += delta
+
+
+_ROW_START = re.compile(rb'(?:^|\n)(\d+),')
+
+# Rows are capped at a few KB and written in (nearly) id order, so the
+# highest id is always among the last rows of the file
+_TAIL_BYTES = 256 * 1024
+
+
+def _max_id(path):
+    """
+    Return the highest row id in a history CSV without reading the whole file
+
+    Looks at every line in the tail that starts like a row. A quoted
+    multi-line field that happens to look like one can only push the
+    result up, which keeps new ids unique. A file just rotated has no
+    rows, and its ids continue from its newest segment.
+    """
+    try:
+        with open(path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - _TAIL_BYTES))
+            tail = f.read()
+    except FileNotFoundError:
+        return history_segments.last_segment_id(path)
+    return max((int(match) for match in _ROW_START.findall(tail)), default=None) or history_segments.last_segment_id(path)
+
+
+def _append_rows(path, columns, rows):
+    """Append ``rows`` to a CSV file with one write, adding the header to a new file"""
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(columns)
+        writer.writerows([row.get(column, '') for column in columns] for row in rows)
@@ -0,0 +1,64 @@
+"""
+Cross-process file locking for the data files
+
+Several uvicorn workers share app/data, so every write that depends on
+what is already on disk (allocating the next id, appending, compacting)
+runs under an exclusive ``flock`` on a ``.lock`` file next to the data
+file. On platforms without fcntl only threads are serialized.
+"""
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class FileLock:
+    """
+    Exclusive lock held across threads and processes
+
+    Re-entrant within a thread: nested ``with`` blocks only take the file
+    lock once.
+
+    Args:
+        path (str): Lock file, created if missing
+        lock (threading.RLock, optional): Thread lock to use, so an object
+            that already has one doesn't end up with two locks to order
+    """
+
+    def __init__(self, path, lock=None):
+        self.path = path
+        self._lock = lock or threading.RLock()
+        self._depth = 0
+        self._fd = None
+        self._pid = None
+
+    def _descriptor(self):
+        # flock belongs to the open file description, which a forked child
+        # shares with its parent; each process needs its own
+        if self._fd is None or self._pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        return self._fd
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                fd = self._descriptor()
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+            except BaseException:
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
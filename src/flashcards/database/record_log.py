@@ -0,0 +1,468 @@
+"""
+Append-only record log used as the flashcard storage engine.
+
+Every line of the log is a JSON object. Writes append the full record,
+deletes append a tombstone, and an in-memory index maps each record id to
+the byte offset of its latest version. Single-record create/update/delete
+is therefore one append regardless of how many records the log holds.
+Superseded versions and tombstones are reclaimed by a background compaction
+that rewrites the live records into a fresh file and renames it into place.
+
+Several processes can share one log. Every write runs under an exclusive
+file lock (see locking.py) after catching up with what other processes
+appended, so ids stay unique and no append is interleaved with another.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from src.flashcards.database.locking import FileLock
+
+TOMBSTONE = '_deleted'
+
+_ID_PREFIX = b'{"id": '
+_TOMBSTONE_SUFFIX = b', "_deleted": true}\n'
+
+
+def _encode(record):
+    return (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def _decode(line):
+    """Decode one log line, returning None for torn or blank lines"""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict) or 'id' not in record:
+        return None
+    return record
+
+
+def _scan(line):
+    """
+    Return ``(id, is_tombstone)`` for a log line without decoding the payload
+
+    Lines written by this module always start with the id, so the index can
+    be rebuilt without parsing every record. Anything else falls back to a
+    full decode; torn or invalid lines return None.
+    """
+    # A second id prefix means a torn line had the next record glued onto it;
+    # the prefix can't occur inside a record because JSON escapes its quotes
+    if line.startswith(_ID_PREFIX) and line.endswith(b'}\n') and line.count(_ID_PREFIX) == 1:
+        end = line.find(b',', len(_ID_PREFIX))
+        if end == -1:
+            end = len(line) - 2
+        digits = line[len(_ID_PREFIX):end]
+        if digits.isdigit():
+            return int(digits), line.endswith(_TOMBSTONE_SUFFIX)
+    record = _decode(line)
+    if record is None:
+        return None
+    return int(record['id']), bool(record.get(TOMBSTONE))
+
+
+def _stamp(stat):
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class RecordLog:
+    """
+    Append-only JSON-lines log with an id -> offset index
+
+    Args:
+        path (str): Location of the log file
+        compact_ratio (float): Fraction of dead lines that triggers compaction
+        compact_min_dead (int): Minimum number of dead lines before compacting
+    """
+
+    def __init__(self, path, compact_ratio=0.5, compact_min_dead=1000):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.compact_min_dead = compact_min_dead
+        self._lock = threading.RLock()
+        # Shares the thread lock so the two are never taken in different orders
+        self._file_lock = FileLock(path + '.lock', self._lock)
+        self._index = {}
+        self._dead = 0
+        self._max_id = 0
+        self._compaction = None
+        # The log as of the last reload. Holding it open keeps its inode
+        # allocated, so a replacement file can never reuse the number and
+        # look unchanged to refresh().
+        self._file = None
+        # Size/inode/mtime of the file as of the last line we applied
+        self._end = 0
+        self._stamp = None
+        # Bumped on every applied change; lets callers cache derived views
+        self.version = 0
+        self._listeners = []
+
+    # Loading
+
+    def open(self):
+        """Create the log if needed and build the index from its contents"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._file_lock:
+            if not os.path.exists(self.path):
+                open(self.path, 'ab').close()
+            # Safe under the lock: no other process can be mid-append
+            self._truncate_torn_tail()
+            self._index = {}
+            self._dead = 0
+            self.version += 1
+            self._reopen()
+            self._end = self._replay(self._file, 0)
+            self._stamp = _stamp(os.fstat(self._file.fileno()))
+            for listener in self._listeners:
+                listener(None)
+        return self
+
+    def subscribe(self, listener):
+        """
+        Call ``listener(record_id)`` for every change applied to the index
+
+        That covers this process's writes and other processes' writes as
+        they are picked up. After a full reload, which re-announces every
+        live id but can't tell what was deleted meanwhile, ``listener`` is
+        called with None. It runs under the log's lock, so it must not
+        call back into the log.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def close(self):
+        """Release the file handle; the log can be reopened with open()"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._stamp = None
+
+    def _reopen(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, 'rb')
+
+    def refresh(self):
+        """
+        Pick up changes made to the file by other processes
+
+        Appends are replayed from where this process left off; a replaced or
+        rewritten file (another process compacted it, or it was edited by
+        hand) triggers a full reload.
+        """
+        with self._lock:
+            try:
+                stamp = _stamp(os.stat(self.path))
+            except FileNotFoundError:
+                return self
+            if stamp == self._stamp:
+                return self
+            if self._stamp is None or stamp[0] != self._stamp[0] or stamp[1] < self._end:
+                return self.open()
+            if stamp[1] == self._end:
+                # Same bytes but touched in place: we can't tell what changed
+                return self.open()
+            # Same inode as the file we hold, so it is the one we indexed
+            self._end = self._replay(self._file, self._end)
+            self._stamp = _stamp(os.fstat(self._file.fileno()))
+        return self
+
+    @contextmanager
+    def transaction(self):
+        """
+        Hold the log exclusively, across processes, for a read-modify-write
+
+        The index is brought up to date on entry, so ids allocated and
+        records read inside the block reflect every other process's writes.
+        """
+        with self._file_lock:
+            self.refresh()
+            yield self
+
+    def _current(self):
+        """Return the log for reading, reloading first if another process replaced it"""
+        try:
+            replaced = os.stat(self.path).st_ino != self._stamp[0]
+        except FileNotFoundError:
+            replaced = False
+        if self._file is None or replaced:
+            self.open()
+        return self._file
+
+    def _truncate_torn_tail(self):
+        """
+        Cut off a partial last line left behind by a crash mid-append
+
+        Otherwise the next append would be glued onto the torn line and
+        both records would be lost.
+        """
+        with open(self.path, 'r+b') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+            # Walk back to the last complete line
+            position = size
+            while position > 0:
+                chunk_start = max(0, position - 65536)
+                f.seek(chunk_start)
+                chunk = f.read(position - chunk_start)
+                newline = chunk.rfind(b'\n')
+                if newline != -1:
+                    f.truncate(chunk_start + newline + 1)
+                    return
+                position = chunk_start
+            f.truncate(0)
+
+    def _replay(self, f, offset):
+        """
+        Apply every complete line of ``f`` from ``offset`` onwards to the index
+
+        Returns the offset just past the last complete line; a trailing
+        partial line (another process mid-append) is left for the next replay.
+        """
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            scanned = _scan(line)
+            if scanned is None:
+                self._dead += 1
+            else:
+                self._apply(scanned[0], scanned[1], offset)
+            offset += len(line)
+        return offset
+
+    def _apply(self, record_id, deleted, offset):
+        self.version += 1
+        for listener in self._listeners:
+            listener(record_id)
+        self._max_id = max(self._max_id, record_id)
+        if self._index.pop(record_id, None) is not None:
+            # The previous version is now superseded
+            self._dead += 1
+        if deleted:
+            # The tombstone line itself is dead weight once applied
+            self._dead += 1
+        else:
+            self._index[record_id] = offset
+
+    # Reads
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, record_id):
+        return int(record_id) in self._index
+
+    def position(self):
+        """Return (inode, offset) of the end of what the index has applied"""
+        with self._lock:
+            return (self._stamp[0] if self._stamp else None, self._end)
+
+    def changed_since(self, offset):
+        """Return the live ids whose latest version was written at or after ``offset``"""
+        with self._lock:
+            return [record_id for record_id, record_offset in self._index.items() if record_offset >= offset]
+
+    def ids(self):
+        """Return the live record ids in ascending order"""
+        with self._lock:
+            return sorted(self._index)
+
+    def get(self, record_id):
+        """Return the latest version of a record, or None if absent"""
+        with self._lock:
+            f = self._current()
+            offset = self._index.get(int(record_id))
+            if offset is None:
+                return None
+            f.seek(offset)
+            return _decode(f.readline())
+
+    def latest(self, limit):
+        """
+        Return the ``limit`` live records with the highest ids, newest first
+
+        Walks down from the highest id allocated, so it costs about
+        ``limit`` index lookups when few records were deleted.
+        """
+        with self._lock:
+            f = self._current()
+            result = []
+            record_id = self._max_id
+            while record_id > 0 and len(result) < limit and len(result) < len(self._index):
+                offset = self._index.get(record_id)
+                record_id -= 1
+                if offset is None:
+                    continue
+                f.seek(offset)
+                record = _decode(f.readline())
+                if record is not None:
+                    result.append(record)
+            return result
+
+    def records(self):
+        """Return every live record in ascending id order"""
+        with self._lock:
+            f = self._current()
+            result = []
+            for _, offset in sorted(self._index.items()):
+                f.seek(offset)
+                record = _decode(f.readline())
+                if record is not None:
+                    result.append(record)
+            return result
+
+    # Writes
+
+    def next_id(self):
+        """
+        Allocate a new record id; ids are never reused, even after deletes
+
+        Call it inside transaction() and append the record before leaving
+        the block, otherwise another process can allocate the same id.
+        """
+        with self.transaction():
+            self._max_id += 1
+            return self._max_id
+
+    def put(self, record):
+        """Append a new version of ``record`` (which must carry an ``id``)"""
+        with self._file_lock:
+            offset = self._append([record])[0]
+            self._apply(int(record['id']), False, offset)
+        self.maybe_compact()
+        return record
+
+    def put_many(self, records):
+        """Append several records with a single write"""
+        if not records:
+            return records
+        with self._file_lock:
+            offsets = self._append(records)
+            for record, offset in zip(records, offsets):
+                self._apply(int(record['id']), False, offset)
+        self.maybe_compact()
+        return records
+
+    def delete(self, record_id):
+        """Append a tombstone for ``record_id``; returns False if it was absent"""
+        record_id = int(record_id)
+        with self.transaction():
+            if record_id not in self._index:
+                return False
+            tombstone = {'id': record_id, TOMBSTONE: True}
+            offset = self._append([tombstone])[0]
+            self._apply(record_id, True, offset)
+        self.maybe_compact()
+        return True
+
+    def _append(self, records):
+        """Append encoded records; the caller holds the file lock"""
+        payloads = [_encode(record) for record in records]
+        # Another process may have compacted (replaced) the file
+        self.refresh()
+        with open(self.path, 'a+b') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size != self._end:
+                # Someone else appended since we last looked; catch up first
+                self._end = self._replay(f, self._end)
+                if size != self._end:
+                    # A writer died mid-append; drop its partial line so ours isn't glued to it
+                    f.truncate(self._end)
+            offset = self._end
+            offsets = []
+            for payload in payloads:
+                offsets.append(offset)
+                offset += len(payload)
+            f.write(b''.join(payloads))
+            f.flush()
+            self._end = offset
+            self._stamp = _stamp(os.fstat(f.fileno()))
+        return offsets
+
+    # Compaction
+
+    def needs_compaction(self):
+        total = self._dead + len(self._index)
+        return self._dead >= self.compact_min_dead and self._dead >= total * self.compact_ratio
+
+    def maybe_compact(self):
+        """Start a background compaction if enough of the log is dead"""
+        with self._lock:
+            if not self.needs_compaction():
+                return False
+            if self._compaction is not None and self._compaction.is_alive():
+                return False
+            self._compaction = threading.Thread(target=self.compact, name='record-log-compaction', daemon=True)
+            self._compaction.start()
+            return True
+
+    def compact(self):
+        """
+        Rewrite the live records into a fresh log and swap it in
+
+        Live records are copied without holding the lock; anything appended
+        while the copy runs is carried over and replayed before the swap.
+        The new file is fsynced and renamed over the old one, so a crash
+        leaves either the old or the new log, never a partial one.
+        """
+        with self._lock:
+            self.refresh()
+            snapshot = sorted(self._index.items())
+            max_id = self._max_id
+            snapshot_end = self._end
+            inode = self._stamp[0]
+            # Our own handle on the snapshotted file (not a dup, which would
+            # share the read position with _file). Holding it keeps the inode
+            # from being reused even if a reload closes _file meanwhile.
+            src = open(self.path, 'rb')
+            if os.fstat(src.fileno()).st_ino != inode:
+                # Another process compacted since refresh()
+                src.close()
+                return False
+
+        # Per process: workers may compact the same log at the same time
+        tmp_path = f'{self.path}.compact.{os.getpid()}'
+        new_index = {}
+        new_dead = 0
+        with src, open(tmp_path, 'wb') as dst:
+            for record_id, offset in snapshot:
+                src.seek(offset)
+                line = src.readline()
+                new_index[record_id] = dst.tell()
+                dst.write(line)
+            if max_id and (not snapshot or snapshot[-1][0] < max_id):
+                # Keep the highest allocated id on disk so it is never reused
+                dst.write(_encode({'id': max_id, TOMBSTONE: True}))
+                new_dead = 1
+
+            with self._file_lock:
+                if os.stat(self.path).st_ino != inode:
+                    # Another process compacted first; our offsets are stale
+                    dst.close()
+                    os.remove(tmp_path)
+                    return False
+                src.seek(snapshot_end)
+                tail = src.read()
+                dst.write(tail)
+                dst.flush()
+                os.fsync(dst.fileno())
+                dst.close()
+                os.replace(tmp_path, self.path)
+                self._index = new_index
+                self._dead = new_dead
+                self._reopen()
+                size = self._file.seek(0, os.SEEK_END)
+                self._end = self._replay(self._file, size - len(tail))
+                self._stamp = _stamp(os.fstat(self._file.fileno()))
+        return True
@@ -0,0 +1,486 @@
+"""
+Spaced-repetition scheduling
+
+next_review() is the SM-2 algorithm: each review is graded 0-5, and a
+card's ease factor, interval and repetition count decide when it is due
+again. Cards that were never reviewed are due from the moment they are
+created.
+
+SM-2 intervals are read as the time after which a card is recalled with
+90% probability (its stability), forgetting exponentially. Due times are
+spread by the target retention: a lower target waits longer than the
+interval, a higher one comes back sooner. The deck-wide functions below
+(forecast, overdue counts, expected retention, rescheduling) work on the
+column arrays of every card's schedule, see schedule_columns().
+
+DueQueue serves the csv backend's "next cards due" query. It keeps one
+binary heap per language keyed by due time, so fetching N due cards pops
+and pushes back N entries instead of scanning the deck. Like the search
+index, it subscribes to the flashcard and schedule logs and applies their
+changes, from this process or others, before the next query. Entries are
+never removed in place: a changed card gets a new entry, and the old one
+is dropped when it reaches the top of its heap.
+"""
+
+import heapq
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Grades of a review: 0-2 are failed recalls, 3-5 successful ones
+MIN_GRADE = 0
+MAX_GRADE = 5
+PASSING_GRADE = 3
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+
+# Probability of recall an interval is calibrated for, and the one aimed at
+INTERVAL_RETENTION = 0.9
+TARGET_RETENTION = float(os.getenv('SRS_TARGET_RETENTION', '0.9'))
+MIN_RETENTION = 0.5
+MAX_RETENTION = 0.99
+
+DAY = 86400
+
+# Heap entries pack the due time and the card id into one int
+_ID_BITS = 32
+_ID_MASK = (1 << _ID_BITS) - 1
+_NOT_SCHEDULED = -1
+
+
+def new_schedule(created_at):
+    """Return the schedule of a card that was never reviewed"""
+    return {
+        'due': created_at,
+        'ease': INITIAL_EASE,
+        'interval': 0,
+        'repetitions': 0,
+        'lapses': 0,
+        'last_reviewed': None,
+    }
+
+
+def retention_factor(retention):
+    """Return how much longer than its interval a card waits to be recalled with ``retention``"""
+    if not MIN_RETENTION <= retention <= MAX_RETENTION:
+        raise ValueError(f"Retention must be between {MIN_RETENTION} and {MAX_RETENTION}")
+    return math.log(retention) / math.log(INTERVAL_RETENTION)
+
+
+def next_review(schedule, grade, now=None, retention=None):
+    """
+    Apply one review to a card's schedule (SM-2)
+
+    A passing grade moves the card to an interval of 1, then 6 days, then
+    the previous interval times the ease factor. A failed one starts it
+    over at 1 day. The ease factor moves with every grade and never drops
+    below MIN_EASE.
+
+    Args:
+        schedule (dict): The card's current schedule (see new_schedule)
+        grade (int): Recall quality, MIN_GRADE to MAX_GRADE
+        now (datetime): Time of the review, defaults to now
+        retention (float): Target retention, defaults to TARGET_RETENTION
+
+    Returns:
+        dict: The new schedule
+    """
+    if not MIN_GRADE <= grade <= MAX_GRADE:
+        raise ValueError(f"Grade must be between {MIN_GRADE} and {MAX_GRADE}")
+    now = now or datetime.now()
+    factor = retention_factor(retention or TARGET_RETENTION)
+
+    repetitions = int(schedule['repetitions'])
+    interval = int(schedule['interval'])
+    lapses = int(schedule['lapses'])
+    ease = float(schedule['ease'])
+
+    if grade >= PASSING_GRADE:
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = max(interval + 1, round(interval * ease))
+        repetitions += 1
+    else:
+        repetitions = 0
+        interval = 1
+        if schedule['last_reviewed'] is not None:
+            lapses += 1
+    miss = MAX_GRADE - grade
+    ease = max(MIN_EASE, ease + 0.1 - miss * (0.08 + miss * 0.02))
+
+    return {
+        'due': (now + timedelta(days=interval * factor)).strftime(TIMESTAMP_FORMAT),
+        'ease': round(ease, 4),
+        'interval': interval,
+        'repetitions': repetitions,
+        'lapses': lapses,
+        'last_reviewed': now.strftime(TIMESTAMP_FORMAT),
+    }
+
+
+def _seconds(timestamps):
+    """Convert 'YYYY-MM-DD HH:MM:SS' strings to seconds, for ordering only"""
+    return np.array(timestamps, dtype='datetime64[s]').astype(np.int64)
+
+
+def _timestamps(seconds):
+    """Convert seconds back to 'YYYY-MM-DD HH:MM:SS' strings"""
+    return np.char.replace(np.asarray(seconds, dtype='datetime64[s]').astype(str), 'T', ' ')
+
+
+def schedule_columns(ids, languages, due, interval, last_reviewed):
+    """
+    Build the column arrays of a deck's schedules
+
+    Args:
+        ids (sequence): Card ids
+        languages (sequence): Each card's language
+        due (sequence): Due timestamps
+        interval (sequence): Intervals in days
+        last_reviewed (sequence): Timestamps, or None for cards never reviewed
+
+    Returns:
+        dict: id, language (codes into ``languages``), languages, due and
+            reviewed (seconds, -1 for never) and interval arrays
+    """
+    reviewed = np.asarray(last_reviewed, dtype=object)
+    never = reviewed == None  # noqa: E711 - elementwise
+    reviewed[never] = '1970-01-01 00:00:00'
+    reviewed = _seconds(reviewed.astype(str))
+    reviewed[never] = _NOT_SCHEDULED
+    return second_columns(ids, languages, _seconds(np.asarray(due, dtype=str)), interval, reviewed)
+
+
+def second_columns(ids, languages, due, interval, reviewed):
+    """Same as schedule_columns, with due and reviewed already in seconds (-1 for never)"""
+    codes = {}
+    language = np.fromiter((codes.setdefault(name, len(codes)) for name in languages), dtype=np.int32, count=len(ids))
+    return {
+        'id': np.asarray(ids, dtype=np.int64),
+        'language': language,
+        'languages': list(codes),
+        'due': np.asarray(due, dtype=np.int64),
+        'interval': np.asarray(interval, dtype=np.float64),
+        'reviewed': np.asarray(reviewed, dtype=np.int64),
+    }
+
+
+def _day_start(now):
+    return int(_seconds(now[:10] + ' 00:00:00'))
+
+
+def forecast(columns, now, days=30):
+    """
+    Count the cards falling due on each of the next ``days`` days
+
+    Cards already overdue are counted on the first day.
+
+    Returns:
+        list: {'date', 'due'} per day, starting today
+    """
+    start = _day_start(now)
+    day = np.maximum((columns['due'] - start) // DAY, 0)
+    counts = np.bincount(day[day < days], minlength=days)
+    dates = _timestamps(start + np.arange(days) * DAY)
+    return [{'date': date[:10], 'due': int(count)} for date, count in zip(dates, counts)]
+
+
+def overdue_by_language(columns, now):
+    """Count the cards due at ``now`` per language"""
+    due = columns['due'] <= int(_seconds(now))
+    counts = np.bincount(columns['language'][due], minlength=len(columns['languages']))
+    return {language: int(count) for language, count in zip(columns['languages'], counts) if count}
+
+
+def reviewed_cards(columns):
+    """Count the cards reviewed at least once"""
+    return int(np.count_nonzero(columns['reviewed'] != _NOT_SCHEDULED))
+
+
+def expected_retention(columns, now):
+    """
+    Return the mean probability of recalling the reviewed cards at ``now``
+
+    Returns None when no card was reviewed yet.
+    """
+    reviewed = columns['reviewed'] != _NOT_SCHEDULED
+    if not reviewed.any():
+        return None
+    elapsed = np.maximum(int(_seconds(now)) - columns['reviewed'][reviewed], 0) / DAY
+    stability = np.maximum(columns['interval'][reviewed], 1)
+    return float(np.exp(np.log(INTERVAL_RETENTION) * elapsed / stability).mean())
+
+
+def rescheduled_due(columns, retention):
+    """
+    Return the ids of the reviewed cards and their due times for a new target retention
+
+    Returns:
+        tuple: (ids, due timestamps) arrays
+    """
+    factor = retention_factor(retention)
+    reviewed = columns['reviewed'] != _NOT_SCHEDULED
+    due = columns['reviewed'][reviewed] + np.round(columns['interval'][reviewed] * factor * DAY).astype(np.int64)
+    return columns['id'][reviewed], _timestamps(due)
+
+
+def study_streak(days, today):
+    """
+    Return the number of consecutive days with a review, up to ``today``
+
+    A streak whose last review was yesterday is still running.
+
+    Args:
+        days (sequence): 'YYYY-MM-DD' dates with at least one review
+        today (str): 'YYYY-MM-DD'
+    """
+    if not len(days):
+        return 0
+    numbers = np.unique(np.array(days, dtype='datetime64[D]').astype(np.int64))
+    numbers = numbers[numbers <= np.datetime64(today, 'D').astype(np.int64)]
+    if not len(numbers) or numbers[-1] < np.datetime64(today, 'D').astype(np.int64) - 1:
+        return 0
+    gaps = np.flatnonzero(np.diff(numbers) != 1)
+    start = numbers[gaps[-1] + 1] if len(gaps) else numbers[0]
+    return int(numbers[-1] - start + 1)
+
+
+class DueQueue:
+    """
+    Flashcards ordered by due time, kept in step with the flashcard logs
+
+    Args:
+        cards (RecordLog): The flashcard log
+        schedules (RecordLog): Review schedules, keyed by flashcard id
+    """
+
+    def __init__(self, cards, schedules):
+        self.cards = cards
+        self.schedules = schedules
+        self._lock = threading.RLock()
+        # Guards only the dirty set; the logs call in while holding their own locks
+        self._dirty_lock = threading.Lock()
+        self._dirty = set()
+        self._reloaded = False
+        self._reset()
+
+    def _reset(self):
+        # Indexed by card id: due time in seconds (or _NOT_SCHEDULED), language
+        # code, interval in days and last review in seconds (or _NOT_SCHEDULED)
+        self._due = np.full(1024, _NOT_SCHEDULED, dtype=np.int64)
+        self._language = np.zeros(1024, dtype=np.int32)
+        self._interval = np.zeros(1024, dtype=np.float64)
+        self._reviewed = np.full(1024, _NOT_SCHEDULED, dtype=np.int64)
+        self._languages = []
+        self._language_codes = {}
+        self._heaps = []
+        self._live = 0
+        self._entries = 0
+
+    def open(self):
+        """Build the queue, then follow the logs' changes"""
+        with self._lock:
+            self.cards.subscribe(self._changed)
+            self.schedules.subscribe(self._changed)
+            self.rebuild()
+        return self
+
+    def rebuild(self):
+        """Queue every card of the log from scratch"""
+        with self._lock:
+            with self._dirty_lock:
+                self._dirty.clear()
+                self._reloaded = False
+            self._reset()
+            cards = self.cards.records()
+            if not cards:
+                return
+            due = {int(card['id']): card['created_at'] for card in cards}
+            reviewed = [schedule for schedule in self.schedules.records() if int(schedule['id']) in due]
+            for schedule in reviewed:
+                due[int(schedule['id'])] = schedule['due']
+
+            ids = np.fromiter(due, dtype=np.int64, count=len(due))
+            self._grow(int(ids.max()))
+            self._due[ids] = _seconds(list(due.values()))
+            self._language[ids] = [self._language_code(card['language']) for card in cards]
+            if reviewed:
+                reviewed_ids = np.array([int(schedule['id']) for schedule in reviewed])
+                self._interval[reviewed_ids] = [schedule['interval'] for schedule in reviewed]
+                self._reviewed[reviewed_ids] = _seconds([schedule['last_reviewed'] for schedule in reviewed])
+            keys = self._due[ids] << _ID_BITS | ids
+            codes = self._language[ids]
+            self._heaps = [keys[codes == code].tolist() for code in range(len(self._languages))]
+            for heap in self._heaps:
+                heapq.heapify(heap)
+            self._live = self._entries = len(ids)
+
+    def _grow(self, card_id):
+        if card_id >= len(self._due):
+            extra = max(card_id + 1, len(self._due) * 2) - len(self._due)
+            self._due = np.concatenate([self._due, np.full(extra, _NOT_SCHEDULED, dtype=np.int64)])
+            self._language = np.concatenate([self._language, np.zeros(extra, dtype=np.int32)])
+            self._interval = np.concatenate([self._interval, np.zeros(extra, dtype=np.float64)])
+            self._reviewed = np.concatenate([self._reviewed, np.full(extra, _NOT_SCHEDULED, dtype=np.int64)])
+
+    def _language_code(self, language):
+        code = self._language_codes.get(language)
+        if code is None:
+            code = len(self._languages)
+            self._language_codes[language] = code
+            self._languages.append(language)
+            self._heaps.append([])
+        return code
+
+    # Following the logs
+
+    def _changed(self, record_id):
+        """RecordLog callback: ``record_id`` changed, or None after a full reload"""
+        with self._dirty_lock:
+            if record_id is None:
+                self._reloaded = True
+            else:
+                self._dirty.add(record_id)
+
+    def sync(self):
+        """Apply the cards and schedules changed since the last sync, from any process"""
+        with self._lock:
+            self.cards.refresh()
+            self.schedules.refresh()
+            with self._dirty_lock:
+                dirty, self._dirty = self._dirty, set()
+                reloaded, self._reloaded = self._reloaded, False
+            if reloaded or len(dirty) > max(1000, self._live // 4):
+                self.rebuild()
+                return
+            for card_id in sorted(dirty):
+                self._update(card_id)
+            if self._entries > 2 * self._live + 1000:
+                # Mostly superseded entries; start over from the arrays
+                self._compact()
+
+    def _update(self, card_id):
+        card = self.cards.get(card_id)
+        self._grow(card_id)
+        was_live = bool(self._due[card_id] != _NOT_SCHEDULED)
+        if card is None:
+            if was_live:
+                self._due[card_id] = _NOT_SCHEDULED
+                self._live -= 1
+            return
+        schedule = self.schedules.get(card_id)
+        due = int(_seconds(schedule['due'] if schedule else card['created_at']))
+        code = self._language_code(card['language'])
+        self._interval[card_id] = schedule['interval'] if schedule else 0
+        self._reviewed[card_id] = _seconds(schedule['last_reviewed']) if schedule else _NOT_SCHEDULED
+        if was_live and self._due[card_id] == due and self._language[card_id] == code:
+            return
+        self._due[card_id] = due
+        self._language[card_id] = code
+        if not was_live:
+            self._live += 1
+        heapq.heappush(self._heaps[code], due << _ID_BITS | card_id)
+        self._entries += 1
+
+    def _compact(self):
+        ids = np.flatnonzero(self._due != _NOT_SCHEDULED)
+        keys = self._due[ids] << _ID_BITS | ids
+        codes = self._language[ids]
+        for code in range(len(self._heaps)):
+            self._heaps[code] = keys[codes == code].tolist()
+            heapq.heapify(self._heaps[code])
+        self._entries = len(ids)
+
+    def set_due(self, ids, due):
+        """
+        Move many cards at once, after this process rewrote their schedules
+
+        Call it while still holding the schedule log's lock, so the change
+        can't interleave with another process's. The heaps are rebuilt
+        instead of taking a new entry per card.
+
+        Args:
+            ids (array): Card ids
+            due (array): Their new due timestamps
+        """
+        with self._lock:
+            with self._dirty_lock:
+                self._dirty.difference_update(ids.tolist())
+            if not len(ids):
+                return
+            self._grow(int(ids.max()))
+            seconds = _seconds(due)
+            live = self._due[ids] != _NOT_SCHEDULED
+            self._due[ids[live]] = seconds[live]
+            self._compact()
+
+    # Querying
+
+    def __len__(self):
+        return self._live
+
+    def columns(self):
+        """Return the schedule column arrays of every card (see schedule_columns)"""
+        self.sync()
+        with self._lock:
+            ids = np.flatnonzero(self._due != _NOT_SCHEDULED)
+            return {
+                'id': ids,
+                'language': self._language[ids],
+                'languages': list(self._languages),
+                'due': self._due[ids],
+                'interval': self._interval[ids],
+                'reviewed': self._reviewed[ids],
+            }
+
+    def due(self, now, limit=20, language=None):
+        """
+        Return the cards due at ``now``, most overdue first
+
+        Args:
+            now (str): 'YYYY-MM-DD HH:MM:SS'
+            limit (int): Maximum number of cards
+            language (str): Only cards of this language
+
+        Returns:
+            list: (card id, due time in seconds) pairs; ties are ordered by id
+        """
+        self.sync()
+        cutoff = int(_seconds(now))
+        with self._lock:
+            if language is None:
+                codes = range(len(self._heaps))
+            elif language in self._language_codes:
+                codes = [self._language_codes[language]]
+            else:
+                return []
+
+            found = []
+            for code in codes:
+                heap = self._heaps[code]
+                taken = []
+                while heap and len(taken) < limit and heap[0] >> _ID_BITS <= cutoff:
+                    key = heapq.heappop(heap)
+                    card_id = key & _ID_MASK
+                    if taken and key == taken[-1]:
+                        # A card moved away and back again has two equal entries
+                        self._entries -= 1
+                    elif self._due[card_id] == key >> _ID_BITS and self._language[card_id] == code:
+                        taken.append(key)
+                    else:
+                        # Superseded by a later entry, or the card is gone
+                        self._entries -= 1
+                # Only looked at, not consumed
+                for key in taken:
+                    heapq.heappush(heap, key)
+                found.extend(taken)
+            return [(key & _ID_MASK, key >> _ID_BITS) for key in heapq.nsmallest(limit, found)]
@@ -0,0 +1,407 @@
+"""
+In-process full-text index over the flashcard record log
+
+Indexes each card's word, translations and examples. Text is case- and
+diacritic-folded (so "Hà Nội" finds "ha noi") and split into word tokens;
+every query token must match, and the last one also matches as a prefix
+for type-ahead. Results are ranked by field (a hit in the word counts more
+than one in the examples), term rarity and how much of a completed prefix
+was typed.
+
+Postings are kept per term as sorted arrays of ``card id << 3 | field
+bits``. numpy reads them in place at query time, so a search is one
+materialized term followed by binary searches into the others.
+
+The index follows the RecordLog: it subscribes to the log's changes, so
+saves and deletes from this process and from other workers are picked up
+before the next search. It is saved next to the log together with the log
+position it covers. On restart, only cards written after that position
+are indexed again.
+"""
+
+import os
+import pickle
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+
+import numpy as np
+
+FORMAT = 1
+
+# Field, bit in a posting, weight of a hit; best field first
+FIELDS = [('word', 1, 3.0), ('translations', 2, 2.0), ('examples', 4, 1.0)]
+# Weight of a posting by its field bits: the best field wins
+_FIELD_WEIGHTS = np.array([
+    max([weight for _, bit, weight in FIELDS if mask & bit], default=0.0) for mask in range(8)
+])
+
+# Terms that can't come out of the tokenizer, so they never match a query word
+_LANGUAGE_PREFIX = ':lang:'
+
+# Prefixes matching more terms than this only complete to the first ones
+MAX_PREFIX_TERMS = 64
+# Words with more postings than this are scored into an array indexed by
+# card id instead of being sorted and merged
+DENSE_POSTINGS = 50000
+
+_TOKEN = re.compile(r'\w+')
+# Combining diacritical marks, plus letters that don't decompose under NFKD
+_FOLD = str.maketrans(
+    {**{chr(code): None for code in range(0x300, 0x370)},
+     'đ': 'd', 'Đ': 'd', 'ø': 'o', 'Ø': 'o', 'ł': 'l', 'Ł': 'l', 'æ': 'ae', 'Æ': 'ae', 'œ': 'oe', 'Œ': 'oe'}
+)
+
+
+def fold(text):
+    """Lower-case ``text`` and strip its diacritics"""
+    if not text:
+        return ''
+    text = str(text)
+    if text.isascii():
+        return text.lower()
+    return unicodedata.normalize('NFKD', text).translate(_FOLD).casefold()
+
+
+def tokenize(text):
+    """Split folded ``text`` into word tokens"""
+    return _TOKEN.findall(fold(text))
+
+
+class SearchIndex:
+    """
+    Inverted index kept in step with a RecordLog of flashcards
+
+    Args:
+        store (RecordLog): The flashcard log to index
+        path (str): Where the index is saved, or None to keep it in memory only
+    """
+
+    def __init__(self, store, path=None):
+        self.store = store
+        self.path = path
+        self._lock = threading.RLock()
+        # Guards only _dirty; the log calls in while holding its own lock
+        self._dirty_lock = threading.Lock()
+        self._dirty = set()
+        self._reloaded = False
+        self._reset()
+
+    def _reset(self):
+        self._term_ids = {}
+        self._terms = []
+        self._postings = []
+        # Every term, sorted, for prefix lookups
+        self._sorted = []
+        # Card id -> bytes of the term ids it was indexed under
+        self._docs = {}
+        # (inode, offset) of the log the index is current with
+        self._position = None
+
+    # Loading and saving
+
+    def open(self):
+        """Load the saved index, or build it, then follow the log's changes"""
+        with self._lock:
+            self.store.subscribe(self._changed)
+            if not self._load():
+                self.rebuild()
+                self.save()
+        return self
+
+    def _load(self):
+        """Restore the saved index and queue what changed since; False if unusable"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+        except Exception:
+            return False
+        if state.get('format') != FORMAT:
+            return False
+
+        inode, offset = state['position']
+        current_inode, current_end = self.store.position()
+        if inode != current_inode or offset > current_end:
+            # The log was compacted or replaced since; offsets no longer line up
+            return False
+
+        self._term_ids = {term: term_id for term_id, term in enumerate(state['terms'])}
+        self._terms = state['terms']
+        self._postings = state['postings']
+        self._sorted = state['sorted']
+        self._docs = state['docs']
+        self._position = state['position']
+        with self._dirty_lock:
+            self._dirty.update(self.store.changed_since(offset))
+            # Deleted since the save; their tombstones aren't in the log's index
+            self._dirty.update(card_id for card_id in self._docs if card_id not in self.store)
+        return True
+
+    def save(self):
+        """Write the index to ``path`` atomically"""
+        if not self.path:
+            return
+        with self._lock:
+            state = {
+                'format': FORMAT,
+                'position': self._position,
+                'terms': self._terms,
+                'postings': self._postings,
+                'sorted': self._sorted,
+                'docs': self._docs,
+            }
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+
+    def rebuild(self):
+        """Index every card of the log from scratch"""
+        with self._lock:
+            with self._dirty_lock:
+                self._dirty.clear()
+                self._reloaded = False
+            self._reset()
+            self._position = self.store.position()
+            # Records come in id order, so every posting is a plain append
+            for record in self.store.records():
+                self._add(record, sort_terms=False)
+            self._sorted = sorted(self._terms)
+
+    # Following the log
+
+    def _changed(self, record_id):
+        """RecordLog callback: ``record_id`` changed, or None after a full reload"""
+        with self._dirty_lock:
+            if record_id is None:
+                self._reloaded = True
+            else:
+                self._dirty.add(record_id)
+
+    def sync(self):
+        """Index the cards changed since the last sync, from any process"""
+        with self._lock:
+            self.store.refresh()
+            position = self.store.position()
+            with self._dirty_lock:
+                dirty, self._dirty = self._dirty, set()
+                reloaded, self._reloaded = self._reloaded, False
+            if reloaded or len(dirty) > max(1000, len(self._docs) // 4):
+                # Re-reading everything in id order is cheaper than patching most postings
+                self.rebuild()
+                return
+            for card_id in sorted(dirty):
+                self._remove(card_id)
+                record = self.store.get(card_id)
+                if record is not None:
+                    self._add(record)
+            self._position = position
+
+    def _term_id(self, term, sort_terms=True):
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._term_ids[term] = term_id
+            self._terms.append(term)
+            self._postings.append(array('q'))
+            if sort_terms:
+                insort(self._sorted, term)
+        return term_id
+
+    def _add(self, record, sort_terms=True):
+        card_id = int(record['id'])
+        masks = {}
+        for field, bit, _ in FIELDS:
+            for token in tokenize(record.get(field)):
+                masks[token] = masks.get(token, 0) | bit
+        masks[_LANGUAGE_PREFIX + fold(record.get('language'))] = 0
+
+        term_ids = array('i')
+        for term, mask in masks.items():
+            term_id = self._term_id(term, sort_terms)
+            posting = self._postings[term_id]
+            entry = card_id << 3 | mask
+            if not posting or posting[-1] < entry:
+                posting.append(entry)
+            else:
+                posting.insert(bisect_left(posting, entry), entry)
+            term_ids.append(term_id)
+        self._docs[card_id] = term_ids.tobytes()
+
+    def _remove(self, card_id):
+        indexed = self._docs.pop(card_id, None)
+        if indexed is None:
+            return
+        term_ids = array('i')
+        term_ids.frombytes(indexed)
+        key = card_id << 3
+        for term_id in term_ids:
+            posting = self._postings[term_id]
+            position = bisect_left(posting, key)
+            if position < len(posting) and posting[position] >> 3 == card_id:
+                del posting[position]
+
+    # Searching
+
+    def __len__(self):
+        return len(self._docs)
+
+    def stats(self):
+        """Return the number of indexed cards and terms"""
+        return {'cards': len(self._docs), 'terms': len(self._terms)}
+
+    def _expand(self, token, prefix):
+        """Return (term id, boost) pairs a query token matches"""
+        matches = []
+        term_id = self._term_ids.get(token)
+        if term_id is not None and self._postings[term_id]:
+            matches.append((term_id, 1.0))
+        if prefix:
+            start = bisect_left(self._sorted, token)
+            for term in self._sorted[start:start + MAX_PREFIX_TERMS + 1]:
+                if not term.startswith(token):
+                    break
+                term_id = self._term_ids[term]
+                if term != token and self._postings[term_id]:
+                    # Completions rank by how much of the word was typed
+                    matches.append((term_id, len(token) / len(term)))
+        return matches
+
+    def _weights(self, term_id, boost, entries):
+        df = len(self._postings[term_id])
+        idf = np.log1p(len(self._docs) / df)
+        return _FIELD_WEIGHTS[entries & 7] * (idf * boost)
+
+    def _materialize(self, terms):
+        """Return the sorted card ids matching any of ``terms`` with their best weight"""
+        ids = []
+        weights = []
+        for term_id, boost in terms:
+            entries = np.frombuffer(self._postings[term_id], dtype=np.int64)
+            ids.append(entries >> 3)
+            weights.append(self._weights(term_id, boost, entries))
+        if len(terms) == 1:
+            return ids[0], weights[0]
+
+        ids = np.concatenate(ids)
+        weights = np.concatenate(weights)
+        order = np.argsort(ids, kind='stable')
+        ids = ids[order]
+        weights = weights[order]
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        return ids[starts], np.maximum.reduceat(weights, starts)
+
+    def _top_of_term(self, term_id, boost, limit):
+        """
+        Return the best ``limit`` cards of a single term
+
+        Its cards only differ by their best field, and the posting is
+        already in id order, so the top is the first cards hit in the word,
+        then in the translations, then in the examples.
+        """
+        entries = np.frombuffer(self._postings[term_id], dtype=np.int64)
+        results = []
+        for _, bit, _ in FIELDS:
+            if len(results) >= limit:
+                break
+            # Best field is ``bit``: its bit is set and no better field's is
+            best = np.flatnonzero((entries & (bit * 2 - 1)) == bit)[:limit - len(results)]
+            if len(best):
+                found = entries[best]
+                results.extend(zip((found >> 3).tolist(), self._weights(term_id, boost, found).tolist()))
+        return results
+
+    def _dense(self, terms, size):
+        """Return the best weight of ``terms`` for every card id below ``size``, -1 where none match"""
+        best = np.full(size, -1.0)
+        for term_id, boost in terms:
+            entries = np.frombuffer(self._postings[term_id], dtype=np.int64)
+            ids = entries >> 3
+            best[ids] = np.maximum(best[ids], self._weights(term_id, boost, entries))
+        return best
+
+    def _probe(self, ids, scores, terms):
+        """Keep the cards of ``ids`` that match any of ``terms``, adding their best weight"""
+        keys = ids << 3
+        matched = np.zeros(len(ids), dtype=bool)
+        best = np.zeros(len(ids))
+        for term_id, boost in terms:
+            entries = np.frombuffer(self._postings[term_id], dtype=np.int64)
+            positions = np.minimum(np.searchsorted(entries, keys), len(entries) - 1)
+            found = entries[positions]
+            hit = (found >> 3) == ids
+            matched |= hit
+            best = np.maximum(best, np.where(hit, self._weights(term_id, boost, found), 0.0))
+        return ids[matched], scores[matched] + best[matched]
+
+    def search(self, query, limit=20, language=None):
+        """
+        Find the cards matching every word of ``query``
+
+        Args:
+            query (str): Words to look for; the last one may be a prefix
+            limit (int): Maximum number of results
+            language (str): Only cards of this language
+
+        Returns:
+            list: (card id, score) pairs, best first
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        self.sync()
+
+        with self._lock:
+            groups = []
+            for position, token in enumerate(tokens):
+                terms = self._expand(token, prefix=position == len(tokens) - 1)
+                if not terms:
+                    return []
+                groups.append(terms)
+            if language:
+                term_id = self._term_ids.get(_LANGUAGE_PREFIX + fold(language))
+                if term_id is None or not self._postings[term_id]:
+                    return []
+                groups.append([(term_id, 0.0)])
+
+            if len(groups) == 1 and len(groups[0]) == 1:
+                return self._top_of_term(*groups[0][0], limit)
+
+            # Start from the rarest word and binary-search the others
+            sizes = [sum(len(self._postings[term_id]) for term_id, _ in terms) for terms in groups]
+            groups = [terms for _, terms in sorted(zip(sizes, groups), key=lambda pair: pair[0])]
+            sizes.sort()
+            size = 1 + max(self._postings[term_id][-1] >> 3 for terms in groups for term_id, _ in terms)
+
+            if sizes[0] >= DENSE_POSTINGS:
+                best = self._dense(groups[0], size)
+                ids = np.flatnonzero(best >= 0)
+                scores = best[ids]
+            else:
+                ids, scores = self._materialize(groups[0])
+            for terms, postings in zip(groups[1:], sizes[1:]):
+                if not len(ids):
+                    return []
+                if postings >= DENSE_POSTINGS and len(ids) * len(terms) * 16 > postings:
+                    # Many candidates: one pass over the postings beats a binary search per candidate
+                    found = self._dense(terms, size)[ids]
+                    matched = found >= 0
+                    ids, scores = ids[matched], scores[matched] + found[matched]
+                else:
+                    ids, scores = self._probe(ids, scores, terms)
+
+            if len(ids) > limit:
+                threshold = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+                # ids are ascending, so ties at the cut-off keep the lowest ids
+                above = np.flatnonzero(scores > threshold)
+                tied = np.flatnonzero(scores == threshold)[:limit - len(above)]
+                top = np.concatenate([above, tied])
+                ids = ids[top]
+                scores = scores[top]
+            # Best score first, then lowest id
+            order = np.lexsort((ids, -scores))
+            return [(int(ids[i]), float(scores[i])) for i in order]
@@ -0,0 +1,919 @@
+"""
+SQLite storage backend
+
+Implements the same functions as csv_db on a single SQLite file, selected
+with STORAGE_BACKEND=sqlite. The database runs in WAL mode so readers
+never wait for the writer, and worker processes can share the file. Each
+thread has its own connection, whose statement cache reuses the prepared
+form of the fixed, parameterized queries below.
+
+On first start, existing flashcards and CSV history are imported once
+(see import_csv_data); the CSV files are left in place. History rows past
+their retention (csv_db.HISTORY_ROTATION) are deleted at startup and then
+every HISTORY_PRUNE_EVERY rows written, by prune_history().
+
+Flashcard search uses an FTS5 table filled by triggers with text passed
+through fold() (search_index.fold), which every connection opened here
+registers. Near-duplicate checks read word 3-grams and vectors filled by
+triggers the same way, through word_grams() and word_vector(). Tools
+writing to the flashcards table from outside the app must register all
+three.
+"""
+
+import csv
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.flashcards.database import csv_db, duplicate_index, history_segments, scheduler
+from src.flashcards.database.record_log import RecordLog
+from src.flashcards.database.search_index import fold, tokenize
+from src.flashcards.utils import metrics
+
+DATA_DIR = csv_db.DATA_DIR
+SQLITE_PATH = os.getenv('SQLITE_PATH') or os.path.join(DATA_DIR, 'studywai.sqlite3')
+
+FLASHCARD_COLUMNS = csv_db.FLASHCARD_COLUMNS
+FLASHCARD_SORT_COLUMNS = csv_db.FLASHCARD_SORT_COLUMNS
+SCHEDULE_COLUMNS = csv_db.SCHEDULE_COLUMNS
+CHAT_SESSION_COLUMNS = csv_db.CHAT_SESSION_COLUMNS
+CHAT_RECENT_TURNS = csv_db.CHAT_RECENT_TURNS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+
+CREATE TABLE IF NOT EXISTS flashcards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    word TEXT NOT NULL,
+    language TEXT NOT NULL,
+    translations TEXT NOT NULL DEFAULT '',
+    pronunciation TEXT NOT NULL DEFAULT '',
+    examples TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS flashcards_language ON flashcards (language, id);
+CREATE INDEX IF NOT EXISTS flashcards_created_at ON flashcards (created_at);
+CREATE INDEX IF NOT EXISTS flashcards_updated_at ON flashcards (updated_at);
+CREATE INDEX IF NOT EXISTS flashcards_word ON flashcards (word);
+
+-- Full-text index over folded text, kept in step with flashcards by triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS flashcards_fts USING fts5(
+    word, translations, examples, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+);
+CREATE TRIGGER IF NOT EXISTS flashcards_fts_insert AFTER INSERT ON flashcards BEGIN
+    INSERT INTO flashcards_fts (rowid, word, translations, examples)
+    VALUES (new.id, fold(new.word), fold(new.translations), fold(new.examples));
+END;
+CREATE TRIGGER IF NOT EXISTS flashcards_fts_update AFTER UPDATE OF word, translations, examples ON flashcards BEGIN
+    UPDATE flashcards_fts SET word = fold(new.word), translations = fold(new.translations), examples = fold(new.examples)
+    WHERE rowid = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS flashcards_fts_delete AFTER DELETE ON flashcards BEGIN
+    DELETE FROM flashcards_fts WHERE rowid = old.id;
+END;
+
+-- Word 3-grams and the key of the normalized word, and word vectors, for
+-- near-duplicate checks (see duplicate_index.py)
+CREATE TABLE IF NOT EXISTS flashcard_grams (
+    gram INTEGER NOT NULL,
+    flashcard_id INTEGER NOT NULL,
+    PRIMARY KEY (gram, flashcard_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS flashcard_vectors (flashcard_id INTEGER PRIMARY KEY, vector BLOB NOT NULL);
+CREATE TRIGGER IF NOT EXISTS flashcard_grams_insert AFTER INSERT ON flashcards BEGIN
+    INSERT OR IGNORE INTO flashcard_grams (gram, flashcard_id)
+    SELECT value, new.id FROM json_each(word_grams(new.word, new.language));
+    INSERT OR REPLACE INTO flashcard_vectors (flashcard_id, vector) VALUES (new.id, word_vector(new.word));
+END;
+CREATE TRIGGER IF NOT EXISTS flashcard_grams_update AFTER UPDATE OF word, language ON flashcards BEGIN
+    DELETE FROM flashcard_grams
+    WHERE flashcard_id = old.id AND gram IN (SELECT value FROM json_each(word_grams(old.word, old.language)));
+    INSERT OR IGNORE INTO flashcard_grams (gram, flashcard_id)
+    SELECT value, new.id FROM json_each(word_grams(new.word, new.language));
+    UPDATE flashcard_vectors SET vector = word_vector(new.word) WHERE flashcard_id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS flashcard_grams_delete AFTER DELETE ON flashcards BEGIN
+    DELETE FROM flashcard_grams
+    WHERE flashcard_id = old.id AND gram IN (SELECT value FROM json_each(word_grams(old.word, old.language)));
+    DELETE FROM flashcard_vectors WHERE flashcard_id = old.id;
+END;
+
+-- One review schedule per card, created with it; language is copied in so
+-- the due queue of one language is a single index range
+CREATE TABLE IF NOT EXISTS schedules (
+    flashcard_id INTEGER PRIMARY KEY,
+    language TEXT NOT NULL,
+    due TEXT NOT NULL,
+    ease REAL NOT NULL DEFAULT 2.5,
+    interval INTEGER NOT NULL DEFAULT 0,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    lapses INTEGER NOT NULL DEFAULT 0,
+    last_reviewed TEXT
+);
+CREATE INDEX IF NOT EXISTS schedules_due ON schedules (due, flashcard_id);
+CREATE INDEX IF NOT EXISTS schedules_language_due ON schedules (language, due, flashcard_id);
+CREATE TRIGGER IF NOT EXISTS schedules_insert AFTER INSERT ON flashcards BEGIN
+    INSERT OR IGNORE INTO schedules (flashcard_id, language, due) VALUES (new.id, new.language, new.created_at);
+END;
+CREATE TRIGGER IF NOT EXISTS schedules_language AFTER UPDATE OF language ON flashcards BEGIN
+    UPDATE schedules SET language = new.language WHERE flashcard_id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS schedules_delete AFTER DELETE ON flashcards BEGIN
+    DELETE FROM schedules WHERE flashcard_id = old.id;
+END;
+
+CREATE TABLE IF NOT EXISTS review_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    flashcard_id INTEGER NOT NULL, grade INTEGER NOT NULL, ease REAL, interval INTEGER, due TEXT,
+    reviewed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS review_history_reviewed_at ON review_history (reviewed_at);
+-- Dates with at least one review, for the study streak
+CREATE TABLE IF NOT EXISTS review_days (day TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS review_days_insert AFTER INSERT ON review_history BEGIN
+    INSERT OR IGNORE INTO review_days (day) VALUES (substr(new.reviewed_at, 1, 10));
+END;
+
+CREATE TABLE IF NOT EXISTS grammar_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    original_text TEXT, corrected_text TEXT, created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS grammar_history_created_at ON grammar_history (created_at);
+
+CREATE TABLE IF NOT EXISTS translate_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    original_text TEXT, source_lang TEXT, target_lang TEXT, translated_text TEXT, created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS translate_history_created_at ON translate_history (created_at);
+
+CREATE TABLE IF NOT EXISTS summarize_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    original_text TEXT, summary TEXT, length TEXT, style TEXT, created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS summarize_history_created_at ON summarize_history (created_at);
+
+CREATE TABLE IF NOT EXISTS chat_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_message TEXT, ai_response TEXT, created_at TEXT NOT NULL, session_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS chat_history_created_at ON chat_history (created_at);
+-- The session_id index is created by init_database, after older tables got the column
+
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_through INTEGER NOT NULL DEFAULT 0,
+    turns INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS query_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    feature TEXT NOT NULL, query TEXT, response TEXT, created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS query_log_feature ON query_log (feature, id);
+CREATE INDEX IF NOT EXISTS query_log_created_at ON query_log (created_at);
+"""
+
+# History tables and the CSV file each one is imported from
+_HISTORY_TABLES = {
+    'grammar_history': (csv_db.GRAMMAR_HISTORY_CSV, csv_db.GRAMMAR_HISTORY_COLUMNS),
+    'translate_history': (csv_db.TRANSLATE_HISTORY_CSV, csv_db.TRANSLATE_HISTORY_COLUMNS),
+    'summarize_history': (csv_db.SUMMARIZE_HISTORY_CSV, csv_db.SUMMARIZE_HISTORY_COLUMNS),
+    'chat_history': (csv_db.CHAT_HISTORY_CSV, csv_db.CHAT_HISTORY_COLUMNS),
+    'query_log': (csv_db.QUERY_LOG_CSV, csv_db.QUERY_LOG_COLUMNS),
+    'review_history': (csv_db.REVIEW_HISTORY_CSV, csv_db.REVIEW_HISTORY_COLUMNS),
+}
+
+_local = threading.local()
+_connections_lock = threading.Lock()
+_connections = []
+# Bumped by close_history(); threads reconnect when their connection is older
+_generation = 0
+_history_stats = {'written': 0}
+
+# History rows written between two prune_history() runs
+HISTORY_PRUNE_EVERY = int(os.getenv('HISTORY_PRUNE_EVERY', '1000'))
+
+
+def _connect():
+    """Return this thread's connection, opening it on first use"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid() and _local.generation == _generation:
+        return conn
+    directory = os.path.dirname(SQLITE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(SQLITE_PATH, timeout=30, check_same_thread=False, cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    conn.create_function('fold', 1, fold, deterministic=True)
+    conn.create_function('word_grams', 2, _word_grams, deterministic=True)
+    conn.create_function('word_vector', 1, _word_vector, deterministic=True)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # WAL makes NORMAL durable against application crashes; only an OS crash can lose the last commits
+    conn.execute('PRAGMA synchronous=NORMAL')
+    _local.conn = conn
+    _local.pid = os.getpid()
+    _local.generation = _generation
+    with _connections_lock:
+        _connections.append(conn)
+    return conn
+
+
+def _timed(operation):
+    """Record the duration of each call in the storage metrics"""
+    return metrics.timed(metrics.storage_duration, backend='sqlite', operation=operation)
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _word_grams(word, language):
+    """SQL function: a JSON list of the word's 3-gram keys and its exact key"""
+    return json.dumps(duplicate_index.grams(word, language) + [duplicate_index.exact_key(word, language)])
+
+
+def _word_vector(word):
+    """SQL function: the word vector as bytes"""
+    return duplicate_index.vector(word).tobytes()
+
+
+# Setup
+
+def init_database():
+    """Create the schema and import the CSV data on first start"""
+    conn = _connect()
+    conn.executescript(_SCHEMA)
+    # Workers starting together take the write lock so only one of them imports
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        chat_columns = [row['name'] for row in conn.execute('PRAGMA table_info(chat_history)')]
+        if 'session_id' not in chat_columns:
+            # Exchanges saved before chat sessions belong to none
+            conn.execute('ALTER TABLE chat_history ADD COLUMN session_id INTEGER')
+        conn.execute('CREATE INDEX IF NOT EXISTS chat_history_session ON chat_history (session_id, id)')
+        imported = conn.execute("SELECT value FROM meta WHERE key = 'csv_import'").fetchone()
+        if imported is None:
+            import_csv_data(conn)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('csv_import', ?)", (_now(),))
+        indexed = conn.execute("SELECT value FROM meta WHERE key = 'search_index'").fetchone()
+        if indexed is None:
+            # Databases created before the search index have cards the triggers never saw
+            conn.execute('DELETE FROM flashcards_fts')
+            conn.execute(
+                'INSERT INTO flashcards_fts (rowid, word, translations, examples) '
+                'SELECT id, fold(word), fold(translations), fold(examples) FROM flashcards'
+            )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('search_index', ?)", (_now(),))
+        scheduled = conn.execute("SELECT value FROM meta WHERE key = 'schedules'").fetchone()
+        if scheduled is None:
+            # Likewise for cards created before review schedules
+            conn.execute(
+                'INSERT OR IGNORE INTO schedules (flashcard_id, language, due) '
+                'SELECT id, language, created_at FROM flashcards'
+            )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('schedules', ?)", (_now(),))
+        vectorized = conn.execute("SELECT value FROM meta WHERE key = 'duplicate_index'").fetchone()
+        if vectorized is None:
+            # Likewise for cards created before near-duplicate checks
+            conn.execute(
+                'INSERT OR IGNORE INTO flashcard_grams (gram, flashcard_id) '
+                'SELECT json_each.value, flashcards.id FROM flashcards, json_each(word_grams(flashcards.word, flashcards.language))'
+            )
+            conn.execute(
+                'INSERT OR REPLACE INTO flashcard_vectors (flashcard_id, vector) SELECT id, word_vector(word) FROM flashcards'
+            )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('duplicate_index', ?)", (_now(),))
+        counted = conn.execute("SELECT value FROM meta WHERE key = 'review_days'").fetchone()
+        if counted is None:
+            conn.execute('INSERT OR IGNORE INTO review_days (day) SELECT DISTINCT substr(reviewed_at, 1, 10) FROM review_history')
+            conn.execute("INSERT INTO meta (key, value) VALUES ('review_days', ?)", (_now(),))
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    prune_history()
+
+
+def import_csv_data(conn=None):
+    """
+    Copy flashcards and history from the CSV storage into SQLite, keeping ids
+
+    Flashcards are read from the record log and from a legacy flashcards.csv
+    not yet migrated. Rows whose id already exists are skipped, so running
+    the import again is harmless.
+
+    Returns:
+        dict: Number of rows imported per table
+    """
+    own_transaction = conn is None
+    conn = conn or _connect()
+    counts = {}
+
+    cards = []
+    if os.path.exists(csv_db.FLASHCARDS_LOG):
+        cards.extend(RecordLog(csv_db.FLASHCARDS_LOG).open().records())
+    cards.extend(_read_csv(csv_db.FLASHCARDS_CSV))
+    rows = [
+        [int(float(card['id']))] + [card.get(column) or '' for column in FLASHCARD_COLUMNS[1:]]
+        for card in cards if card.get('id')
+    ]
+    counts['flashcards'] = _insert_ignore(conn, 'flashcards', FLASHCARD_COLUMNS, rows)
+
+    # Schedules of imported cards were created by the insert trigger; only
+    # never-reviewed ones take the csv schedule, so reviews made here win
+    schedules = []
+    if os.path.exists(csv_db.SCHEDULES_LOG):
+        schedules = RecordLog(csv_db.SCHEDULES_LOG).open().records()
+    before = conn.total_changes
+    conn.executemany(
+        f"UPDATE schedules SET {', '.join(column + ' = ?' for column in SCHEDULE_COLUMNS)} "
+        'WHERE flashcard_id = ? AND last_reviewed IS NULL',
+        [[schedule[column] for column in SCHEDULE_COLUMNS] + [int(schedule['id'])] for schedule in schedules],
+    )
+    counts['schedules'] = conn.total_changes - before
+
+    # Chat exchanges and sessions saved since chat sessions live in record logs
+    turns = []
+    if os.path.exists(csv_db.CHAT_TURNS_LOG):
+        turns = RecordLog(csv_db.CHAT_TURNS_LOG).open().records()
+    columns = csv_db.CHAT_HISTORY_COLUMNS + ['session_id']
+    rows = [[turn.get(column) for column in columns] for turn in turns]
+    counts['chat_turns'] = _insert_ignore(conn, 'chat_history', columns, rows)
+    sessions = []
+    if os.path.exists(csv_db.CHAT_SESSIONS_LOG):
+        sessions = RecordLog(csv_db.CHAT_SESSIONS_LOG).open().records()
+    rows = [[session[column] for column in CHAT_SESSION_COLUMNS] for session in sessions]
+    counts['chat_sessions'] = _insert_ignore(conn, 'chat_sessions', CHAT_SESSION_COLUMNS, rows)
+
+    for table, (path, columns) in _HISTORY_TABLES.items():
+        # Rotated segments too
+        rows = [
+            [int(float(row['id']))] + [row.get(column) or '' for column in columns[1:]]
+            for row in history_segments.read_rows(path) if row.get('id')
+        ]
+        counts[table] = _insert_ignore(conn, table, columns, rows)
+
+    if own_transaction:
+        conn.commit()
+    return counts
+
+
+def _read_csv(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def _insert_ignore(conn, table, columns, rows):
+    placeholders = ', '.join('?' for _ in columns)
+    before = conn.total_changes
+    conn.executemany(f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+    return conn.total_changes - before
+
+
+def close_history():
+    """Close every connection (call at shutdown); threads reconnect on next use"""
+    global _generation
+    with _connections_lock:
+        _generation += 1
+        connections = list(_connections)
+        _connections.clear()
+    for conn in connections:
+        conn.close()
+
+
+def flush_history():
+    """History rows are committed as they are saved; nothing to flush"""
+
+
+def get_history_writer_stats():
+    """Get the number of history rows written by this process"""
+    return dict(_history_stats)
+
+
+# Flashcards
+
+@_timed('get_flashcards')
+def get_flashcards():
+    """Get all flashcards as a DataFrame, ordered by id"""
+    import pandas as pd
+    try:
+        rows = _connect().execute(f"SELECT {', '.join(FLASHCARD_COLUMNS)} FROM flashcards ORDER BY id").fetchall()
+        return pd.DataFrame([tuple(row) for row in rows], columns=FLASHCARD_COLUMNS)
+    except sqlite3.Error:
+        return pd.DataFrame(columns=FLASHCARD_COLUMNS)
+
+
+def get_flashcards_by_language(language):
+    """Get the flashcards of one language as a list of dicts, ordered by id"""
+    rows = _connect().execute('SELECT * FROM flashcards WHERE language = ? ORDER BY id', (language,)).fetchall()
+    return [dict(row) for row in rows]
+
+
+@_timed('list_flashcards')
+def list_flashcards(sort='id', descending=False, after=None, limit=50, language=None,
+                    created_from=None, created_to=None, updated_from=None, updated_to=None):
+    """
+    Get one page of flashcards in (sort, id) order
+
+    Same arguments as csv_db.list_flashcards. The cursor becomes a row-value
+    comparison on (sort, id), which the per-column indexes (they end in the
+    rowid) can seek to directly.
+    """
+    if sort not in FLASHCARD_SORT_COLUMNS:
+        raise ValueError(f"Unknown sort column {sort!r}")
+    
+    clauses = []
+    params = []
+    if language:
+        clauses.append('language = ?')
+        params.append(language)
+    for column, low, high in (('created_at', created_from, created_to), ('updated_at', updated_from, updated_to)):
+        if low:
+            clauses.append(f'{column} >= ?')
+            params.append(low)
+        if high:
+            clauses.append(f'{column} <= ?')
+            params.append(high)
+    
+    direction = 'DESC' if descending else 'ASC'
+    comparison = '<' if descending else '>'
+    if after is not None:
+        value, after_id = after
+        if sort == 'id':
+            clauses.append(f'id {comparison} ?')
+            params.append(int(after_id))
+        else:
+            clauses.append(f'({sort}, id) {comparison} (?, ?)')
+            params.extend([value, int(after_id)])
+    
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+    order = f'id {direction}' if sort == 'id' else f'{sort} {direction}, id {direction}'
+    try:
+        rows = _connect().execute(
+            f'SELECT * FROM flashcards{where} ORDER BY {order} LIMIT ?', (*params, int(limit))
+        ).fetchall()
+        return [dict(row) for row in rows]
+    except sqlite3.Error:
+        return []
+
+
+@_timed('search_flashcards')
+def search_flashcards(query, limit=20, language=None):
+    """
+    Full-text search over flashcard words, translations and examples
+
+    Same arguments and results as csv_db.search_flashcards; matches are
+    ranked by BM25 with the word weighted above translations and examples.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    # Quoted so no token is read as FTS syntax; the last one is a prefix
+    match = ' '.join(f'"{token}"' for token in tokens) + ' *'
+    sql = (
+        'SELECT flashcards.*, -bm25(flashcards_fts, 3.0, 2.0, 1.0) AS score FROM flashcards_fts '
+        'JOIN flashcards ON flashcards.id = flashcards_fts.rowid WHERE flashcards_fts MATCH ?'
+    )
+    params = [match]
+    if language:
+        sql += ' AND flashcards.language = ?'
+        params.append(language)
+    sql += ' ORDER BY score DESC, flashcards.id LIMIT ?'
+    params.append(int(limit))
+    try:
+        rows = _connect().execute(sql, params).fetchall()
+    except sqlite3.Error:
+        return []
+    return [dict(row, score=round(row['score'], 4)) for row in rows]
+
+
+def close_search_index():
+    """The FTS table is saved with every write; nothing to do"""
+
+
+@_timed('find_duplicate_flashcards')
+def find_duplicate_flashcards(word, language, limit=5, threshold=None):
+    """
+    Find existing flashcards that are the same as or close to a new word
+
+    Same arguments and results as csv_db.find_duplicate_flashcards. Exact
+    keys and 3-grams are looked up in flashcard_grams, and the candidates'
+    vectors are scored with numpy.
+    """
+    normalized = duplicate_index.normalize(word)
+    if not normalized:
+        return []
+    conn = _connect()
+    try:
+        exact_ids = [
+            row['id'] for row in conn.execute(
+                'SELECT flashcards.id, flashcards.word FROM flashcard_grams '
+                'JOIN flashcards ON flashcards.id = flashcard_grams.flashcard_id WHERE flashcard_grams.gram = ?',
+                (duplicate_index.exact_key(word, language),),
+            )
+            # The key is a hash; other words may share it
+            if duplicate_index.normalize(row['word']) == normalized
+        ]
+
+        grams = duplicate_index.grams(word, language)
+        counts = conn.execute(
+            f"SELECT gram, COUNT(*) FROM flashcard_grams WHERE gram IN ({', '.join('?' * len(grams))}) GROUP BY gram",
+            grams,
+        ).fetchall()
+        chosen = duplicate_index.probe([tuple(row) for row in counts])
+        ids = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0, dtype=np.float32)
+        if chosen:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            rows = cursor.execute(
+                'SELECT flashcard_id, vector FROM flashcard_vectors WHERE flashcard_id IN '
+                f"(SELECT flashcard_id FROM flashcard_grams WHERE gram IN ({', '.join('?' * len(chosen))}))",
+                chosen,
+            ).fetchall()
+            if rows:
+                ids = np.array([row[0] for row in rows], dtype=np.int64)
+                vectors = np.frombuffer(b''.join(row[1] for row in rows), dtype=np.int8).reshape(len(rows), -1)
+                scores = duplicate_index.similarities(duplicate_index.vector(word), vectors)
+
+        matches = duplicate_index.rank(exact_ids, ids, scores, limit, threshold)
+        if not matches:
+            return []
+        cards = {
+            row['id']: dict(row) for row in conn.execute(
+                f"SELECT * FROM flashcards WHERE id IN ({', '.join('?' * len(matches))})",
+                [card_id for card_id, _, _ in matches],
+            )
+        }
+    except sqlite3.Error:
+        return []
+    return [
+        dict(cards[card_id], similarity=round(similarity, 4), exact=exact)
+        for card_id, similarity, exact in matches if card_id in cards
+    ]
+
+
+@_timed('get_due_flashcards')
+def get_due_flashcards(limit=20, language=None, now=None):
+    """
+    Get the flashcards due for review, most overdue first
+
+    Same arguments and results as csv_db.get_due_flashcards; the query
+    reads the first ``limit`` entries of an index on (due, id).
+    """
+    now = now or _now()
+    sql = (
+        f"SELECT flashcards.*, {', '.join('schedules.' + column for column in SCHEDULE_COLUMNS)} FROM schedules "
+        'JOIN flashcards ON flashcards.id = schedules.flashcard_id WHERE schedules.due <= ?'
+    )
+    params = [now]
+    if language:
+        sql += ' AND schedules.language = ?'
+        params.append(language)
+    sql += ' ORDER BY schedules.due, schedules.flashcard_id LIMIT ?'
+    params.append(int(limit))
+    try:
+        return [dict(row) for row in _connect().execute(sql, params).fetchall()]
+    except sqlite3.Error:
+        return []
+
+
+@_timed('review_flashcard')
+def review_flashcard(flashcard_id, grade):
+    """
+    Record a review of a flashcard and schedule its next one
+
+    Same arguments and results as csv_db.review_flashcard.
+    """
+    conn = _connect()
+    # Write lock up front so concurrent reviews of a card don't overwrite each other
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute(
+            f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM schedules WHERE flashcard_id = ?", (int(flashcard_id),)
+        ).fetchone()
+        if row is None:
+            conn.execute('ROLLBACK')
+            return None
+        schedule = scheduler.next_review(dict(row), grade)
+        conn.execute(
+            f"UPDATE schedules SET {', '.join(column + ' = ?' for column in SCHEDULE_COLUMNS)} WHERE flashcard_id = ?",
+            [schedule[column] for column in SCHEDULE_COLUMNS] + [int(flashcard_id)],
+        )
+        conn.execute(
+            'INSERT INTO review_history (flashcard_id, grade, ease, interval, due, reviewed_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (int(flashcard_id), grade, schedule['ease'], schedule['interval'], schedule['due'], schedule['last_reviewed']),
+        )
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return dict(get_flashcard(flashcard_id), **schedule)
+
+
+@_timed('get_schedule_columns')
+def get_schedule_columns():
+    """
+    Get every card's schedule as column arrays (see scheduler.schedule_columns)
+
+    The arrays are kept per thread and reused until a connection writes to
+    the database. Callers must not modify them.
+    """
+    conn = _connect()
+    version = (conn.execute('PRAGMA data_version').fetchone()[0], conn.total_changes)
+    cached = getattr(_local, 'schedule_columns', None)
+    if cached is not None and cached[0] is conn and cached[1] == version:
+        return cached[2]
+    cursor = conn.cursor()
+    # Plain tuples: this reads every card. Timestamps are turned into
+    # seconds here, read as UTC like numpy's datetime64 does
+    cursor.row_factory = None
+    rows = cursor.execute(
+        "SELECT flashcard_id, language, CAST(strftime('%s', due) AS INTEGER), interval, "
+        "IFNULL(CAST(strftime('%s', last_reviewed) AS INTEGER), -1) FROM schedules ORDER BY flashcard_id"
+    ).fetchall()
+    columns = scheduler.second_columns(*(zip(*rows) if rows else [()] * 5))
+    _local.schedule_columns = (conn, version, columns)
+    return columns
+
+
+@_timed('reschedule_flashcards')
+def reschedule_flashcards(retention):
+    """
+    Move the due time of every reviewed card to match a new target retention
+
+    Same arguments and results as csv_db.reschedule_flashcards.
+    """
+    conn = _connect()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        ids, due = scheduler.rescheduled_due(get_schedule_columns(), retention)
+        conn.executemany('UPDATE schedules SET due = ? WHERE flashcard_id = ?', zip(due.tolist(), ids.tolist()))
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return len(ids)
+
+
+def get_review_days():
+    """Get the dates with at least one review, oldest first, as 'YYYY-MM-DD' strings"""
+    try:
+        return [row[0] for row in _connect().execute('SELECT day FROM review_days ORDER BY day')]
+    except sqlite3.Error:
+        return []
+
+
+def get_flashcard_stats():
+    """Get the flashcard count and list of languages"""
+    try:
+        conn = _connect()
+        count = conn.execute('SELECT COUNT(*) FROM flashcards').fetchone()[0]
+        languages = [row[0] for row in conn.execute('SELECT DISTINCT language FROM flashcards ORDER BY language')]
+        return {'count': count, 'languages': languages}
+    except sqlite3.Error:
+        return {'count': 0, 'languages': []}
+
+
+@_timed('get_flashcard')
+def get_flashcard(flashcard_id):
+    """Get a specific flashcard by ID"""
+    row = _connect().execute('SELECT * FROM flashcards WHERE id = ?', (int(flashcard_id),)).fetchone()
+    return dict(row) if row is not None else None
+
+
+@_timed('save_flashcard')
+def save_flashcard(word, language, translations, pronunciation, examples, flashcard_id=None):
+    """Update the flashcard with ``flashcard_id``, or create a new one if there is none"""
+    conn = _connect()
+    now = _now()
+    with conn:
+        updated = 0
+        if not csv_db.is_missing_id(flashcard_id):
+            updated = conn.execute(
+                'UPDATE flashcards SET word = ?, language = ?, translations = ?, pronunciation = ?, examples = ?, '
+                'updated_at = ? WHERE id = ?',
+                (word, language, translations, pronunciation, examples, now, int(flashcard_id)),
+            ).rowcount
+        if not updated:
+            conn.execute(
+                'INSERT INTO flashcards (word, language, translations, pronunciation, examples, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (word, language, translations, pronunciation, examples, now, now),
+            )
+    return True
+
+
+@_timed('save_flashcards')
+def save_flashcards(flashcards):
+    """
+    Create several flashcards in one transaction
+
+    Returns:
+        list: The ids of the created flashcards, in input order
+    """
+    conn = _connect()
+    now = _now()
+    ids = []
+    with conn:
+        for flashcard in flashcards:
+            cursor = conn.execute(
+                'INSERT INTO flashcards (word, language, translations, pronunciation, examples, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (flashcard['word'], flashcard['language'], flashcard['translations'],
+                 flashcard['pronunciation'], flashcard['examples'], now, now),
+            )
+            ids.append(cursor.lastrowid)
+    return ids
+
+
+@_timed('delete_flashcard')
+def delete_flashcard(flashcard_id):
+    """Delete a flashcard; returns False if it didn't exist"""
+    conn = _connect()
+    with conn:
+        return conn.execute('DELETE FROM flashcards WHERE id = ?', (int(flashcard_id),)).rowcount > 0
+
+
+# History and query log
+
+@_timed('history_write')
+def _insert_history(table, row):
+    columns = list(row)
+    conn = _connect()
+    with conn:
+        conn.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            [row[column] for column in columns],
+        )
+    _history_stats['written'] += 1
+    if HISTORY_PRUNE_EVERY and _history_stats['written'] % HISTORY_PRUNE_EVERY == 0:
+        prune_history()
+
+
+def prune_history(now=None):
+    """
+    Delete history rows older than their file's retention in csv_db.HISTORY_ROTATION
+
+    Args:
+        now (datetime): Time to measure ages from, defaults to now
+
+    Returns:
+        dict: Number of deleted rows per table
+    """
+    now = now or datetime.now()
+    deleted = {}
+    conn = _connect()
+    with conn:
+        for table, (path, _) in _HISTORY_TABLES.items():
+            policy = csv_db.HISTORY_ROTATION.get(path)
+            if policy is None or not policy.retention_days:
+                continue
+            cutoff = (now - timedelta(days=policy.retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+            deleted[table] = conn.execute(f'DELETE FROM {table} WHERE created_at < ?', (cutoff,)).rowcount
+    return deleted
+
+
+def save_grammar_history(original_text, corrected_text):
+    """Save a grammar check to the history table"""
+    _insert_history('grammar_history', {
+        'original_text': original_text[:500],  # Limit text length
+        'corrected_text': corrected_text[:500],  # Limit text length
+        'created_at': _now()
+    })
+    save_query_log("grammar", original_text, corrected_text)
+    return True
+
+
+def save_translation_history(original_text, translated_text, source_lang, target_lang):
+    """Save a translation to the history table"""
+    _insert_history('translate_history', {
+        'original_text': original_text[:500],  # Limit text length
+        'source_lang': source_lang,
+        'target_lang': target_lang,
+        'translated_text': translated_text[:500],  # Limit text length
+        'created_at': _now()
+    })
+    save_query_log("translate", f"{original_text} ({source_lang} to {target_lang})", translated_text)
+    return True
+
+
+def save_summarize_history(original_text, summary, length, style):
+    """Save a summary to the history table"""
+    _insert_history('summarize_history', {
+        'original_text': original_text[:500],  # Limit text length
+        'summary': summary[:500],  # Limit text length
+        'length': length or 'medium',
+        'style': style or 'informative',
+        'created_at': _now()
+    })
+    save_query_log("summarize", f"{original_text[:100]}... (length: {length}, style: {style})", summary)
+    return True
+
+
+def create_chat_session():
+    """Start an empty chat session and return it"""
+    now = _now()
+    conn = _connect()
+    with conn:
+        cursor = conn.execute('INSERT INTO chat_sessions (created_at, updated_at) VALUES (?, ?)', (now, now))
+    return get_chat_session(cursor.lastrowid)
+
+
+@_timed('get_chat_session')
+def get_chat_session(session_id):
+    """Get a chat session with the ids of its recent turns, or None if there is no such session"""
+    conn = _connect()
+    row = conn.execute('SELECT * FROM chat_sessions WHERE id = ?', (int(session_id),)).fetchone()
+    if row is None:
+        return None
+    recent = conn.execute(
+        'SELECT id FROM chat_history WHERE session_id = ? ORDER BY id DESC LIMIT ?', (row['id'], CHAT_RECENT_TURNS)
+    ).fetchall()
+    return dict(row, recent=[turn['id'] for turn in reversed(recent)])
+
+
+@_timed('save_chat_history')
+def save_chat_history(user_message, ai_response, session_id=None):
+    """Save a chat exchange to the history table and count it in its session"""
+    now = _now()
+    conn = _connect()
+    with conn:
+        conn.execute(
+            'INSERT INTO chat_history (user_message, ai_response, created_at, session_id) VALUES (?, ?, ?, ?)',
+            (user_message, ai_response, now, session_id),
+        )
+        if session_id is not None:
+            conn.execute('UPDATE chat_sessions SET turns = turns + 1, updated_at = ? WHERE id = ?', (now, session_id))
+    _history_stats['written'] += 1
+    save_query_log("chat", user_message, ai_response)
+    return True
+
+
+@_timed('get_recent_chat_turns')
+def get_recent_chat_turns(session_id, limit=CHAT_RECENT_TURNS):
+    """Get the last ``limit`` turns of a chat session (at most CHAT_RECENT_TURNS), oldest first"""
+    rows = _connect().execute(
+        'SELECT * FROM chat_history WHERE session_id = ? ORDER BY id DESC LIMIT ?',
+        (int(session_id), max(0, min(limit, CHAT_RECENT_TURNS))),
+    ).fetchall()
+    return [dict(row) for row in reversed(rows)]
+
+
+def update_chat_summary(session_id, summary, summarized_through):
+    """Replace a chat session's summary unless it already covers ``summarized_through``"""
+    conn = _connect()
+    with conn:
+        cursor = conn.execute(
+            'UPDATE chat_sessions SET summary = ?, summarized_through = ?, updated_at = ? '
+            'WHERE id = ? AND summarized_through < ?',
+            (summary, summarized_through, _now(), int(session_id), summarized_through),
+        )
+    return cursor.rowcount > 0
+
+
+@_timed('get_chat_history')
+def get_chat_history(limit=10):
+    """Get recent chat history entries, newest first"""
+    try:
+        rows = _connect().execute('SELECT * FROM chat_history ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [dict(row) for row in rows]
+    except sqlite3.Error:
+        return []
+
+
+def save_query_log(feature, query, response):
+    """Log an AI interaction in the generic query log"""
+    _insert_history('query_log', {
+        'feature': feature,
+        'query': query[:500],  # Limit text length
+        'response': response[:500],  # Limit text length
+        'created_at': _now()
+    })
+    return True
+
+
+@_timed('get_query_log')
+def get_query_log(feature=None, limit=50):
+    """Get recent query log entries, newest first, optionally filtered by feature"""
+    try:
+        conn = _connect()
+        if feature:
+            rows = conn.execute(
+                'SELECT * FROM query_log WHERE feature = ? ORDER BY id DESC LIMIT ?', (feature, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute('SELECT * FROM query_log ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [dict(row) for row in rows]
+    except sqlite3.Error:
+        return []
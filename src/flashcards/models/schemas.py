@@ -1,32 +1,84 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 
 class TextRequest(BaseModel):
     """Request model for text-based operations like grammar checking and summarization"""
     text: str
+    use_cache: bool = True  # set to False to bypass the response cache
+
+class GrammarRequest(TextRequest):
+    """Request model for grammar checking"""
+    language: Optional[str] = None
+    check_types: Optional[List[str]] = None  # grammar, spelling, style, punctuation
 
 class TranslationRequest(BaseModel):
     """Request model for translation operations"""
     text: str
     source_lang: Optional[str] = None
     target_lang: Optional[str] = None
+    use_cache: bool = True
 
 class SummarizeRequest(BaseModel):
     """Request model for summarization with additional parameters"""
     text: str
     length: Optional[str] = None  # short, medium, long
     style: Optional[str] = None   # informative, academic, simplified
+    use_cache: bool = True
+
+class UrlRequest(BaseModel):
+    """Request model for extracting the text of a web page"""
+    url: str
 
 class ChatRequest(BaseModel):
     """Request model for chat with AI assistant"""
     message: str
     context: Optional[str] = None
+    session_id: Optional[int] = None  # a new session is started without one
 
 class FlashcardCreate(BaseModel):
     """Model for flashcard creation"""
     word: str
     language: str = "english"
 
+class FlashcardData(BaseModel):
+    """AI-generated content for a flashcard"""
+    translations: str
+    pronunciation: str
+    examples: str
+
+class FlashcardBatchItem(FlashcardData):
+    """One card of a batched flashcard generation response"""
+    word: str
+
+class FlashcardBatchCreate(BaseModel):
+    """Model for bulk flashcard creation"""
+    words: List[str]
+    language: str = "english"
+    skip_duplicates: bool = True  # leave out words that already have a card or a near duplicate
+
+class BatchDuplicate(BaseModel):
+    """A word left out of a bulk creation job because a similar card exists"""
+    word: str
+    flashcard_id: int
+    match: str  # the existing card's word
+    similarity: float
+
+class FlashcardBatchJob(BaseModel):
+    """Response model for the progress of a bulk flashcard creation job"""
+    job_id: str
+    status: str  # pending, running, completed, failed
+    language: str
+    total: int
+    generated: int
+    failed: List[str]
+    retried: List[str]
+    flashcard_ids: List[int]
+    duplicates: List[BatchDuplicate] = []
+    prompts: int
+    created_at: str
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+
 class FlashcardUpdate(BaseModel):
     """Model for flashcard updates"""
     word: str
@@ -46,10 +98,108 @@ class FlashcardResponse(BaseModel):
     created_at: str
     updated_at: str
 
+class FlashcardPage(BaseModel):
+    """Response model for one page of the flashcard listing"""
+    items: List[FlashcardResponse]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page; None on the last page
+    limit: int
+    sort: str
+    order: str
+
+class FlashcardSearchResult(FlashcardResponse):
+    """A flashcard matching a search, with its relevance score"""
+    score: float
+
+class FlashcardSearchResponse(BaseModel):
+    """Response model for flashcard search"""
+    query: str
+    results: List[FlashcardSearchResult]
+
+class FlashcardDuplicate(FlashcardResponse):
+    """An existing flashcard close to a new word"""
+    similarity: float  # 1.0 for the same normalized word
+    exact: bool
+
+class FlashcardDuplicates(BaseModel):
+    """Response model for a near-duplicate check"""
+    word: str
+    language: str
+    duplicates: List[FlashcardDuplicate]
+
+class ReviewRequest(BaseModel):
+    """Request model for recording a flashcard review"""
+    flashcard_id: int
+    grade: int = Field(..., ge=0, le=5)  # 0-2 forgot, 3 hard, 4 good, 5 easy
+
+class ScheduledFlashcard(FlashcardResponse):
+    """A flashcard with its spaced-repetition schedule"""
+    due: str
+    ease: float
+    interval: int  # days
+    repetitions: int
+    lapses: int
+    last_reviewed: Optional[str] = None
+
+class DueFlashcards(BaseModel):
+    """Response model for the due-card queue"""
+    now: str
+    cards: List[ScheduledFlashcard]
+
+class StudyStats(BaseModel):
+    """Response model for deck-wide study statistics"""
+    now: str
+    cards: int
+    reviewed: int
+    due_now: int
+    overdue_by_language: Dict[str, int]
+    expected_retention: Optional[float] = None  # mean recall probability of reviewed cards; None before any review
+    target_retention: float
+    study_streak: int
+
+class ForecastDay(BaseModel):
+    """Cards falling due on one day"""
+    date: str
+    due: int
+
+class StudyForecast(BaseModel):
+    """Response model for the review workload forecast"""
+    now: str
+    days: List[ForecastDay]
+
+class RescheduleRequest(BaseModel):
+    """Request model for rescheduling the deck to a new target retention"""
+    retention: float = Field(..., ge=0.5, le=0.99)
+
+class RescheduleResponse(BaseModel):
+    """Response model for a deck reschedule"""
+    retention: float
+    rescheduled: int
+
+class GrammarIssue(BaseModel):
+    """One problem found in a sentence"""
+    type: str = "grammar"  # grammar, spelling, style or punctuation
+    severity: str = "error"  # error, warning or suggestion
+    original: str
+    suggestion: str = ""
+    explanation: str = ""
+    start: int = 0  # offsets of original in the checked text
+    end: int = 0
+
+class GrammarSentence(BaseModel):
+    """The model's check of one numbered sentence"""
+    index: int
+    corrected: str
+    issues: List[GrammarIssue] = []
+
 class GrammarResponse(BaseModel):
     """Response model for grammar checking"""
     corrected_text: str
     errors: str
+    improved_text: str = ""  # same as corrected_text
+    overall_score: int = 100
+    issues: List[GrammarIssue] = []
+    sentences: int = 0
+    sentences_checked: int = 0  # sent to the model; the rest came from the cache
 
 class TranslationResponse(BaseModel):
     """Response model for translation"""
@@ -59,9 +209,35 @@ class SummaryResponse(BaseModel):
     """Response model for text summarization"""
     summary: str
 
+class ExtractUrlResponse(BaseModel):
+    """Response model for web page text extraction"""
+    url: str  # after redirects
+    title: str
+    content: str
+    truncated: bool  # the page or its text was cut short
+    cached: bool  # the page was not downloaded again
+
 class ChatResponse(BaseModel):
     """Response model for chat with AI assistant"""
     response: str
+    session_id: Optional[int] = None
+
+class ChatTurn(BaseModel):
+    """One exchange of a chat session"""
+    id: int
+    user_message: str
+    ai_response: str
+    created_at: str
+
+class ChatSession(BaseModel):
+    """Response model for a chat session"""
+    id: int
+    summary: str  # of the turns up to summarized_through
+    summarized_through: int
+    turns: int
+    recent_turns: List[ChatTurn]  # oldest first
+    created_at: str
+    updated_at: str
 
 class QueryLogEntry(BaseModel):
     """Model for a query log entry"""
@@ -1,32 +1,107 @@
-from fastapi import APIRouter, HTTPException
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from typing import List, Optional
 
 from src.flashcards.models.schemas import (
-    TextRequest,
+    GrammarRequest,
     TranslationRequest,
     SummarizeRequest,
+    UrlRequest,
     GrammarResponse,
     TranslationResponse,
     SummaryResponse,
+    ExtractUrlResponse,
     ChatRequest,
-    ChatResponse
+    ChatResponse,
+    ChatSession,
+    FlashcardBatchCreate,
+    FlashcardBatchJob,
+    FlashcardPage,
+    FlashcardSearchResponse,
+    FlashcardDuplicates,
+    ReviewRequest,
+    ScheduledFlashcard,
+    DueFlashcards,
+    StudyStats,
+    StudyForecast,
+    RescheduleRequest,
+    RescheduleResponse
 )
-from src.flashcards.ai import gemini
-from src.flashcards.database import csv_db
+from src.flashcards.ai import gemini, batch
+from src.flashcards.ai.parser import ParseError, get_parse_stats
+from src.flashcards.database import db
+from src.flashcards.utils import pagination, study_stats
+from src.flashcards.utils.rate_limit import RateLimitExceeded
+from src.flashcards.utils.url_extractor import ExtractError, extract_url as fetch_url_text
 
 # Create API router
 router = APIRouter(prefix="/api")
 
+def _sse(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _too_many_requests(error):
+    """429 for a model call refused by the rate limiter"""
+    return HTTPException(status_code=429, detail=str(error), headers={"Retry-After": error.retry_after_header})
+
+def _event_stream(chunks, save_history):
+    """
+    Forward text chunks to the client as Server-Sent Events
+    
+    Each chunk is sent as a "message" event, followed by "done" or "error".
+    Once the response has been sent, ``save_history`` is called in the
+    background with the full text, only if the stream completed.
+    """
+    parts = []
+    completed = []
+    
+    async def events():
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield _sse("message", {"text": chunk})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        completed.append(True)
+        yield _sse("done", {})
+    
+    def save():
+        if completed:
+            save_history("".join(parts))
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(save)
+    )
+
+@router.post("/grammar-check", response_model=GrammarResponse)
 @router.post("/check-grammar", response_model=GrammarResponse)
-async def check_grammar(request: TextRequest):
-    """Check grammar for given text"""
-    if not request.text:
+async def check_grammar(request: GrammarRequest):
+    """Check grammar for given text, sentence by sentence"""
+    if not request.text.strip():
         raise HTTPException(status_code=400, detail="No text provided")
     
     try:
         # The gemini.check_grammar function now handles database logging internally
-        result = await gemini.check_grammar(request.text)
+        result = await gemini.check_grammar(
+            request.text,
+            use_cache=request.use_cache,
+            language=request.language,
+            check_types=request.check_types
+        )
         return result
+    except RateLimitExceeded as e:
+        raise _too_many_requests(e)
+    except ParseError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -44,10 +119,15 @@ async def translate(request: TranslationRequest):
         result = await gemini.translate(
             request.text, 
             source_lang, 
-            target_lang
+            target_lang,
+            use_cache=request.use_cache
         )
         
         return result
+    except RateLimitExceeded as e:
+        raise _too_many_requests(e)
+    except ParseError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -65,35 +145,242 @@ async def summarize(request: SummarizeRequest):
         result = await gemini.summarize(
             request.text,
             length,
-            style
+            style,
+            use_cache=request.use_cache
         )
         
         return result
+    except RateLimitExceeded as e:
+        raise _too_many_requests(e)
+    except ParseError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/summarize/stream")
+async def summarize_stream(request: SummarizeRequest):
+    """Summarize text, streaming the summary as Server-Sent Events"""
+    if not request.text:
+        raise HTTPException(status_code=400, detail="No text provided")
+    
+    length = request.length or "medium"
+    style = request.style or "informative"
+    
+    return _event_stream(
+        gemini.stream_summary(request.text, length, style),
+        lambda summary: db.save_summarize_history(request.text, summary, length, style)
+    )
+
+@router.post("/extract-url", response_model=ExtractUrlResponse)
+async def extract_url(request: UrlRequest):
+    """Extract the readable text of a web page"""
+    if not request.url.strip():
+        raise HTTPException(status_code=400, detail="No URL provided")
+    
+    try:
+        return await fetch_url_text(request.url)
+    except ExtractError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+def _chat_session_id(request):
+    """Return the request's chat session, starting one if it names none"""
+    if request.session_id is None:
+        return db.create_chat_session()["id"]
+    if db.get_chat_session(request.session_id) is None:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return request.session_id
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Chat with AI assistant"""
     if not request.message:
         raise HTTPException(status_code=400, detail="No message provided")
     
+    session_id = _chat_session_id(request)
     try:
         # The chat_with_ai function handles database logging internally
         response = await gemini.chat_with_ai(
             request.message,
-            request.context
+            request.context,
+            session_id
         )
         
-        return {"response": response}
+        return {"response": response, "session_id": session_id}
+    except RateLimitExceeded as e:
+        raise _too_many_requests(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Chat with AI assistant, streaming the reply as Server-Sent Events
+    
+    The session id is sent in the X-Chat-Session header.
+    """
+    if not request.message:
+        raise HTTPException(status_code=400, detail="No message provided")
+    
+    session_id = _chat_session_id(request)
+    response = _event_stream(
+        gemini.stream_chat(request.message, request.context, session_id),
+        lambda text: db.save_chat_history(request.message, text, session_id)
+    )
+    response.headers["X-Chat-Session"] = str(session_id)
+    return response
+
+@router.get("/chat/sessions/{session_id}", response_model=ChatSession)
+async def get_chat_session(session_id: int, limit: int = Query(db.CHAT_RECENT_TURNS, ge=0)):
+    """Get a chat session's summary and its most recent turns"""
+    session = db.get_chat_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return {**session, "recent_turns": db.get_recent_chat_turns(session_id, limit)}
+
 @router.get("/history/{feature}")
 async def get_history(feature: str, limit: int = 10):
     """Get history of interactions for a specific feature"""
     try:
-        history = csv_db.get_query_log(feature, limit)
+        history = db.get_query_log(feature, limit)
         return {"history": history}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/flashcards", response_model=FlashcardPage)
+async def list_flashcards(
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    sort: str = "id",
+    order: str = "asc",
+    language: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    updated_from: Optional[str] = None,
+    updated_to: Optional[str] = None
+):
+    """
+    List flashcards one page at a time
+    
+    Filter by language and inclusive created/updated date ranges, sort by
+    id, word, created_at or updated_at, and pass next_cursor back as
+    ``cursor`` to get the following page.
+    """
+    try:
+        return pagination.get_flashcard_page(
+            cursor=cursor, limit=limit, sort=sort, order=order, language=language,
+            created_from=created_from, created_to=created_to,
+            updated_from=updated_from, updated_to=updated_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/flashcards/search", response_model=FlashcardSearchResponse)
+async def search_flashcards(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    language: Optional[str] = None
+):
+    """
+    Search flashcard words, translations and examples
+    
+    Case and diacritics are ignored, every word of ``q`` must match and the
+    last one also matches as a prefix, so it works for type-ahead.
+    """
+    return {"query": q, "results": db.search_flashcards(q, limit, language)}
+
+@router.get("/flashcards/duplicates", response_model=FlashcardDuplicates)
+async def find_duplicate_flashcards(
+    word: str,
+    language: str = "english",
+    limit: int = Query(5, ge=1, le=50)
+):
+    """
+    Find existing flashcards that are the same as or close to a new word
+    
+    Checked locally, without a model call: the same word ignoring case,
+    diacritics and spacing first, then words with similar spelling.
+    """
+    return {"word": word, "language": language, "duplicates": db.find_duplicate_flashcards(word, language, limit)}
+
+@router.post("/flashcards/batch", response_model=FlashcardBatchJob, status_code=202)
+async def create_flashcard_batch(request: FlashcardBatchCreate):
+    """Start generating flashcards for a list of words"""
+    if not any(word.strip() for word in request.words):
+        raise HTTPException(status_code=400, detail="No words provided")
+    
+    return batch.start_job(request.words, request.language, request.skip_duplicates)
+
+@router.post("/flashcards/batch/upload", response_model=FlashcardBatchJob, status_code=202)
+async def upload_flashcard_batch(
+    file: UploadFile = File(...),
+    language: str = Form("english"),
+    skip_duplicates: bool = Form(True)
+):
+    """Start generating flashcards for an uploaded word list (one word per line or comma-separated)"""
+    content = await file.read()
+    try:
+        words = batch.parse_word_list(content.decode('utf-8-sig'))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Word list must be UTF-8 text")
+    
+    if not words:
+        raise HTTPException(status_code=400, detail="No words provided")
+    
+    return batch.start_job(words, language, skip_duplicates)
+
+@router.get("/flashcards/batch/{job_id}", response_model=FlashcardBatchJob)
+async def get_flashcard_batch(job_id: str):
+    """Get the progress of a bulk flashcard creation job"""
+    job = batch.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
+
+@router.get("/study/due", response_model=DueFlashcards)
+async def get_due_flashcards(
+    limit: int = Query(20, ge=1, le=200),
+    language: Optional[str] = None
+):
+    """Get the flashcards due for review, most overdue first"""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return {"now": now, "cards": db.get_due_flashcards(limit, language, now)}
+
+@router.post("/study/review", response_model=ScheduledFlashcard)
+async def review_flashcard(request: ReviewRequest):
+    """Record how well a flashcard was recalled and schedule its next review"""
+    card = db.review_flashcard(request.flashcard_id, request.grade)
+    if card is None:
+        raise HTTPException(status_code=404, detail="Flashcard not found")
+    
+    return card
+
+@router.get("/study/stats", response_model=StudyStats)
+async def get_study_stats():
+    """Get card counts, cards due per language, expected retention and the study streak"""
+    return study_stats.get_study_stats()
+
+@router.get("/study/forecast", response_model=StudyForecast)
+async def get_study_forecast(days: int = Query(study_stats.DEFAULT_FORECAST_DAYS, ge=1, le=study_stats.MAX_FORECAST_DAYS)):
+    """Get the number of cards falling due on each of the next ``days`` days"""
+    return study_stats.get_forecast(days)
+
+@router.post("/study/reschedule", response_model=RescheduleResponse)
+async def reschedule_flashcards(request: RescheduleRequest):
+    """
+    Move every reviewed card's due time to match a new target retention
+    
+    Set SRS_TARGET_RETENTION to the same value so later reviews keep it.
+    """
+    rescheduled = db.reschedule_flashcards(request.retention)
+    return {"retention": request.retention, "rescheduled": rescheduled}
+
+@router.get("/stats")
+async def get_stats():
+    """Get runtime statistics for the AI call pool, response cache, parser and history writer"""
+    return {
+        "ai": gemini.get_call_stats(),
+        "cache": gemini.response_cache.stats(),
+        "parser": get_parse_stats(),
+        "history": db.get_history_writer_stats()
+    }
@@ -3,9 +3,9 @@ from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from typing import Optional, Dict, Any
 
-from src.flashcards.database import csv_db
+from src.flashcards.database import db
 from src.flashcards.ai import gemini
-from src.flashcards.utils.template_helper import get_common_context
+from src.flashcards.utils.template_helper import get_common_context, get_flashcard_page_context, get_study_context
 
 # Create web router with no prefix (for root routes)
 router = APIRouter(tags=["web"])
@@ -16,11 +16,13 @@ templates = Jinja2Templates(directory="app/templates")
 # Routes
 @router.get("/", response_class=HTMLResponse)
 async def home(request: Request):
-    """Homepage showing all flashcards"""
-    flashcards = csv_db.get_flashcards()
+    """Homepage showing a page of flashcards"""
     context = get_common_context()
     context["nav_info"]["current_path"] = "/"
-    context["flashcards"] = flashcards.to_dict('records')
+    try:
+        context.update(get_flashcard_page_context(request, "/"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return templates.TemplateResponse("index.html", {"request": request, **context})
 
@@ -35,9 +37,15 @@ async def create_get(request: Request):
 async def create_post(
     request: Request,
     word: str = Form(...),
-    language: str = Form("english")
+    language: str = Form("english"),
+    force: bool = Form(False)
 ):
-    """Handle flashcard creation form submission"""
+    """
+    Handle flashcard creation form submission
+    
+    Words with an existing card or a near duplicate are sent back with the
+    matches listed, before any model call; ``force`` creates them anyway.
+    """
     if not word.strip():
         context = get_common_context()
         context["nav_info"]["current_path"] = "/create"
@@ -46,11 +54,21 @@ async def create_post(
             {"request": request, **context, "error": "Please enter a word"}
         )
     
+    if not force:
+        duplicates = db.find_duplicate_flashcards(word, language)
+        if duplicates:
+            context = get_common_context()
+            context["nav_info"]["current_path"] = "/create"
+            return templates.TemplateResponse(
+                "create.html",
+                {"request": request, **context, "duplicates": duplicates, "word": word, "language": language}
+            )
+    
     try:
         # Use Gemini to generate flashcard content
         flashcard_data = await gemini.generate_flashcard_data(word, language)
         
-        csv_db.save_flashcard(
+        db.save_flashcard(
             word=word,
             language=language,
             translations=flashcard_data['translations'],
@@ -70,7 +88,7 @@ async def create_post(
 @router.get("/edit/{flashcard_id}", response_class=HTMLResponse)
 async def edit_get(request: Request, flashcard_id: int):
     """Flashcard edit page"""
-    flashcard = csv_db.get_flashcard(flashcard_id)
+    flashcard = db.get_flashcard(flashcard_id)
     if not flashcard:
         return RedirectResponse(url="/", status_code=303)
     
@@ -92,7 +110,7 @@ async def edit_post(
 ):
     """Handle flashcard edit form submission"""
     if not word.strip():
-        flashcard = csv_db.get_flashcard(flashcard_id)
+        flashcard = db.get_flashcard(flashcard_id)
         
         context = get_common_context()
         context["nav_info"]["current_path"] = f"/edit/{flashcard_id}"
@@ -101,7 +119,7 @@ async def edit_post(
         
         return templates.TemplateResponse("edit.html", {"request": request, **context})
     
-    csv_db.save_flashcard(
+    db.save_flashcard(
         word=word,
         language=language,
         translations=translations,
@@ -115,16 +133,14 @@ async def edit_post(
 @router.post("/delete/{flashcard_id}")
 async def delete(flashcard_id: int):
     """Delete a flashcard"""
-    csv_db.delete_flashcard(flashcard_id)
+    db.delete_flashcard(flashcard_id)
     return RedirectResponse(url="/", status_code=303)
 
 @router.get("/study", response_class=HTMLResponse)
 async def study(request: Request):
-    """Study page for flashcards"""
-    flashcards = csv_db.get_flashcards()
-    
+    """Study page for the flashcards due for review"""
     context = get_common_context()
     context["nav_info"]["current_path"] = "/study"
-    context["flashcards"] = flashcards.to_dict('records')
+    context.update(get_study_context(request))
     
     return templates.TemplateResponse("study.html", {"request": request, **context}) 
\ No newline at end of file
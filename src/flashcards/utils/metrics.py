@@ -0,0 +1,261 @@
+"""
+Prometheus-style metrics kept in process
+
+Counters and histograms with labels, rendered in the Prometheus text
+format by render() for GET /metrics. Values that are cheaper to read when
+scraped (queue depths, file sizes) come from collectors registered with
+register_collector().
+
+Recording a value is a dict lookup and a few additions under a lock, cheap
+enough for every request and storage call (benchmarks/bench_metrics.py
+measures it). Nothing needs a running server: tests read values back with
+value() and start from zero with reset().
+
+Hooks in the app:
+
+- MetricsMiddleware: http_request_duration_seconds per method, route
+  template and status
+- gemini.py: model call stages (rate limit, pool queue, model), outcomes
+  and estimated tokens per feature
+- parser.py: parse outcomes and fallbacks to the lenient parse
+- csv_db.py and sqlite_db.py: storage operation durations (timed()) and
+  the size of every file in the data directory
+"""
+
+import bisect
+import functools
+import threading
+import time
+
+# Seconds; from a cached lookup to a slow model call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_lock = threading.Lock()
+_metrics = {}
+_collectors = []
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A value per label set that only goes up"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        return [(self.name, key, (), value) for key, value in sorted(self._values.items())]
+
+    def clear(self):
+        self._values.clear()
+
+
+class Histogram:
+    """Observations per label set, counted into cumulative buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [count per bucket (the last one is +Inf), sum]
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def time(self, **labels):
+        """Context manager observing how long its block takes"""
+        return _Timer(self, labels)
+
+    def value(self, **labels):
+        """Return {'count': ..., 'sum': ...} for one label set"""
+        entry = self._values.get(self._key(labels))
+        if entry is None:
+            return {'count': 0, 'sum': 0.0}
+        return {'count': sum(entry[0]), 'sum': entry[1]}
+
+    def samples(self):
+        samples = []
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((self.name + '_bucket', key, (('le', _format_value(float(bound))),), cumulative))
+            samples.append((self.name + '_sum', key, (), total))
+            samples.append((self.name + '_count', key, (), cumulative))
+        return samples
+
+    def clear(self):
+        self._values.clear()
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+def _register(cls, name, help, labels, **kwargs):
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, help, labels, **kwargs)
+        return metric
+
+
+def counter(name, help, labels=()):
+    """Get the counter called ``name``, creating it on first use"""
+    return _register(Counter, name, help, labels)
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    """Get the histogram called ``name``, creating it on first use"""
+    return _register(Histogram, name, help, labels, buckets=buckets)
+
+
+def register_collector(collect):
+    """
+    Add a function called on every render
+
+    ``collect()`` returns (name, kind, help, samples) tuples, where kind is
+    "gauge" or "counter" and samples is a list of (labels dict, value).
+    """
+    _collectors.append(collect)
+    return collect
+
+
+def timed(histogram, **labels):
+    """Decorator observing each call's duration in ``histogram``"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, **labels)
+        return wrapper
+    return decorate
+
+
+def value(name, **labels):
+    """Get the current value of a metric, for tests and ad-hoc checks"""
+    metric = _metrics.get(name)
+    if metric is None:
+        return 0
+    return metric.value(**labels)
+
+
+def reset():
+    """Set every metric back to zero"""
+    with _lock:
+        for metric in _metrics.values():
+            metric.clear()
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        metrics = [(metric, metric.samples()) for metric in _metrics.values()]
+    for metric, samples in metrics:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, key, extra, sample in samples:
+            lines.append(f'{name}{_format_labels(metric.labels, key, extra)} {_format_value(sample)}')
+    for collect in _collectors:
+        try:
+            collected = collect()
+        except Exception:
+            # A failing collector leaves out its own metrics only
+            continue
+        for name, kind, help, samples in collected:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, sample in samples:
+                lines.append(f'{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(sample)}')
+    return '\n'.join(lines) + '\n'
+
+
+http_request_duration = histogram(
+    'http_request_duration_seconds', 'Time to handle an HTTP request', ('method', 'route', 'status'),
+)
+storage_duration = histogram(
+    'storage_operation_duration_seconds', 'Time spent in a storage call', ('backend', 'operation'),
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request by its route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            # Set by the router; requests that match no route share one label
+            route = scope.get('route')
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope['method'], route=getattr(route, 'path', 'unmatched'), status=status[0],
+            )
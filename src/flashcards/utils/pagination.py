@@ -0,0 +1,133 @@
+"""
+Keyset pagination of the flashcard listing
+
+Shared by GET /api/flashcards and the paged home and study views. A page
+is fetched with db.list_flashcards, which filters in the storage backend;
+the position is carried between requests as an opaque cursor holding the
+sort order and the (sort value, id) of the last card shown, so deep pages
+cost the same as the first one.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from urllib.parse import urlencode
+
+from src.flashcards.database import db
+
+DEFAULT_PAGE_SIZE = 48
+MAX_PAGE_SIZE = 200
+
+SORT_COLUMNS = db.FLASHCARD_SORT_COLUMNS
+SORT_ORDERS = ['asc', 'desc']
+
+
+def encode_cursor(sort, order, card):
+    """Return the cursor that continues after ``card``"""
+    value = int(card['id']) if sort == 'id' else str(card[sort])
+    payload = json.dumps([sort, order, value, int(card['id'])], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort, order):
+    """
+    Return the (sort value, id) stored in a cursor
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another sort order
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, cursor_order, value, card_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise ValueError("Cursor was issued for a different sort order")
+    if not isinstance(card_id, int) or not isinstance(value, int if sort == 'id' else str):
+        raise ValueError("Invalid cursor")
+    return value, card_id
+
+
+def parse_date_bound(value, end=False):
+    """
+    Normalize a date or datetime filter to the stored 'YYYY-MM-DD HH:MM:SS' form
+
+    A bare date used as an upper bound covers the whole day.
+
+    Raises:
+        ValueError: If the value isn't an ISO date or datetime
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date {value!r}; use YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS")
+
+    if end and len(value) == 10:
+        parsed = parsed.replace(hour=23, minute=59, second=59)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def get_flashcard_page(cursor=None, limit=DEFAULT_PAGE_SIZE, sort='id', order='asc', language=None,
+                       created_from=None, created_to=None, updated_from=None, updated_to=None):
+    """
+    Get one page of the flashcard listing
+
+    Args:
+        cursor (str): next_cursor of the previous page, or None for the first page
+        limit (int): Page size, at most MAX_PAGE_SIZE
+        sort (str): One of SORT_COLUMNS
+        order (str): 'asc' or 'desc'
+        language (str): Only cards of this language
+        created_from, created_to, updated_from, updated_to (str): Inclusive
+            ISO date or datetime bounds
+
+    Returns:
+        dict: items, next_cursor (None on the last page), limit, sort and order
+
+    Raises:
+        ValueError: On an unknown sort or order, a bad cursor or a bad date
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Unknown sort {sort!r}; use one of {', '.join(SORT_COLUMNS)}")
+    if order not in SORT_ORDERS:
+        raise ValueError(f"Unknown order {order!r}; use 'asc' or 'desc'")
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    after = decode_cursor(cursor, sort, order) if cursor else None
+
+    # One extra card tells whether there is a next page
+    items = db.list_flashcards(
+        sort=sort,
+        descending=order == 'desc',
+        after=after,
+        limit=limit + 1,
+        language=language or None,
+        created_from=parse_date_bound(created_from),
+        created_to=parse_date_bound(created_to, end=True),
+        updated_from=parse_date_bound(updated_from),
+        updated_to=parse_date_bound(updated_to, end=True),
+    )
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(sort, order, items[-1])
+
+    return {
+        'items': items,
+        'next_cursor': next_cursor,
+        'limit': limit,
+        'sort': sort,
+        'order': order,
+    }
+
+
+def next_page_url(path, query_params, next_cursor):
+    """Return a link to the next page that keeps the current filters, or None"""
+    if not next_cursor:
+        return None
+    params = {key: value for key, value in query_params.items() if key != 'cursor' and value}
+    params['cursor'] = next_cursor
+    return f"{path}?{urlencode(params)}"
@@ -0,0 +1,273 @@
+"""
+Token-bucket rate limits for the AI endpoints and for the model itself
+
+Two limits apply to a request that reaches the model:
+
+- RateLimitMiddleware gives each client its own bucket for the AI
+  endpoints. A client that empties it gets a 429 with Retry-After, so one
+  client hammering /api/chat can't use up the model quota by itself.
+- FairLimiter, in front of every model call (see gemini.py), holds one
+  bucket for the provider's quota. When calls have to wait for it, they
+  are served round-robin across clients rather than first come first
+  served, so a client with many calls queued doesn't delay everyone else.
+
+The client is identified by its address (the first X-Forwarded-For entry
+when RATE_LIMIT_TRUST_PROXY is set), or by its X-API-Key header if the key
+is one of RATE_LIMIT_API_KEYS. The app doesn't issue keys, so any other
+key is ignored: a client could otherwise send a new one with each request
+and get a full bucket every time. The middleware stores the key in
+``client_key`` for the model calls of the request.
+"""
+
+import asyncio
+import contextvars
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from starlette.responses import JSONResponse
+
+# Per-client limit on the AI endpoints; 0 turns it off
+RATE_LIMIT_PER_MINUTE = float(os.getenv('RATE_LIMIT_PER_MINUTE', '30'))
+RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', '10'))
+RATE_LIMIT_TRUST_PROXY = bool(os.getenv('RATE_LIMIT_TRUST_PROXY'))
+# Comma-separated X-API-Key values accepted as a client's identity
+RATE_LIMIT_API_KEYS = {key.strip() for key in os.getenv('RATE_LIMIT_API_KEYS', '').split(',') if key.strip()}
+# Buckets kept at most; the least recently seen clients are dropped first
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv('RATE_LIMIT_MAX_CLIENTS', '10000'))
+
+# Endpoints that call the model
+LIMITED_PATHS = (
+    '/api/chat',
+    '/api/translate',
+    '/api/grammar-check',
+    '/api/check-grammar',
+    '/api/summarize',
+    '/api/flashcards/batch',
+    '/create',
+)
+
+# The client a model call is made for
+client_key = contextvars.ContextVar('client_key', default='local')
+
+
+class RateLimitExceeded(Exception):
+    """A call was refused; ``retry_after`` is the number of seconds to wait"""
+
+    def __init__(self, retry_after, message='Too many requests'):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """
+    Holds up to ``burst`` tokens, refilled at ``rate`` tokens per second
+
+    Args:
+        rate (float): Tokens added per second
+        burst (int): Most tokens held at once; a new bucket starts full
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        """Take a token; returns 0, or the seconds until one is available (nothing taken)"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ClientLimiter:
+    """
+    One token bucket per client key
+
+    Args:
+        per_minute (float): Requests each client may make per minute
+        burst (int): Requests a client may make at once after being idle
+        max_clients (int): Buckets kept at most
+    """
+
+    def __init__(self, per_minute=RATE_LIMIT_PER_MINUTE, burst=RATE_LIMIT_BURST, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self.stats = {'allowed': 0, 'limited': 0}
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def take(self, key):
+        """Count a request of ``key``; returns 0, or the seconds it has to wait"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            # A dropped client starts again with a full bucket, as if idle
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        wait = bucket.take()
+        self.stats['limited' if wait else 'allowed'] += 1
+        return wait
+
+    def reset(self):
+        """Forget every client's bucket"""
+        self._buckets.clear()
+
+
+def request_client_key(scope):
+    """Identify the client of an ASGI request"""
+    headers = dict(scope.get('headers') or [])
+    api_key = headers.get(b'x-api-key', b'').decode('latin-1')
+    if api_key in RATE_LIMIT_API_KEYS:
+        return 'key:' + api_key
+    if RATE_LIMIT_TRUST_PROXY and headers.get(b'x-forwarded-for'):
+        return headers[b'x-forwarded-for'].decode('latin-1').split(',')[0].strip()
+    client = scope.get('client')
+    return client[0] if client else 'unknown'
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware applying a ClientLimiter to the AI endpoints
+
+    Every HTTP request gets its client key set in ``client_key``; POSTs to
+    LIMITED_PATHS also take a token from the client's bucket or get a 429.
+    """
+
+    def __init__(self, app, limiter, paths=LIMITED_PATHS):
+        self.app = app
+        self.limiter = limiter
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        key = request_client_key(scope)
+        token = client_key.set(key)
+        try:
+            if self.limiter.enabled and scope['method'] == 'POST' and scope['path'].startswith(self.paths):
+                wait = self.limiter.take(key)
+                if wait:
+                    error = RateLimitExceeded(wait)
+                    response = JSONResponse(
+                        {'detail': str(error)}, status_code=429,
+                        headers={'Retry-After': error.retry_after_header},
+                    )
+                    return await response(scope, receive, send)
+            await self.app(scope, receive, send)
+        finally:
+            client_key.reset(token)
+
+
+class FairLimiter:
+    """
+    A shared token bucket whose waiting calls are served round-robin by client
+
+    Args:
+        per_minute (float): Calls allowed per minute; 0 means no limit
+        burst (int): Calls allowed at once after an idle spell
+        max_waiting (int): Calls one client may have waiting; more are refused
+    """
+
+    def __init__(self, per_minute, burst, max_waiting):
+        self.bucket = TokenBucket(per_minute / 60, burst) if per_minute > 0 else None
+        self.max_waiting = max_waiting
+        # Client key -> its waiting futures; the order is the round-robin turn
+        self._waiting = OrderedDict()
+        self._timer = None
+        self.stats = {'immediate': 0, 'queued': 0, 'refused': 0, 'max_waiting': 0}
+
+    def waiting(self):
+        """Number of calls waiting for a token"""
+        return sum(len(queue) for queue in self._waiting.values())
+
+    async def acquire(self, key, timeout=None):
+        """
+        Wait for a token for a call made for client ``key``
+
+        Raises:
+            RateLimitExceeded: If the client already has max_waiting calls
+                waiting, or no token came within ``timeout`` seconds
+        """
+        if self.bucket is None:
+            return
+        if not self._waiting and not self.bucket.take():
+            self.stats['immediate'] += 1
+            return
+        queue = self._waiting.setdefault(key, deque())
+        if len(queue) >= self.max_waiting:
+            self.stats['refused'] += 1
+            raise RateLimitExceeded(self._expected_wait(), 'Too many model calls waiting for this client')
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        self.stats['queued'] += 1
+        self.stats['max_waiting'] = max(self.stats['max_waiting'], self.waiting())
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.stats['refused'] += 1
+            raise RateLimitExceeded(self._expected_wait(), 'Timed out waiting for the model quota')
+        finally:
+            if not future.done() or future.cancelled():
+                self._discard(key, future)
+
+    def _expected_wait(self):
+        return (self.waiting() + 1) / self.bucket.rate
+
+    def _discard(self, key, future):
+        queue = self._waiting.get(key)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            if not queue:
+                del self._waiting[key]
+
+    def _dispatch(self):
+        """Hand out the available tokens, one client at a time, and wake up when the next is due"""
+        loop = asyncio.get_running_loop()
+        if self._timer is not None:
+            timer_loop, handle = self._timer
+            if timer_loop is loop and not handle.cancelled():
+                # Already due to run; it hands out whatever has accumulated
+                return
+            self._timer = None
+        while self._waiting:
+            key, queue = next(iter(self._waiting.items()))
+            if queue[0].done():
+                # Its caller gave up already
+                queue.popleft()
+            else:
+                wait = self.bucket.take()
+                if wait:
+                    self._timer = (loop, loop.call_later(wait, self._wake))
+                    return
+                queue.popleft().set_result(None)
+            # The client goes to the back of the line
+            if queue:
+                self._waiting.move_to_end(key)
+            else:
+                del self._waiting[key]
+
+    def _wake(self):
+        self._timer = None
+        self._dispatch()
@@ -0,0 +1,70 @@
+"""
+Deck-wide study statistics
+
+Workload forecasts, overdue counts and expected retention are computed
+with numpy over the schedule column arrays of the storage backend
+(db.get_schedule_columns), not card by card.
+"""
+
+from datetime import datetime
+
+from src.flashcards.database import db, scheduler
+
+DEFAULT_FORECAST_DAYS = 30
+MAX_FORECAST_DAYS = 365
+
+
+def _now():
+    return datetime.now().strftime(scheduler.TIMESTAMP_FORMAT)
+
+
+def get_study_streak(today=None):
+    """
+    Get the number of consecutive days, up to today, with at least one review
+
+    Args:
+        today (str): 'YYYY-MM-DD', defaults to today
+
+    Returns:
+        int: The streak; a streak last extended yesterday still counts
+    """
+    return scheduler.study_streak(db.get_review_days(), today or _now()[:10])
+
+
+def get_study_stats(now=None):
+    """
+    Get the deck's review state at ``now``
+
+    Args:
+        now (str): 'YYYY-MM-DD HH:MM:SS', defaults to now
+
+    Returns:
+        dict: Card counts, cards due per language, the expected retention
+            of the reviewed cards, the target retention and the study streak
+    """
+    now = now or _now()
+    columns = db.get_schedule_columns()
+    overdue = scheduler.overdue_by_language(columns, now)
+    return {
+        'now': now,
+        'cards': len(columns['id']),
+        'reviewed': scheduler.reviewed_cards(columns),
+        'due_now': sum(overdue.values()),
+        'overdue_by_language': overdue,
+        'expected_retention': scheduler.expected_retention(columns, now),
+        'target_retention': scheduler.TARGET_RETENTION,
+        'study_streak': get_study_streak(now[:10]),
+    }
+
+
+def get_forecast(days=DEFAULT_FORECAST_DAYS, now=None):
+    """
+    Get the number of cards falling due on each of the next ``days`` days
+
+    Cards already overdue count towards today.
+
+    Returns:
+        dict: now and a list of {'date', 'due'}
+    """
+    now = now or _now()
+    return {'now': now, 'days': scheduler.forecast(db.get_schedule_columns(), now, days)}
@@ -4,9 +4,12 @@ This module provides helper functions for template rendering
 """
 
 import datetime
-import random
-from src.flashcards.database import csv_db
-import pandas as pd
+from urllib.parse import urlencode
+from src.flashcards.database import db
+from src.flashcards.utils import pagination, study_stats
+
+# Cards handed to the study page at a time
+STUDY_SESSION_SIZE = 50
 
 def get_common_context():
     """
@@ -15,27 +18,20 @@ def get_common_context():
     Returns:
         dict: Dictionary with common template variables
     """
-    # Get all flashcards to extract languages and stats
-    try:
-        flashcards_df = csv_db.get_flashcards()
-    except Exception:
-        flashcards_df = pd.DataFrame(columns=['id', 'word', 'language', 'translations', 'pronunciation', 'examples', 'created_at', 'updated_at'])
+    # Languages and card count come from the cached flashcard snapshot,
+    # so rendering a page doesn't re-read the flashcard store
+    stats = db.get_flashcard_stats()
+    languages = stats['languages']
     
-    # Count languages
-    languages = []
-    if not flashcards_df.empty and 'language' in flashcards_df.columns:
-        languages = flashcards_df['language'].unique().tolist()
-    
-    # Calculate study streak (simulated for now)
-    # In a real app, this would be calculated from user's study history
-    study_streak = random.randint(1, 30)
+    # Consecutive days with at least one review
+    study_streak = study_stats.get_study_streak()
     
     # Navigation info
     nav_info = {
         'current_path': '/',
         'languages': languages,
         'study_streak': study_streak,
-        'flashcard_count': len(flashcards_df) if not flashcards_df.empty else 0,
+        'flashcard_count': stats['count'],
         'dark_mode': False,
         'today': datetime.datetime.now().strftime('%Y-%m-%d'),
     }
@@ -45,6 +41,55 @@ def get_common_context():
         'debug': False,  # Set to True to enable debug mode
     }
 
+def get_flashcard_page_context(request, path):
+    """
+    Get one page of flashcards for a listing view
+    
+    The page follows the request's cursor, sort, order and language query
+    parameters, like GET /api/flashcards.
+    
+    Args:
+        request: The incoming request
+        path (str): Path of the view, used for the page links
+        
+    Returns:
+        dict: flashcards, next_page_url and first_page_url (None on the first page)
+        
+    Raises:
+        ValueError: On an invalid sort, order or cursor
+    """
+    params = request.query_params
+    page = pagination.get_flashcard_page(
+        cursor=params.get('cursor'),
+        sort=params.get('sort', 'id'),
+        order=params.get('order', 'asc'),
+        language=params.get('language'),
+    )
+    
+    first_page_url = None
+    if params.get('cursor'):
+        filters = urlencode({key: value for key, value in params.items() if key != 'cursor' and value})
+        first_page_url = f"{path}?{filters}" if filters else path
+    
+    return {
+        'flashcards': page['items'],
+        'next_page_url': pagination.next_page_url(path, params, page['next_cursor']),
+        'first_page_url': first_page_url,
+    }
+
+def get_study_context(request):
+    """
+    Get the cards due for review for the study page
+    
+    Args:
+        request: The incoming request; ``language`` limits the cards to one language
+        
+    Returns:
+        dict: flashcards, the most overdue first
+    """
+    language = request.query_params.get('language') or None
+    return {'flashcards': db.get_due_flashcards(STUDY_SESSION_SIZE, language)}
+
 def format_flashcard_for_template(flashcard):
     """
     Format a flashcard dictionary for use in templates
@@ -0,0 +1,409 @@
+"""
+Fetch web pages and extract their readable text
+
+Pages are fetched with one shared httpx.AsyncClient, so connections are
+pooled and kept alive across requests. Each host also has its own limit on
+concurrent fetches, so one slow site can't take up the whole pool. The
+body is streamed and reading stops at EXTRACT_MAX_BYTES.
+
+Only public addresses are fetched: the host is resolved before connecting,
+and loopback, private, link-local, multicast and reserved addresses are
+refused (EXTRACT_ALLOW_PRIVATE lifts this for local testing). Redirects are
+followed one hop at a time, so every hop is checked the same way. Decoding
+and parsing a page run in a worker thread, off the event loop.
+
+Extracted text is cached per URL together with the page's ETag and
+Last-Modified headers. The next fetch of the URL sends those headers, and
+a 304 answer reuses the cached text without downloading or parsing the
+page again. Within a max-age given by the page, no request is made at all.
+
+The extractor is a single pass of html.parser. It drops scripts, styles,
+navigation, headers, footers, sidebars and forms, along with elements
+whose class or id names such boilerplate. When the page has an <article>
+or <main> element, only its content is kept. Blocks made up mostly of link
+text are dropped too.
+"""
+
+import asyncio
+import ipaddress
+import re
+import os
+import socket
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+EXTRACT_TIMEOUT = float(os.getenv('EXTRACT_TIMEOUT', '10'))
+EXTRACT_MAX_BYTES = int(os.getenv('EXTRACT_MAX_BYTES', str(2 * 1024 * 1024)))
+EXTRACT_MAX_CONNECTIONS = int(os.getenv('EXTRACT_MAX_CONNECTIONS', '100'))
+EXTRACT_PER_HOST = int(os.getenv('EXTRACT_PER_HOST', '6'))
+EXTRACT_CACHE_ENTRIES = int(os.getenv('EXTRACT_CACHE_ENTRIES', '512'))
+EXTRACT_MAX_REDIRECTS = int(os.getenv('EXTRACT_MAX_REDIRECTS', '5'))
+EXTRACT_ALLOW_PRIVATE = bool(os.getenv('EXTRACT_ALLOW_PRIVATE'))
+# The summarize page accepts this much text
+MAX_CONTENT_CHARS = 10000
+
+USER_AGENT = 'StudyWAI/1.0 (+text extraction for summaries)'
+_TEXT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+_REDIRECTS = (301, 302, 303, 307, 308)
+
+_SKIP_TAGS = {
+    'script', 'style', 'noscript', 'template', 'svg', 'canvas', 'iframe', 'object',
+    'nav', 'header', 'footer', 'aside', 'form', 'button', 'select', 'textarea', 'dialog',
+}
+_VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr',
+}
+_BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'main', 'blockquote', 'pre', 'li', 'ul', 'ol', 'dl', 'dt', 'dd',
+    'table', 'tr', 'td', 'th', 'figcaption', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br', 'hr', 'body',
+}
+_HEADINGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+_BOILERPLATE = re.compile(
+    r'(^|[\s_-])(nav|navbar|menu|header|footer|sidebar|breadcrumbs?|comments?|cookies?|banner|share|'
+    r'social|related|advert|ads?|promo|newsletter|subscribe|popup|modal)($|[\s_-])',
+    re.IGNORECASE,
+)
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+class ExtractError(Exception):
+    """A page could not be fetched or had no text; ``status_code`` is the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _TextExtractor(HTMLParser):
+    """Collect the text blocks of a page, skipping boilerplate subtrees"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ''
+        self.blocks = []
+        self._stack = []
+        # Depth in _stack of the outermost skipped element, or None
+        self._skip_depth = None
+        self._main_depth = None
+        self._in_title = False
+        self._in_link = 0
+        self._parts = []
+        self._link_chars = 0
+        self._heading = False
+
+    def _flush(self):
+        text = ' '.join(''.join(self._parts).split())
+        if text:
+            self.blocks.append((text, self._link_chars, self._heading, self._main_depth is not None))
+        self._parts = []
+        self._link_chars = 0
+        self._heading = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_TAGS:
+            if tag in ('br', 'hr') and self._skip_depth is None:
+                self._flush()
+            return
+        self._stack.append(tag)
+        if tag == 'title':
+            self._in_title = True
+        if self._skip_depth is not None:
+            return
+        names = ' '.join(value for name, value in attrs if name in ('class', 'id', 'role') and value)
+        if tag in _SKIP_TAGS or (names and _BOILERPLATE.search(names) and tag not in ('body', 'main', 'article')):
+            self._flush()
+            self._skip_depth = len(self._stack)
+            return
+        if tag in _BLOCK_TAGS:
+            self._flush()
+            self._heading = tag in _HEADINGS
+        if tag in ('article', 'main') and self._main_depth is None:
+            self._main_depth = len(self._stack)
+        if tag == 'a':
+            self._in_link += 1
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_TAGS or tag not in self._stack:
+            return
+        # Close whatever the page left open inside this element
+        while self._stack:
+            depth = len(self._stack)
+            closed = self._stack.pop()
+            if closed == 'title':
+                self._in_title = False
+            if self._skip_depth == depth:
+                self._skip_depth = None
+            elif self._skip_depth is None:
+                if closed == 'a':
+                    self._in_link = max(self._in_link - 1, 0)
+                if closed in _BLOCK_TAGS:
+                    self._flush()
+                if self._main_depth == depth:
+                    self._main_depth = None
+            if closed == tag:
+                break
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            return
+        if self._skip_depth is not None:
+            return
+        self._parts.append(data)
+        if self._in_link:
+            self._link_chars += len(data.strip())
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def extract_text(html):
+    """
+    Extract the readable text of an HTML page
+
+    Args:
+        html (str): The page
+
+    Returns:
+        tuple: (title, text); paragraphs of the text are separated by blank lines
+    """
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    blocks = parser.blocks
+    if any(in_main for _, _, _, in_main in blocks):
+        blocks = [block for block in blocks if block[3]]
+    paragraphs = [
+        text for text, link_chars, heading, _ in blocks
+        # Menus and link lists: mostly link text
+        if link_chars <= len(text) * 0.5 and (heading or len(text.split()) >= 3)
+    ]
+    return ' '.join(parser.title.split()), '\n\n'.join(paragraphs)
+
+
+# Shared client and per-host limits. Both belong to the event loop that
+# created them, so another loop (tests, scripts) gets its own.
+_state = {'loop': None, 'client': None, 'hosts': {}}
+_cache = OrderedDict()
+_stats = {'fetched': 0, 'not_modified': 0, 'fresh': 0, 'truncated': 0}
+
+
+def _client():
+    # Imported on the first fetch: httpx is slow to import and only needed here
+    import httpx
+    loop = asyncio.get_running_loop()
+    if _state['loop'] is not loop:
+        _state['loop'] = loop
+        _state['hosts'] = {}
+        _state['client'] = httpx.AsyncClient(
+            timeout=httpx.Timeout(EXTRACT_TIMEOUT),
+            limits=httpx.Limits(max_connections=EXTRACT_MAX_CONNECTIONS, max_keepalive_connections=EXTRACT_MAX_CONNECTIONS),
+            # Followed by extract_url, which checks each hop's address
+            follow_redirects=False,
+            headers={'User-Agent': USER_AGENT, 'Accept': 'text/html,application/xhtml+xml,text/plain;q=0.9'},
+        )
+    return _state['client']
+
+
+def _host_limit(host):
+    limit = _state['hosts'].get(host)
+    if limit is None:
+        limit = _state['hosts'][host] = asyncio.Semaphore(EXTRACT_PER_HOST)
+    return limit
+
+
+async def close_client():
+    """Close the shared client's connections (call at shutdown)"""
+    client = _state['client']
+    _state.update(loop=None, client=None, hosts={})
+    if client is not None:
+        await client.aclose()
+
+
+def get_extract_stats():
+    """Get the fetch counters and the number of cached pages"""
+    return dict(_stats, cached_pages=len(_cache))
+
+
+def _remember(url, entry):
+    _cache[url] = entry
+    _cache.move_to_end(url)
+    while len(_cache) > EXTRACT_CACHE_ENTRIES:
+        _cache.popitem(last=False)
+
+
+def _decode(body, response):
+    encoding = response.charset_encoding
+    if not encoding:
+        found = _META_CHARSET.search(body[:2048])
+        encoding = found.group(1).decode('ascii') if found else 'utf-8'
+    try:
+        return body.decode(encoding, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+
+async def _read_body(response):
+    """Read at most EXTRACT_MAX_BYTES of the body; returns (bytes, truncated)"""
+    length = response.headers.get('content-length')
+    chunks = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= EXTRACT_MAX_BYTES:
+            return b''.join(chunks)[:EXTRACT_MAX_BYTES], True
+    truncated = bool(length and length.isdigit() and int(length) > size)
+    return b''.join(chunks), truncated
+
+
+def _checked(url):
+    """Return the parts of an http(s) URL, or raise a 400 ExtractError"""
+    parts = urlsplit(url)
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+        parts = None
+    if parts is None or parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ExtractError('Only http and https URLs can be extracted', status_code=400)
+    return parts, port or (443 if parts.scheme == 'https' else 80)
+
+
+async def _check_address(host, port):
+    """
+    Refuse hosts that resolve to a non-public address
+
+    Raises:
+        ExtractError: 400 for a loopback, private, link-local, multicast or
+            reserved address; 502 if the host can't be resolved
+    """
+    if EXTRACT_ALLOW_PRIVATE:
+        return
+    try:
+        found = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except OSError:
+        raise ExtractError(f'Could not resolve {host}')
+    for *_, sockaddr in found:
+        address = ipaddress.ip_address(sockaddr[0].split('%')[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ExtractError('Pages on local or private addresses cannot be extracted', status_code=400)
+
+
+def _parse(body, response, content_type):
+    """Decode a page and extract its text; returns (title, content)"""
+    text = _decode(body, response)
+    if content_type == 'text/plain':
+        return '', text.strip()
+    return extract_text(text)
+
+
+def _result(url, entry, cached):
+    content = entry['content']
+    return {
+        'url': url,
+        'title': entry['title'],
+        'content': content[:MAX_CONTENT_CHARS],
+        'truncated': entry['truncated'] or len(content) > MAX_CONTENT_CHARS,
+        'cached': cached,
+    }
+
+
+async def extract_url(url):
+    """
+    Fetch a web page and extract its text
+
+    Args:
+        url (str): An http or https URL
+
+    Returns:
+        dict: url (after redirects), title, content (at most
+            MAX_CONTENT_CHARS), truncated and cached (True when the page
+            was not downloaded again)
+
+    Raises:
+        ExtractError: The URL is invalid or the page could not be fetched
+            or has no text
+    """
+    import httpx
+    url = url.strip()
+    parts, port = _checked(url)
+
+    entry = _cache.get(url)
+    if entry is not None and entry['expires'] > time.monotonic():
+        _stats['fresh'] += 1
+        _cache.move_to_end(url)
+        return _result(entry['url'], entry, cached=True)
+
+    headers = {}
+    if entry is not None:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    # The client first: a new event loop starts with new host limits
+    client = _client()
+    target = url
+    try:
+        for _ in range(EXTRACT_MAX_REDIRECTS + 1):
+            await _check_address(parts.hostname, port)
+            async with _host_limit(parts.hostname.lower()):
+                async with client.stream('GET', target, headers=headers) as response:
+                    if response.status_code in _REDIRECTS and 'location' in response.headers:
+                        target = urljoin(target, response.headers['location'])
+                        parts, port = _checked(target)
+                        continue
+                    if response.status_code == 304 and entry is not None:
+                        _stats['not_modified'] += 1
+                        entry['expires'] = _expires(response)
+                        _remember(url, entry)
+                        return _result(entry['url'], entry, cached=True)
+                    if response.status_code >= 400:
+                        raise ExtractError(f'The page answered with HTTP {response.status_code}')
+                    content_type = response.headers.get('content-type', 'text/html').split(';')[0].strip().lower()
+                    if content_type not in _TEXT_TYPES:
+                        raise ExtractError(f'Cannot extract text from {content_type or "this page"}', status_code=415)
+                    body, truncated = await _read_body(response)
+                    break
+        else:
+            raise ExtractError('The page redirected too many times')
+    except httpx.TimeoutException:
+        raise ExtractError('Timed out fetching the page', status_code=504)
+    except httpx.HTTPError as e:
+        raise ExtractError(f'Could not fetch the page: {e}')
+
+    _stats['fetched'] += 1
+    if truncated:
+        _stats['truncated'] += 1
+    # Parsing a large page takes long enough to hold up other requests
+    title, content = await asyncio.to_thread(_parse, body, response, content_type)
+    if not content:
+        raise ExtractError('No readable text found on the page', status_code=422)
+
+    entry = {
+        'url': str(response.url),
+        'title': title,
+        'content': content,
+        'truncated': truncated,
+        'etag': response.headers.get('etag'),
+        'last_modified': response.headers.get('last-modified'),
+        'expires': _expires(response),
+    }
+    _remember(url, entry)
+    return _result(entry['url'], entry, cached=False)
+
+
+def _expires(response):
+    """When a page may be reused without asking the server again"""
+    control = response.headers.get('cache-control', '')
+    found = _MAX_AGE.search(control)
+    if not found or 'no-cache' in control or 'no-store' in control:
+        return 0.0
+    return time.monotonic() + int(found.group(1))
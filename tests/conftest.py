@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Tests never reach the real model
+os.environ.setdefault('AI_PROVIDER', 'fake')
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Run the test from an empty directory so app/data is created fresh"""
+    from src.flashcards.database import csv_db
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(csv_db, '_flashcard_log', None)
+    monkeypatch.setattr(csv_db, '_history_writer', None)
+    monkeypatch.setattr(csv_db, '_history_readers', {})
+    monkeypatch.setattr(csv_db, '_search_index', None)
+    monkeypatch.setattr(csv_db, '_duplicate_index', None)
+    monkeypatch.setattr(csv_db, '_schedule_log', None)
+    monkeypatch.setattr(csv_db, '_due_queue', None)
+    monkeypatch.setattr(csv_db, '_chat_turn_log', None)
+    monkeypatch.setattr(csv_db, '_chat_session_log', None)
+    monkeypatch.setattr(csv_db, '_review_days', {'inode': None, 'offset': 0, 'days': set()})
+    monkeypatch.setattr(csv_db, '_flashcard_table', None)
+    csv_db.init_database()
+    yield tmp_path / csv_db.DATA_DIR
+    # Queued history rows belong to this test's directory
+    csv_db.close_history()
+
+
+@pytest.fixture
+def app_client(data_dir):
+    """
+    Return an async HTTP client bound to the FastAPI app
+
+    The app resolves app/static and app/templates relative to the working
+    directory, so they are linked into the test directory first.
+    """
+    import httpx
+
+    for name in ('static', 'templates'):
+        os.symlink(os.path.join(REPO_ROOT, 'app', name), os.path.join('app', name))
+
+    import app
+
+    # Every test starts with full rate-limit buckets
+    app.client_limiter.reset()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url='http://testserver')
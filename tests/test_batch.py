@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+from src.flashcards.ai import batch, gemini
+from src.flashcards.ai.cache import ResponseCache
+from src.flashcards.ai.fake_model import FakeProvider, respond
+from src.flashcards.database import csv_db
+
+
+class PartialModel(FakeProvider):
+    """Batches skip words starting with "x"; single-word calls for "xbad" are malformed"""
+
+    def respond(self, prompt):
+        if 'Generate flashcard data for each' in prompt:
+            cards = [card for card in json.loads(respond(prompt)) if not card['word'].startswith('x')]
+            return json.dumps(cards)
+        if '"xbad"' in prompt:
+            return 'I am not sure.'
+        return respond(prompt)
+
+
+def run_job(words):
+    async def run():
+        job = batch.start_job(words, 'english')
+        while batch.get_job(job['job_id'])['status'] in ('pending', 'running'):
+            await asyncio.sleep(0.01)
+        return batch.get_job(job['job_id'])
+
+    return asyncio.run(run())
+
+
+def test_batches_words_and_retries_missing_ones(data_dir, monkeypatch):
+    model = PartialModel()
+    monkeypatch.setattr(gemini, 'provider', model)
+    monkeypatch.setattr(gemini, 'response_cache', ResponseCache())
+    monkeypatch.setattr(batch, 'BATCH_SIZE', 10)
+
+    words = [f'word{i}' for i in range(25)] + ['xgood', 'xbad']
+    job = run_job(words)
+
+    assert job['status'] == 'completed'
+    assert job['generated'] == 26
+    assert job['failed'] == ['xbad']
+    assert sorted(job['retried']) == ['xbad', 'xgood']
+    # 3 batches, one retry for xgood and two for xbad
+    assert model.calls == 6
+    assert len(job['flashcard_ids']) == 26
+    assert 'xbad' not in set(csv_db.get_flashcards()['word'])
+
+
+def test_parse_word_list_drops_blanks_and_repeats():
+    assert batch.parse_word_list('run\nwalk, jump\n\nRun\n') == ['run', 'walk', 'jump']
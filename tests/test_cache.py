@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from src.flashcards.ai import gemini
+from src.flashcards.ai.cache import ResponseCache, make_key
+from src.flashcards.ai.fake_model import FakeProvider
+from src.flashcards.ai.parser import ParseError
+
+
+def test_key_normalizes_whitespace_and_params():
+    assert make_key('translate', 'hello   world ', target_lang='ES') == make_key('translate', 'hello world', target_lang='es')
+    assert make_key('translate', 'hello', target_lang='es') != make_key('translate', 'hello', target_lang='fr')
+
+
+def test_concurrent_identical_requests_share_one_computation():
+    cache = ResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'value'
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute('k', compute) for _ in range(20)))
+
+    assert asyncio.run(run()) == ['value'] * 20
+    assert len(calls) == 1
+    assert cache.stats()['coalesced'] == 19
+
+
+def test_cancelled_leader_does_not_fail_waiters():
+    cache = ResponseCache()
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return 'value'
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_compute('k', compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute('k', compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(run()) == 'value'
+    assert cache.get('k') == 'value'
+
+
+def test_uncacheable_values_are_not_stored():
+    cache = ResponseCache()
+
+    async def compute():
+        return 'garbage'
+
+    asyncio.run(cache.get_or_compute('k', compute, cacheable=lambda value: value != 'garbage'))
+    assert cache.get('k') is None
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+
+    async def compute():
+        return {'translated_text': 'hola'}
+
+    asyncio.run(ResponseCache(disk_path=path).get_or_compute('k', compute))
+    assert ResponseCache(disk_path=path).get('k') == {'translated_text': 'hola'}
+
+
+def test_malformed_model_reply_is_not_cached(data_dir, monkeypatch):
+    class Malformed(FakeProvider):
+        def respond(self, prompt):
+            return 'Sorry, I cannot help with that.'
+
+    model = Malformed()
+    monkeypatch.setattr(gemini, 'provider', model)
+    monkeypatch.setattr(gemini, 'response_cache', ResponseCache())
+
+    for _ in range(2):
+        with pytest.raises(ParseError):
+            asyncio.run(gemini.translate('hello', 'en', 'es'))
+
+    assert model.calls == 2
@@ -0,0 +1,138 @@
+import asyncio
+import csv
+import os
+
+import pytest
+
+from src.flashcards.ai import gemini
+from src.flashcards.ai.chunking import estimate_tokens
+from src.flashcards.ai.fake_model import FakeProvider
+from src.flashcards.database import csv_db, sqlite_db
+
+
+class RecordingModel(FakeProvider):
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    def generate(self, prompt):
+        self.prompts.append(prompt)
+        return super().generate(prompt)
+
+
+@pytest.fixture
+def model(data_dir, monkeypatch):
+    model = RecordingModel()
+    monkeypatch.setattr(gemini, 'provider', model)
+    return model
+
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def backend(request, data_dir):
+    if request.param == 'csv':
+        yield csv_db
+        return
+    sqlite_db.close_history()
+    sqlite_db.init_database()
+    yield sqlite_db
+    sqlite_db.close_history()
+
+
+def test_sessions_keep_a_ring_of_recent_turns(backend):
+    session = backend.create_chat_session()
+    other = backend.create_chat_session()
+    for i in range(15):
+        backend.save_chat_history(f'question {i}', f'answer {i}', session['id'])
+    backend.save_chat_history('elsewhere', 'reply', other['id'])
+
+    recent = backend.get_recent_chat_turns(session['id'], 3)
+    assert [turn['user_message'] for turn in recent] == ['question 12', 'question 13', 'question 14']
+    assert len(backend.get_recent_chat_turns(session['id'], 100)) == backend.CHAT_RECENT_TURNS
+
+    saved = backend.get_chat_session(session['id'])
+    assert saved['turns'] == 15
+    assert saved['recent'] == [turn['id'] for turn in backend.get_recent_chat_turns(session['id'])]
+    assert backend.get_chat_session(999) is None
+
+    # An older summary never replaces a newer one
+    assert backend.update_chat_summary(session['id'], 'up to ten', recent[0]['id'] - 2)
+    assert not backend.update_chat_summary(session['id'], 'up to five', recent[0]['id'] - 7)
+    assert backend.get_chat_session(session['id'])['summary'] == 'up to ten'
+    assert [turn['user_message'] for turn in backend.get_chat_history(2)] == ['elsewhere', 'question 14']
+
+
+def test_long_conversations_are_summarized(model, monkeypatch):
+    monkeypatch.setattr(gemini, 'CHAT_HISTORY_TOKENS', 200)
+    session_id = csv_db.create_chat_session()['id']
+
+    for i in range(60):
+        asyncio.run(gemini.chat_with_ai(f'How do I say word number {i} in Spanish?', session_id=session_id))
+
+    chat_prompts = [prompt for prompt in model.prompts if 'Update the summary' not in prompt]
+    summary_prompts = len(model.prompts) - len(chat_prompts)
+    assert len(chat_prompts) == 60
+    # Summaries are folded in batches, not on every turn
+    assert 0 < summary_prompts <= 60 / 4
+    # The prompt stops growing once the history reaches its budget
+    assert max(estimate_tokens(prompt) for prompt in chat_prompts) < 200 + estimate_tokens(chat_prompts[0]) * 2
+    assert 'word number 58' in chat_prompts[-1]
+    assert 'word number 0 ' not in chat_prompts[-1]
+
+    session = csv_db.get_chat_session(session_id)
+    assert session['turns'] == 60
+    assert session['summary'] in chat_prompts[-1]
+    # Turns after the summary are all still in the ring
+    assert session['summarized_through'] >= session['recent'][0] - 1
+
+
+def test_failed_summary_keeps_the_prompt_bounded(model, monkeypatch):
+    monkeypatch.setattr(gemini, 'CHAT_HISTORY_TOKENS', 200)
+    session_id = csv_db.create_chat_session()['id']
+    for i in range(20):
+        csv_db.save_chat_history(f'message {i} ' * 5, 'reply', session_id)
+
+    async def fail(prompt, timeout=None):
+        raise RuntimeError('model went away')
+
+    monkeypatch.setattr(gemini, '_generate', fail)
+    summary, turns = asyncio.run(gemini._chat_history(session_id))
+
+    assert summary == ''
+    assert gemini._history_tokens(summary, turns) <= 100
+    assert csv_db.get_chat_session(session_id)['summarized_through'] == 0
+
+
+def test_chat_endpoint_continues_a_session(app_client, model):
+    async def run():
+        async with app_client as client:
+            first = await client.post('/api/chat', json={'message': 'I am learning French.'})
+            session_id = first.json()['session_id']
+            second = await client.post('/api/chat', json={'message': 'Quiz me.', 'session_id': session_id})
+            session = await client.get(f'/api/chat/sessions/{session_id}', params={'limit': 1})
+            missing = await client.post('/api/chat', json={'message': 'Hi', 'session_id': 999})
+            return first, second, session, missing
+
+    first, second, session, missing = asyncio.run(run())
+
+    assert first.status_code == second.status_code == 200
+    assert second.json()['session_id'] == first.json()['session_id']
+    assert 'I am learning French.' in model.prompts[1]
+    assert session.json()['turns'] == 2
+    assert [turn['user_message'] for turn in session.json()['recent_turns']] == ['Quiz me.']
+    assert missing.status_code == 404
+
+
+def test_legacy_chat_history_is_migrated(data_dir, monkeypatch):
+    with open(csv_db.CHAT_HISTORY_CSV, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_db.CHAT_HISTORY_COLUMNS)
+        writer.writerow([1, 'hi', 'hello', '2024-01-01 10:00:00'])
+        writer.writerow([2, 'bye', 'goodbye', '2024-01-01 10:01:00'])
+    monkeypatch.setattr(csv_db, '_chat_turn_log', None)
+
+    csv_db.init_database()
+    csv_db.save_chat_history('again', 'welcome back')
+
+    assert [turn['user_message'] for turn in csv_db.get_chat_history()] == ['again', 'bye', 'hi']
+    assert os.path.exists(csv_db.CHAT_HISTORY_CSV + '.migrated')
+    assert not os.path.exists(csv_db.CHAT_HISTORY_CSV)
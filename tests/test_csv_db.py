@@ -0,0 +1,43 @@
+from src.flashcards.database import csv_db
+
+
+def test_one_parse_per_write(data_dir):
+    csv_db.save_flashcard('hola', 'spanish', 'hello', 'o-la', 'Hola amigo')
+
+    for _ in range(10):
+        csv_db.get_flashcards()
+        csv_db.get_flashcard_stats()
+
+    stats = csv_db.get_flashcard_cache_stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 19
+
+    csv_db.save_flashcard('adios', 'spanish', 'bye', '', '')
+    assert csv_db.get_flashcard_stats() == {'count': 2, 'languages': ['spanish']}
+    assert csv_db.get_flashcard_cache_stats()['misses'] == 2
+
+
+def test_out_of_process_write_invalidates_snapshot(data_dir):
+    csv_db.save_flashcard('hola', 'spanish', 'hello', '', '')
+    assert len(csv_db.get_flashcards()) == 1
+
+    other = csv_db.RecordLog(csv_db.FLASHCARDS_LOG).open()
+    other.put({'id': other.next_id(), 'word': 'ciao', 'language': 'italian'})
+
+    assert csv_db.get_flashcard_stats()['languages'] == ['spanish', 'italian']
+
+
+def test_migrates_legacy_csv(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(csv_db, '_flashcard_log', None)
+    (tmp_path / 'app' / 'data').mkdir(parents=True)
+    (tmp_path / csv_db.FLASHCARDS_CSV).write_text(
+        'id,word,language,translations,pronunciation,examples,created_at,updated_at\n'
+        '3,hola,spanish,hello,o-la,Hola,2024-01-01 00:00:00,2024-01-01 00:00:00\n',
+        encoding='utf-8'
+    )
+
+    csv_db.init_database()
+
+    assert csv_db.get_flashcard(3)['word'] == 'hola'
+    assert (tmp_path / (csv_db.FLASHCARDS_CSV + '.migrated')).exists()
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from src.flashcards.ai import gemini
+from src.flashcards.ai.cache import ResponseCache
+from src.flashcards.ai.fake_model import FakeProvider
+from src.flashcards.database import csv_db, duplicate_index, sqlite_db
+from src.flashcards.database.duplicate_index import DuplicateIndex, normalize, similarities, vector
+from src.flashcards.database.record_log import RecordLog
+
+
+def card(card_id, word, language='english'):
+    return {'id': card_id, 'word': word, 'language': language}
+
+
+def matches(found):
+    return [(card_id, exact) for card_id, _, exact in found]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RecordLog(str(tmp_path / 'flashcards.log')).open()
+    store.put_many([
+        card(1, 'Run'),
+        card(2, 'running'),
+        card(3, 'house'),
+        card(4, 'run', language='spanish'),
+        card(5, 'café'),
+    ])
+    return store
+
+
+def test_similar_spellings_score_high():
+    assert normalize('  Café  au   lait ') == 'cafe au lait'
+
+    def score(a, b):
+        return float(similarities(vector(a), vector(b)[None])[0])
+
+    # int8 rounding costs a little
+    assert score('Run', 'run') == pytest.approx(1.0, abs=0.02)
+    assert score('run', 'running') > duplicate_index.DUPLICATE_THRESHOLD
+    assert score('house', 'houses') > duplicate_index.DUPLICATE_THRESHOLD
+    assert score('book', 'look') < duplicate_index.DUPLICATE_THRESHOLD
+    assert score('house', 'running') < 0.2
+
+
+def test_finds_exact_then_near_duplicates(store):
+    index = DuplicateIndex(store).open()
+
+    # Exact matches ignore case, diacritics and spacing, and come first
+    assert matches(index.find(' RUN ', 'english')) == [(1, True), (2, False)]
+    assert matches(index.find('cafe', 'English')) == [(5, True)]
+    assert matches(index.find('runs', 'english')) == [(1, False), (2, False)]
+    assert matches(index.find('houses', 'english')) == [(3, False)]
+    assert matches(index.find('run', 'english', limit=1)) == [(1, True)]
+    # Other languages are never compared
+    assert matches(index.find('run', 'spanish')) == [(4, True)]
+    assert index.find('run', 'french') == []
+    assert index.find('zebra', 'english') == []
+    assert index.find('  ', 'english') == []
+
+
+def test_follows_edits_and_deletes(store):
+    index = DuplicateIndex(store).open()
+
+    store.put(card(3, 'mouse'))
+    store.put(card(2, 'running', language='spanish'))
+    store.delete(5)
+    # A second handle on the same file stands in for another worker
+    RecordLog(store.path).open().put(card(6, 'Houses'))
+
+    assert matches(index.find('house', 'english')) == [(6, False)]
+    assert matches(index.find('mouse', 'english')) == [(3, True)]
+    assert matches(index.find('run', 'english')) == [(1, True)]
+    assert matches(index.find('run', 'spanish')) == [(4, True), (2, False)]
+    assert index.find('café', 'english') == []
+    assert len(index) == 5
+
+
+@pytest.mark.parametrize('backend', [csv_db, sqlite_db], ids=['csv', 'sqlite'])
+def test_find_duplicate_flashcards(data_dir, backend):
+    sqlite_db.close_history()
+    backend.init_database()
+    first, second, _ = backend.save_flashcards([
+        {'word': word, 'language': language, 'translations': '', 'pronunciation': '', 'examples': ''}
+        for word, language in [('Run', 'english'), ('house', 'english'), ('run', 'spanish')]
+    ])
+
+    found = backend.find_duplicate_flashcards('running', 'english')
+    assert [(card['word'], card['exact']) for card in found] == [('Run', False)]
+    assert 0.6 < found[0]['similarity'] < 1
+    assert [card['id'] for card in backend.find_duplicate_flashcards('run', 'english')] == [first]
+    assert backend.find_duplicate_flashcards('run', 'english')[0]['similarity'] == 1.0
+
+    backend.save_flashcard('houses', 'english', '', '', '', flashcard_id=second)
+    assert [card['exact'] for card in backend.find_duplicate_flashcards('houses', 'english')] == [True]
+    backend.delete_flashcard(first)
+    assert backend.find_duplicate_flashcards('running', 'english') == []
+    assert backend.find_duplicate_flashcards('', 'english') == []
+    sqlite_db.close_history()
+
+
+def test_duplicates_are_flagged_before_any_model_call(app_client, monkeypatch):
+    model = FakeProvider()
+    monkeypatch.setattr(gemini, 'provider', model)
+    monkeypatch.setattr(gemini, 'response_cache', ResponseCache())
+    csv_db.save_flashcards([
+        {'word': 'Run', 'language': 'english', 'translations': '', 'pronunciation': '', 'examples': ''}
+    ])
+
+    async def run():
+        async with app_client as client:
+            checked = await client.get('/api/flashcards/duplicates', params={'word': 'running'})
+            flagged = await client.post('/create', data={'word': 'running', 'language': 'english'})
+            calls = model.calls
+            forced = await client.post('/create', data={'word': 'running', 'language': 'english', 'force': 'true'})
+            job = await client.post('/api/flashcards/batch', json={'words': ['run', 'jump', 'runner'], 'language': 'english'})
+            job_id = job.json()['job_id']
+            while (await client.get(f'/api/flashcards/batch/{job_id}')).json()['status'] in ('pending', 'running'):
+                await asyncio.sleep(0.01)
+            finished = await client.get(f'/api/flashcards/batch/{job_id}')
+            return checked, flagged, calls, forced, finished
+
+    checked, flagged, calls, forced, finished = asyncio.run(run())
+
+    assert [card['word'] for card in checked.json()['duplicates']] == ['Run']
+    assert 'You may already have this card' in flagged.text
+    assert calls == 0
+    assert forced.status_code == 303
+    job = finished.json()
+    # Each is listed with its closest card
+    assert [(duplicate['word'], duplicate['match']) for duplicate in job['duplicates']] == [('run', 'Run'), ('runner', 'Run')]
+    assert job['generated'] == 1
+    assert sorted(csv_db.get_flashcards()['word']) == ['Run', 'jump', 'running']
@@ -0,0 +1,71 @@
+import random
+
+from src.flashcards.database import csv_db
+from src.flashcards.database.flashcard_table import FIELDS, Flashcard, FlashcardTable
+from src.flashcards.database.record_log import RecordLog
+
+
+def expected_page(records, column, descending, limit):
+    key = lambda record: (str(record[column]) if column != 'id' else record[column], record['id'])
+    ordered = sorted(records, key=key, reverse=descending)
+    return [record['id'] for record in ordered[:limit]]
+
+
+def test_rows_follow_writes_without_a_rebuild(tmp_path):
+    rng = random.Random(3)
+    store = RecordLog(str(tmp_path / 'flashcards.log')).open()
+    store.put_many([
+        {'id': store.next_id(), 'word': f'w{rng.randint(0, 30)}', 'language': rng.choice(['es', 'it']),
+         'created_at': f'2024-01-{rng.randint(1, 28):02d} 00:00:00', 'updated_at': '2024-02-01 00:00:00'}
+        for _ in range(200)
+    ])
+    table = FlashcardTable(store).open()
+    for column in csv_db.FLASHCARD_SORT_COLUMNS:
+        table.page(column)
+    loads = []
+    read_all = store.records
+    store.records = lambda: loads.append(1) or read_all()
+
+    for step in range(300):
+        action = rng.random()
+        if action < 0.3:
+            store.delete(rng.choice(store.ids()))
+        elif action < 0.7:
+            card_id = rng.choice(store.ids())
+            store.put(dict(store.get(card_id), word=f'w{rng.randint(0, 30)}', updated_at=f'2024-03-{step % 28 + 1:02d} 00:00:00'))
+        else:
+            store.put({'id': store.next_id(), 'word': f'w{step}', 'language': 'fr',
+                       'created_at': '2024-01-15 00:00:00', 'updated_at': '2024-01-15 00:00:00'})
+        table.sync()
+
+    assert loads == []
+    records = read_all()
+    for column in csv_db.FLASHCARD_SORT_COLUMNS:
+        for descending in (False, True):
+            page = [card['id'] for card in table.page(column, descending, limit=500)]
+            assert page == expected_page(records, column, descending, 500)
+    stats = table.stats()
+    assert stats['count'] == len(records)
+    assert sorted(stats['languages']) == sorted({record['language'] for record in records})
+    assert table.get(records[0]['id']) == {field: records[0].get(field) for field in FIELDS}
+
+
+def test_rows_pick_up_other_processes(tmp_path):
+    path = str(tmp_path / 'flashcards.log')
+    store = RecordLog(path).open()
+    store.put({'id': store.next_id(), 'word': 'hola', 'language': 'spanish'})
+    table = FlashcardTable(store).open()
+
+    other = RecordLog(path).open()
+    other.put({'id': other.next_id(), 'word': 'ciao', 'language': 'italian'})
+    other.compact()
+
+    assert [card['word'] for card in table.sync().page('word')] == ['ciao', 'hola']
+
+
+def test_flashcard_rows_have_no_dict():
+    row = Flashcard({'id': '7', 'word': 'hola'})
+
+    assert not hasattr(row, '__dict__')
+    assert row.as_dict() == dict.fromkeys(FIELDS) | {'id': 7, 'word': 'hola'}
+    assert tuple(csv_db.FLASHCARD_COLUMNS) == FIELDS
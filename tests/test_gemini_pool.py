@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from src.flashcards.ai import gemini
+from src.flashcards.ai.fake_model import FakeProvider
+from src.flashcards.utils import rate_limit
+
+
+def test_healthcheck_stays_flat_while_translations_are_pending(app_client, monkeypatch):
+    monkeypatch.setattr(gemini, 'provider', FakeProvider(latency=0.2))
+    monkeypatch.setattr(rate_limit, 'RATE_LIMIT_API_KEYS', {f'user {i}' for i in range(50)})
+
+    async def run():
+        async with app_client as client:
+            pending = [
+                # Separate clients, each within its rate limit
+                asyncio.create_task(client.post(
+                    '/api/translate', json={'text': f'word {i}', 'use_cache': False}, headers={'X-API-Key': f'user {i}'},
+                ))
+                for i in range(50)
+            ]
+            await asyncio.sleep(0.05)
+
+            latencies = []
+            for _ in range(10):
+                start = time.perf_counter()
+                response = await client.get('/healthcheck')
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200
+            stats = gemini.get_call_stats()
+
+            responses = await asyncio.gather(*pending)
+            return latencies, stats, responses
+
+    latencies, stats, responses = asyncio.run(run())
+
+    assert max(latencies) < 0.1
+    assert stats['in_flight'] == gemini.GEMINI_MAX_CONCURRENCY
+    assert stats['queued'] > 0
+    assert all(response.status_code == 200 for response in responses)
+    assert gemini.get_call_stats()['queued'] == 0
+
+
+def test_cancelled_queued_call_leaves_the_queue(monkeypatch):
+    monkeypatch.setattr(gemini, 'provider', FakeProvider(latency=0.1))
+
+    async def run():
+        busy = [asyncio.create_task(gemini._generate('busy')) for _ in range(gemini.GEMINI_MAX_CONCURRENCY)]
+        queued = asyncio.create_task(gemini._generate('queued'))
+        await asyncio.sleep(0.01)
+        assert gemini.get_call_stats()['queued'] == 1
+
+        queued.cancel()
+        await asyncio.gather(*busy)
+        return gemini.get_call_stats()
+
+    stats = asyncio.run(run())
+    assert stats['queued'] == 0
+    assert stats['in_flight'] == 0
@@ -0,0 +1,100 @@
+import asyncio
+import re
+
+import pytest
+
+from src.flashcards.ai import gemini
+from src.flashcards.ai.cache import ResponseCache
+from src.flashcards.ai.chunking import sentence_spans
+from src.flashcards.ai.fake_model import FakeProvider
+
+ESSAY = (
+    'Plants need light to grow.  Most of the the energy comes from the sun!\n'
+    'Water moves up from the roots. Leaves let out oxygen.\n\n'
+    'Dr. J. Smith wrote about this. "Is it simple?" Not really.'
+)
+
+
+class RecordingModel(FakeProvider):
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    def generate(self, prompt):
+        self.prompts.append(prompt)
+        return super().generate(prompt)
+
+
+def numbered(prompt):
+    return re.findall(r'^\s*\d+\. (.+)$', prompt, re.MULTILINE)
+
+
+@pytest.fixture
+def model(data_dir, monkeypatch):
+    model = RecordingModel()
+    monkeypatch.setattr(gemini, 'provider', model)
+    monkeypatch.setattr(gemini, 'response_cache', ResponseCache())
+    return model
+
+
+def test_sentence_spans():
+    assert [ESSAY[start:end] for start, end in sentence_spans(ESSAY)] == [
+        'Plants need light to grow.',
+        'Most of the the energy comes from the sun!',
+        'Water moves up from the roots.',
+        'Leaves let out oxygen.',
+        'Dr. J. Smith wrote about this.',
+        '"Is it simple?"',
+        'Not really.',
+    ]
+    assert sentence_spans('  \n ') == []
+
+
+def test_only_edited_sentences_are_checked_again(model):
+    first = asyncio.run(gemini.check_grammar(ESSAY))
+
+    assert len(model.prompts) == 1
+    assert first['sentences'] == first['sentences_checked'] == 7
+    # Corrections go back in place, keeping the spacing between sentences
+    assert first['corrected_text'] == ESSAY.replace('the the', 'the')
+    [issue] = first['issues']
+    assert ESSAY[issue['start']:issue['end']] == 'the the'
+    assert (issue['suggestion'], issue['severity']) == ('the', 'error')
+    assert first['overall_score'] == round(100 * (1 - 1 / 7))
+
+    edited = ESSAY.replace('Leaves let out oxygen.', 'Leaves let out out oxygen.')
+    second = asyncio.run(gemini.check_grammar(edited))
+
+    assert len(model.prompts) == 2
+    assert numbered(model.prompts[1]) == ['Leaves let out out oxygen.']
+    assert second['sentences_checked'] == 1
+    assert second['corrected_text'] == ESSAY.replace('the the', 'the')
+    assert [edited[issue['start']:issue['end']] for issue in second['issues']] == ['the the', 'out out']
+
+    again = asyncio.run(gemini.check_grammar(edited))
+    assert len(model.prompts) == 2
+    assert again['sentences_checked'] == 0
+    assert again['issues'] == second['issues']
+
+    # Other check types are separate results
+    asyncio.run(gemini.check_grammar(edited, check_types=['spelling']))
+    assert len(numbered(model.prompts[2])) == 7
+
+
+def test_grammar_endpoint_serves_both_paths(app_client, model):
+    async def run():
+        async with app_client as client:
+            new = await client.post('/api/grammar-check', json={
+                'text': 'I like the the park.', 'language': 'english', 'check_types': ['grammar', 'spelling'],
+            })
+            old = await client.post('/api/check-grammar', json={'text': 'I like the the park.'})
+            empty = await client.post('/api/grammar-check', json={'text': '  '})
+            return new, old, empty
+
+    new, old, empty = asyncio.run(run())
+
+    assert new.status_code == old.status_code == 200
+    assert new.json()['improved_text'] == old.json()['corrected_text'] == 'I like the park.'
+    assert new.json()['issues'][0]['start'] == 7
+    assert old.json()['errors'] == '"the" is repeated'
+    assert empty.status_code == 400
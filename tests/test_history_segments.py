@@ -0,0 +1,80 @@
+import os
+from datetime import datetime, timedelta
+
+from src.flashcards.database import csv_db, history_segments
+from src.flashcards.database.history_segments import LatestRows, RotationPolicy
+from src.flashcards.database.history_writer import HistoryWriter
+
+COLUMNS = ['id', 'feature', 'query', 'response', 'created_at']
+NOW = datetime.now().replace(microsecond=0)
+
+
+def row(i, feature='translate', when=NOW):
+    return {'feature': feature, 'query': f'query {i}\nsecond line', 'response': f'response {i}',
+            'created_at': when.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def write(path, rows, policy, batch_size=50):
+    writer = HistoryWriter(batch_size=batch_size, flush_interval=10, rotation={path: policy}).start()
+    for item in rows:
+        writer.log(path, COLUMNS, item)
+    writer.close()
+    return writer.stats()
+
+
+def test_full_files_rotate_and_reads_span_segments(tmp_path):
+    path = str(tmp_path / 'query_log.csv')
+    # Every 60th row is a rare feature, so reading 8 of those crosses segments
+    rows = [row(i, 'grammar' if i % 60 == 0 else 'translate') for i in range(1, 501)]
+
+    stats = write(path, rows, RotationPolicy(segment_bytes=4000))
+
+    segments = history_segments.segments(path)
+    assert stats['rotations'] == len(segments) >= 4
+    assert os.path.getsize(path) < 4000 + 50 * 100
+    assert [int(r['id']) for r in history_segments.read_rows(path)] == list(range(1, 501))
+
+    latest = LatestRows(path)
+    assert [r['id'] for r in latest.latest(5)] == [500, 499, 498, 497, 496]
+    grammar = latest.latest(8, lambda r: r['feature'] == 'grammar')
+    assert [r['id'] for r in grammar] == [480, 420, 360, 300, 240, 180, 120, 60]
+    assert grammar[0]['query'] == 'query 480\nsecond line'
+
+
+def test_reader_catches_up_across_rotations(tmp_path):
+    path = str(tmp_path / 'query_log.csv')
+    policy = RotationPolicy(segment_bytes=3000)
+    latest = LatestRows(path)
+
+    write(path, [row(i) for i in range(1, 31)], policy, batch_size=10)
+    assert latest.latest(1)[0]['id'] == 30
+    write(path, [row(i) for i in range(31, 101)], policy, batch_size=10)
+
+    assert [r['id'] for r in latest.latest(100)] == list(range(100, 0, -1))
+
+
+def test_old_rows_rotate_and_expire(tmp_path):
+    path = str(tmp_path / 'query_log.csv')
+    policy = RotationPolicy(segment_days=7, retention_days=30)
+    old = [row(i, when=NOW - timedelta(days=90, hours=-i)) for i in range(1, 11)]
+    recent = [row(i, when=NOW - timedelta(days=10 - i)) for i in range(11, 21)]
+
+    write(path, old + recent, policy, batch_size=5)
+
+    kept = history_segments.read_rows(path)
+    assert [int(r['id']) for r in kept] == list(range(11, 21))
+    assert all(first > 10 for first, _, _ in history_segments.segments(path))
+
+
+def test_query_log_reads_only_the_head_when_it_has_enough(data_dir, monkeypatch):
+    monkeypatch.setitem(csv_db.HISTORY_ROTATION, csv_db.QUERY_LOG_CSV, RotationPolicy(segment_bytes=2000))
+    for i in range(60):
+        csv_db.save_query_log('translate', f'query {i}', f'response {i}')
+        if i % 10 == 9:
+            csv_db.flush_history()
+    assert history_segments.segments(csv_db.QUERY_LOG_CSV)
+
+    read = []
+    monkeypatch.setattr(history_segments, '_read_segment', lambda segment: read.append(segment) or [])
+    assert [r['id'] for r in csv_db.get_query_log('translate', 3)] == [60, 59, 58]
+    assert read == []
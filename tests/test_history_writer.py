@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pandas as pd
+
+from src.flashcards.database import csv_db
+from src.flashcards.database.history_writer import HistoryWriter
+
+COLUMNS = ['id', 'feature', 'query', 'response', 'created_at']
+
+
+def row(i):
+    return {'feature': 'translate', 'query': f'query {i}', 'response': f'response {i}', 'created_at': '2024-01-01 00:00:00'}
+
+
+def test_rows_are_appended_in_batches(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    writer = HistoryWriter(batch_size=100, flush_interval=10).start()
+
+    for i in range(250):
+        writer.log(path, COLUMNS, row(i))
+    writer.flush()
+
+    df = pd.read_csv(path)
+    assert list(df['id']) == list(range(1, 251))
+    assert list(df.columns) == COLUMNS
+    # Two full batches, then the flush writes the remaining 50
+    assert writer.stats()['batches'] == 3
+    writer.close()
+
+
+def test_partial_batch_is_written_after_the_interval(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    writer = HistoryWriter(batch_size=100, flush_interval=0.05).start()
+
+    writer.log(path, COLUMNS, row(1))
+    time.sleep(0.3)
+
+    assert len(pd.read_csv(path)) == 1
+    writer.close()
+
+
+def test_ids_continue_from_the_existing_file(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    first = HistoryWriter().start()
+    for i in range(3):
+        first.log(path, COLUMNS, row(i))
+    first.close()
+
+    second = HistoryWriter().start()
+    second.log(path, COLUMNS, row(3))
+    second.close()
+    assert list(pd.read_csv(path)['id']) == [1, 2, 3, 4]
+
+
+def test_full_queue_makes_the_producer_write(tmp_path, monkeypatch):
+    path = str(tmp_path / 'log.csv')
+    writer = HistoryWriter(batch_size=10, flush_interval=10, max_queue=5)
+    # No writer thread yet, so the queue fills up
+    for i in range(23):
+        writer.log(path, COLUMNS, row(i))
+
+    stats = writer.stats()
+    assert stats['producer_writes'] > 0
+    assert stats['queued'] <= 5
+
+    writer.start()
+    writer.close()
+    assert sorted(pd.read_csv(path)['id']) == list(range(1, 24))
+
+
+def test_writers_sharing_a_file_never_reuse_ids(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    # Stand-ins for two worker processes, each with its own id counter
+    first = HistoryWriter()
+    second = HistoryWriter()
+    for i in range(6):
+        (first if i % 2 else second).log(path, COLUMNS, row(i))
+        (first if i % 2 else second).flush()
+
+    assert list(pd.read_csv(path)['id']) == [1, 2, 3, 4, 5, 6]
+
+
+def test_close_writes_rows_queued_from_many_threads(tmp_path):
+    path = str(tmp_path / 'log.csv')
+    writer = HistoryWriter(batch_size=64, flush_interval=10, max_queue=100).start()
+
+    def produce(offset):
+        for i in range(500):
+            writer.log(path, COLUMNS, row(offset + i))
+
+    threads = [threading.Thread(target=produce, args=(n * 1000,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    assert sorted(pd.read_csv(path)['id']) == list(range(1, 2001))
+
+
+def test_history_functions_only_enqueue(data_dir):
+    csv_db.save_translation_history('hello', 'xin chào', 'en', 'vi')
+
+    # Nothing reaches the file until the batch is flushed...
+    assert pd.read_csv(csv_db.TRANSLATE_HISTORY_CSV).empty
+    # ...but readers flush before reading
+    entries = csv_db.get_query_log('translate')
+    assert [entry['response'] for entry in entries] == ['xin chào']
+    assert len(pd.read_csv(csv_db.TRANSLATE_HISTORY_CSV)) == 1
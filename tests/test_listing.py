@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from src.flashcards.database import csv_db, sqlite_db
+from src.flashcards.utils import pagination
+
+CARDS = [
+    # word, language, created_at, updated_at
+    ('hola', 'spanish', '2024-01-01 09:00:00', '2024-03-01 09:00:00'),
+    ('ciao', 'italian', '2024-01-02 09:00:00', '2024-01-02 09:00:00'),
+    ('adios', 'spanish', '2024-01-02 18:00:00', '2024-01-05 09:00:00'),
+    ('gracias', 'spanish', '2024-01-03 09:00:00', '2024-01-03 09:00:00'),
+    ('grazie', 'italian', '2024-01-03 09:00:00', '2024-02-01 09:00:00'),
+    ('amigo', 'spanish', '2024-01-04 09:00:00', '2024-01-04 09:00:00'),
+]
+
+
+def seed(backend):
+    backend.init_database()
+    backend.save_flashcards([
+        {'word': word, 'language': language, 'translations': '', 'pronunciation': '', 'examples': ''}
+        for word, language, _, _ in CARDS
+    ])
+    # Fixed timestamps, written past the save functions
+    if backend is sqlite_db:
+        conn = sqlite_db._connect()
+        with conn:
+            conn.executemany(
+                'UPDATE flashcards SET created_at = ?, updated_at = ? WHERE id = ?',
+                [(created, updated, i) for i, (_, _, created, updated) in enumerate(CARDS, 1)]
+            )
+    else:
+        store = csv_db._flashcard_store()
+        store.put_many([
+            dict(store.get(i), created_at=created, updated_at=updated)
+            for i, (_, _, created, updated) in enumerate(CARDS, 1)
+        ])
+
+
+def walk(limit=2, **filters):
+    """Follow next_cursor through every page and return the word of each card"""
+    pages = []
+    cursor = None
+    while True:
+        page = pagination.get_flashcard_page(cursor=cursor, limit=limit, **filters)
+        pages.append([card['word'] for card in page['items']])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def backend(request, data_dir, monkeypatch):
+    backend = csv_db if request.param == 'csv' else sqlite_db
+    sqlite_db.close_history()
+    monkeypatch.setattr(pagination, 'db', backend)
+    seed(backend)
+    yield backend
+    sqlite_db.close_history()
+
+
+def test_pages_follow_the_cursor(backend):
+    assert walk() == [['hola', 'ciao'], ['adios', 'gracias'], ['grazie', 'amigo']]
+    assert walk(limit=4, order='desc') == [['amigo', 'grazie', 'gracias', 'adios'], ['ciao', 'hola']]
+
+
+def test_sorts_break_ties_by_id(backend):
+    assert walk(sort='word', limit=4) == [['adios', 'amigo', 'ciao', 'gracias'], ['grazie', 'hola']]
+    # gracias and grazie share a creation time
+    assert walk(sort='created_at', order='desc', limit=3) == [['amigo', 'grazie', 'gracias'], ['adios', 'ciao', 'hola']]
+    assert walk(sort='updated_at', limit=5) == [['ciao', 'gracias', 'amigo', 'adios', 'grazie'], ['hola']]
+
+
+def test_filters_by_language_and_dates(backend):
+    assert walk(language='spanish') == [['hola', 'adios'], ['gracias', 'amigo']]
+    # A bare end date covers the whole day
+    assert walk(created_from='2024-01-02', created_to='2024-01-03') == [['ciao', 'adios'], ['gracias', 'grazie']]
+    assert walk(language='italian', updated_from='2024-01-15T00:00:00') == [['grazie']]
+    assert walk(language='french') == [[]]
+
+
+def test_pages_stay_stable_under_inserts(backend):
+    first = pagination.get_flashcard_page(limit=3)
+    backend.save_flashcard('zebra', 'spanish', '', '', '')
+    backend.delete_flashcard(2)
+
+    second = pagination.get_flashcard_page(cursor=first['next_cursor'], limit=3)
+    assert [card['word'] for card in second['items']] == ['gracias', 'grazie', 'amigo']
+    assert second['next_cursor'] is not None
+
+
+def test_rejects_bad_cursors_and_sorts(backend):
+    cursor = pagination.get_flashcard_page(limit=2)['next_cursor']
+
+    with pytest.raises(ValueError):
+        pagination.get_flashcard_page(cursor=cursor, sort='word')
+    with pytest.raises(ValueError):
+        pagination.get_flashcard_page(cursor='not-a-cursor')
+    with pytest.raises(ValueError):
+        pagination.get_flashcard_page(sort='translations')
+    with pytest.raises(ValueError):
+        pagination.get_flashcard_page(created_from='last week')
+
+
+def test_listing_endpoint_and_home_page(app_client):
+    seed(csv_db)
+
+    async def run():
+        async with app_client as client:
+            first = await client.get('/api/flashcards', params={'limit': 3, 'language': 'spanish'})
+            second = await client.get('/api/flashcards', params={
+                'limit': 3, 'language': 'spanish', 'cursor': first.json()['next_cursor']
+            })
+            bad = await client.get('/api/flashcards', params={'sort': 'nope'})
+            home = await client.get('/', params={'language': 'italian'})
+            return first, second, bad, home
+
+    first, second, bad, home = asyncio.run(run())
+
+    assert [card['word'] for card in first.json()['items']] == ['hola', 'adios', 'gracias']
+    assert [card['word'] for card in second.json()['items']] == ['amigo']
+    assert second.json()['next_cursor'] is None
+    assert bad.status_code == 400
+    assert home.status_code == 200
+    assert 'data-word="ciao"' in home.text and 'data-word="hola"' not in home.text
+
+
+def test_edit_page_shows_the_card(app_client):
+    seed(csv_db)
+
+    async def run():
+        async with app_client as client:
+            return await client.get('/edit/3'), await client.get('/edit/999')
+
+    page, missing = asyncio.run(run())
+
+    assert page.status_code == 200
+    assert 'value="adios"' in page.text and 'action="/edit/3"' in page.text
+    assert missing.status_code == 303
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from src.flashcards.ai import gemini
+from src.flashcards.ai.fake_model import FakeProvider
+from src.flashcards.ai.parser import parse_response
+from src.flashcards.database import csv_db
+from src.flashcards.models.schemas import GrammarResponse
+from src.flashcards.utils import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_histograms_render_cumulative_buckets():
+    latency = metrics.histogram('test_latency_seconds', 'Test latency', ('path',), buckets=(0.1, 1))
+    latency.observe(0.05, path='/a')
+    latency.observe(0.5, path='/a')
+    latency.observe(5, path='/a')
+    metrics.counter('test_events_total', 'Test events', ('kind',)).inc(2, kind='say "hi"')
+
+    text = metrics.render()
+
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert 'test_latency_seconds_bucket{path="/a",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{path="/a",le="1.0"} 2' in text
+    assert 'test_latency_seconds_bucket{path="/a",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{path="/a"} 3' in text
+    assert 'test_events_total{kind="say \\"hi\\""} 2' in text
+    assert metrics.value('test_latency_seconds', path='/a') == {'count': 3, 'sum': pytest.approx(5.55)}
+
+
+def test_storage_and_parse_hooks_record_without_a_server(data_dir):
+    csv_db.save_flashcard('hola', 'spanish', 'hello', '', '')
+    csv_db.get_flashcard(1)
+    csv_db.get_flashcard(2)
+    parse_response('{"corrected_text": "Hi.", "errors": ["a", "b"]}', GrammarResponse, 'metrics')
+
+    assert metrics.value('storage_operation_duration_seconds', backend='csv', operation='get_flashcard')['count'] == 2
+    assert metrics.value('storage_operation_duration_seconds', backend='csv', operation='save_flashcard')['count'] == 1
+    assert metrics.value('ai_parse_fallbacks_total', feature='metrics') == 1
+    assert metrics.value('ai_parse_total', feature='metrics', outcome='ok') == 1
+    assert 'storage_file_bytes{file="flashcards.log"}' in metrics.render()
+
+
+def test_metrics_endpoint_covers_requests_and_model_calls(app_client, monkeypatch):
+    monkeypatch.setattr(gemini, 'provider', FakeProvider())
+
+    async def run():
+        async with app_client as client:
+            await client.post('/api/translate', json={'text': 'hello', 'use_cache': False})
+            await client.get('/api/flashcards/search', params={'q': 'x'})
+            await client.get('/no-such-page')
+            return await client.get('/metrics')
+
+    response = asyncio.run(run())
+    text = response.text
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert 'http_request_duration_seconds_count{method="POST",route="/api/translate",status="200"} 1' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/flashcards/search",status="200"} 1' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"} 1' in text
+    assert 'gemini_calls_total{feature="translate",outcome="ok"} 1' in text
+    for stage in ('rate_limit', 'queue', 'model'):
+        assert metrics.value('gemini_stage_duration_seconds', feature='translate', stage=stage)['count'] == 1
+    assert metrics.value('gemini_prompt_tokens_total', feature='translate') > 0
+    assert 'gemini_calls_in_flight 0' in text
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+from typing import List
+
+from src.flashcards.ai.parser import ParseError, extract_json, get_parse_stats, parse_response
+from src.flashcards.models.schemas import FlashcardBatchItem, FlashcardData, GrammarResponse, GrammarSentence, TranslationResponse
+
+# Replies in the shapes the model actually produces
+CORPUS = [
+    ('{"translated_text": "hola"}', {'translated_text': 'hola'}),
+    ('```json\n{"translated_text": "hola"}\n```', {'translated_text': 'hola'}),
+    ('Sure! Here is the translation:\n{"translated_text": "hola"}\nLet me know if you need more.', {'translated_text': 'hola'}),
+    ('{"translated_text": "hola",}', {'translated_text': 'hola'}),
+    ('{"translated_text": "he said \\"hi\\" {not a brace}"}', {'translated_text': 'he said "hi" {not a brace}'}),
+    ('{"translated_text": "line one\nline two"}', {'translated_text': 'line one\nline two'}),
+    ('{"meta": {"lang": "es"}, "translated_text": "hola"}', {'meta': {'lang': 'es'}, 'translated_text': 'hola'}),
+    ('{oops} then {"translated_text": "hola"}', {'translated_text': 'hola'}),
+    ('[{"a": 1,}, {"a": 2},]', [{'a': 1}, {'a': 2}]),
+    ('Use { to open it: {"translated_text": "hola"}', {'translated_text': 'hola'}),
+]
+
+
+@pytest.mark.parametrize('text, expected', CORPUS)
+def test_extract_json_corpus(text, expected):
+    assert extract_json(text) == expected
+
+
+@pytest.mark.parametrize('text', ['', 'no json here', '{"translated_text": "unterminated', '}{'])
+def test_extract_json_rejects_garbage(text):
+    with pytest.raises(ValueError):
+        extract_json(text)
+
+
+def test_extract_json_scans_stray_brackets_once(monkeypatch):
+    from src.flashcards.ai import parser
+
+    scans = []
+    scan_from = parser._scan_from
+    monkeypatch.setattr(parser, '_scan_from', lambda text, start: scans.append(start) or scan_from(text, start))
+    with pytest.raises(ValueError):
+        extract_json('{ ' + 'a [ in prose ' * 5000)
+    assert len(scans) == 1
+    scans.clear()
+    assert extract_json('{ ' * 5000 + '{"translated_text": "hola"}') == {'translated_text': 'hola'}
+    assert len(scans) <= 2
+
+
+def test_parse_response_validates_schema():
+    assert parse_response('```json\n{"corrected_text": "Hi.", "errors": ["a", "b"]}\n```', GrammarResponse, 'test') == {
+        'corrected_text': 'Hi.',
+        'errors': 'a; b',
+        'improved_text': '',
+        'overall_score': 100,
+        'issues': [],
+        'sentences': 0,
+        'sentences_checked': 0,
+    }
+    cards = parse_response(
+        '[{"word": "run", "translations": "correr", "pronunciation": "/rʌn/", "examples": "I run."}]',
+        List[FlashcardBatchItem],
+        'test'
+    )
+    assert cards[0]['word'] == 'run'
+    # Lists of objects are kept; string fields inside them are still joined
+    sentences = parse_response(
+        '[{"index": 1, "corrected": "Hi.", "issues": [{"original": "hi", "explanation": ["x", "y"]}]}]',
+        List[GrammarSentence],
+        'test'
+    )
+    assert sentences[0]['issues'][0]['explanation'] == 'x; y'
+
+
+def test_parse_failures_are_counted_by_reason():
+    with pytest.raises(ParseError) as excinfo:
+        parse_response('I cannot do that', TranslationResponse, 'counted')
+    assert excinfo.value.reason == 'no_json'
+    with pytest.raises(ParseError) as excinfo:
+        parse_response('{"translations": "x"}', FlashcardData, 'counted')
+    assert excinfo.value.reason == 'invalid_schema'
+    parse_response('{"translated_text": "ok"}', TranslationResponse, 'counted')
+
+    assert get_parse_stats()['counted'] == {'ok': 1, 'failed': 2, 'reasons': {'no_json': 1, 'invalid_schema': 1}}
+
+
+def test_fuzzed_replies_only_raise_parse_error():
+    rng = random.Random(1234)
+    for _ in range(2000):
+        text, _ = rng.choice(CORPUS)
+        chars = list(text)
+        for _ in range(rng.randint(1, 4)):
+            position = rng.randrange(len(chars) + 1)
+            if rng.random() < 0.5 and chars:
+                del chars[min(position, len(chars) - 1)]
+            else:
+                chars.insert(position, rng.choice('{}[]",:\\ x\n'))
+        try:
+            parse_response(''.join(chars), TranslationResponse, 'fuzz')
+        except ParseError:
+            pass
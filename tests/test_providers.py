@@ -0,0 +1,89 @@
+import asyncio
+import os
+import subprocess
+import sys
+from collections import Counter
+
+import pytest
+
+from src.flashcards.ai import gemini
+from src.flashcards.ai.fake_model import MALFORMED_RESPONSE, FakeProvider, FakeProviderError
+from src.flashcards.ai.providers import ProviderError, create_provider
+
+from conftest import REPO_ROOT
+
+
+def outcomes(provider, prompts):
+    results = []
+    for prompt in prompts:
+        try:
+            results.append(provider.generate(prompt))
+        except FakeProviderError:
+            results.append('error')
+    return results
+
+
+def test_app_starts_without_an_api_key():
+    env = {key: value for key, value in os.environ.items() if key not in ('AI_PROVIDER', 'GEMINI_FAKE_MODEL')}
+    # Set but empty, so a key in .env isn't loaded either
+    env.update(GEMINI_API_KEY='', GOOGLE_AI_API_KEY='')
+    script = (
+        'import app\n'
+        'from src.flashcards.ai import gemini\n'
+        'try:\n'
+        '    gemini.get_provider()\n'
+        'except ValueError as e:\n'
+        '    print(gemini.get_call_stats()["provider"], type(e).__name__)\n'
+    )
+
+    result = subprocess.run([sys.executable, '-c', script], cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'gemini ProviderError'
+
+
+def test_missing_key_fails_the_model_call_only(app_client, monkeypatch):
+    monkeypatch.setenv('AI_PROVIDER', 'gemini')
+    monkeypatch.delenv('GEMINI_API_KEY', raising=False)
+    monkeypatch.delenv('GOOGLE_AI_API_KEY', raising=False)
+    monkeypatch.setattr(gemini, 'provider', None)
+
+    async def run():
+        async with app_client as client:
+            return (
+                await client.post('/api/translate', json={'text': 'hello', 'use_cache': False}),
+                await client.get('/healthcheck'),
+            )
+
+    translate, health = asyncio.run(run())
+
+    assert translate.status_code == 500
+    assert 'No Gemini API key' in translate.json()['detail']
+    assert health.status_code == 200
+    with pytest.raises(ProviderError):
+        create_provider('nope')
+
+
+def test_fake_provider_draws_are_reproducible():
+    prompts = [f'Translate the following text "word {i % 20}"' for i in range(200)]
+    settings = dict(error_rate=0.2, malformed_rate=0.1, seed=7)
+
+    first = outcomes(FakeProvider(**settings), prompts)
+    # The same calls in another order get the same draws
+    second = outcomes(FakeProvider(**settings), prompts[::-1])
+
+    assert Counter(zip(prompts, first)) == Counter(zip(prompts[::-1], second))
+    assert 20 <= first.count('error') <= 60
+    assert 5 <= first.count(MALFORMED_RESPONSE) <= 40
+    assert outcomes(FakeProvider(seed=8, error_rate=0.2), prompts) != outcomes(FakeProvider(seed=7, error_rate=0.2), prompts)
+
+
+@pytest.mark.parametrize('distribution', ['uniform', 'exponential', 'lognormal'])
+def test_fake_latency_distributions_keep_their_mean(distribution):
+    provider = FakeProvider(latency=0.2, distribution=distribution)
+
+    delays = [provider._delay(provider._draw(f'prompt {i}')) for i in range(4000)]
+
+    assert sum(delays) / len(delays) == pytest.approx(0.2, rel=0.1)
+    assert min(delays) >= 0
+    assert len(set(delays)) > 1000
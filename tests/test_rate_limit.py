@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from src.flashcards.ai import gemini
+from src.flashcards.ai.fake_model import FakeProvider
+from src.flashcards.utils import rate_limit
+from src.flashcards.utils.rate_limit import FairLimiter, RateLimitExceeded, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_at_its_rate():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.take() == pytest.approx(0.5)
+    clock.now = 0.25
+    assert bucket.take() == pytest.approx(0.25)
+    clock.now = 0.5
+    assert bucket.take() == 0
+    # Never more than the burst, however long it was idle
+    clock.now = 100
+    assert [bucket.take() for _ in range(4)][-1] > 0
+
+
+def test_waiting_calls_are_served_round_robin():
+    limiter = FairLimiter(per_minute=60 * 200, burst=1, max_waiting=50)
+    served = []
+
+    async def call(key):
+        await limiter.acquire(key, timeout=5)
+        served.append(key)
+
+    async def run():
+        heavy = [asyncio.create_task(call('heavy')) for _ in range(10)]
+        await asyncio.sleep(0)
+        light = [asyncio.create_task(call(key)) for key in ('light 1', 'light 2')]
+        await asyncio.gather(*heavy, *light)
+
+    asyncio.run(run())
+
+    assert len(served) == 12
+    # The light clients don't wait behind every heavy call queued before them
+    assert max(served.index('light 1'), served.index('light 2')) <= 4
+    assert limiter.waiting() == 0
+
+
+def test_waiting_calls_are_bounded_per_client():
+    limiter = FairLimiter(per_minute=60, burst=1, max_waiting=1)
+
+    async def run():
+        await limiter.acquire('a')
+        waiting = asyncio.create_task(limiter.acquire('a', timeout=0.05))
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire('a')
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            await waiting
+        return excinfo.value
+
+    timed_out = asyncio.run(run())
+
+    assert timed_out.retry_after > 0
+    assert limiter.waiting() == 0
+    assert limiter.stats['refused'] == 2
+
+
+def test_clients_over_their_limit_get_429(app_client, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app.client_limiter, 'rate', 1 / 60)
+    monkeypatch.setattr(app.client_limiter, 'burst', 2)
+    monkeypatch.setattr(rate_limit, 'RATE_LIMIT_API_KEYS', {'other'})
+    monkeypatch.setattr(gemini, 'provider', FakeProvider())
+
+    async def run():
+        async with app_client as client:
+            responses = [await client.post('/api/translate', json={'text': f'word {i}'}) for i in range(3)]
+            other = await client.post('/api/translate', json={'text': 'word'}, headers={'X-API-Key': 'other'})
+            page = await client.get('/healthcheck')
+            return responses, other, page
+
+    responses, other, page = asyncio.run(run())
+
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert 55 <= int(responses[2].headers['Retry-After']) <= 60
+    assert other.status_code == page.status_code == 200
+
+
+def test_unknown_api_keys_share_the_address_bucket(app_client, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app.client_limiter, 'rate', 1 / 60)
+    monkeypatch.setattr(app.client_limiter, 'burst', 2)
+    monkeypatch.setattr(gemini, 'provider', FakeProvider())
+
+    async def run():
+        async with app_client as client:
+            return [
+                await client.post('/api/translate', json={'text': f'word {i}'}, headers={'X-API-Key': f'random-{i}'})
+                for i in range(3)
+            ]
+
+    assert [response.status_code for response in asyncio.run(run())] == [200, 200, 429]
+
+
+def test_refused_model_calls_get_429(app_client, monkeypatch):
+    monkeypatch.setattr(gemini, 'provider', FakeProvider(latency=0.1))
+    monkeypatch.setattr(gemini, 'upstream_limiter', FairLimiter(per_minute=60, burst=1, max_waiting=0))
+
+    async def run():
+        async with app_client as client:
+            return await asyncio.gather(*(
+                client.post('/api/translate', json={'text': f'word {i}', 'use_cache': False}) for i in range(2)
+            ))
+
+    responses = asyncio.run(run())
+
+    assert sorted(response.status_code for response in responses) == [200, 429]
+    assert 'Retry-After' in [response for response in responses if response.status_code == 429][0].headers
@@ -0,0 +1,67 @@
+from src.flashcards.database.record_log import RecordLog
+
+
+def make_log(tmp_path):
+    return RecordLog(str(tmp_path / 'cards.log')).open()
+
+
+def test_put_get_delete(tmp_path):
+    log = make_log(tmp_path)
+    record_id = log.next_id()
+    log.put({'id': record_id, 'word': 'hola'})
+    log.put({'id': record_id, 'word': 'adios'})
+
+    assert log.get(record_id) == {'id': record_id, 'word': 'adios'}
+    assert log.delete(record_id)
+    assert not log.delete(record_id)
+    assert log.get(record_id) is None
+    assert len(log) == 0
+
+
+def test_ids_are_not_reused_after_compaction(tmp_path):
+    log = make_log(tmp_path)
+    for _ in range(3):
+        log.put({'id': log.next_id()})
+    log.delete(3)
+    log.compact()
+
+    assert make_log(tmp_path).next_id() == 4
+
+
+def test_torn_tail_is_truncated_on_open(tmp_path):
+    log = make_log(tmp_path)
+    log.put({'id': log.next_id(), 'word': 'one'})
+    with open(log.path, 'ab') as f:
+        f.write(b'{"id": 2, "word": "tor')
+
+    reopened = make_log(tmp_path)
+    record_id = reopened.next_id()
+    reopened.put({'id': record_id, 'word': 'two'})
+
+    again = make_log(tmp_path)
+    assert again.get(record_id) == {'id': record_id, 'word': 'two'}
+    assert len(again) == 2
+    assert [record['word'] for record in again.records()] == ['one', 'two']
+
+
+def test_glued_line_is_not_indexed(tmp_path):
+    log = make_log(tmp_path)
+    with open(log.path, 'ab') as f:
+        f.write(b'{"id": 1, "word": "t{"id": 2, "word": "ok"}\n')
+
+    reopened = make_log(tmp_path)
+    assert len(reopened) == 0
+    assert reopened.records() == []
+
+
+def test_next_id_sees_other_writers(tmp_path):
+    first = make_log(tmp_path)
+    second = make_log(tmp_path)
+
+    first_id = first.next_id()
+    first.put({'id': first_id, 'word': 'first'})
+    second_id = second.next_id()
+    second.put({'id': second_id, 'word': 'second'})
+
+    assert second_id != first_id
+    assert make_log(tmp_path).get(first_id)['word'] == 'first'
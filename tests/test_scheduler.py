@@ -0,0 +1,247 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.flashcards.database import csv_db, sqlite_db
+from src.flashcards.database.record_log import RecordLog
+from src.flashcards.database.scheduler import (
+    DueQueue, expected_retention, forecast, new_schedule, next_review, overdue_by_language, rescheduled_due,
+    schedule_columns, study_streak
+)
+
+NOW = datetime(2024, 3, 1, 9, 0, 0)
+
+
+def card(card_id, language='spanish', created_at='2024-01-01 00:00:00'):
+    return {'id': card_id, 'word': f'word{card_id}', 'language': language, 'created_at': created_at}
+
+
+def review_many(grades):
+    schedule = new_schedule('2024-01-01 00:00:00')
+    for grade in grades:
+        schedule = next_review(schedule, grade, NOW)
+    return schedule
+
+
+def test_sm2_intervals_and_ease():
+    assert [review_many([4] * n)['interval'] for n in (1, 2, 3, 4)] == [1, 6, 15, 38]
+    assert review_many([4])['due'] == '2024-03-02 09:00:00'
+    # A perfect answer raises the ease, a hard one lowers it
+    assert review_many([5])['ease'] == 2.6
+    assert review_many([3])['ease'] == 2.36
+
+    lapsed = review_many([4, 4, 4, 1])
+    assert (lapsed['interval'], lapsed['repetitions'], lapsed['lapses']) == (1, 0, 1)
+    # The ease never drops below 1.3
+    assert review_many([0] * 10)['ease'] == 1.3
+    # Failing a card never seen before isn't a lapse
+    assert review_many([0])['lapses'] == 0
+
+    with pytest.raises(ValueError):
+        review_many([6])
+
+
+@pytest.fixture
+def logs(tmp_path):
+    cards = RecordLog(str(tmp_path / 'flashcards.log')).open()
+    cards.put_many([
+        card(1, created_at='2024-01-03 00:00:00'),
+        card(2, language='italian', created_at='2024-01-01 00:00:00'),
+        card(3, created_at='2024-01-02 00:00:00'),
+        card(4, created_at='2024-06-01 00:00:00'),
+    ])
+    schedules = RecordLog(str(tmp_path / 'schedules.log')).open()
+    return cards, schedules
+
+
+def ids(due):
+    return [card_id for card_id, _ in due]
+
+
+def test_due_queue_orders_by_due_time(logs):
+    queue = DueQueue(*logs).open()
+
+    assert ids(queue.due('2024-03-01 00:00:00')) == [2, 3, 1]
+    assert ids(queue.due('2024-03-01 00:00:00', limit=2)) == [2, 3]
+    assert ids(queue.due('2024-03-01 00:00:00', language='spanish')) == [3, 1]
+    assert queue.due('2024-03-01 00:00:00', language='french') == []
+    # Looking doesn't consume anything
+    assert ids(queue.due('2024-12-31 00:00:00')) == [2, 3, 1, 4]
+
+
+def test_due_queue_follows_reviews_and_edits(logs):
+    cards, schedules = logs
+    queue = DueQueue(cards, schedules).open()
+
+    schedules.put({'id': 2, **next_review(new_schedule('2024-01-01 00:00:00'), 4, NOW)})
+    cards.put(card(3, language='italian', created_at='2024-01-02 00:00:00'))
+    cards.delete(1)
+    assert ids(queue.due('2024-03-01 10:00:00')) == [3]
+    assert ids(queue.due('2024-03-01 10:00:00', language='italian')) == [3]
+    assert ids(queue.due('2024-03-02 10:00:00')) == [3, 2]
+
+    # A second handle on the same files stands in for another worker
+    RecordLog(cards.path).open().put(card(5, created_at='2023-12-31 00:00:00'))
+    assert ids(queue.due('2024-03-01 10:00:00')) == [5, 3]
+    assert len(queue) == 4
+
+
+def test_due_queue_lists_a_card_once_after_it_moves_back(logs):
+    cards, schedules = logs
+    queue = DueQueue(cards, schedules).open()
+
+    for created_at, language in (('2024-01-05 00:00:00', 'spanish'), ('2024-01-02 00:00:00', 'spanish'),
+                                 ('2024-01-02 00:00:00', 'italian'), ('2024-01-02 00:00:00', 'spanish')):
+        cards.put(card(3, language=language, created_at=created_at))
+        queue.sync()
+    assert ids(queue.due('2024-03-01 00:00:00')) == [2, 3, 1]
+    assert ids(queue.due('2024-03-01 00:00:00', language='spanish')) == [3, 1]
+    # The spare entry was dropped, so the next look finds it once too
+    assert ids(queue.due('2024-03-01 00:00:00')) == [2, 3, 1]
+
+
+@pytest.mark.parametrize('backend', [csv_db, sqlite_db], ids=['csv', 'sqlite'])
+def test_review_flashcard(data_dir, backend):
+    sqlite_db.close_history()
+    backend.init_database()
+    first, second, third = backend.save_flashcards([
+        {'word': word, 'language': language, 'translations': '', 'pronunciation': '', 'examples': ''}
+        for word, language in [('hola', 'spanish'), ('ciao', 'italian'), ('adios', 'spanish')]
+    ])
+
+    due = backend.get_due_flashcards()
+    assert [card['word'] for card in due] == ['hola', 'ciao', 'adios']
+    assert due[0]['repetitions'] == 0 and due[0]['last_reviewed'] is None
+
+    reviewed = backend.review_flashcard(first, 4)
+    assert (reviewed['word'], reviewed['interval'], reviewed['repetitions']) == ('hola', 1, 1)
+    assert [card['word'] for card in backend.get_due_flashcards()] == ['ciao', 'adios']
+    assert [card['word'] for card in backend.get_due_flashcards(language='spanish')] == ['adios']
+    assert [card['word'] for card in backend.get_due_flashcards(now=reviewed['due'])] == ['ciao', 'adios', 'hola']
+
+    backend.delete_flashcard(second)
+    assert [card['word'] for card in backend.get_due_flashcards()] == ['adios']
+    assert backend.review_flashcard(second, 4) is None
+    with pytest.raises(ValueError):
+        backend.review_flashcard(third, 9)
+    sqlite_db.close_history()
+
+
+def test_study_endpoints(app_client):
+    card_id = csv_db.save_flashcards([
+        {'word': 'hola', 'language': 'spanish', 'translations': 'hello', 'pronunciation': '', 'examples': ''}
+    ])[0]
+
+    async def run():
+        async with app_client as client:
+            due = await client.get('/api/study/due')
+            reviewed = await client.post('/api/study/review', json={'flashcard_id': card_id, 'grade': 5})
+            missing = await client.post('/api/study/review', json={'flashcard_id': 999, 'grade': 5})
+            invalid = await client.post('/api/study/review', json={'flashcard_id': card_id, 'grade': 7})
+            after = await client.get('/api/study/due')
+            page = await client.get('/study')
+            return due, reviewed, missing, invalid, after, page
+
+    due, reviewed, missing, invalid, after, page = asyncio.run(run())
+
+    assert [card['word'] for card in due.json()['cards']] == ['hola']
+    assert reviewed.json()['interval'] == 1
+    assert missing.status_code == 404
+    assert invalid.status_code == 422
+    assert after.json()['cards'] == []
+    assert 'All Caught Up' in page.text
+    csv_db.flush_history()
+    with open(csv_db.REVIEW_HISTORY_CSV, encoding='utf-8') as f:
+        assert len(f.readlines()) == 2
+
+
+def columns():
+    return schedule_columns(
+        ids=[1, 2, 3, 4],
+        languages=['spanish', 'italian', 'spanish', 'spanish'],
+        due=['2024-03-01 08:00:00', '2024-03-02 10:00:00', '2024-02-20 00:00:00', '2024-03-04 00:00:00'],
+        interval=[0, 1, 6, 10],
+        last_reviewed=[None, '2024-03-01 10:00:00', '2024-02-14 00:00:00', '2024-02-23 00:00:00'],
+    )
+
+
+def test_deck_statistics_over_columns():
+    now = '2024-03-01 09:00:00'
+
+    assert [day['due'] for day in forecast(columns(), now, days=4)] == [2, 1, 0, 1]
+    assert forecast(columns(), now, days=2)[1]['date'] == '2024-03-02'
+    assert overdue_by_language(columns(), now) == {'spanish': 2}
+    # Recall decays by 10% per interval elapsed since the review
+    elapsed = [0, (16 + 10 / 24) / 6, (7 + 10 / 24) / 10]
+    assert expected_retention(columns(), '2024-03-01 10:00:00') == pytest.approx(sum(0.9 ** e for e in elapsed) / 3)
+
+    ids, due = rescheduled_due(columns(), 0.81)
+    assert ids.tolist() == [2, 3, 4]
+    # Half the retention's log: twice the interval
+    assert due.tolist() == ['2024-03-03 10:00:00', '2024-02-26 00:00:00', '2024-03-14 00:00:00']
+    with pytest.raises(ValueError):
+        rescheduled_due(columns(), 0.2)
+
+
+def test_study_streak():
+    days = ['2024-02-25', '2024-02-27', '2024-02-28', '2024-02-29']
+    assert study_streak(days, '2024-02-29') == 3
+    # Not broken until a whole day passes without a review
+    assert study_streak(days, '2024-03-01') == 3
+    assert study_streak(days, '2024-03-02') == 0
+    assert study_streak([], '2024-03-01') == 0
+
+
+@pytest.mark.parametrize('backend', [csv_db, sqlite_db], ids=['csv', 'sqlite'])
+def test_reschedule_and_review_days(data_dir, backend):
+    sqlite_db.close_history()
+    backend.init_database()
+    first, second = backend.save_flashcards([
+        {'word': word, 'language': 'spanish', 'translations': '', 'pronunciation': '', 'examples': ''}
+        for word in ('hola', 'adios')
+    ])
+    reviewed = backend.review_flashcard(first, 4)
+
+    deck = backend.get_schedule_columns()
+    assert deck['id'].tolist() == [first, second]
+    assert deck['interval'].tolist() == [1, 0]
+
+    assert backend.reschedule_flashcards(0.81) == 1
+    # One day at 90% retention is two at 81%
+    due = datetime.strptime(reviewed['last_reviewed'], '%Y-%m-%d %H:%M:%S') + timedelta(days=2)
+    assert backend.get_due_flashcards(now=due.strftime('%Y-%m-%d %H:%M:%S'))[-1]['word'] == 'hola'
+    assert [card['word'] for card in backend.get_due_flashcards(now=reviewed['due'])] == ['adios']
+
+    backend.flush_history()
+    assert backend.get_review_days() == [reviewed['last_reviewed'][:10]]
+    sqlite_db.close_history()
+
+
+def test_study_stats_endpoints(app_client):
+    csv_db.save_flashcards([
+        {'word': word, 'language': language, 'translations': '', 'pronunciation': '', 'examples': ''}
+        for word, language in [('hola', 'spanish'), ('ciao', 'italian')]
+    ])
+    csv_db.review_flashcard(1, 5)
+    csv_db.flush_history()
+
+    async def run():
+        async with app_client as client:
+            stats = await client.get('/api/study/stats')
+            upcoming = await client.get('/api/study/forecast', params={'days': 3})
+            rescheduled = await client.post('/api/study/reschedule', json={'retention': 0.95})
+            invalid = await client.post('/api/study/reschedule', json={'retention': 1.5})
+            home = await client.get('/')
+            return stats, upcoming, rescheduled, invalid, home
+
+    stats, upcoming, rescheduled, invalid, home = asyncio.run(run())
+
+    assert {key: stats.json()[key] for key in ('cards', 'reviewed', 'due_now', 'overdue_by_language', 'study_streak')} == {
+        'cards': 2, 'reviewed': 1, 'due_now': 1, 'overdue_by_language': {'italian': 1}, 'study_streak': 1
+    }
+    assert stats.json()['expected_retention'] == pytest.approx(1.0)
+    assert [day['due'] for day in upcoming.json()['days']] == [1, 1, 0]
+    assert rescheduled.json() == {'retention': 0.95, 'rescheduled': 1}
+    assert invalid.status_code == 422
+    assert home.status_code == 200
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from src.flashcards.database import csv_db, sqlite_db
+from src.flashcards.database.record_log import RecordLog
+from src.flashcards.database.search_index import SearchIndex, fold, tokenize
+
+
+def card(card_id, word, translations='', examples='', language='spanish'):
+    return {'id': card_id, 'word': word, 'language': language, 'translations': translations, 'examples': examples}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RecordLog(str(tmp_path / 'flashcards.log')).open()
+    store.put_many([
+        card(1, 'Hà Nội', 'Hanoi', 'Tôi sống ở Hà Nội', language='vietnamese'),
+        card(2, 'hola', 'hello, hi', 'Hola amigo|Hola, ¿qué tal?'),
+        card(3, 'holanda', 'Netherlands', 'Vivo en Holanda'),
+        card(4, 'amigo', 'friend', 'Hola amigo'),
+    ])
+    return store
+
+
+def ids(results):
+    return [card_id for card_id, _ in results]
+
+
+def test_folds_case_and_diacritics():
+    assert fold('Đà Nẵng') == 'da nang'
+    assert tokenize('¿Qué TAL, señor?') == ['que', 'tal', 'senor']
+
+
+def test_matches_folded_words_and_prefixes(store):
+    index = SearchIndex(store).open()
+
+    assert ids(index.search('ha noi')) == [1]
+    assert ids(index.search('HÀ NỘI')) == [1]
+    # The last word is a prefix; earlier ones must match whole words
+    assert ids(index.search('hol')) == [2, 3, 4]
+    assert ids(index.search('hol amigo')) == []
+    assert ids(index.search('amigo hol')) == [4, 2]
+    assert ids(index.search('hola', language='spanish')) == [2, 3, 4]
+    assert index.search('hola', language='vietnamese') == []
+
+
+def test_ranks_word_hits_above_examples(store):
+    index = SearchIndex(store).open()
+
+    # "amigo" is card 4's word but only in card 2's examples
+    assert ids(index.search('amigo')) == [4, 2]
+    # An exact word beats a completion of it
+    assert ids(index.search('hola')) == [2, 3, 4]
+    assert ids(index.search('hola', limit=1)) == [2]
+
+
+def test_follows_writes_from_any_process(store):
+    index = SearchIndex(store).open()
+    assert ids(index.search('adios')) == []
+
+    store.put(card(5, 'adiós', 'goodbye'))
+    store.put(card(2, 'buenas', 'hello'))
+    store.delete(4)
+    assert ids(index.search('adios')) == [5]
+    assert ids(index.search('hola')) == [3]
+    assert ids(index.search('amigo')) == []
+
+    # A second handle on the same file stands in for another worker
+    other = RecordLog(store.path).open()
+    other.put(card(6, 'adiós amigo', 'goodbye, friend'))
+    assert ids(index.search('adios')) == [5, 6]
+
+
+def test_restart_only_indexes_newer_cards(store, tmp_path, monkeypatch):
+    path = str(tmp_path / 'flashcards.search')
+    SearchIndex(store, path).open().save()
+
+    store.put(card(5, 'adiós', 'goodbye'))
+    store.delete(3)
+    restarted = RecordLog(store.path).open()
+
+    added = []
+    monkeypatch.setattr(SearchIndex, 'rebuild', lambda self: pytest.fail('index was rebuilt'))
+    original_add = SearchIndex._add
+    monkeypatch.setattr(SearchIndex, '_add', lambda self, record, *args: (added.append(record['id']), original_add(self, record, *args)))
+
+    index = SearchIndex(restarted, path).open()
+    assert ids(index.search('adios')) == [5]
+    assert ids(index.search('hol')) == [2, 4]
+    assert added == [5]
+
+
+def test_rebuilds_after_the_log_is_compacted(store, tmp_path):
+    path = str(tmp_path / 'flashcards.search')
+    SearchIndex(store, path).open().save()
+
+    store.delete(3)
+    assert store.compact()
+
+    index = SearchIndex(RecordLog(store.path).open(), path).open()
+    assert ids(index.search('hol')) == [2, 4]
+
+
+@pytest.mark.parametrize('backend', [csv_db, sqlite_db], ids=['csv', 'sqlite'])
+def test_search_flashcards(data_dir, backend):
+    sqlite_db.close_history()
+    backend.init_database()
+    backend.save_flashcards([
+        {'word': 'Hà Nội', 'language': 'vietnamese', 'translations': 'Hanoi', 'pronunciation': '', 'examples': ''},
+        {'word': 'hola', 'language': 'spanish', 'translations': 'hello', 'pronunciation': '', 'examples': 'Hola amigo'},
+        {'word': 'amigo', 'language': 'spanish', 'translations': 'friend', 'pronunciation': '', 'examples': 'Hola amigo'},
+    ])
+    backend.save_flashcard('hola', 'spanish', 'hello, hi', '', 'Hola amigo', flashcard_id=2)
+    backend.delete_flashcard(1)
+
+    assert backend.search_flashcards('ha noi') == []
+    results = backend.search_flashcards('amig')
+    assert [result['word'] for result in results] == ['amigo', 'hola']
+    assert results[0]['score'] >= results[1]['score']
+    assert backend.search_flashcards('hi')[0]['translations'] == 'hello, hi'
+    assert backend.search_flashcards('hola', language='vietnamese') == []
+    assert backend.search_flashcards('"*') == []
+    sqlite_db.close_history()
+
+
+def test_search_endpoint(app_client):
+    csv_db.save_flashcard('Ελλάδα', 'greek', 'Greece', '', '')
+
+    async def run():
+        async with app_client as client:
+            found = await client.get('/api/flashcards/search', params={'q': 'ελλα'})
+            missing = await client.get('/api/flashcards/search')
+            return found, missing
+
+    found, missing = asyncio.run(run())
+
+    assert [result['translations'] for result in found.json()['results']] == ['Greece']
+    assert missing.status_code == 422
@@ -0,0 +1,95 @@
+import pytest
+
+from src.flashcards.database import csv_db, history_segments, sqlite_db
+
+
+@pytest.fixture
+def sqlite_dir(data_dir):
+    """Fresh SQLite database in the test's data directory"""
+    sqlite_db.close_history()
+    yield data_dir
+    sqlite_db.close_history()
+
+
+def exercise(backend):
+    """Run the same operations against a backend and return what it reports"""
+    backend.init_database()
+    backend.save_flashcard('hola', 'spanish', 'hello', 'o-la', 'Hola amigo')
+    ids = backend.save_flashcards([
+        {'word': 'ciao', 'language': 'italian', 'translations': 'hi', 'pronunciation': '', 'examples': ''},
+        {'word': 'adios', 'language': 'spanish', 'translations': 'bye', 'pronunciation': '', 'examples': ''},
+    ])
+    backend.save_flashcard('hola', 'spanish', 'hello, hi', 'o-la', 'Hola amigo', flashcard_id=1)
+    deleted = backend.delete_flashcard(ids[0])
+    backend.save_translation_history('hello', 'hola', 'en', 'es')
+    backend.save_chat_history('hi', 'hello there')
+    backend.flush_history()
+
+    def cards(rows):
+        return [(row['id'], row['word'], row['translations']) for row in rows]
+
+    return {
+        'ids': ids,
+        'deleted': deleted,
+        'deleted_again': backend.delete_flashcard(ids[0]),
+        'all': cards(backend.get_flashcards().to_dict('records')),
+        'spanish': cards(backend.get_flashcards_by_language('spanish')),
+        'one': backend.get_flashcard(1)['translations'],
+        'missing': backend.get_flashcard(99),
+        'stats': backend.get_flashcard_stats(),
+        'queries': [(row['feature'], row['response']) for row in backend.get_query_log()],
+        'translations': [row['response'] for row in backend.get_query_log('translate')],
+        'chat': [row['ai_response'] for row in backend.get_chat_history()],
+    }
+
+
+def test_backends_behave_the_same(sqlite_dir):
+    # SQLite first, so its one-time import finds no CSV data yet
+    sqlite_result = exercise(sqlite_db)
+    csv_result = exercise(csv_db)
+
+    assert sqlite_result == csv_result
+    assert sqlite_result['all'] == [(1, 'hola', 'hello, hi'), (3, 'adios', 'bye')]
+    assert sqlite_result['stats'] == {'count': 2, 'languages': ['spanish']}
+    assert sqlite_result['queries'] == [('chat', 'hello there'), ('translate', 'hola')]
+
+
+def test_imports_csv_data_once(sqlite_dir):
+    csv_db.save_flashcard('hola', 'spanish', 'hello', '', '')
+    csv_db.save_flashcard('ciao', 'italian', 'hi', '', '')
+    csv_db.delete_flashcard(1)
+    csv_db.save_grammar_history('i has', 'I have')
+    csv_db.flush_history()
+
+    sqlite_db.init_database()
+    sqlite_db.init_database()
+
+    assert sqlite_db.get_flashcards()['id'].tolist() == [2]
+    assert [row['response'] for row in sqlite_db.get_query_log()] == ['I have']
+    # Ids continue after the imported ones and the deleted card's id isn't reused
+    sqlite_db.save_flashcard('adios', 'spanish', 'bye', '', '')
+    assert sqlite_db.get_flashcards()['id'].tolist() == [2, 3]
+
+
+def test_uses_wal_and_indexes(sqlite_dir):
+    sqlite_db.init_database()
+    conn = sqlite_db._connect()
+
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM query_log WHERE feature = ? ORDER BY id DESC LIMIT 10", ('chat',)
+    ).fetchall()
+    assert 'query_log_feature' in ' '.join(row[-1] for row in plan)
+
+
+def test_sqlite_prunes_history_past_retention(sqlite_dir, monkeypatch):
+    monkeypatch.setitem(csv_db.HISTORY_ROTATION, csv_db.QUERY_LOG_CSV, history_segments.RotationPolicy(retention_days=30))
+    sqlite_db.init_database()
+    sqlite_db.save_query_log('translate', 'old', 'old')
+    sqlite_db.save_query_log('translate', 'new', 'new')
+    conn = sqlite_db._connect()
+    with conn:
+        conn.execute("UPDATE query_log SET created_at = '2000-01-01 00:00:00' WHERE query = 'old'")
+
+    assert sqlite_db.prune_history()['query_log'] == 1
+    assert [r['query'] for r in sqlite_db.get_query_log()] == ['new']
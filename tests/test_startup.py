@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import REPO_ROOT
+
+# Generous for a loaded CI machine; benchmarks/bench_startup.py has the real numbers
+IMPORT_BUDGET_MS = float(os.getenv('IMPORT_BUDGET_MS', '1500'))
+
+HEAVY_MODULES = ['pandas', 'httpx', 'google.generativeai']
+
+
+def test_importing_the_app_is_fast_and_skips_heavy_dependencies(tmp_path):
+    env = dict(os.environ, GEMINI_API_KEY='', GOOGLE_AI_API_KEY='')
+    script = (
+        'import json, sys, time\n'
+        'started = time.perf_counter()\n'
+        'import app\n'
+        'elapsed = (time.perf_counter() - started) * 1000\n'
+        f'print(json.dumps({{"ms": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n'
+    )
+
+    result = subprocess.run([sys.executable, '-c', script], cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report['loaded'] == []
+    assert report['ms'] < IMPORT_BUDGET_MS
+
+
+def test_importing_the_app_writes_nothing(tmp_path):
+    os.makedirs(tmp_path / 'app')
+    for name in ('static', 'templates'):
+        os.symlink(os.path.join(REPO_ROOT, 'app', name), tmp_path / 'app' / name)
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, GEMINI_API_KEY='', GOOGLE_AI_API_KEY='')
+
+    result = subprocess.run([sys.executable, '-c', 'import app'], cwd=tmp_path, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert not os.path.exists(tmp_path / 'app' / 'data')
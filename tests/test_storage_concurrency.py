@@ -0,0 +1,58 @@
+import multiprocessing
+
+import pandas as pd
+
+from src.flashcards.database import csv_db
+from src.flashcards.database.record_log import RecordLog
+
+WORKERS = 4
+CARDS = 60
+
+
+def hammer(worker):
+    """Create, update and delete cards and log queries from a separate process"""
+    # Fresh handles in the child; a low threshold makes the workers compact while the others write
+    csv_db._flashcard_log = RecordLog(csv_db.FLASHCARDS_LOG, compact_min_dead=20).open()
+    csv_db._history_writer = None
+
+    created = []
+    for i in range(CARDS):
+        csv_db.save_flashcard(f'w{worker}-{i}', 'english', 'new', '', '')
+        # Another worker may have created a newer card since; find ours by word
+        card_id = next(
+            record['id'] for record in reversed(csv_db._flashcard_store().records())
+            if record['word'] == f'w{worker}-{i}'
+        )
+        created.append(card_id)
+        csv_db.save_flashcard(f'w{worker}-{i}', 'english', 'updated', '', '', flashcard_id=card_id)
+        if i % 4 == 0:
+            assert csv_db.delete_flashcard(card_id)
+        csv_db.save_query_log('stress', f'worker {worker} op {i}', 'ok')
+
+    csv_db.close_history()
+    compaction = csv_db._flashcard_store()._compaction
+    if compaction is not None:
+        compaction.join()
+    return created
+
+
+def test_workers_never_lose_or_duplicate_writes(data_dir):
+    with multiprocessing.get_context('fork').Pool(WORKERS) as pool:
+        created = pool.map(hammer, range(WORKERS))
+
+    all_ids = [card_id for ids in created for card_id in ids]
+    assert len(set(all_ids)) == WORKERS * CARDS
+
+    records = RecordLog(csv_db.FLASHCARDS_LOG).open().records()
+    expected = {
+        card_id: f'w{worker}-{i}'
+        for worker, ids in enumerate(created)
+        for i, card_id in enumerate(ids)
+        if i % 4
+    }
+    assert {record['id']: record['word'] for record in records} == expected
+    assert all(record['translations'] == 'updated' for record in records)
+
+    log = pd.read_csv(csv_db.QUERY_LOG_CSV)
+    assert len(log) == WORKERS * CARDS
+    assert log['id'].is_unique
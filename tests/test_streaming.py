@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+
+# Starlette loads anyio's asyncio backend on the first streamed response;
+# importing it here keeps that import out of the timed requests
+import anyio._backends._asyncio  # noqa: F401
+import pandas as pd
+
+from src.flashcards.ai import gemini
+from src.flashcards.ai.fake_model import FakeProvider
+from src.flashcards.database import csv_db
+
+
+def post_stream(app, path, payload):
+    """
+    Call the ASGI app directly, recording when each body chunk is sent
+
+    httpx's ASGI transport buffers the whole body, which would hide when
+    the first byte went out.
+    """
+    body = json.dumps(payload).encode()
+    chunks = []
+    status = []
+
+    async def receive():
+        nonlocal body
+        if body is None:
+            # Never disconnect; the response finishes on its own
+            await asyncio.Event().wait()
+        message = {'type': 'http.request', 'body': body, 'more_body': False}
+        body = None
+        return message
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif message.get('body'):
+            chunks.append((time.perf_counter(), message['body'].decode()))
+
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'POST',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'content-type', b'application/json')],
+        'client': ('testclient', 50000),
+        'server': ('testserver', 80),
+    }
+
+    async def run():
+        start = time.perf_counter()
+        await app(scope, receive, send)
+        return start
+
+    start = asyncio.run(run())
+    return status[0], [(at - start, text) for at, text in chunks]
+
+
+def parse_events(chunks):
+    events = []
+    for block in ''.join(text for _, text in chunks).split('\n\n'):
+        if block:
+            event, data = block.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+def test_summary_streams_before_generation_finishes(app_client, monkeypatch):
+    import app
+
+    monkeypatch.setattr(gemini, 'provider', FakeProvider(chunk_latency=0.02))
+    text = ' '.join(f'word{i}' for i in range(30))
+
+    status, chunks = post_stream(app.app, '/api/summarize/stream', {'text': text, 'length': 'short'})
+
+    assert status == 200
+    events = parse_events(chunks)
+    assert events[-1] == ('done', {})
+    assert ''.join(data['text'] for event, data in events if event == 'message') == text
+    # 30 chunks 20ms apart: the first one must not wait for the rest
+    first, last = chunks[0][0], chunks[-1][0]
+    assert first < 0.1
+    assert last > 0.5
+
+    csv_db.flush_history()
+    history = pd.read_csv(csv_db.SUMMARIZE_HISTORY_CSV)
+    assert len(history) == 1
+    assert history.iloc[0]['summary'] == text
+    assert history.iloc[0]['length'] == 'short'
+
+
+def test_chat_stream_saves_history_once(app_client, monkeypatch):
+    import app
+
+    monkeypatch.setattr(gemini, 'provider', FakeProvider())
+
+    status, chunks = post_stream(app.app, '/api/chat/stream', {'message': 'hello'})
+
+    assert status == 200
+    events = parse_events(chunks)
+    reply = ''.join(data['text'] for event, data in events if event == 'message')
+    assert reply == 'This is a response from the local fake model.'
+
+    history = csv_db.get_chat_history()
+    assert [(turn['user_message'], turn['ai_response']) for turn in history] == [('hello', reply)]
+    assert gemini.get_call_stats()['in_flight'] == 0
+
+
+class FailingModel(FakeProvider):
+    def stream(self, prompt):
+        yield 'Partial'
+        raise RuntimeError('model went away')
+
+
+def test_failed_stream_sends_error_and_saves_nothing(app_client, monkeypatch):
+    import app
+
+    monkeypatch.setattr(gemini, 'provider', FailingModel())
+
+    status, chunks = post_stream(app.app, '/api/chat/stream', {'message': 'hello'})
+
+    assert status == 200
+    assert parse_events(chunks) == [
+        ('message', {'text': 'Partial'}),
+        ('error', {'detail': 'model went away'}),
+    ]
+    assert csv_db.get_chat_history() == []
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.flashcards.ai import gemini
+from src.flashcards.ai.cache import ResponseCache
+from src.flashcards.ai.chunking import chunk_text, estimate_tokens
+from src.flashcards.ai.fake_model import FakeProvider
+
+BUDGET = 400
+
+
+def document(edited=None):
+    paragraphs = [
+        ' '.join(f'Paragraph {i} sentence {j} explains one more detail of the topic.' for j in range(5))
+        for i in range(14)
+    ]
+    if edited is not None:
+        paragraphs[edited] += ' This sentence was added in an edit.'
+    return '\n\n'.join(paragraphs)
+
+
+class CountingModel(FakeProvider):
+    """FakeProvider that records the prompts it got and the most calls in flight at once"""
+
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self.prompts = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            return super().generate(prompt)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def model(data_dir, monkeypatch):
+    model = CountingModel(latency=0.05)
+    monkeypatch.setattr(gemini, 'provider', model)
+    monkeypatch.setattr(gemini, 'response_cache', ResponseCache())
+    monkeypatch.setattr(gemini, 'SUMMARY_CHUNK_TOKENS', BUDGET)
+    monkeypatch.setattr(gemini, 'SUMMARY_MAX_PARALLEL', 2)
+    return model
+
+
+def test_chunks_end_on_boundaries_within_the_budget():
+    text = document()
+    chunks = chunk_text(text, BUDGET)
+
+    assert len(chunks) > 2
+    assert all(estimate_tokens(chunk) <= BUDGET for chunk in chunks)
+    assert all(chunk.endswith('topic.') for chunk in chunks)
+    assert '\n\n'.join(chunks).split() == text.split()
+    # A sentence longer than the budget is split between words
+    long_sentence = 'word ' * 400
+    assert [len(chunk.split()) for chunk in chunk_text(long_sentence, BUDGET)] == [320, 80]
+    assert chunk_text('  \n\n ', BUDGET) == []
+
+
+def test_edits_change_only_nearby_chunks():
+    chunks = chunk_text(document(), BUDGET)
+    edited = chunk_text(document(edited=9), BUDGET)
+
+    assert edited[:2] == chunks[:2]
+    assert 1 <= len(set(edited) - set(chunks)) <= 2
+
+
+def test_long_text_is_summarized_chunk_by_chunk(model):
+    text = document()
+    chunks = chunk_text(text, BUDGET)
+
+    def calls(*args):
+        before = len(model.prompts)
+        summary = asyncio.run(gemini.summarize(*args))
+        return len(model.prompts) - before, summary
+
+    first, summary = calls(text, 'short')
+    # Only the reduce step runs again for another length
+    other_length, _ = calls(text, 'long')
+    edited, _ = calls(document(edited=9), 'short')
+    repeated, _ = calls(document(edited=9), 'short')
+
+    changed = set(chunk_text(document(edited=9), BUDGET)) - set(chunks)
+    assert summary['summary']
+    assert first == len(chunks) + 1
+    assert other_length == 1
+    # The reduce step is cached too, and is skipped when the changed
+    # chunks' summaries come out the same
+    assert 1 <= len(changed) <= edited <= len(changed) + 1 < first
+    assert repeated == 0
+    assert model.peak == 2
+    # Section prompts carry one chunk each; the last prompt combines them
+    assert all(len(prompt) < len(text) / 2 for prompt in model.prompts)
+    assert 'summaries of consecutive sections' in model.prompts[first - 1]
+
+
+def test_long_text_streams_the_combined_summary(model):
+    async def run():
+        return [chunk async for chunk in gemini.stream_summary(document(), 'short')]
+
+    chunks = asyncio.run(run())
+
+    assert ''.join(chunks).startswith('Paragraph 0 sentence 0')
+    assert len(model.prompts) == len(chunk_text(document(), BUDGET)) + 1
@@ -0,0 +1,244 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.flashcards.utils import url_extractor
+from src.flashcards.utils.url_extractor import ExtractError, extract_text, extract_url
+
+ARTICLE = b"""<html><head><title> Photosynthesis  basics </title>
+<style>p { color: red }</style><script>var tracking = 'do not read me';</script></head>
+<body>
+<header><h1>Science Weekly</h1><p>Sign in to read more stories today.</p></header>
+<nav><a href="/">Home</a> <a href="/news">News</a></nav>
+<div class="cookie-banner">We use cookies to improve your experience.</div>
+<p>This teaser sits outside the article and is left out.</p>
+<article>
+<h2>How plants make food</h2>
+<p>Plants turn light, water and carbon dioxide into sugar.</p>
+<div class="share-links"><a href="/t">Share on social media now</a></div>
+<p>The process happens in the chloroplasts of leaf cells.<br>It releases oxygen.</p>
+<ul class="related"><li><a href="/a">Related story one</a></li></ul>
+<p><a href="/1">Read</a> <a href="/2">these</a> <a href="/3">linked</a> words</p>
+</article>
+<footer><p>Copyright 2025 Science Weekly, all rights reserved.</p></footer>
+</body></html>"""
+
+
+class StubServer:
+    """
+    A local HTTP server answering from ``routes``: path -> function(handler)
+
+    Records the path and headers of each request.
+    """
+
+    def __init__(self, routes):
+        stub = self
+        self.routes = routes
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests.append((self.path, dict(self.headers)))
+                stub.routes[self.path](self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def reply(handler, body, status=200, content_type='text/html; charset=utf-8', headers=None):
+    handler.send_response(status)
+    handler.send_header('Content-Type', content_type)
+    handler.send_header('Content-Length', str(len(body)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def conditional(handler):
+    if handler.headers.get('If-None-Match') == '"v1"':
+        handler.send_response(304)
+        handler.send_header('ETag', '"v1"')
+        handler.end_headers()
+    else:
+        reply(handler, ARTICLE, headers={'ETag': '"v1"', 'Last-Modified': 'Wed, 01 Jan 2025 00:00:00 GMT'})
+
+
+def slow(handler):
+    stub = handler.server.stub
+    with stub._lock:
+        stub.active += 1
+        stub.peak = max(stub.peak, stub.active)
+    time.sleep(0.1)
+    with stub._lock:
+        stub.active -= 1
+    reply(handler, b'<p>A slow page with some words.</p>', headers={'Cache-Control': 'no-store'})
+
+
+def stalled(handler):
+    time.sleep(1)
+
+
+def huge(handler):
+    body = b'<p>' + b'word ' * 200000 + b'</p>'
+    reply(handler, body)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(url_extractor, '_cache', type(url_extractor._cache)())
+    monkeypatch.setattr(url_extractor, '_state', {'loop': None, 'client': None, 'hosts': {}})
+    # The stub server listens on loopback
+    monkeypatch.setattr(url_extractor, 'EXTRACT_ALLOW_PRIVATE', True)
+    server = StubServer({
+        '/article': conditional,
+        '/fresh': lambda handler: reply(handler, ARTICLE, headers={'Cache-Control': 'max-age=60'}),
+        '/redirect': lambda handler: reply(handler, b'', status=302, headers={'Location': '/article'}),
+        '/to-metadata': lambda handler: reply(
+            handler, b'', status=302, headers={'Location': 'http://169.254.169.254/latest/meta-data/'}
+        ),
+        '/loop': lambda handler: reply(handler, b'', status=302, headers={'Location': '/loop'}),
+        '/plain': lambda handler: reply(handler, b'  Just some text.  ', content_type='text/plain'),
+        '/image': lambda handler: reply(handler, b'\x89PNG', content_type='image/png'),
+        '/missing': lambda handler: reply(handler, b'Not found', status=404),
+        '/empty': lambda handler: reply(handler, b'<nav>Home</nav>'),
+        '/slow': slow,
+        '/stalled': stalled,
+        '/huge': huge,
+    })
+    yield server
+    server.close()
+
+
+def fetch(*urls):
+    async def run():
+        try:
+            return await asyncio.gather(*(extract_url(url) for url in urls), return_exceptions=True)
+        finally:
+            await url_extractor.close_client()
+
+    return asyncio.run(run())
+
+
+def test_extract_text_keeps_only_the_article():
+    title, text = extract_text(ARTICLE.decode())
+
+    assert title == 'Photosynthesis basics'
+    assert text.split('\n\n') == [
+        'How plants make food',
+        'Plants turn light, water and carbon dioxide into sugar.',
+        'The process happens in the chloroplasts of leaf cells.',
+        'It releases oxygen.',
+    ]
+    # Without an article, the rest of the page is kept, minus boilerplate
+    title, text = extract_text('<div id="main-menu"><p>Skip this menu text</p></div><p>Keep this one &amp; that.</p>')
+    assert (title, text) == ('', 'Keep this one & that.')
+
+
+def test_revalidates_with_conditional_requests(stub):
+    first, second = fetch(stub.url + '/article'), fetch(stub.url + '/article')
+
+    assert first[0]['content'].startswith('How plants make food')
+    assert first[0]['title'] == 'Photosynthesis basics'
+    assert (first[0]['cached'], second[0]['cached']) == (False, True)
+    assert second[0]['content'] == first[0]['content']
+    headers = stub.requests[1][1]
+    assert headers['If-None-Match'] == '"v1"'
+    assert headers['If-Modified-Since'] == 'Wed, 01 Jan 2025 00:00:00 GMT'
+
+    # Within max-age the server is not asked at all
+    fetch(stub.url + '/fresh')
+    assert fetch(stub.url + '/fresh')[0]['cached'] is True
+    assert [path for path, _ in stub.requests].count('/fresh') == 1
+
+    redirected = fetch(stub.url + '/redirect')[0]
+    assert redirected['url'] == stub.url + '/article'
+    assert fetch(stub.url + '/plain')[0]['content'] == 'Just some text.'
+
+
+def test_cuts_off_large_pages(stub, monkeypatch):
+    monkeypatch.setattr(url_extractor, 'EXTRACT_MAX_BYTES', 50000)
+
+    result = fetch(stub.url + '/huge')[0]
+
+    assert result['truncated'] is True
+    assert len(result['content']) == url_extractor.MAX_CONTENT_CHARS
+
+
+def test_reports_pages_that_cannot_be_extracted(stub, monkeypatch):
+    monkeypatch.setattr(url_extractor, 'EXTRACT_TIMEOUT', 0.2)
+
+    errors = fetch(*(stub.url + path for path in ('/missing', '/image', '/empty', '/stalled')), 'ftp://example.com/')
+
+    assert all(isinstance(error, ExtractError) for error in errors)
+    assert [error.status_code for error in errors] == [502, 415, 422, 504, 400]
+
+
+def test_refuses_private_addresses(stub, monkeypatch):
+    monkeypatch.setattr(url_extractor, 'EXTRACT_ALLOW_PRIVATE', False)
+    check_address = url_extractor._check_address
+
+    async def stub_is_public(host, port):
+        if host != '127.0.0.1' or port != stub.server.server_port:
+            await check_address(host, port)
+
+    errors = fetch('http://127.0.0.1:9/', 'http://localhost/', 'http://[::1]/', 'http://10.0.0.1/')
+    assert [error.status_code for error in errors] == [400] * 4
+
+    # Every redirect hop is checked before it is followed
+    monkeypatch.setattr(url_extractor, '_check_address', stub_is_public)
+    error, looped = fetch(stub.url + '/to-metadata', stub.url + '/loop')
+    assert error.status_code == 400
+    assert looped.status_code == 502
+    assert [path for path, _ in stub.requests].count('/loop') == url_extractor.EXTRACT_MAX_REDIRECTS + 1
+
+
+def test_limits_concurrent_fetches_per_host(stub, monkeypatch):
+    monkeypatch.setattr(url_extractor, 'EXTRACT_PER_HOST', 2)
+
+    results = fetch(*[stub.url + '/slow'] * 6)
+
+    assert [result['content'] for result in results] == ['A slow page with some words.'] * 6
+    assert stub.peak == 2
+
+
+def test_extract_url_endpoint(app_client, stub):
+    async def run():
+        async with app_client as client:
+            found = await client.post('/api/extract-url', json={'url': stub.url + '/article'})
+            missing = await client.post('/api/extract-url', json={'url': stub.url + '/missing'})
+            blank = await client.post('/api/extract-url', json={'url': ' '})
+            url_extractor.EXTRACT_ALLOW_PRIVATE = False
+            loopback = await client.post('/api/extract-url', json={'url': stub.url + '/article'})
+        await url_extractor.close_client()
+        return found, missing, blank, loopback
+
+    found, missing, blank, loopback = asyncio.run(run())
+
+    assert found.status_code == 200
+    assert found.json()['title'] == 'Photosynthesis basics'
+    assert found.json()['truncated'] is False
+    assert missing.status_code == 502
+    assert missing.json()['detail'] == 'The page answered with HTTP 404'
+    assert blank.status_code == 400
+    assert loopback.status_code == 400
+    assert loopback.json()['detail'] == 'Pages on local or private addresses cannot be extracted'